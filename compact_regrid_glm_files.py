@@ -0,0 +1,85 @@
+"""
+Compact existing hourly regrid GLM files (regrid_hourly_glm) into one compressed file per day or per month
+python compact_regrid_glm_files.py --logname compact_regrid_2018 -d /o3p/patj/glm/regrid_hourly_glm/2018/ --parent-dir --layout monthly
+"""
+import argparse
+import logging
+import pathlib
+from sys import argv
+
+import common.log
+from common.log import logger
+from common.utils import timestamp_now_formatted, short_list_repr
+
+from softioli import sat_regrid
+from softioli import constants as cts
+from softioli.utils import generate_sat_dirname_pattern
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+
+    default_logdir = pathlib.Path(cts.DEFAULT_LOGDIR, 'compact_regrid_glm_files')
+    parser.add_argument('-l', '--logdir', default=default_logdir, help=f'log directory; default is {default_logdir}',
+                        type=pathlib.Path)
+    parser.add_argument('--logname',
+                        help='Log file prefix, resulting log file will be of the form "YYYY-MM-DD_HHmm_<log_file_prefix>.log" with YYYY: year, MM: month, DD: day, HH: hour, mm: minutes',
+                        default='compact_regrid_glm_files')
+    parser.add_argument('--loglevel',
+                        help='logging level, default=logging.DEBUG(10) - other values: INFO=10, WARNING=30, ERROR=40, CRITICAL=50',
+                        default=logging.DEBUG, type=int)
+
+    parser.add_argument('-d', '--dir-list', required=True, nargs='+', type=pathlib.Path,
+                        help='List of daily regrid directories (xxdeg_OR_GLM-L2-LCFA_YYYY_DDD) to compact')
+    parser.add_argument('--parent-dir', action='store_true',
+                        help='indicates if directory path passed with -d is a parent directory containing the daily regrid directories')
+    parser.add_argument('-s', '--sat-name', default=cts.GOES_SATELLITE_GLM,
+                        help=f'satellite name, supported satellites so far: "{cts.GOES_SATELLITE_GLM}" (default value)')
+    parser.add_argument('--regrid-res-str', default=cts.GRID_RESOLUTION_STR,
+                        help=f'grid resolution (str), default = "{cts.GRID_RESOLUTION_STR}"')
+    parser.add_argument('--layout', choices=[cts.DAILY_LAYOUT, cts.MONTHLY_LAYOUT], default=cts.DAILY_LAYOUT,
+                        help=f'consolidated file layout (default = "{cts.DAILY_LAYOUT}")')
+    parser.add_argument('--complevel', type=int, default=cts.CONSOLIDATED_COMPLEVEL,
+                        help=f'zlib compression level (default = {cts.CONSOLIDATED_COMPLEVEL})')
+    parser.add_argument('--encoding-profile', choices=list(cts.REGRID_ENCODING_PROFILES),
+                        default=cts.CONSOLIDATED_ENCODING_PROFILE,
+                        help=f'netcdf encoding profile of the consolidated files (default = "{cts.CONSOLIDATED_ENCODING_PROFILE}")')
+    parser.add_argument('--regrid-root-dir', type=pathlib.Path,
+                        help='root directory of the hourly regrid files (if different from default, mostly used when testing)')
+    parser.add_argument('--res-path', type=pathlib.Path,
+                        help='root directory of the consolidated files (if different from default, mostly used when testing)')
+    parser.add_argument('--mosaic', action='store_true',
+                        help='compact the GLM mosaic regrid files (satellite version "MOSAIC") instead of the per satellite ones')
+    parser.add_argument('--overwrite', '-o', action='store_true',
+                        help='indicates if consolidated files should be overwritten if they already exist')
+
+    args = parser.parse_args()
+
+    # logs
+    if not args.logdir.exists():
+        args.logdir.mkdir(parents=True)
+    timenow = timestamp_now_formatted(cts.TIMESTAMP_FORMAT, tz="CET")
+    logfile = str(pathlib.Path(default_logdir, f'{timenow}_{args.logname}.log'))
+    common.log.start_logging(logfile, logging_level=args.loglevel)
+
+    print(args)
+    cmd_line = ' '.join(argv)
+    logger().info(f'Running: {cmd_line}')
+    logger().debug(f'Arguments passed : {args}')
+
+    if args.parent_dir:
+        dirname_pattern = generate_sat_dirname_pattern(sat_name=args.sat_name, regrid=True,
+                                                       regrid_res_str=args.regrid_res_str)
+        dir_list = sorted(dir_path for parent_dir_path in args.dir_list
+                          for dir_path in parent_dir_path.glob(dirname_pattern))
+    else:
+        dir_list = sorted(args.dir_list)
+    logger().info(f'List of directories:\n{short_list_repr(dir_list)}')
+
+    written_file_list = sat_regrid.compact_regrid_files(dir_list=dir_list, sat_name=args.sat_name, layout=args.layout,
+                                                        grid_res_str=args.regrid_res_str, overwrite=args.overwrite,
+                                                        regrid_root_dir_path=args.regrid_root_dir,
+                                                        result_dir_path=args.res_path, complevel=args.complevel,
+                                                        encoding_profile=args.encoding_profile,
+                                                        sat_version=cts.GLM_MOSAIC_VERSION if args.mosaic else cts.Gxx_PATTERN)
+    logger().info(f'{len(written_file_list)} consolidated files written:\n{short_list_repr(written_file_list)}')
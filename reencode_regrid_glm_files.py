@@ -0,0 +1,75 @@
+"""
+Re-encode existing regrid GLM files (hourly or consolidated) in place with an encoding profile (e.g. migrate the
+legacy uncompressed archive to the compact encoding: zlib, uint16 counts, hourly time units)
+python reencode_regrid_glm_files.py --logname reencode_regrid_2018 -f /o3p/patj/glm/regrid_hourly_glm/2018/ --parent-dir --workers 8
+"""
+import argparse
+import logging
+import pathlib
+from sys import argv
+
+import common.log
+from common.log import logger
+from common.utils import timestamp_now_formatted, short_list_repr
+
+from softioli import sat_regrid
+from softioli import constants as cts
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+
+    default_logdir = pathlib.Path(cts.DEFAULT_LOGDIR, 'reencode_regrid_glm_files')
+    parser.add_argument('-l', '--logdir', default=default_logdir, help=f'log directory; default is {default_logdir}',
+                        type=pathlib.Path)
+    parser.add_argument('--logname',
+                        help='Log file prefix, resulting log file will be of the form "YYYY-MM-DD_HHmm_<log_file_prefix>.log" with YYYY: year, MM: month, DD: day, HH: hour, mm: minutes',
+                        default='reencode_regrid_glm_files')
+    parser.add_argument('--loglevel',
+                        help='logging level, default=logging.DEBUG(10) - other values: INFO=10, WARNING=30, ERROR=40, CRITICAL=50',
+                        default=logging.DEBUG, type=int)
+
+    parser.add_argument('-f', '--file-list', required=True, nargs='+', type=pathlib.Path,
+                        help='List of regrid files to re-encode (or directories)')
+    parser.add_argument('--parent-dir', action='store_true',
+                        help='indicates if paths passed with -f are directories: all the netcdf files they contain (subdirectories included) are re-encoded')
+    parser.add_argument('--encoding-profile', choices=list(cts.REGRID_ENCODING_PROFILES),
+                        default=cts.COMPACT_ENCODING_PROFILE,
+                        help=f'encoding profile (default = "{cts.COMPACT_ENCODING_PROFILE}")')
+    parser.add_argument('--complevel', type=int,
+                        help='compression level (default = encoding profile compression level)')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='number of worker processes used to re-encode the files in parallel (default = 1)')
+    parser.add_argument('--overwrite', '-o', action='store_true',
+                        help='re-encode the files even if they are already encoded with the encoding profile')
+
+    args = parser.parse_args()
+
+    # logs
+    if not args.logdir.exists():
+        args.logdir.mkdir(parents=True)
+    timenow = timestamp_now_formatted(cts.TIMESTAMP_FORMAT, tz="CET")
+    logfile = str(pathlib.Path(default_logdir, f'{timenow}_{args.logname}.log'))
+    common.log.start_logging(logfile, logging_level=args.loglevel)
+
+    print(args)
+    cmd_line = ' '.join(argv)
+    logger().info(f'Running: {cmd_line}')
+    logger().debug(f'Arguments passed : {args}')
+
+    if args.parent_dir:
+        # temp_ files are files being written by an interrupted or running job
+        file_list = sorted(file_path for dir_path in args.file_list for file_path in dir_path.rglob('*.nc')
+                           if not file_path.name.startswith('temp_'))
+    else:
+        file_list = sorted(args.file_list)
+    logger().info(f'{len(file_list)} files to re-encode:\n{short_list_repr(file_list)}')
+
+    reencode_summary = sat_regrid.reencode_regrid_files(file_list=file_list, encoding_profile=args.encoding_profile,
+                                                        complevel=args.complevel, overwrite=args.overwrite,
+                                                        workers=args.workers)
+    for status, status_file_list in reencode_summary.items():
+        logger().info(f'{len(status_file_list)} files {status}')
+        logger().debug(f'{status}: {short_list_repr(status_file_list)}')
+    if reencode_summary[cts.REGRID_FAILED]:
+        logger().error(f'Failed to re-encode the following files: {reencode_summary[cts.REGRID_FAILED]}')
@@ -32,10 +32,50 @@ if __name__ == '__main__':
     parser.add_argument('-s', '--sat-name', help='satellite name, supported satellites so far: "GOES_GLM" (default value)', default='GOES_GLM')
     parser.add_argument('--parent-dir', help='indicates if directory path passed with -f is a parent directory containing the subdirectories we need to go through to find the glm files', action='store_true')
 
-    parser.add_argument('--regrid-res-str', help='grid resolution (str), default = "05deg"',
-                        default=cts.GRID_RESOLUTION_STR)
-    parser.add_argument('--regrid-res', help='grid resolution (float), default = 0.5',
-                        default=cts.GRID_RESOLUTION)
+    parser.add_argument('--regrid-res-str', help='grid resolution (str), default = "05deg", several values (one per --regrid-res value) to regrid on several grids in a single pass over the flashes',
+                        default=cts.GRID_RESOLUTION_STR, nargs='+')
+    parser.add_argument('--regrid-res', help='grid resolution (float), default = 0.5, several values e.g. --regrid-res 0.5 1.5 --regrid-res-str 05deg 15deg',
+                        default=cts.GRID_RESOLUTION, nargs='+', type=float)
+    domain_group = parser.add_mutually_exclusive_group()
+    domain_group.add_argument('--domain-bbox', nargs=4, type=float, metavar=('LAT_MIN', 'LAT_MAX', 'LON_MIN', 'LON_MAX'),
+                              help='only write the grid cells intersecting this bbox (default: whole grid)')
+    domain_group.add_argument('--domain-regions', nargs='+', type=int,
+                              help='only write the grid cells intersecting the bbox containing these GEO_REGIONS ids (see utils/common_coords.py)')
+    domain_group.add_argument('--domain-fov', action='store_true',
+                              help='only write the grid cells intersecting the bbox containing the satellite field of view')
+    parser.add_argument('--engine', choices=cts.REGRID_ENGINES, default=cts.REGRID_ENGINE_PANDAS,
+                        help=f'regrid engine: "{cts.REGRID_ENGINE_PANDAS}" (default, xarray nearest + pandas groupby) or "{cts.REGRID_ENGINE_INDEX}" (arithmetic grid cell indices + bincount, faster)')
+
+    parser.add_argument('--layout', choices=cts.REGRID_LAYOUTS, default=cts.HOURLY_LAYOUT,
+                        help=f'regrid file layout: "{cts.HOURLY_LAYOUT}" (default, one file per hour) or "{cts.DAILY_LAYOUT}"/"{cts.MONTHLY_LAYOUT}" (hourly files also compacted into one compressed file per day/month)')
+    parser.add_argument('--output-format', choices=cts.REGRID_FORMATS, default=cts.REGRID_DENSE_FORMAT,
+                        help=f'hourly regrid file format: "{cts.REGRID_DENSE_FORMAT}" (default) or "{cts.REGRID_SPARSE_FORMAT}" (only lit cells and non-zero histogram entries stored)')
+    parser.add_argument('--encoding-profile', choices=list(cts.REGRID_ENCODING_PROFILES),
+                        default=cts.DEFAULT_REGRID_ENCODING_PROFILE,
+                        help=f'netcdf encoding profile of the regrid files (default = "{cts.DEFAULT_REGRID_ENCODING_PROFILE}", see reencode_regrid_glm_files.py to migrate existing files)')
+    parser.add_argument('--no-manifest', action='store_true',
+                        help='do NOT use the regrid manifest (regrid_manifest.sqlite in the hourly regrid root directory): only the existence of the regrid files is checked to skip hours')
+    parser.add_argument('--raw-granules', action='store_true',
+                        help='files passed with -f (or files in the directories passed with -f if --parent-dir) are raw 20 sec granules: they are grouped by hour and streamed straight into the hourly regrid files (no pre-regrid hourly file)')
+    parser.add_argument('--mosaic', action='store_true',
+                        help='regrid the files of all the GOES satellites (e.g. G16 and G17) of each hour into a single mosaic regrid file (satellite version "MOSAIC"), flashes of the overlap zone counted once')
+    parser.add_argument('--mosaic-seam', type=float, nargs='?', const=cts.GLM_MOSAIC_SEAM_LON,
+                        help=f'mosaic: keep the flashes of the overlap zone from the satellite on the same side of this seam longitude (default = {cts.GLM_MOSAIC_SEAM_LON} if no value is given) instead of the satellite with the closest sub-satellite point')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='number of worker processes used to regrid the files in parallel (default = 1, files regridded one after the other)')
+    parser.add_argument('--flash-count-cube', action='store_true',
+                        help='also write the flash counts of the regridded hours to the yearly memory-mapped flash count cubes (flash_count_cube_glm directory)')
+    parser.add_argument('--flash-count-cumsum', action='store_true',
+                        help='also update the yearly cumulative flash count cubes (prefix sums: flash count of any hour window from two reads, implies --flash-count-cube)')
+    parser.add_argument('--reference-index', action='store_true',
+                        help='also build or update the reference index (regrid_reference_index.json) of the daily regrid directories of the regridded hours (hourly regrid files of any time range opened without reading their headers)')
+    parser.add_argument('--batch', action='store_true',
+                        help='regrid the hours of each day (and satellite) together in one pass instead of one hour at a time (pre-regrid hourly files only, --engine, --chunk-size and --max-memory ignored)')
+
+    parser.add_argument('--chunk-size', type=int,
+                        help='read and regrid the flashes of each hour in slices of this number of flashes (memory-bounded regrid, same result)')
+    parser.add_argument('--max-memory', type=float,
+                        help='memory ceiling of each regrid in MB (per worker): flashes read in slices small enough to stay below it')
 
     parser.add_argument('--res-path', help='result netcdf file path (mostly used when testing)')
     parser.add_argument('--tests', help='test mode (using default test result path if --res-path arg was forgotten', action='store_true')
@@ -73,10 +113,35 @@ if __name__ == '__main__':
     else:
         naming_convention = None
 
-    regrid_sat_files(path_list=sorted(args.file_list), sat_name=args.sat_name,
-                     grid_res=args.regrid_res, grid_res_str=args.regrid_res_str,
-                     dir_list=args.parent_dir,
-                     overwrite=args.overwrite, result_dir_path=args.res_path, naming_convention=naming_convention)
+    if args.domain_bbox is not None:
+        domain = dict(zip(['LAT_MIN', 'LAT_MAX', 'LON_MIN', 'LON_MAX'], args.domain_bbox))
+    elif args.domain_regions is not None:
+        domain = args.domain_regions
+    elif args.domain_fov:
+        domain = cts.REGRID_DOMAIN_FOV
+    else:
+        domain = None
+
+    regrid_summary = regrid_sat_files(path_list=sorted(args.file_list), sat_name=args.sat_name,
+                                      grid_res=args.regrid_res, grid_res_str=args.regrid_res_str,
+                                      dir_list=args.parent_dir,
+                                      overwrite=args.overwrite, result_dir_path=args.res_path,
+                                      naming_convention=naming_convention, engine=args.engine, workers=args.workers,
+                                      layout=args.layout, output_format=args.output_format,
+                                      raw_granules=args.raw_granules, encoding_profile=args.encoding_profile,
+                                      use_manifest=not args.no_manifest, domain=domain,
+                                      chunk_size=args.chunk_size, max_memory_mb=args.max_memory,
+                                      mosaic=args.mosaic,
+                                      mosaic_rule=cts.GLM_MOSAIC_NADIR_RULE if args.mosaic_seam is None else args.mosaic_seam,
+                                      batch=args.batch, flash_count_cube_append=args.flash_count_cube,
+                                      flash_count_cumsum=args.flash_count_cumsum,
+                                      reference_index=args.reference_index)
+
+    for status, file_list in regrid_summary.items():
+        logger().info(f'{len(file_list)} files {status}')
+        logger().debug(f'{status}: {short_list_repr(file_list)}')
+    if regrid_summary[cts.REGRID_FAILED]:
+        logger().error(f'Failed to regrid the following files: {regrid_summary[cts.REGRID_FAILED]}')
 
 """
 Examples: (??)
@@ -84,6 +149,12 @@ Examples: (??)
 python sat_regrid_script_src.py --logname <logname> -f <pre_regrid_file_path> --res-path <res_path> --overwrite
 - regrid ALL pre_regrid hourly GLM files in /o3p/macc/glm
 
+- regrid raw 20 sec GLM files straight into hourly regrid files (no pre-regrid hourly file):
+python sat_regrid_script_src.py --logname <logname> -f <raw_granules_dir> --parent-dir --raw-granules
+
+- regrid only the cells of the North America and North Atlantic GEO_REGIONS:
+python sat_regrid_script_src.py --logname <logname> -f <pre_regrid_dir> --parent-dir --domain-regions 0 1 3 5
+
 - tests parent dir
 python sat_regrid_script_src.py --logname new_tests_regrid_dir_parent -f /o3p/macc/glm/ --parent-dir --tests --old-temp-glm-filename
 """
@@ -3,7 +3,9 @@ UPGRADES: gérer pour aller chercher les données satellites de PLUSIEURS satell
 Faut que je connaisse la zone couverte par FP out et que je lance get_sat_ds sur plusieurs sat
 """
 import argparse
+import contextlib
 import numpy as np
+import os
 import pandas as pd
 import pathlib
 import xarray as xr
@@ -15,8 +17,15 @@ from fpsim import check_fp_status
 import utils
 from utils import constants as cts
 from utils import GLMPathParser
+from utils import flash_count_cube
+from utils import regrid_reference_index
+from utils import dask_utils
+from utils import sparse_footprint_utils
+from utils.fp_release_windows import FpOutReleaseWindows
+from utils.sat_file_catalogue import SatFileCatalogue, get_sat_file_catalogue_path
 import sat_regrid
-from utils.sat_utils import generate_sat_dir_list_between_start_end_date, get_sat_files_list_between_start_end_date
+from utils.sat_utils import generate_sat_dir_list_between_start_end_date, get_sat_files_list_between_start_end_date, \
+    get_sat_consolidated_files_list_between_start_end_date, generate_sat_hourly_filename_pattern
 from utils.fp_utils import get_fpout_nc_file_path_from_fp_dir
 
 
@@ -49,7 +58,7 @@ def get_fp_out_da(fpout_path, sum_height=True, load=False, chunks='auto', max_ch
 
 
 def get_fp_out_ds_7days(fpout_path, sum_height=True, load=False, chunks='auto', max_chunk_size=1e8,
-                        assign_releases_position_coords=False):
+                        assign_releases_position_coords=False, lazy=False, lazy_chunks=cts.FP_SAT_LAZY_CHUNKS):
     """
 
     :param fpout_path:
@@ -58,6 +67,10 @@ def get_fp_out_ds_7days(fpout_path, sum_height=True, load=False, chunks='auto',
     :param chunks:
     :param max_chunk_size:
     :param assign_releases_position_coords:
+    :param lazy: <bool> if True, nothing is computed: the time steps and releases outside of all the 7 days windows are
+                    dropped by index (mask computed from the coordinates and release dates only), spec001_mr is masked
+                    lazily and rechunked with lazy_chunks (load ignored, see get_weighted_fp_sat_lazy_ds)
+    :param lazy_chunks: <dict> { <dim>: <int>, ... } spec001_mr chunks if lazy
     :return:
     """
     if not pathlib.Path(fpout_path).exists():
@@ -76,22 +89,102 @@ def get_fp_out_ds_7days(fpout_path, sum_height=True, load=False, chunks='auto',
     # get "end" date (release_start_date - 7 days)
     end_dates = release_start_dates - np.timedelta64(7, 'D')
     # get spec001_mr over 7 days
-    date_mask = ((fp_ds.time >= end_dates) & (fp_ds.time <= release_start_dates)).compute()
-    fp_da = fp_ds.where(date_mask, drop=True).spec001_mr
+    if lazy:
+        # release dates loaded (one value per release) so that the mask does not depend on any dask array
+        date_mask = (fp_ds.time >= end_dates.load()) & (fp_ds.time <= release_start_dates.load())
+        # same time steps and releases as where(drop=True)
+        window_index = {'time': date_mask.any('pointspec').values, 'pointspec': date_mask.any('time').values}
+        fp_da = fp_ds.spec001_mr.isel(window_index).where(date_mask.isel(window_index))
+        fp_da = fp_da.chunk({dim: chunk for dim, chunk in lazy_chunks.items() if dim in fp_da.dims})
+    else:
+        date_mask = ((fp_ds.time >= end_dates) & (fp_ds.time <= release_start_dates)).compute()
+        fp_da = fp_ds.where(date_mask, drop=True).spec001_mr
     # merge rel info and spec001_mr
     fp_ds = xr.merge([fp_da, rel_ds])
     # load et cie
     if sum_height:
         fp_ds = fp_ds.sum('height')
-    if load:
+    if load and not lazy:
         fp_ds.load()
     return fp_ds
 
 
+def get_fp_out_release_windows(fpout_path, sum_height=True, chunks='auto', max_chunk_size=1e8,
+                               assign_releases_position_coords=False):
+    """
+    Alternative to get_fp_out_ds_7days: spec001_mr of each release over its own 7 days window only, selected by index
+    from the release dates (no (time, pointspec) mask of the whole cube, only the hyperslab of each release is read)
+    :param fpout_path:
+    :param sum_height:
+    :param chunks: <!> the hyperslabs are read chunk by chunk: time chunks smaller than the windows (e.g. {'time': 24})
+                    avoid reading time steps outside of the windows
+    :param max_chunk_size:
+    :param assign_releases_position_coords:
+    :return: <utils.fp_release_windows.FpOutReleaseWindows>
+    """
+    if not pathlib.Path(fpout_path).exists():
+        raise ValueError(f'fp_path {fpout_path} does NOT exist')
+    fp_ds = open_fp_dataset(fpout_path, chunks=chunks, max_chunk_size=max_chunk_size,
+                            assign_releases_position_coords=assign_releases_position_coords) \
+        .squeeze('nageclass')
+    # rename numpoint dimension to pointspec
+    fp_ds = fp_ds.rename({'numpoint': 'pointspec'})
+    return FpOutReleaseWindows(fp_ds, window=pd.Timedelta(cts.FP_RELEASE_WINDOW_DAYS, 'D'), sum_height=sum_height)
+
+
+def get_sparse_footprint_ds(fpout_path, threshold=None, top_k=None, sum_height=True, chunks='auto',
+                            max_chunk_size=1e8, assign_releases_position_coords=False,
+                            slab_hours=cts.FP_SAT_STREAMING_SLAB_HOURS, overwrite=False, print_debug=False):
+    """
+    Alternative to get_fp_out_ds_7days: 7 days windows of the FLEXPART output as sparse (COO) footprints (see
+    utils.sparse_footprint_utils.dense_to_sparse_footprint_ds), stored next to the FLEXPART output file and reused as long
+    as they were built with the same threshold and top_k
+    :param fpout_path:
+    :param threshold: <float> cells below threshold x max value of each footprint dropped (None: no threshold)
+    :param top_k: <int> only the top_k cells of each footprint kept (None: no limit)
+    :param sum_height: <!> must be True (footprints summed over height)
+    :param chunks:
+    :param max_chunk_size:
+    :param assign_releases_position_coords:
+    :param slab_hours: <int> number of time steps of the FLEXPART output read at once to build the sparse footprints
+    :param overwrite: <bool> if True, the sparse footprints are built again even if a matching file exists
+    :param print_debug:
+    :return: <xarray.Dataset> sparse footprints + release variables (RELxxxx)
+    """
+    sparse_fp_path = sparse_footprint_utils.get_sparse_footprint_path(fpout_path)
+    if sparse_fp_path.exists() and not overwrite:
+        sparse_fp_ds = xr.open_dataset(sparse_fp_path)
+        if sparse_footprint_utils.is_sparse_footprint_ds_matching(sparse_fp_ds, threshold=threshold, top_k=top_k):
+            if print_debug:
+                print(f'Sparse footprints: {sparse_fp_path}')
+            return sparse_fp_ds
+        sparse_fp_ds.close()
+    fp_ds = get_fp_out_ds_7days(fpout_path=fpout_path, sum_height=sum_height, chunks=chunks,
+                                max_chunk_size=max_chunk_size,
+                                assign_releases_position_coords=assign_releases_position_coords, lazy=True,
+                                lazy_chunks={**cts.FP_SAT_LAZY_CHUNKS, 'time': slab_hours})
+    with fp_ds:
+        sparse_fp_ds = sparse_footprint_utils.dense_to_sparse_footprint_ds(fp_ds['spec001_mr'], threshold=threshold,
+                                                                           top_k=top_k, slab_hours=slab_hours)
+        rel_ds = fp_ds.drop_vars([var for var in fp_ds.data_vars if not 'REL' in var]).load()
+    sparse_fp_ds = xr.merge([sparse_fp_ds, rel_ds], combine_attrs='override')
+    temp_sparse_fp_path = sparse_fp_path.parent / f'temp_{sparse_fp_path.name}'
+    sparse_fp_ds.to_netcdf(temp_sparse_fp_path)
+    os.replace(temp_sparse_fp_path, sparse_fp_path)
+    retained_mass_fraction = sparse_footprint_utils.get_retained_mass_fraction(sparse_fp_ds)
+    release_retained_mass_fraction = sparse_footprint_utils.get_retained_mass_fraction(sparse_fp_ds, dim='time')
+    print(f'Sparse footprints: {sparse_fp_path} ({sparse_fp_ds.sizes[sparse_footprint_utils.FOOTPRINT_ENTRY_DIM]} '
+          f'cells, retained sensitivity mass: {float(retained_mass_fraction):.2%}, '
+          f'min per release: {float(release_retained_mass_fraction.min()):.2%})')
+    return sparse_fp_ds
+
+
 # TODO: suppr dry_run une fois que les tests sont finis
 # TODO: pour avoir un sat_ds avec PLUSIEURS sources sat --> sat_name = list, for loop et ensuite je merge tout ?
 def get_satellite_ds(start_date, end_date, sat_name, grid_resolution=cts.GRID_RESOLUTION,
-                     grid_res_str=cts.GRID_RESOLUTION_STR, overwrite=False, dry_run=False, print_debug=False):
+                     grid_res_str=cts.GRID_RESOLUTION_STR, overwrite=False, dry_run=False, print_debug=False,
+                     layout=cts.HOURLY_LAYOUT, mosaic=False, in_memory=False, catalogue=None, reference_index=False,
+                     use_manifest=False, use_flash_count_cube=False):
     """
     Returns dataset with regridded satellite data between start and end date
     @param start_date:
@@ -101,9 +194,64 @@ def get_satellite_ds(start_date, end_date, sat_name, grid_resolution=cts.GRID_RE
     @param grid_res_str:
     @param overwrite:
     @param dry_run:
+    @param layout: <str> 'hourly' (default): open the hourly regrid files, 'daily' or 'monthly': open the consolidated
+                    regrid files (missing consolidated files are generated from the hourly regrid files first)
+    @param mosaic: <bool> if True, open the GLM mosaic regrid files (all the GOES satellites in a single product, see
+                    sat_regrid.generate_lightning_sat_hourly_mosaic_regrid_file) instead of the per satellite ones
+    @param in_memory: <bool> if True, the missing hours are regridded in memory (sat_regrid.regrid_sat_files_in_memory)
+                    instead of being written to the regrid archive (hourly regrid files opened for the other hours,
+                    even if layout is 'daily' or 'monthly' when consolidated files are missing)
+    @param catalogue: <utils.sat_file_catalogue.SatFileCatalogue> if not None, the files are listed from the satellite
+                    file catalogue (directories listed again only if they changed) instead of globbing the directories
+    @param reference_index: <bool> if True, the hourly regrid files are opened from the reference indexes of their
+                    daily directories (single lazy dataset without opening the files, see
+                    utils.regrid_reference_index), missing or stale indexes are built after falling back to
+                    open_mfdataset
+    @param use_manifest: <bool> if True, the missing directories are regridded using the regrid manifest (see
+                    sat_regrid.regrid_sat_files), only the existence of the regrid files is checked otherwise (default)
+    @param use_flash_count_cube: <bool> if True, the flash counts are read from the yearly flash count cubes (see
+                    utils.flash_count_cube, cubes generated with sat_regrid.regrid_sat_files flash_count_cube_append=True)
+                    instead of the regrid files: flash_count variable only, nothing regridded (layout, in_memory,
+                    catalogue and reference_index ignored). Mosaic cubes only (one cube per satellite version
+                    otherwise) <!> hours missing from the cubes are NaN (no flash)
     @return:
     """
     start_date, end_date = utils.date_to_pd_timestamp(start_date), utils.date_to_pd_timestamp(end_date)
+    if layout not in cts.REGRID_LAYOUTS:
+        raise ValueError(f'{layout} {cts.REGRID_LAYOUT_VALUE_ERROR}')
+    sat_version = cts.GLM_MOSAIC_VERSION if mosaic else cts.Gxx_PATTERN
+    if use_flash_count_cube:
+        if sat_name != cts.GOES_SATELLITE_GLM:
+            raise ValueError(f'{sat_name} {cts.SAT_VALUE_ERROR}')
+        if not mosaic:
+            raise ValueError(cts.FLASH_COUNT_CUBE_MOSAIC_VALUE_ERROR)
+        if dry_run:
+            return None
+        # memory-mapped cubes: no file opened per hour (same flash_count values as the regrid files)
+        try:
+            flash_count_da = flash_count_cube.open_flash_count_cube_da(
+                start_date=start_date, end_date=end_date, grid_res_str=grid_res_str,
+                sat_version=sat_version, masked=True)
+        except FileNotFoundError as e:
+            # (not a missing GLM download, see fpout_sat_comparison)
+            raise RuntimeError(f'{e}, generate it with sat_regrid_script_src.py --flash-count-cube') from e
+        return flash_count_da.to_dataset()
+    in_memory_sat_ds = None
+    if layout != cts.HOURLY_LAYOUT:
+        missing_periods = get_sat_consolidated_files_list_between_start_end_date(start_date=start_date,
+                                                                                 end_date=end_date, sat_name=sat_name,
+                                                                                 layout=layout,
+                                                                                 regrid_res_str=grid_res_str,
+                                                                                 missing=True, sat_version=sat_version,
+                                                                                 catalogue=catalogue)
+        if not missing_periods:
+            return open_consolidated_satellite_ds(start_date=start_date, end_date=end_date, sat_name=sat_name,
+                                                  layout=layout, grid_res_str=grid_res_str, dry_run=dry_run,
+                                                  print_debug=print_debug, sat_version=sat_version,
+                                                  catalogue=catalogue)
+        if print_debug:
+            print(f'Missing {layout} consolidated files: {missing_periods}')
+            print()
     # list of daily directories containing the hourly satellite data files between start and end date
     regrid_daily_dir_list = generate_sat_dir_list_between_start_end_date(start_date=start_date, end_date=end_date,
                                                                          satellite=sat_name, regrid=True)
@@ -112,7 +260,12 @@ def get_satellite_ds(start_date, end_date, sat_name, grid_resolution=cts.GRID_RE
     else:
         raise ValueError(f'{sat_name} {cts.SAT_VALUE_ERROR}')
 
-    # get list of missing regrid sat dir
+    # get list of missing regrid sat dir (mosaic: regrid dir without any mosaic file, e.g. only per satellite files)
+    sat_fname_pattern = generate_sat_hourly_filename_pattern(sat_name=sat_name, regrid=True, sat_version=sat_version)
+    if catalogue is not None:
+        catalogue.refresh_dirs(regrid_daily_dir_list)
+        mosaic_dir_set = {file_path.parent for file_path in catalogue.get_file_list(
+            regrid=True, regrid_res_str=grid_res_str, sat_version=sat_version, dir_list=regrid_daily_dir_list)}
     missing_raw_daily_dir_list = {
         utils.generate_sat_dir_path(
             date=SatPathParser(regrid_dir_path, directory=True, regrid=True) \
@@ -120,7 +273,10 @@ def get_satellite_ds(start_date, end_date, sat_name, grid_resolution=cts.GRID_RE
             sat_name=sat_name,
             regrid=False
         )
-        for regrid_dir_path in regrid_daily_dir_list if not regrid_dir_path.exists()
+        for regrid_dir_path in regrid_daily_dir_list
+        if not regrid_dir_path.exists() or (mosaic and (regrid_dir_path.absolute() not in mosaic_dir_set
+                                                        if catalogue is not None
+                                                        else not any(regrid_dir_path.glob(sat_fname_pattern))))
     }
     # check if missing_raw_daily_dir_list is empty, if not --> check if pre-regrid directories exist
     if missing_raw_daily_dir_list:
@@ -137,10 +293,31 @@ def get_satellite_ds(start_date, end_date, sat_name, grid_resolution=cts.GRID_RE
             if print_debug:
                 print(f'Directories to regrid: {sorted(dir_to_regrid_list)}')
                 print()
-            if not dry_run:
-                sat_regrid.regrid_sat_files(path_list=list(dir_to_regrid_list), sat_name=sat_name,
-                                            grid_res=grid_resolution, dir_list=True,
-                                            grid_res_str=grid_res_str, overwrite=overwrite, naming_convention=None)
+            if not dry_run and in_memory:
+                # pre-regrid files of the directories to regrid between start and end date (any satellite version,
+                # mosaic of each hour if mosaic) <!> whole period listed so that the first/last day hours are sliced
+                pre_regrid_file_list = [
+                    file_path
+                    for file_path in get_sat_files_list_between_start_end_date(
+                        dir_list=generate_sat_dir_list_between_start_end_date(start_date=start_date, end_date=end_date,
+                                                                              satellite=sat_name, regrid=False),
+                        start_date=start_date, end_date=end_date, sat_name=sat_name, regrid=False,
+                        catalogue=catalogue)
+                    if file_path.parent in dir_to_regrid_list
+                ]
+                in_memory_sat_ds = sat_regrid.regrid_sat_files_in_memory(pre_regrid_file_list, sat_name=sat_name,
+                                                                         grid_res=grid_resolution, mosaic=mosaic)
+            elif not dry_run:
+                regrid_summary = sat_regrid.regrid_sat_files(path_list=list(dir_to_regrid_list), sat_name=sat_name,
+                                                             grid_res=grid_resolution, dir_list=True,
+                                                             grid_res_str=grid_res_str, overwrite=overwrite,
+                                                             naming_convention=None, mosaic=mosaic,
+                                                             use_manifest=use_manifest)
+                # failed hours would be silently missing from sat_ds (weighted flash counts too low)
+                if regrid_summary[cts.REGRID_FAILED]:
+                    raise RuntimeError(
+                        f'Failed to regrid the following files, see the regrid errors above: \n'
+                        f'{short_list_repr(regrid_summary[cts.REGRID_FAILED])}')
         # if we still have missing pre-regrid directories --> FileNotFoundError
         if missing_raw_daily_dir_list - dir_to_regrid_list:
             # get the missing dates from the remaining missing directory paths to display them in the error message
@@ -150,20 +327,96 @@ def get_satellite_ds(start_date, end_date, sat_name, grid_resolution=cts.GRID_RE
             )
             raise FileNotFoundError(
                 f'The GLM files for the following dates are missing, please download them from the ICARE server and try again: \n{sorted(missing_dates)}')
+    if layout != cts.HOURLY_LAYOUT and not in_memory:
+        # generate the missing consolidated files from the hourly regrid files
+        if not dry_run:
+            sat_regrid.compact_regrid_files(
+                dir_list=[
+                    d_path for d_path in regrid_daily_dir_list
+                    if d_path.exists() and utils.get_consolidated_period_start_date(
+                        date=SatPathParser(d_path, directory=True, regrid=True), layout=layout) in missing_periods
+                ],
+                sat_name=sat_name, layout=layout, grid_res_str=grid_res_str, overwrite=overwrite,
+                sat_version=sat_version)
+        return open_consolidated_satellite_ds(start_date=start_date, end_date=end_date, sat_name=sat_name,
+                                              layout=layout, grid_res_str=grid_res_str, dry_run=dry_run,
+                                              print_debug=print_debug, sat_version=sat_version,
+                                              catalogue=catalogue)
     # get list of satellite data files between start and end date
     regrid_daily_file_list = get_sat_files_list_between_start_end_date(dir_list=sorted(regrid_daily_dir_list),
                                                                        start_date=start_date, end_date=end_date,
-                                                                       sat_name=sat_name, regrid=True)
+                                                                       sat_name=sat_name, regrid=True,
+                                                                       sat_version=sat_version, catalogue=catalogue)
     if print_debug:
         print(f'Regrid daily file list: {short_list_repr(regrid_daily_file_list)}')
         print()
     if not dry_run:
+        if not regrid_daily_file_list:
+            return in_memory_sat_ds
         # create a dataset merging all the regrid hourly files
-        sat_ds = xr.open_mfdataset(regrid_daily_file_list,
-                                   combine_attrs='drop_conflicts')  # TODO: <?> utiliser dask: ajouter parallel=True
+        # hourly regrid files can be stored in dense or sparse format
+        if reference_index:
+            sat_ds = regrid_reference_index.open_regrid_mfdataset_from_index(regrid_daily_file_list, update_index=True,
+                                                                             print_debug=print_debug)
+        else:
+            sat_ds = utils.sparse_regrid_utils.open_regrid_mfdataset(regrid_daily_file_list)  # TODO: <?> utiliser dask: ajouter parallel=True
+        if in_memory_sat_ds is not None:
+            # hours regridded in memory merged with the hours of the regrid archive
+            sat_ds = xr.concat([sat_ds, in_memory_sat_ds], dim='time', combine_attrs='drop_conflicts').sortby('time')
         return sat_ds
 
 
+def get_satellite_flash_count_window_sum(start_date, end_date, sat_name, grid_res_str=cts.GRID_RESOLUTION_STR,
+                                         sat_version=cts.GLM_MOSAIC_VERSION):
+    """
+    Returns the flash counts summed over hour windows (e.g. the 7 days before each release of a FLEXPART simulation,
+    for a coarse screening) read from the cumulative flash count cubes: two rows read per window whatever its length
+    (see utils.flash_count_cube.CumulativeFlashCountCube, cubes generated with sat_regrid.regrid_sat_files
+    flash_count_cumsum=True)
+    <!> cells without any flash and hours missing from the flash count cubes are counted as 0
+    @param start_date: <pandas.Timestamp> or array-like of window start dates
+    @param end_date: <pandas.Timestamp> or array-like of window end dates
+    @param sat_name: <str>
+    @param grid_res_str: <str>
+    @param sat_version: <str> satellite version of the cubes e.g.: 'G16', default: 'MOSAIC' (all the GOES satellites)
+    @return: <xarray.DataArray> (window, latitude, longitude), (latitude, longitude) if single dates
+    """
+    if sat_name != cts.GOES_SATELLITE_GLM:
+        raise ValueError(f'{sat_name} {cts.SAT_VALUE_ERROR}')
+    return flash_count_cube.get_flash_count_window_sum_da(start_date=start_date, end_date=end_date,
+                                                          grid_res_str=grid_res_str, sat_version=sat_version)
+
+
+def open_consolidated_satellite_ds(start_date, end_date, sat_name, layout, grid_res_str=cts.GRID_RESOLUTION_STR,
+                                   dry_run=False, print_debug=False, sat_version=cts.Gxx_PATTERN, catalogue=None):
+    """
+    Returns dataset with regridded satellite data between start and end date opened from the consolidated (daily or
+    monthly) regrid files
+    @param start_date: <pandas.Timestamp>
+    @param end_date: <pandas.Timestamp>
+    @param sat_name: <str>
+    @param layout: <str> 'daily' or 'monthly'
+    @param grid_res_str: <str>
+    @param dry_run: <bool>
+    @param print_debug: <bool>
+    @param sat_version: <str> satellite version (pattern), default: any GOES satellite, 'MOSAIC' for GLM mosaic files
+    @param catalogue: <utils.sat_file_catalogue.SatFileCatalogue> see get_satellite_ds
+    @return: <xarray.Dataset> (None if dry_run)
+    """
+    consolidated_file_list = get_sat_files_list_between_start_end_date(dir_list=None, start_date=start_date,
+                                                                       end_date=end_date, sat_name=sat_name,
+                                                                       regrid=True, regrid_res_str=grid_res_str,
+                                                                       layout=layout, sat_version=sat_version,
+                                                                       catalogue=catalogue)
+    if print_debug:
+        print(f'Consolidated file list: {short_list_repr(consolidated_file_list)}')
+        print()
+    if not dry_run:
+        sat_ds = xr.open_mfdataset(consolidated_file_list, combine_attrs='drop_conflicts')
+        # consolidated files contain whole days/months --> same hours as the hourly files between start and end date
+        return sat_ds.sel(time=slice(start_date.floor('h'), end_date))
+
+
 def get_weighted_flash_count(spec001_mr_da, flash_count_da):
     """
 
@@ -174,6 +427,49 @@ def get_weighted_flash_count(spec001_mr_da, flash_count_da):
     return (spec001_mr_da * flash_count_da).sum(['latitude', 'longitude']) / 3600
 
 
+def is_sat_sub_grid(fp_ds, sat_ds):
+    """
+    @param fp_ds: <xarray.Dataset> FLEXPART output
+    @param sat_ds: <xarray.Dataset> satellite dataset on the FLEXPART grid or on a sub-grid of it (cropped regrid files)
+    @return: <bool> True if sat_ds only covers a sub-grid of the FLEXPART grid
+    """
+    return any(sat_ds.sizes[dim] != fp_ds.sizes[dim] or
+               not np.allclose(sat_ds[dim].values, fp_ds[dim].values, rtol=0., atol=1e-6)
+               for dim in ['latitude', 'longitude'])
+
+
+def get_sat_sub_grid_fp_ds(fp_ds, sat_ds):
+    """
+    @param fp_ds: <xarray.Dataset> FLEXPART output
+    @param sat_ds: <xarray.Dataset> satellite dataset on a sub-grid of the FLEXPART grid
+    @return: <xarray.Dataset> FLEXPART output cropped to the satellite sub-grid cells (satellite latitude and longitude
+                    coordinates)
+    """
+    lat_index = utils.xarray_pandas_utils.get_sub_grid_index(sat_ds['latitude'].values, fp_ds['latitude'].values)
+    lon_index = utils.xarray_pandas_utils.get_sub_grid_index(sat_ds['longitude'].values, fp_ds['longitude'].values)
+    return fp_ds.isel(latitude=lat_index, longitude=lon_index) \
+        .assign_coords(latitude=sat_ds['latitude'], longitude=sat_ds['longitude'])
+
+
+def get_sat_sub_grid_spec001_mr(fp_ds, sat_ds):
+    """
+    @param fp_ds: <xarray.Dataset> FLEXPART output
+    @param sat_ds: <xarray.Dataset> satellite dataset on a sub-grid of the FLEXPART grid
+    @return: <xarray.DataArray> spec001_mr of the satellite sub-grid cells (satellite latitude and longitude coordinates)
+    """
+    return get_sat_sub_grid_fp_ds(fp_ds[['spec001_mr']], sat_ds)['spec001_mr']
+
+
+def get_fp_sat_time(fp_ds, sat_ds):
+    """
+    @param fp_ds: <xarray.Dataset> FLEXPART output (or sparse footprints)
+    @param sat_ds: <xarray.Dataset>
+    @return: <xarray.DataArray> time steps of the merged FLEXPART output / satellite dataset (outer join, see
+                    get_weighted_fp_sat_ds)
+    """
+    return xr.align(fp_ds['time'], sat_ds['time'], join='outer')[0]['time']
+
+
 def get_weighted_fp_sat_ds(fp_ds, sat_ds, sum_height=True, load=False, chunks='auto',
                            max_chunk_size=1e8, assign_releases_position_coords=False):
     """
@@ -200,71 +496,299 @@ def get_weighted_fp_sat_ds(fp_ds, sat_ds, sum_height=True, load=False, chunks='a
     if not isinstance(sat_ds, xr.Dataset):
         raise TypeError(
             f'Invalid sat_ds ({sat_ds}). Expecting <xarray.Dataset> object')
+    if is_sat_sub_grid(fp_ds, sat_ds):
+        # regrid files cropped to a sub-domain of the FLEXPART grid (see regrid domain in sat_regrid): FLEXPART output
+        # cropped to the satellite sub-grid (no flash outside of it, cells outside of the domain count as 0)
+        fp_ds = get_sat_sub_grid_fp_ds(fp_ds, sat_ds)
     # merge fp da and sat ds
     fp_sat_ds = xr.merge([fp_ds, sat_ds], combine_attrs='drop_conflicts')
-    # get weighted flash count
     fp_sat_ds['weighted_flash_count'] = get_weighted_flash_count(spec001_mr_da=fp_sat_ds['spec001_mr'],
                                                                  flash_count_da=fp_sat_ds['flash_count'])
     return fp_sat_ds
 
 
+def get_weighted_fp_sat_lazy_ds(fp_ds, sat_ds, chunks=cts.FP_SAT_LAZY_CHUNKS):
+    """
+    Lazy version of get_weighted_fp_sat_ds: weighted_flash_count is built as a dask graph straight from spec001_mr and
+    flash_count (same time steps, chunks aligned on time and pointspec, latitude and longitude not split), without the
+    merged FLEXPART output / satellite dataset. Nothing is read until the result is computed (one chunk of each array
+    per task in memory, see dask_utils.dask_scheduler)
+    @param fp_ds: <xarray.Dataset> see get_fp_out_ds_7days (lazy=True)
+    @param sat_ds: <xarray.Dataset> see get_satellite_ds
+    @param chunks: <dict> { <dim>: <int>, ... } time and pointspec chunks
+    @return: <xarray.Dataset> weighted_flash_count (time, pointspec) dask array + release variables (RELxxxx) of fp_ds
+                    (same values as get_weighted_fp_sat_ds)
+    """
+    if not isinstance(fp_ds, xr.Dataset):
+        raise TypeError(f'Invalid fp_ds ({fp_ds}). Expecting <xarray.Dataset> object')
+    if not isinstance(sat_ds, xr.Dataset):
+        raise TypeError(f'Invalid sat_ds ({sat_ds}). Expecting <xarray.Dataset> object')
+    # flash count computed on the satellite sub-grid only (see get_weighted_fp_sat_ds)
+    lat_index = utils.xarray_pandas_utils.get_sub_grid_index(sat_ds['latitude'].values, fp_ds['latitude'].values)
+    lon_index = utils.xarray_pandas_utils.get_sub_grid_index(sat_ds['longitude'].values, fp_ds['longitude'].values)
+    spec001_mr_da = fp_ds['spec001_mr'].isel(latitude=lat_index, longitude=lon_index) \
+        .assign_coords(latitude=sat_ds['latitude'], longitude=sat_ds['longitude'])
+    # time steps of the product (inner join) selected before chunking so that the chunks of both arrays match
+    spec001_mr_da, flash_count_da = xr.align(spec001_mr_da, sat_ds['flash_count'], join='inner')
+    spec001_mr_da = spec001_mr_da.chunk({dim: chunks.get(dim, -1) for dim in spec001_mr_da.dims})
+    flash_count_da = flash_count_da.chunk({dim: chunks.get(dim, -1) for dim in flash_count_da.dims})
+    weighted_flash_count_da = get_weighted_flash_count(spec001_mr_da=spec001_mr_da, flash_count_da=flash_count_da)
+    # time steps without FLEXPART output or satellite data: 0 (same as get_weighted_fp_sat_ds)
+    weighted_flash_count_da = weighted_flash_count_da.reindex(time=get_fp_sat_time(fp_ds, sat_ds), fill_value=0.)
+    rel_ds = fp_ds.drop_vars([var for var in fp_ds.data_vars if not 'REL' in var])
+    # (time coordinate of rel_ds: FLEXPART output time steps only, included in the weighted flash count ones)
+    return xr.merge([rel_ds, weighted_flash_count_da.rename('weighted_flash_count')], join='outer',
+                    combine_attrs='drop_conflicts')
+
+
+def get_weighted_fp_sat_streaming_ds(fp_ds, sat_ds, slab_hours=cts.FP_SAT_STREAMING_SLAB_HOURS):
+    """
+    Streaming version of get_weighted_fp_sat_ds (bounded memory): the common time steps of spec001_mr and flash_count
+    are computed by slabs of whole spec001_mr time chunks (at most slab_hours hours unless a chunk is larger, see
+    dask_utils.get_chunk_aligned_slabs) so that each chunk is read once, all the releases of a slab in a single
+    dask.compute. The weighted sums of each slab are kept and the slab is released before the next one is computed.
+    Peak memory: the spec001_mr chunks being processed (one per dask worker) and one slab of flash_count, whatever the
+    simulation duration and number of releases
+    @param fp_ds: <xarray.Dataset> see get_fp_out_ds_7days (lazy=True, source time chunks kept, one release per chunk)
+    @param sat_ds: <xarray.Dataset> see get_satellite_ds
+    @param slab_hours: <int> maximum number of time steps of each slab (slabs of slab_hours time steps if spec001_mr
+                    is not a dask array)
+    @return: <xarray.Dataset> weighted_flash_count (pointspec, time) + release variables (RELxxxx) of fp_ds (same
+                    values as get_weighted_fp_sat_ds)
+    """
+    if not isinstance(fp_ds, xr.Dataset):
+        raise TypeError(f'Invalid fp_ds ({fp_ds}). Expecting <xarray.Dataset> object')
+    if not isinstance(sat_ds, xr.Dataset):
+        raise TypeError(f'Invalid sat_ds ({sat_ds}). Expecting <xarray.Dataset> object')
+    # flash count computed on the satellite sub-grid only (see get_weighted_fp_sat_ds)
+    spec001_mr_da = get_sat_sub_grid_spec001_mr(fp_ds, sat_ds)
+    if spec001_mr_da.chunks:
+        time_slab_list = dask_utils.get_chunk_aligned_slabs(spec001_mr_da.chunksizes['time'], slab_hours)
+    else:
+        time_slab_list = [slice(time_start, time_start + slab_hours)
+                          for time_start in range(0, spec001_mr_da.sizes['time'], slab_hours)]
+    weighted_slab_da_list = []
+    for time_slab in time_slab_list:
+        # time steps of the product (inner join), nothing read
+        spec001_mr_slab_da, flash_count_slab_da = xr.align(spec001_mr_da.isel(time=time_slab), sat_ds['flash_count'],
+                                                           join='inner')
+        weighted_slab_da_list.append(get_weighted_flash_count(spec001_mr_da=spec001_mr_slab_da,
+                                                              flash_count_da=flash_count_slab_da).compute())
+    weighted_flash_count_da = xr.concat(weighted_slab_da_list, dim='time')
+    weighted_flash_count_da = weighted_flash_count_da.transpose(
+        *[dim for dim in spec001_mr_da.dims if dim in weighted_flash_count_da.dims])
+    # time steps without FLEXPART output or satellite data: 0 (same as get_weighted_fp_sat_ds)
+    weighted_flash_count_da = weighted_flash_count_da.reindex(time=get_fp_sat_time(fp_ds, sat_ds), fill_value=0.)
+    rel_ds = fp_ds.drop_vars([var for var in fp_ds.data_vars if not 'REL' in var])
+    # (time coordinate of rel_ds: FLEXPART output time steps only, included in the weighted flash count ones)
+    return xr.merge([rel_ds, weighted_flash_count_da.rename('weighted_flash_count')], join='outer',
+                    combine_attrs='drop_conflicts')
+
+
+def get_weighted_fp_sat_release_windows_ds(fp_release_windows, sat_ds):
+    """
+    Weighted flash count computed release by release over the window of each release only (see
+    get_fp_out_release_windows), without the merged FLEXPART output / satellite dataset (lazy if the FLEXPART output
+    is, computed with .compute())
+    @param fp_release_windows: <utils.fp_release_windows.FpOutReleaseWindows>
+    @param sat_ds: <xarray.Dataset> see get_satellite_ds
+    @return: <xarray.Dataset> weighted_flash_count (pointspec, time) + release variables (RELxxxx): 0 outside of the
+                    window of each release (same values as get_weighted_fp_sat_ds)
+    """
+    if not isinstance(sat_ds, xr.Dataset):
+        raise TypeError(f'Invalid sat_ds ({sat_ds}). Expecting <xarray.Dataset> object')
+    # flash count computed on the satellite sub-grid only (see get_weighted_fp_sat_ds)
+    fp_ds = fp_release_windows.fp_ds
+    lat_index = utils.xarray_pandas_utils.get_sub_grid_index(sat_ds['latitude'].values, fp_ds['latitude'].values)
+    lon_index = utils.xarray_pandas_utils.get_sub_grid_index(sat_ds['longitude'].values, fp_ds['longitude'].values)
+    weighted_flash_count_da_list = [
+        get_weighted_flash_count(
+            spec001_mr_da=release_da.isel(latitude=lat_index, longitude=lon_index)
+                .assign_coords(latitude=sat_ds['latitude'], longitude=sat_ds['longitude']),
+            flash_count_da=sat_ds['flash_count'])
+        for release_da in fp_release_windows
+    ]
+    weighted_flash_count_da = xr.concat(weighted_flash_count_da_list, dim='pointspec', join='outer').fillna(0)
+    # time steps of the windows without satellite data and satellite hours outside of the windows: 0 (same as
+    # get_weighted_fp_sat_ds on the 7 days windows)
+    window_time_ds = xr.Dataset(coords={'time': fp_release_windows.get_window_times()})
+    weighted_flash_count_da = weighted_flash_count_da.reindex(time=get_fp_sat_time(window_time_ds, sat_ds),
+                                                              fill_value=0.)
+    return xr.merge([fp_release_windows.rel_ds, weighted_flash_count_da.rename('weighted_flash_count')],
+                    combine_attrs='drop_conflicts')
+
+
+def get_weighted_fp_sat_age_ds(fp_release_windows, sat_ds):
+    """
+    Weighted flash count on a release relative age axis: weighted flash count of each release (spec001_mr of its window
+    weighted by the flash count of the same hours, reduced release by release) re-indexed on the number of hours
+    before its start date (see utils.fp_release_windows.FpOutReleaseWindows.get_release_age_da). No (age, pointspec,
+    latitude, longitude) array is built: one release window in memory at a time (lazy if the FLEXPART output is,
+    computed with .compute())
+    @param fp_release_windows: <utils.fp_release_windows.FpOutReleaseWindows>
+    @param sat_ds: <xarray.Dataset> see get_satellite_ds
+    @return: <xarray.Dataset> weighted_flash_count (age, pointspec) with a time (age, pointspec) coordinate + release
+                    variables (RELxxxx): 0 for the hours without FLEXPART output or satellite data
+    """
+    if not isinstance(sat_ds, xr.Dataset):
+        raise TypeError(f'Invalid sat_ds ({sat_ds}). Expecting <xarray.Dataset> object')
+    # flash count computed on the satellite sub-grid only (see get_weighted_fp_sat_ds)
+    fp_ds = fp_release_windows.fp_ds
+    lat_index = utils.xarray_pandas_utils.get_sub_grid_index(sat_ds['latitude'].values, fp_ds['latitude'].values)
+    lon_index = utils.xarray_pandas_utils.get_sub_grid_index(sat_ds['longitude'].values, fp_ds['longitude'].values)
+    weighted_flash_count_da_list = []
+    for release_index, release_da in enumerate(fp_release_windows):
+        # hours of the window with satellite data (inner join, hours missing from sat_ds: no flash)
+        spec001_mr_da, flash_count_da = xr.align(
+            release_da.isel(latitude=lat_index, longitude=lon_index)
+                .assign_coords(latitude=sat_ds['latitude'], longitude=sat_ds['longitude']),
+            sat_ds['flash_count'], join='inner')
+        weighted_flash_count_da_list.append(fp_release_windows.get_release_age_da(
+            release_index, get_weighted_flash_count(spec001_mr_da=spec001_mr_da, flash_count_da=flash_count_da),
+            fill_value=0.))
+    weighted_flash_count_da = xr.concat(weighted_flash_count_da_list, dim='pointspec').transpose('age', 'pointspec')
+    weighted_flash_count_da = weighted_flash_count_da.assign_coords(
+        time=(('age', 'pointspec'), fp_release_windows.get_age_times()))
+    return xr.merge([fp_release_windows.rel_ds, weighted_flash_count_da.rename('weighted_flash_count')],
+                    combine_attrs='drop_conflicts')
+
+
+def get_weighted_fp_sat_sparse_ds(sparse_fp_ds, sat_ds):
+    """
+    Weighted flash count computed from sparse footprints (see get_sparse_footprint_ds): sparse dot product of each
+    footprint with the flash count of its hour (see utils.sparse_footprint_utils.get_sparse_footprint_weighted_flash_count)
+    @param sparse_fp_ds: <xarray.Dataset> see get_sparse_footprint_ds
+    @param sat_ds: <xarray.Dataset> see get_satellite_ds
+    @return: <xarray.Dataset> weighted_flash_count (pointspec, time) + release variables (RELxxxx) + fraction of the
+                    sensitivity mass of each release retained by the sparse footprints (same values as
+                    get_weighted_fp_sat_ds if no threshold and no top_k)
+    """
+    if not isinstance(sat_ds, xr.Dataset):
+        raise TypeError(f'Invalid sat_ds ({sat_ds}). Expecting <xarray.Dataset> object')
+    weighted_flash_count_da = sparse_footprint_utils.get_sparse_footprint_weighted_flash_count(
+        sparse_fp_ds=sparse_fp_ds, flash_count_da=sat_ds['flash_count'])
+    # time steps without FLEXPART output or satellite data: 0 (same as get_weighted_fp_sat_ds)
+    weighted_flash_count_da = weighted_flash_count_da.reindex(time=get_fp_sat_time(sparse_fp_ds, sat_ds),
+                                                              fill_value=0.)
+    rel_ds = sparse_fp_ds.drop_vars([var for var in sparse_fp_ds.data_vars if not 'REL' in var])
+    retained_mass_fraction_da = sparse_footprint_utils.get_retained_mass_fraction(sparse_fp_ds, dim='time')
+    # (time coordinate of rel_ds: sparse footprints time steps only, included in the weighted flash count ones)
+    return xr.merge([rel_ds, weighted_flash_count_da.rename('weighted_flash_count'),
+                     retained_mass_fraction_da.rename('retained_mass_fraction')], join='outer',
+                    combine_attrs='drop_conflicts')
+
+
 # TODO: fp_sat_comp doit savoir TOUT SEUL quelles données sat on va chercher en fonction de ce qui est dispo et tout (? pourquoi j'ai dit ça?)
 def fpout_sat_comparison(fp_path, sat_name, flights_id_list, file_list=False, sum_height=True, load=False,
                          chunks='auto',
                          max_chunk_size=1e8, assign_releases_position_coords=False, grid_resolution=cts.GRID_RESOLUTION,
                          grid_res_str=cts.GRID_RESOLUTION_STR, save_weighted_ds=False, flights_output_dirpath=None,
-                         weighted_ds_filename_suffix=''):
+                         weighted_ds_filename_suffix='', mosaic=False, regrid_in_memory=False, use_catalogue=False,
+                         use_reference_index=False, use_flash_count_cube=False,
+                         weighting_engine=cts.WEIGHTING_ENGINE_EAGER,
+                         scheduler=cts.DASK_SCHEDULER_THREADS, workers=None,
+                         slab_hours=cts.FP_SAT_STREAMING_SLAB_HOURS, footprint_threshold=None, footprint_top_k=None):
+    if weighting_engine not in cts.WEIGHTING_ENGINES:
+        raise ValueError(f'{weighting_engine} {cts.WEIGHTING_ENGINE_VALUE_ERROR}')
+    # lazy FLEXPART output (see get_fp_out_ds_7days), streaming: source time chunks kept (slabs of whole chunks)
+    lazy = weighting_engine in [cts.WEIGHTING_ENGINE_LAZY, cts.WEIGHTING_ENGINE_STREAMING]
+    lazy_chunks = {'pointspec': cts.FP_SAT_LAZY_CHUNKS['pointspec']} \
+        if weighting_engine == cts.WEIGHTING_ENGINE_STREAMING else cts.FP_SAT_LAZY_CHUNKS
     if not file_list and isinstance(fp_path, str) or isinstance(fp_path, pathlib.Path):
         fp_path = [fp_path]
     missing_dates_list = []
-    for index, fp_file in enumerate(fp_path):
-        # fp_file expected to be in <flight_output_dir>/flexpart/output/... hence the <fp_path>.parent.parent to get to the flexpart directory
-        if check_fp_status(pathlib.Path(fp_file).parent.parent):
-            # step2: recup fp_ds sur 7 JOURS avec les 7j pour chaque release, PAS depuis début fichier
-            with get_fp_out_ds_7days(fpout_path=fp_file, sum_height=sum_height, load=load, chunks=chunks,
-                                     max_chunk_size=max_chunk_size,
-                                     assign_releases_position_coords=assign_releases_position_coords) \
-                    as fp_ds:
-                if args.print_debug:
-                    print('\n\n##################################################')
-                    print(f'Flight {flights_id_list[index]}')
-                    print(f'Flexpart output: {fp_file}')
-                    print('##################################################')
-                # TODO: step3: recup liste des sat_name des zones couvertes
-                start_date, end_date = pd.Timestamp(fp_ds.time.min().values), pd.Timestamp(fp_ds.time.max().values)
-                #   step4: get sat_ds
-                try:
-                    sat_ds = get_satellite_ds(start_date=start_date, end_date=end_date, sat_name=sat_name,
-                                              grid_resolution=grid_resolution,
-                                              grid_res_str=grid_res_str)
-                except FileNotFoundError as e:
-                    print(f'<!> {e}')
-                    for m_date in eval(str(e).split('\n')[1]):
-                        if m_date not in missing_dates_list:
-                            missing_dates_list.append(m_date)
-                    continue
-                # setp5: get weighted fp_sat_ds
-                weighted_fp_sat_ds = get_weighted_fp_sat_ds(fp_ds=fp_ds, sat_ds=sat_ds)
-                # TODO: step6: ajouter données ABI à weighted_fp_sat_ds
-                # TODO: blablablabla
-                if save_weighted_ds:
-                    if flights_output_dirpath is None:
-                        Warning(f'Saving weighted ds to current directory ({pathlib.Path.cwd()})')
-                        weighted_fp_sat_ds.to_netcdf(f'weighted_fp_sat_ds{weighted_ds_filename_suffix}.nc')
+    # the dask scheduler and the catalogue are closed on exit, including on exceptions (e.g. missing FLEXPART output)
+    with contextlib.ExitStack() as stack:
+        # lazy weighting engines: dask scheduler (e.g. local cluster) shared by all the flights
+        if weighting_engine != cts.WEIGHTING_ENGINE_EAGER:
+            stack.enter_context(dask_utils.dask_scheduler(scheduler=scheduler, workers=workers))
+        # satellite file catalogue shared by all the flights (directories listed once, again only if they changed)
+        catalogue = None
+        if use_catalogue:
+            catalogue = SatFileCatalogue(get_sat_file_catalogue_path(), sat_name=sat_name)
+            stack.callback(catalogue.close)
+        for index, fp_file in enumerate(fp_path):
+            # fp_file expected to be in <flight_output_dir>/flexpart/output/... hence the <fp_path>.parent.parent to get to the flexpart directory
+            if check_fp_status(pathlib.Path(fp_file).parent.parent):
+                # step2: recup fp_ds sur 7 JOURS avec les 7j pour chaque release, PAS depuis début fichier
+                if weighting_engine in [cts.WEIGHTING_ENGINE_RELEASES, cts.WEIGHTING_ENGINE_AGE]:
+                    fp_out = get_fp_out_release_windows(fpout_path=fp_file, sum_height=sum_height, chunks=chunks,
+                                                        max_chunk_size=max_chunk_size,
+                                                        assign_releases_position_coords=assign_releases_position_coords)
+                elif weighting_engine == cts.WEIGHTING_ENGINE_SPARSE:
+                    # sparse footprints stored next to the FLEXPART output, built on first use
+                    fp_out = get_sparse_footprint_ds(fpout_path=fp_file, threshold=footprint_threshold,
+                                                     top_k=footprint_top_k, sum_height=sum_height, chunks=chunks,
+                                                     max_chunk_size=max_chunk_size,
+                                                     assign_releases_position_coords=assign_releases_position_coords,
+                                                     slab_hours=slab_hours, print_debug=args.print_debug)
+                else:
+                    fp_out = get_fp_out_ds_7days(fpout_path=fp_file, sum_height=sum_height, load=load, chunks=chunks,
+                                                 max_chunk_size=max_chunk_size,
+                                                 assign_releases_position_coords=assign_releases_position_coords,
+                                                 lazy=lazy, lazy_chunks=lazy_chunks)
+                with fp_out as fp_ds:
+                    if args.print_debug:
+                        print('\n\n##################################################')
+                        print(f'Flight {flights_id_list[index]}')
+                        print(f'Flexpart output: {fp_file}')
+                        print('##################################################')
+                    # TODO: step3: recup liste des sat_name des zones couvertes
+                    if weighting_engine in [cts.WEIGHTING_ENGINE_RELEASES, cts.WEIGHTING_ENGINE_AGE]:
+                        start_date, end_date = fp_ds.get_time_range()
                     else:
-                        weighted_ds_dirpath = pathlib.Path(
-                            f'{flights_output_dirpath}/{flights_id_list[index]}/flexpart_lightning_comparison')
-                        weighted_ds_dirpath.mkdir(
-                            exist_ok=True)  # create lightning comparison dirpath if it doesn't exist yet
-                        weighted_fp_sat_ds.to_netcdf(
-                            f'{weighted_ds_dirpath}/weighted_fp_sat_ds{weighted_ds_filename_suffix}.nc')
-                        print(f'Saved {weighted_ds_dirpath}/weighted_fp_sat_ds{weighted_ds_filename_suffix}.nc file')
-
-                # TODO: step7: générer le fichier intermédiaire <?>
-                # TODO: pour chaque RELSTART donner weighted_fp_sat_ds['weighted_flash_count'].sum('time') <?>
-        else:
-            raise FileNotFoundError(
-                f'Expecting existing completed fp out file! {fp_file} does NOT exist and/or flexpart simulation has NOT been successful')
+                        start_date, end_date = pd.Timestamp(fp_ds.time.min().values), pd.Timestamp(fp_ds.time.max().values)
+                    #   step4: get sat_ds
+                    try:
+                        sat_ds = get_satellite_ds(start_date=start_date, end_date=end_date, sat_name=sat_name,
+                                                  grid_resolution=grid_resolution,
+                                                  grid_res_str=grid_res_str, mosaic=mosaic,
+                                                  in_memory=regrid_in_memory, catalogue=catalogue,
+                                                  reference_index=use_reference_index,
+                                                  use_flash_count_cube=use_flash_count_cube)
+                    except FileNotFoundError as e:
+                        print(f'<!> {e}')
+                        for m_date in eval(str(e).split('\n')[1]):
+                            if m_date not in missing_dates_list:
+                                missing_dates_list.append(m_date)
+                        continue
+                    # setp5: get weighted fp_sat_ds
+                    if weighting_engine == cts.WEIGHTING_ENGINE_LAZY:
+                        # only the weighted flash count is computed
+                        weighted_fp_sat_ds = get_weighted_fp_sat_lazy_ds(fp_ds=fp_ds, sat_ds=sat_ds).compute()
+                    elif weighting_engine == cts.WEIGHTING_ENGINE_STREAMING:
+                        weighted_fp_sat_ds = get_weighted_fp_sat_streaming_ds(fp_ds=fp_ds, sat_ds=sat_ds,
+                                                                              slab_hours=slab_hours)
+                    elif weighting_engine == cts.WEIGHTING_ENGINE_RELEASES:
+                        weighted_fp_sat_ds = get_weighted_fp_sat_release_windows_ds(fp_release_windows=fp_ds,
+                                                                                     sat_ds=sat_ds).compute()
+                    elif weighting_engine == cts.WEIGHTING_ENGINE_AGE:
+                        # age resolved weighted flash count (hours before the start of each release)
+                        weighted_fp_sat_ds = get_weighted_fp_sat_age_ds(fp_release_windows=fp_ds, sat_ds=sat_ds).compute()
+                    elif weighting_engine == cts.WEIGHTING_ENGINE_SPARSE:
+                        weighted_fp_sat_ds = get_weighted_fp_sat_sparse_ds(sparse_fp_ds=fp_ds, sat_ds=sat_ds)
+                    else:
+                        weighted_fp_sat_ds = get_weighted_fp_sat_ds(fp_ds=fp_ds, sat_ds=sat_ds)
+                    # TODO: step6: ajouter données ABI à weighted_fp_sat_ds
+                    # TODO: blablablabla
+                    if save_weighted_ds:
+                        if flights_output_dirpath is None:
+                            Warning(f'Saving weighted ds to current directory ({pathlib.Path.cwd()})')
+                            weighted_fp_sat_ds.to_netcdf(f'weighted_fp_sat_ds{weighted_ds_filename_suffix}.nc')
+                        else:
+                            weighted_ds_dirpath = pathlib.Path(
+                                f'{flights_output_dirpath}/{flights_id_list[index]}/flexpart_lightning_comparison')
+                            weighted_ds_dirpath.mkdir(
+                                exist_ok=True)  # create lightning comparison dirpath if it doesn't exist yet
+                            weighted_fp_sat_ds.to_netcdf(
+                                f'{weighted_ds_dirpath}/weighted_fp_sat_ds{weighted_ds_filename_suffix}.nc')
+                            print(f'Saved {weighted_ds_dirpath}/weighted_fp_sat_ds{weighted_ds_filename_suffix}.nc file')
+
+                    # TODO: step7: générer le fichier intermédiaire <?>
+                    # TODO: pour chaque RELSTART donner weighted_fp_sat_ds['weighted_flash_count'].sum('time') <?>
+            else:
+                raise FileNotFoundError(
+                    f'Expecting existing completed fp out file! {fp_file} does NOT exist and/or flexpart simulation has NOT been successful')
 
     return sorted(missing_dates_list)
 
@@ -304,6 +828,16 @@ if __name__ == '__main__':
                            help=f'Satellite grid resolution (default={cts.GRID_RESOLUTION})')
     sat_group.add_argument('--grid-res-str', default=cts.GRID_RESOLUTION_STR,
                            help=f'Satellite grid resolution string, format="<res>deg" (default={cts.GRID_RESOLUTION_STR})')
+    sat_group.add_argument('--mosaic', action='store_true',
+                           help='Use the GLM mosaic regrid files (all the GOES satellites in a single product)')
+    sat_group.add_argument('--regrid-in-memory', action='store_true',
+                           help='Regrid the missing hours in memory instead of writing them to the regrid archive')
+    sat_group.add_argument('--catalogue', action='store_true',
+                           help=f'List the satellite files from the file catalogue ({cts.SAT_FILE_CATALOGUE_FILENAME} in the GLM root directory, refreshed incrementally) instead of globbing the directories for each flight')
+    sat_group.add_argument('--flash-count-cube', action='store_true',
+                           help='Read the flash counts from the yearly memory-mapped flash count cubes (generated with sat_regrid_script_src.py --flash-count-cube) instead of the regrid files, requires --mosaic')
+    sat_group.add_argument('--reference-index', action='store_true',
+                           help=f'Open the hourly regrid files from the reference index of their daily directory ({cts.REGRID_REFERENCE_INDEX_FILENAME}, built if missing or stale) instead of reading the header of each file')
 
     # flexpart output parameters
     fp_group = parser.add_argument_group('Flexpart output parameters')
@@ -311,6 +845,21 @@ if __name__ == '__main__':
                           help='Indicates if flexpart output should NOT be summed over altitude (by default it is because satellite data does not have altitude information)')
     fp_group.add_argument('--load-fpout', action='store_true', help='load fp_out dataArray into memory (default=False)')
 
+    # weighting
+    weighting_group = parser.add_argument_group('Weighting parameters')
+    weighting_group.add_argument('--weighting-engine', choices=cts.WEIGHTING_ENGINES, default=cts.WEIGHTING_ENGINE_EAGER,
+                                 help=f'"{cts.WEIGHTING_ENGINE_EAGER}" (default): merged flexpart output / satellite dataset, "{cts.WEIGHTING_ENGINE_LAZY}": dask graph of the weighted flash count only, computed at the end (flexpart output and satellite data never fully in memory, --load-fpout ignored), "{cts.WEIGHTING_ENGINE_RELEASES}": only the 7 days window of each release read from the flexpart output (--load-fpout ignored), "{cts.WEIGHTING_ENGINE_AGE}": same as "{cts.WEIGHTING_ENGINE_RELEASES}" with the releases stacked on a release relative age axis (hours before the release, weighted flash count per (age, release)), "{cts.WEIGHTING_ENGINE_STREAMING}": slabs of whole flexpart output time chunks (at most --slab-hours hours) read and weighted one after the other, all the releases of a slab at once (bounded memory, --load-fpout ignored), "{cts.WEIGHTING_ENGINE_SPARSE}": sparse footprints (see --footprint-threshold and --footprint-top-k) stored next to the flexpart output and weighted with sparse dot products (--load-fpout ignored)')
+    weighting_group.add_argument('--scheduler', choices=cts.DASK_SCHEDULERS, default=cts.DASK_SCHEDULER_THREADS,
+                                 help=f'dask scheduler of the lazy weighting engines (default="{cts.DASK_SCHEDULER_THREADS}", "{cts.DASK_SCHEDULER_DISTRIBUTED}": local cluster, requires the distributed package)')
+    weighting_group.add_argument('--workers', type=int,
+                                 help='number of threads, processes or local cluster workers of the dask scheduler (default: dask default)')
+    weighting_group.add_argument('--slab-hours', type=int, default=cts.FP_SAT_STREAMING_SLAB_HOURS,
+                                 help=f'maximum number of hours read at once by the "{cts.WEIGHTING_ENGINE_STREAMING}" weighting engine (default={cts.FP_SAT_STREAMING_SLAB_HOURS})')
+    weighting_group.add_argument('--footprint-threshold', type=float,
+                                 help=f'"{cts.WEIGHTING_ENGINE_SPARSE}" weighting engine: footprint cells below threshold x max value of the footprint dropped (default: no threshold)')
+    weighting_group.add_argument('--footprint-top-k', type=int,
+                                 help=f'"{cts.WEIGHTING_ENGINE_SPARSE}" weighting engine: number of cells kept per footprint (default: all)')
+
     # weighted ds
     weighted_ds_group = parser.add_argument_group('Weighted ds parameters')
     weighted_ds_group.add_argument('--save-weighted-ds', action='store_true',
@@ -352,7 +901,14 @@ if __name__ == '__main__':
                                          grid_resolution=args.grid_res, grid_res_str=args.grid_res_str,
                                          save_weighted_ds=args.save_weighted_ds,
                                          flights_output_dirpath=args.flights_output_dir,
-                                         weighted_ds_filename_suffix=args.ds_fname_suffix)
+                                         weighted_ds_filename_suffix=args.ds_fname_suffix, mosaic=args.mosaic,
+                                         regrid_in_memory=args.regrid_in_memory, use_catalogue=args.catalogue,
+                                         use_reference_index=args.reference_index,
+                                         use_flash_count_cube=args.flash_count_cube,
+                                         weighting_engine=args.weighting_engine, scheduler=args.scheduler,
+                                         workers=args.workers, slab_hours=args.slab_hours,
+                                         footprint_threshold=args.footprint_threshold,
+                                         footprint_top_k=args.footprint_top_k)
 
     if len(missing_dates) > 0:
         print('\nxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxx')
@@ -1,18 +1,490 @@
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
 import numpy as np
+import os
+import pandas as pd
+import pathlib
 import xarray as xr
 
-from utils import GLMPathParser, generate_sat_hourly_file_path, generate_sat_hourly_filename_pattern, generate_sat_dirname_pattern
+from utils import GLMPathParser, generate_sat_hourly_file_path, generate_sat_hourly_filename_pattern, generate_sat_dirname_pattern, \
+    generate_sat_dir_path, generate_sat_consolidated_file_path, get_consolidated_period_start_date, \
+    get_consolidated_period_end_date, generate_sat_raw_granule_filename_pattern, get_sat_field_of_view_bbox
+from utils.sat_utils import generate_sat_dir_list_between_start_end_date, get_sat_files_list_between_start_end_date
 from utils import constants as cts
 from utils.constants import SAT_SETTINGS, raw_lat_cname, raw_lon_cname, flash_area_varname, flash_energy_varname, \
     attrs_to_keep
 from utils import xarray_pandas_utils as xr_pd_utils
+from utils import sparse_regrid_utils
+from utils import regrid_encoding_utils
+from utils import regrid_manifest
+from utils import regions_utils
+from utils import flash_count_cube
+from utils import regrid_reference_index
+
+
+class LightningRegridAccumulator:
+    """
+    Incremental lightning satellite regrid: flashes can be added chunk by chunk (e.g. raw 20 sec granules of an hour)
+    and the flash count and log10(flash_energy) and log10(flash_area) histograms of each grid cell are summed.
+    The resulting dataset (to_dataset) is identical to the regrid dataset obtained with the whole hour at once.
+    """
+
+    def __init__(self, latitudes, longitudes):
+        """
+        @param latitudes: <numpy.ndarray> regular grid latitudes (ascending)
+        @param longitudes: <numpy.ndarray> regular grid longitudes (ascending)
+        """
+        self.latitudes = latitudes
+        self.longitudes = longitudes
+        self.n_cells = latitudes.size * longitudes.size
+        self.energy_bin_edges = xr_pd_utils.get_histogram_bin_edges(cts.f_en_min_bin, cts.f_en_max_bin,
+                                                                    cts.f_en_hist_step)
+        self.area_bin_edges = xr_pd_utils.get_histogram_bin_edges(cts.f_ar_min_bin, cts.f_ar_max_bin,
+                                                                  cts.f_ar_hist_step)
+        # number of flashes in each grid cell (all flashes, used to find the lit cells)
+        self.all_flash_count = np.zeros(self.n_cells, dtype='i8')
+        # number of flashes with a valid flash_energy value in each grid cell (flash_count variable)
+        self.flash_count = np.zeros(self.n_cells, dtype='i8')
+        # (int32: number of flashes of a grid cell in an hour, halves the memory of the histograms)
+        self.flash_energy_log_hist = np.zeros((self.n_cells, self.energy_bin_edges.size - 1), dtype='i4')
+        self.flash_area_log_hist = np.zeros((self.n_cells, self.area_bin_edges.size - 1), dtype='i4')
+
+    @property
+    def nbytes(self):
+        """
+        @return: <int> memory used by the grid cell counts and histograms (bytes)
+        """
+        return sum(getattr(self, var_name).nbytes for var_name in
+                   ['all_flash_count', 'flash_count', 'flash_energy_log_hist', 'flash_area_log_hist'])
+
+    @property
+    def dataset_nbytes(self):
+        """
+        @return: <int> memory used by the dense (float64) regrid dataset (to_dataset) (bytes)
+        """
+        return self.n_cells * (1 + self.flash_energy_log_hist.shape[1] + self.flash_area_log_hist.shape[1]) * 8
+
+    def add_flashes(self, flash_lat, flash_lon, flash_energy, flash_area):
+        """
+        Add a chunk of flashes to the grid cell counts and histograms
+        @param flash_lat: <numpy.ndarray> flash latitudes
+        @param flash_lon: <numpy.ndarray> flash longitudes
+        @param flash_energy: <numpy.ndarray> flash energies
+        @param flash_area: <numpy.ndarray> flash areas
+        """
+        # index of the grid cell containing each flash (nearest grid value)
+        lat_index = xr_pd_utils.get_nearest_grid_index(flash_lat, self.latitudes)
+        lon_index = xr_pd_utils.get_nearest_grid_index(flash_lon, self.longitudes)
+        cell_index = lat_index * self.longitudes.size + lon_index
+        self.all_flash_count += xr_pd_utils.count_using_bincount(cell_index, n_cells=self.n_cells)
+        # same as pandas count: only flashes with a valid flash_energy value are counted
+        self.flash_count += xr_pd_utils.count_using_bincount(cell_index, n_cells=self.n_cells,
+                                                             mask=~np.isnan(flash_energy))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            self.flash_energy_log_hist += xr_pd_utils.histogram_using_bincount(
+                np.log10(flash_energy), cell_index, n_cells=self.n_cells, bin_edges=self.energy_bin_edges)
+            self.flash_area_log_hist += xr_pd_utils.histogram_using_bincount(
+                np.log10(flash_area), cell_index, n_cells=self.n_cells, bin_edges=self.area_bin_edges)
+
+    def aggregate(self, latitudes, longitudes):
+        """
+        Sum the counts and histograms over the cells of a coarser grid nesting exactly in this grid
+        (see xarray_pandas_utils.is_nested_grid): identical to adding the flashes to the coarse grid directly
+        @param latitudes: <numpy.ndarray> coarse grid latitudes
+        @param longitudes: <numpy.ndarray> coarse grid longitudes
+        @return: <LightningRegridAccumulator> coarse grid accumulator
+        """
+        coarse_accumulator = LightningRegridAccumulator(latitudes=latitudes, longitudes=longitudes)
+        lat_index = xr_pd_utils.get_nearest_grid_index(self.latitudes, latitudes)
+        lon_index = xr_pd_utils.get_nearest_grid_index(self.longitudes, longitudes)
+        for var_name in ['all_flash_count', 'flash_count', 'flash_energy_log_hist', 'flash_area_log_hist']:
+            fine_values = getattr(self, var_name)
+            fine_values = fine_values.reshape((self.latitudes.size, self.longitudes.size) + fine_values.shape[1:])
+            coarse_values = xr_pd_utils.sum_over_nested_grid(fine_values, lat_index, n_coarse=latitudes.size, axis=0)
+            coarse_values = xr_pd_utils.sum_over_nested_grid(coarse_values, lon_index, n_coarse=longitudes.size,
+                                                             axis=1)
+            setattr(coarse_accumulator, var_name,
+                    coarse_values.reshape((coarse_accumulator.n_cells,) + fine_values.shape[2:]))
+        return coarse_accumulator
+
+    def to_dataset(self, grid_res, attrs=None):
+        """
+        Dense regrid dataset (same NaN pattern as the pandas regrid):
+            - flash_count: NaN in cells without any flash
+            - histograms: 0 in the cells of the (lit latitudes x lit longitudes) product, NaN elsewhere
+        @param grid_res: <float> grid resolution (variable attributes)
+        @param attrs: <dict> dataset attributes
+        @return: <xarray.Dataset>
+        """
+        grid_shape = (self.latitudes.size, self.longitudes.size)
+        lit_cells = (self.all_flash_count > 0).reshape(grid_shape)
+        hist_defined = lit_cells.any(axis=1)[:, np.newaxis] & lit_cells.any(axis=0)[np.newaxis, :]
+        regrid_ds = xr.Dataset(coords={'latitude': self.latitudes, 'longitude': self.longitudes}, attrs=attrs)
+        regrid_ds['flash_count'] = (('latitude', 'longitude'),
+                                    np.where(lit_cells, self.flash_count.reshape(grid_shape), np.nan),
+                                    _get_regrid_var_attrs(grid_res)['flash_count'])
+        for var_name, hist, bin_edges, (min_bin_edge, max_bin_edge, step) in [
+            ('flash_energy_log', self.flash_energy_log_hist, self.energy_bin_edges,
+             (cts.f_en_min_bin, cts.f_en_max_bin, cts.f_en_hist_step)),
+            ('flash_area_log', self.flash_area_log_hist, self.area_bin_edges,
+             (cts.f_ar_min_bin, cts.f_ar_max_bin, cts.f_ar_hist_step))
+        ]:
+            bin_dim = f'{var_name}_bin'
+            regrid_ds.coords[bin_dim] = (bin_dim, bin_edges[1:] - step / 2,
+                                         {'comment': f'{min_bin_edge} <= bin <= {max_bin_edge}, bin_step = {step}'})
+            regrid_ds[f'{var_name}_hist'] = (
+                ('latitude', 'longitude', bin_dim),
+                np.where(hist_defined[..., np.newaxis], hist.reshape(grid_shape + (bin_edges.size - 1,)), np.nan),
+                _get_regrid_var_attrs(grid_res)[f'{var_name}_hist']
+            )
+        return regrid_ds
+
+
+class MultiResolutionRegridAccumulator:
+    """
+    Lightning satellite regrid on several grid resolutions in a single pass over the flashes: the flashes are added
+    to the grids that cannot be derived from a finer one and the grids nesting exactly in a finer grid
+    (see xarray_pandas_utils.is_nested_grid) are obtained by summing the finer grid cells
+    """
+
+    def __init__(self, grid_res_list, lat_min=cts.FPOUT_LAT_MIN, lat_max=cts.FPOUT_LAT_MAX,
+                 lon_min=cts.FPOUT_LON_MIN, lon_max=cts.FPOUT_LON_MAX):
+        """
+        @param grid_res_list: <list> [ <float>, ... ] grid resolutions
+        @param lat_min: <float>
+        @param lat_max: <float>
+        @param lon_min: <float>
+        @param lon_max: <float>
+        """
+        self.grids = {
+            grid_res: (np.arange(lat_min, lat_max + grid_res, grid_res), np.arange(lon_min, lon_max + grid_res, grid_res))
+            for grid_res in sorted(grid_res_list)
+        }
+        # accumulators of the grids the flashes are added to
+        self.accumulators = {}
+        # finer grid resolution each nested grid is derived from
+        self.derived_from = {}
+        for grid_res, (latitudes, longitudes) in self.grids.items():
+            for fine_grid_res, fine_accumulator in self.accumulators.items():
+                if xr_pd_utils.is_nested_grid(fine_accumulator.latitudes, latitudes) and \
+                        xr_pd_utils.is_nested_grid(fine_accumulator.longitudes, longitudes):
+                    self.derived_from[grid_res] = fine_grid_res
+                    break
+            else:
+                self.accumulators[grid_res] = LightningRegridAccumulator(latitudes=latitudes, longitudes=longitudes)
+
+    @property
+    def nbytes(self):
+        """
+        @return: <int> memory used by the accumulators the flashes are added to (bytes)
+        """
+        return sum(accumulator.nbytes for accumulator in self.accumulators.values())
+
+    @property
+    def dataset_nbytes(self):
+        """
+        @return: <int> memory used by the largest dense regrid dataset (datasets are generated one at a time, nested
+                    grids being coarser than the grid they are derived from) (bytes)
+        """
+        return max(accumulator.dataset_nbytes for accumulator in self.accumulators.values())
+
+    def add_flashes(self, flash_lat, flash_lon, flash_energy, flash_area):
+        for accumulator in self.accumulators.values():
+            accumulator.add_flashes(flash_lat, flash_lon, flash_energy, flash_area)
+
+    def get_accumulator(self, grid_res):
+        """
+        @param grid_res: <float>
+        @return: <LightningRegridAccumulator> accumulator of the grid resolution (derived from a finer grid if nested)
+        """
+        if grid_res in self.accumulators:
+            return self.accumulators[grid_res]
+        return self.accumulators[self.derived_from[grid_res]].aggregate(*self.grids[grid_res])
+
+    def to_dataset(self, grid_res, attrs=None):
+        return self.get_accumulator(grid_res).to_dataset(grid_res=grid_res, attrs=attrs)
+
+
+def _get_regrid_var_attrs(grid_res):
+    return {
+        'flash_count': {
+            'long_name': f'Number of flash occurrences in a {grid_res}° x {grid_res}° x 1h grid cell'
+        },
+        'flash_energy_log_hist': {
+            'long_name': f'Number of flash occurrences in log10(flash_energy) bin in a {grid_res}° x {grid_res}° x 1h grid cell',
+            'comment': 'log10(flash_energy) bins between -15 and -10, step between bins = 0.1'
+        },
+        'flash_area_log_hist': {
+            'long_name': f'Number of flash occurrences in log10(flash_area) bin in a {grid_res}° x {grid_res}° x 1h grid cell',
+            'comment': 'log10(flash_area) bins between 1.5 and 4.5, step between bins = 0.1'
+        }
+    }
+
+
+def _get_attrs_to_keep(sat_ds_attrs, sat_name):
+    """
+    Attributes of the original sat file kept in the regrid file
+    TODO: update conditions (processing_level) if attribute names are different for other satellites
+    """
+    new_attrs = {}
+    for attr in SAT_SETTINGS[sat_name][attrs_to_keep]:
+        if attr == "processing_level":
+            new_attrs[f'pre_regrid_data_{attr}'] = sat_ds_attrs.get(attr, '')
+        else:
+            new_attrs[attr] = sat_ds_attrs.get(attr, '')
+    return new_attrs
+
+
+def _get_flash_arrays(lightning_sat_ds, sat_name):
+    """
+    Load only the flash variables needed for the regrid (latitude, longitude, energy and area)
+    :return: <tuple> (flash_lat, flash_lon, flash_energy, flash_area) <numpy.ndarray>
+    """
+    return tuple(
+        lightning_sat_ds[SAT_SETTINGS[sat_name][var_key]].values
+        for var_key in [raw_lat_cname, raw_lon_cname, flash_energy_varname, flash_area_varname]
+    )
+
+
+def iter_flash_array_chunks(lightning_sat_ds, sat_name, chunk_size=None):
+    """
+    Generator over slices of chunk_size flashes of a lightning satellite dataset: only the slice of the flash
+    variables needed for the regrid is read (dataset opened lazily with xarray.open_dataset)
+    :param lightning_sat_ds: <xarray.Dataset>
+    :param sat_name: <str> satellite name
+    :param chunk_size: <int> number of flashes per slice, if None all the flashes are read at once
+    :return: <generator> yields (flash_lat, flash_lon, flash_energy, flash_area) <numpy.ndarray>
+    """
+    if chunk_size is None:
+        yield _get_flash_arrays(lightning_sat_ds, sat_name)
+        return
+    flash_dim = lightning_sat_ds[SAT_SETTINGS[sat_name][raw_lat_cname]].dims[0]
+    for start_index in range(0, lightning_sat_ds.sizes[flash_dim], chunk_size):
+        yield _get_flash_arrays(lightning_sat_ds.isel({flash_dim: slice(start_index, start_index + chunk_size)}),
+                                sat_name)
+
+
+def get_regrid_chunk_size(max_memory_mb, regrid_accumulator):
+    """
+    Number of flashes per slice so that the regrid memory stays below max_memory_mb: the memory left once the python
+    libraries, the accumulators and the largest output dataset (+ netcdf encoding copies) are accounted for is divided
+    by the estimated memory used per flash when adding a slice (see constants.REGRID_BYTES_PER_FLASH)
+    :param max_memory_mb: <float> memory ceiling of the process (MB)
+    :param regrid_accumulator: <LightningRegridAccumulator> or <MultiResolutionRegridAccumulator>
+    :return: <int> chunk size (number of flashes)
+    """
+    fixed_nbytes = cts.REGRID_BASE_MEMORY_MB * 2 ** 20 + regrid_accumulator.nbytes + \
+        cts.REGRID_OUTPUT_MEMORY_FACTOR * regrid_accumulator.dataset_nbytes
+    chunk_size = int((max_memory_mb * 2 ** 20 - fixed_nbytes) // cts.REGRID_BYTES_PER_FLASH)
+    if chunk_size < cts.REGRID_MIN_CHUNK_SIZE:
+        raise ValueError(f'Regrid memory ceiling too low ({max_memory_mb} MB): '
+                         f'{(fixed_nbytes + cts.REGRID_MIN_CHUNK_SIZE * cts.REGRID_BYTES_PER_FLASH) / 2 ** 20:.0f} MB '
+                         f'needed with slices of {cts.REGRID_MIN_CHUNK_SIZE} flashes')
+    return chunk_size
+
+
+def _regrid_using_pandas(lightning_sat_ds, target_ds, sat_name, grid_res):
+    """
+    Regrid using xarray nearest selection and pandas groupby (count + histograms), result merged with target_ds
+    """
+    raw_lat_da = lightning_sat_ds[SAT_SETTINGS[sat_name][raw_lat_cname]]
+    raw_lon_da = lightning_sat_ds[SAT_SETTINGS[sat_name][raw_lon_cname]]
+    # assign new longitude and latitude coords with chosen grid resolution using nearest method
+    _ds_assigncoords_lonlat = lightning_sat_ds.assign_coords({
+        'latitude': target_ds.latitude.sel(latitude=raw_lat_da, method='nearest'),
+        'longitude': target_ds.longitude.sel(longitude=raw_lon_da, method='nearest')
+    })
+    # apply operations (count + hist) on flash energy and flash area variables
+    flash_energy = SAT_SETTINGS[sat_name][flash_energy_varname]
+    flash_area = SAT_SETTINGS[sat_name][flash_area_varname]
+    # only keep relevant variables and coords
+    _ds = _ds_assigncoords_lonlat[[flash_energy, flash_area]] \
+        .reset_coords(names=['latitude', 'longitude'], drop=False) \
+        .reset_coords(drop=True)
+    regrid_var_attrs = _get_regrid_var_attrs(grid_res)
+    # flash count <!> result = xarray.Dataset
+    count_ds = xr_pd_utils.count_using_pandas(_ds[[flash_energy, 'latitude', 'longitude']],
+                                              data_var_name=flash_energy, res_var_name='flash_count')
+    count_ds['flash_count'].attrs.update(regrid_var_attrs['flash_count'])
+    # flash energy histogram <!> result = xarray.DataArray
+    _ds['flash_energy_log'] = np.log10(_ds[flash_energy])
+    flash_en_hist_ds = xr_pd_utils.histogram_using_pandas(
+                            _ds[['flash_energy_log', 'latitude', 'longitude']], data_var_name='flash_energy_log',
+                            min_bin_edge=cts.f_en_min_bin, max_bin_edge=cts.f_en_max_bin,
+                            step=cts.f_en_hist_step, res_var_name='flash_energy_log_hist')
+    flash_en_hist_ds['flash_energy_log_hist'].attrs.update(regrid_var_attrs['flash_energy_log_hist'])
+    # flash area histogram
+    _ds['flash_area_log'] = np.log10(_ds[flash_area])
+    flash_area_hist_ds = xr_pd_utils.histogram_using_pandas(
+                            _ds[['flash_area_log', 'latitude', 'longitude']], data_var_name='flash_area_log',
+                            min_bin_edge=cts.f_ar_min_bin, max_bin_edge=cts.f_ar_max_bin,
+                            step=cts.f_ar_hist_step, res_var_name='flash_area_log_hist')
+    flash_area_hist_ds['flash_area_log_hist'].attrs.update(regrid_var_attrs['flash_area_log_hist'])
+    # merge count and hist ds with target ds
+    return xr.merge([count_ds, flash_en_hist_ds, flash_area_hist_ds, target_ds], join='outer',
+                    combine_attrs='no_conflicts')
+
+
+def get_sparse_regrid_ds(flash_time_index, flash_lat, flash_lon, flash_energy, flash_area, times, latitudes,
+                         longitudes, grid_res, domain_bbox=None, attrs=None):
+    """
+    Vectorized regrid of the flashes of several hours in a single pass: the time step is an extra grouping key of the
+    flat (time, latitude, longitude) cell index and only the lit cells are counted (unique cell indices + bincount on
+    the lit cells, memory scales with the number of lit cells, NOT time steps x grid cells)
+    Each time step is identical to the hourly regrid dataset of its flashes (cropped to domain_bbox) stored in sparse
+    format (see sparse_regrid_utils.dense_to_sparse_regrid_ds)
+    :param flash_time_index: <numpy.ndarray> index of the time step of each flash in times
+    :param flash_lat: <numpy.ndarray> flash latitudes
+    :param flash_lon: <numpy.ndarray> flash longitudes
+    :param flash_energy: <numpy.ndarray> flash energies
+    :param flash_area: <numpy.ndarray> flash areas
+    :param times: <list> [ <pandas.Timestamp>, ... ] start date of each time step (hour)
+    :param latitudes: <numpy.ndarray> regular grid latitudes (ascending)
+    :param longitudes: <numpy.ndarray> regular grid longitudes (ascending)
+    :param grid_res: <float> grid resolution (variable attributes)
+    :param domain_bbox: <dict> if not None, only the grid cells intersecting the bbox are kept (see _crop_regrid_ds)
+    :param attrs: <dict> dataset attributes
+    :return: <xarray.Dataset> sparse regrid dataset (time, latitude, longitude)
+    """
+    regrid_var_attrs = _get_regrid_var_attrs(grid_res)
+    lat_index = xr_pd_utils.get_nearest_grid_index(flash_lat, latitudes)
+    lon_index = xr_pd_utils.get_nearest_grid_index(flash_lon, longitudes)
+    if domain_bbox is not None:
+        # only keep the flashes of the domain cells, indices relative to the cropped grid
+        lat_slice = xr_pd_utils.get_grid_domain_slice(latitudes, domain_bbox['LAT_MIN'], domain_bbox['LAT_MAX'])
+        lon_slice = xr_pd_utils.get_grid_domain_slice(longitudes, domain_bbox['LON_MIN'], domain_bbox['LON_MAX'])
+        latitudes, longitudes = latitudes[lat_slice], longitudes[lon_slice]
+        lat_index, lon_index = lat_index - lat_slice.start, lon_index - lon_slice.start
+    in_grid = (lat_index >= 0) & (lat_index < latitudes.size) & (lon_index >= 0) & (lon_index < longitudes.size)
+    cell_index = np.ravel_multi_index((np.asarray(flash_time_index)[in_grid], lat_index[in_grid], lon_index[in_grid]),
+                                      (len(times), latitudes.size, longitudes.size))
+    flash_energy, flash_area = np.asarray(flash_energy)[in_grid], np.asarray(flash_area)[in_grid]
+    # lit cells (at least one flash) sorted by (time, latitude, longitude) + lit cell of each flash
+    lit_cell_index, flash_lit_cell = np.unique(cell_index, return_inverse=True)
+    n_lit_cells = lit_cell_index.size
+    sparse_ds = xr.Dataset(
+        coords={'time': list(times), 'latitude': latitudes, 'longitude': longitudes},
+        attrs={**(attrs or {}), cts.REGRID_FORMAT_ATTR: cts.REGRID_SPARSE_FORMAT}
+    )
+    cell_dims = list(sparse_regrid_utils.LIT_CELL_INDEX_VARNAMES)
+    for dim, index in zip(cell_dims, np.unravel_index(lit_cell_index, (len(times), latitudes.size, longitudes.size))):
+        sparse_ds[sparse_regrid_utils.LIT_CELL_INDEX_VARNAMES[dim]] = (sparse_regrid_utils.LIT_CELL_DIM,
+                                                                       index.astype('i4'))
+    # same as pandas count: only flashes with a valid flash_energy value are counted
+    sparse_ds['flash_count'] = (
+        sparse_regrid_utils.LIT_CELL_DIM,
+        xr_pd_utils.count_using_bincount(flash_lit_cell, n_cells=n_lit_cells, mask=~np.isnan(flash_energy)).astype('i4'),
+        {**regrid_var_attrs['flash_count'], sparse_regrid_utils.SPARSE_DIMS_ATTR: ' '.join(cell_dims)}
+    )
+    for var_name, values, (min_bin_edge, max_bin_edge, step) in [
+        ('flash_energy_log', flash_energy, (cts.f_en_min_bin, cts.f_en_max_bin, cts.f_en_hist_step)),
+        ('flash_area_log', flash_area, (cts.f_ar_min_bin, cts.f_ar_max_bin, cts.f_ar_hist_step))
+    ]:
+        bin_edges = xr_pd_utils.get_histogram_bin_edges(min_bin_edge, max_bin_edge, step)
+        bin_dim = f'{var_name}_bin'
+        sparse_ds.coords[bin_dim] = (bin_dim, bin_edges[1:] - step / 2,
+                                     {'comment': f'{min_bin_edge} <= bin <= {max_bin_edge}, bin_step = {step}'})
+        with np.errstate(divide='ignore', invalid='ignore'):
+            hist = xr_pd_utils.histogram_using_bincount(np.log10(values), flash_lit_cell, n_cells=n_lit_cells,
+                                                        bin_edges=bin_edges)
+        entry_lit_cell, entry_bin_index = np.nonzero(hist)
+        entry_dim = f'{var_name}_hist_entry'
+        sparse_ds[f'{var_name}_hist_lit_cell'] = (entry_dim, entry_lit_cell.astype('i4'))
+        sparse_ds[f'{var_name}_hist_bin_index'] = (entry_dim, entry_bin_index.astype('i2'))
+        sparse_ds[f'{var_name}_hist'] = (
+            entry_dim, hist[entry_lit_cell, entry_bin_index].astype('i4'),
+            {**regrid_var_attrs[f'{var_name}_hist'], sparse_regrid_utils.SPARSE_DIMS_ATTR: ' '.join(cell_dims + [bin_dim])}
+        )
+    return sparse_ds
+
+
+def regrid_lightning_flashes(flash_lat, flash_lon, flash_energy, flash_area, flash_time, grid_res=cts.GRID_RESOLUTION,
+                             lat_min=cts.FPOUT_LAT_MIN, lat_max=cts.FPOUT_LAT_MAX, lon_min=cts.FPOUT_LON_MIN,
+                             lon_max=cts.FPOUT_LON_MAX, attrs=None, domain=None, sat_name=cts.GOES_SATELLITE_GLM,
+                             sat_version=None, output_format=cts.REGRID_DENSE_FORMAT, engine=cts.REGRID_ENGINE_INDEX):
+    """
+    In-memory regrid of lightning flashes (nothing read from or written to disk), same dataset as the hourly regrid
+    files (without the creation date and encoding attributes added when written):
+        - 'flash_count': number of lightning flashes occurences
+        - 'flash_energy_log_hist': histogram of the flash energy values (log10)
+        - 'flash_area_log_hist': histogram of the flash area values (log10)
+    :param flash_lat: <numpy.ndarray> flash latitudes
+    :param flash_lon: <numpy.ndarray> flash longitudes
+    :param flash_energy: <numpy.ndarray> flash energies
+    :param flash_area: <numpy.ndarray> flash areas
+    :param flash_time: <pandas.Timestamp> start date of the hour (all the flashes belong to the same hour, one time
+                    step even without any flash) or <numpy.ndarray> flash times (one time step per hour containing flashes)
+    :param grid_res: <float> grid resolution
+    :param lat_min: <float>
+    :param lat_max: <float>
+    :param lon_min: <float>
+    :param lon_max: <float>
+    :param attrs: <dict> dataset attributes (e.g. attributes of the pre-regrid file, see _get_attrs_to_keep)
+    :param domain: regrid domain: None (default, whole grid), <dict> bbox, <list> of GEO_REGIONS ids or 'fov' (see
+                    generate_lightning_sat_hourly_regrid_file)
+    :param sat_name: <str> satellite name (field of view domain and 'pandas' engine variable names)
+    :param sat_version: <str> satellite version or <list> of satellite versions (only used by the 'fov' domain)
+    :param output_format: <str> 'dense' (default) or 'sparse_coo'
+    :param engine: <str> 'index' (default, see get_sparse_regrid_ds) or 'pandas' (see _regrid_using_pandas), same result
+    :return: <xarray.Dataset> (time, latitude, longitude) regrid dataset
+    """
+    if engine not in cts.REGRID_ENGINES:
+        raise ValueError(f'{engine} {cts.REGRID_ENGINE_VALUE_ERROR}')
+    if output_format not in cts.REGRID_FORMATS:
+        raise ValueError(f'{output_format} {cts.REGRID_FORMAT_VALUE_ERROR}')
+    domain_bbox, domain_description = _get_regrid_domain_bbox(domain, sat_name=sat_name, sat_version=sat_version)
+    if isinstance(flash_time, pd.Timestamp):
+        times = [flash_time]
+        flash_time_index = np.zeros(np.size(flash_lat), dtype='i8')
+    else:
+        hour_index, flash_time_index = np.unique(pd.DatetimeIndex(flash_time).floor('h'), return_inverse=True)
+        times = list(pd.DatetimeIndex(hour_index))
+    attrs = {'grid_resolution': f'{grid_res}° x {grid_res}°', **(attrs or {})}
+    latitudes = np.arange(lat_min, lat_max + grid_res, grid_res)
+    longitudes = np.arange(lon_min, lon_max + grid_res, grid_res)
+    if engine == cts.REGRID_ENGINE_INDEX:
+        if output_format == cts.REGRID_DENSE_FORMAT:
+            # dense histograms are defined on the lit latitudes x lit longitudes of the WHOLE grid: regrid on the whole
+            # grid and crop once dense (same as _regrid_using_pandas + _crop_regrid_ds)
+            regrid_ds = get_sparse_regrid_ds(flash_time_index, flash_lat, flash_lon, flash_energy, flash_area,
+                                             times=times, latitudes=latitudes, longitudes=longitudes,
+                                             grid_res=grid_res, attrs=attrs)
+            return _crop_regrid_ds(sparse_regrid_utils.sparse_to_dense_regrid_ds(regrid_ds), domain_bbox,
+                                   domain_description)
+        regrid_ds = get_sparse_regrid_ds(flash_time_index, flash_lat, flash_lon, flash_energy, flash_area, times=times,
+                                         latitudes=latitudes, longitudes=longitudes, grid_res=grid_res,
+                                         domain_bbox=domain_bbox, attrs=attrs)
+        if domain_bbox is not None:
+            # (same attributes order as _crop_regrid_ds)
+            regrid_ds.attrs = {**attrs, cts.REGRID_DOMAIN_ATTR: domain_description,
+                               cts.REGRID_FORMAT_ATTR: cts.REGRID_SPARSE_FORMAT}
+        return regrid_ds
+    # pandas engine: one hour at a time
+    target_ds = xr.Dataset(coords={'latitude': latitudes, 'longitude': longitudes}, attrs=attrs)
+    hour_ds_list = []
+    for time_index, hour_date in enumerate(times):
+        hour_flashes = flash_time_index == time_index
+        lightning_sat_ds = xr.Dataset({
+            SAT_SETTINGS[sat_name][var_key]: ('flash', np.asarray(flash_array)[hour_flashes])
+            for var_key, flash_array in zip([raw_lat_cname, raw_lon_cname, flash_energy_varname, flash_area_varname],
+                                            [flash_lat, flash_lon, flash_energy, flash_area])
+        })
+        hour_ds = _crop_regrid_ds(_regrid_using_pandas(lightning_sat_ds, target_ds, sat_name, grid_res), domain_bbox,
+                                  domain_description)
+        hour_ds_list.append(hour_ds.expand_dims({'time': [hour_date]}))
+    regrid_ds = xr.concat(hour_ds_list, dim='time') if len(hour_ds_list) > 1 else hour_ds_list[0]
+    if output_format == cts.REGRID_SPARSE_FORMAT:
+        regrid_ds = sparse_regrid_utils.dense_to_sparse_regrid_ds(regrid_ds)
+    return regrid_ds
 
 
 def generate_lightning_sat_hourly_regrid_file(pre_regrid_file_url, sat_name, grid_res, grid_res_str, overwrite,
                                               lat_min=cts.FPOUT_LAT_MIN, lat_max=cts.FPOUT_LAT_MAX,
                                               lon_min=cts.FPOUT_LON_MIN, lon_max=cts.FPOUT_LON_MAX,
-                                              result_dir_path=None, naming_convention=None):
+                                              result_dir_path=None, naming_convention=None,
+                                              engine=cts.REGRID_ENGINE_PANDAS, output_format=cts.REGRID_DENSE_FORMAT,
+                                              encoding_profile=cts.DEFAULT_REGRID_ENCODING_PROFILE, domain=None,
+                                              chunk_size=None, max_memory_mb=None):
     """
     Pre-process lightning satellite hourly data file to regrid it to specific resolution and obtain
     the following information for each grid cell:
@@ -21,8 +493,9 @@ def generate_lightning_sat_hourly_regrid_file(pre_regrid_file_url, sat_name, gri
         - 'flash_area_log_hist': histogram of the flash area values (log10)
     :param pre_regrid_file_url: <pathlib.Path> or <str>
     :param sat_name: <str> satellite name (supported so far: 'GOES_GLM')
-    :param grid_res: <float> grid resolution (default: 0.5°)
-    :param grid_res_str: <str> grid resolution str (default: '05deg')
+    :param grid_res: <float> grid resolution (default: 0.5°) or <list> of grid resolutions: all the grid resolutions
+                    are obtained from a single read of the flashes (with the 'index' engine whatever the engine)
+    :param grid_res_str: <str> grid resolution str (default: '05deg') or <list> (one per grid resolution)
     :param overwrite: <bool> overwrite file if it already exists
     :param lat_min: <float>
     :param lat_max: <float>
@@ -30,9 +503,33 @@ def generate_lightning_sat_hourly_regrid_file(pre_regrid_file_url, sat_name, gri
     :param lon_max: <float>
     :param result_dir_path: <str> or <pathlib.Path>
     :param naming_convention: <str> pre-regrid file naming convention (useful for backward compatibility). Supported values: 'OLD_TEMP', 'OLD', None (default)
+    :param engine: <str> regrid engine, 'pandas' (default): flashes snapped to the grid with xarray nearest selection and
+                    counted with pandas groupby, 'index': grid cell indices computed arithmetically from lat_min, lon_min
+                    and grid_res and counted with a flat bincount (same result, faster on hours with many flashes)
+    :param output_format: <str> regrid file format, 'dense' (default) or 'sparse_coo' (only lit cells and non-zero
+                    histogram entries are stored, see utils.sparse_regrid_utils to read them back as dense dataset)
+    :param encoding_profile: <str> netcdf encoding profile, 'legacy' (default) or 'compact' (see
+                    constants.REGRID_ENCODING_PROFILES and utils.regrid_encoding_utils)
+    :param domain: regrid domain, only the grid cells intersecting the domain are written (same coordinates as the
+                    whole grid): None (default, whole grid), <dict> bbox { "LAT_MIN": , "LAT_MAX": , "LON_MIN": ,
+                    "LON_MAX": }, <list> of GEO_REGIONS ids (see utils.common_coords) or 'fov' (satellite field of view)
+    :param chunk_size: <int> chunked regrid (memory-bounded, 'index' engine computation whatever the engine): the
+                    flashes are read and accumulated in slices of chunk_size flashes (same result). If None (and
+                    max_memory_mb is None), the whole hour is read and regridded in memory with regrid_lightning_flashes
+    :param max_memory_mb: <float> chunked regrid with a memory ceiling (MB): the chunk size is derived from the
+                    memory left once the regrid grids are allocated (see get_regrid_chunk_size), peak memory does
+                    NOT depend on the number of flashes of the hour
+    :return: <bool> True if at least one regrid file has been created, False if they all already existed (and
+                    overwrite == False)
     """
     if not sat_name in cts.SAT_SETTINGS:
         raise ValueError(f'{sat_name} {cts.SAT_VALUE_ERROR}')
+    if engine not in cts.REGRID_ENGINES:
+        raise ValueError(f'{engine} {cts.REGRID_ENGINE_VALUE_ERROR}')
+    if output_format not in cts.REGRID_FORMATS:
+        raise ValueError(f'{output_format} {cts.REGRID_FORMAT_VALUE_ERROR}')
+    if encoding_profile not in cts.REGRID_ENCODING_PROFILES:
+        raise ValueError(f'{encoding_profile} {cts.REGRID_ENCODING_PROFILE_VALUE_ERROR}')
     if sat_name == cts.GOES_SATELLITE_GLM:
         SatPathParser = GLMPathParser
 
@@ -40,126 +537,1268 @@ def generate_lightning_sat_hourly_regrid_file(pre_regrid_file_url, sat_name, gri
     pre_regrid_path_parsed = SatPathParser(file_url=pre_regrid_file_url, regrid=False,
                                            naming_convention=naming_convention)
     pre_regrid_file_date = pre_regrid_path_parsed.get_start_date_pdTimestamp(ignore_missing_start_hour=False)
-    # create result nc file path
-    result_dir_path = generate_sat_hourly_file_path(date=pre_regrid_file_date, satellite=sat_name, regrid=True,
-                                                    sat_version=pre_regrid_path_parsed.satellite_version,
-                                                    regrid_res_str=grid_res_str, dir_path=result_dir_path)
-    # if directory/ies containing result nc file path does NOT exist --> create it/them
-    if not result_dir_path.parent.exists():
-        result_dir_path.parent.mkdir(parents=True)
-        print(f"Creating directory {result_dir_path.parent}")
-
-    # check if regrid file exists and if it doesn't OR if overwrite == True --> "create it"
-    if not result_dir_path.exists() or (result_dir_path.exists() and overwrite):
-        # generate empty dataset with correctly gridded lat et lon
-        target_ds = xr.Dataset(
-            coords={
-                'latitude': np.arange(lat_min, lat_max + grid_res, grid_res),
-                'longitude': np.arange(lon_min, lon_max + grid_res, grid_res)
-            },
-            attrs={'grid_resolution': f'{grid_res}° x {grid_res}°',
-                   'pre_regrid_satellite_file': pre_regrid_path_parsed.url.name}
-        )
-        #       STEP 4.2: open pre-regrid glm file
-        with xr.open_dataset(pre_regrid_file_url) as lightning_sat_ds:
-            # assign new longitude and latitude coords with chosen grid resolution using nearest method
-            _ds_assigncoords_lonlat = lightning_sat_ds.assign_coords({
-                'latitude': target_ds.latitude.sel(latitude=lightning_sat_ds[SAT_SETTINGS[sat_name][raw_lat_cname]],
-                                                   method='nearest'),
-                'longitude': target_ds.longitude.sel(longitude=lightning_sat_ds[SAT_SETTINGS[sat_name][raw_lon_cname]],
-                                                     method='nearest')
-            })
-            # keep several attributes from the original sat file
-            # TODO: update conditions (processing_level) if attribute names are different for other satellites
-            new_attrs = {}
-            for attr in SAT_SETTINGS[sat_name][attrs_to_keep]:
-                if attr == "processing_level":
-                    new_attrs[f'pre_regrid_data_{attr}'] = lightning_sat_ds.attrs.get(attr, '')
-                else:
-                    new_attrs[attr] = lightning_sat_ds.attrs.get(attr, '')
-            new_attrs['pre_regrid_satellite_file'] = pre_regrid_path_parsed.url.name
-            target_ds = target_ds.assign_attrs(new_attrs)
-            # apply operations (count + hist) on flash energy and flash area variables
-            flash_energy = SAT_SETTINGS[sat_name][flash_energy_varname]
-            flash_area = SAT_SETTINGS[sat_name][flash_area_varname]
-            # only keep relevant variables and coords
-            _ds = _ds_assigncoords_lonlat[[flash_energy, flash_area]] \
-                .reset_coords(names=['latitude', 'longitude'], drop=False) \
-                .reset_coords(drop=True)
-            # flash count <!> result = xarray.Dataset
-            count_ds = xr_pd_utils.count_using_pandas(_ds[[flash_energy, 'latitude', 'longitude']],
-                                                      data_var_name=flash_energy, res_var_name='flash_count')
-            count_ds['flash_count'].attrs['long_name'] = f'Number of flash occurrences in a {grid_res}° x {grid_res}° x 1h grid cell'
-            # flash energy histogram <!> result = xarray.DataArray
-            _ds['flash_energy_log'] = np.log10(_ds[flash_energy])
-            flash_en_hist_ds = xr_pd_utils.histogram_using_pandas(
-                                    _ds[['flash_energy_log', 'latitude', 'longitude']], data_var_name='flash_energy_log',
-                                    min_bin_edge=cts.f_en_min_bin, max_bin_edge=cts.f_en_max_bin,
-                                    step=cts.f_en_hist_step, res_var_name='flash_energy_log_hist')
-            flash_en_hist_ds['flash_energy_log_hist'].attrs.update({
-                'long_name': f'Number of flash occurrences in log10(flash_energy) bin in a {grid_res}° x {grid_res}° x 1h grid cell',
-                'comment': 'log10(flash_energy) bins between -15 and -10, step between bins = 0.1'
-            })
-            # flash area histogram
-            _ds['flash_area_log'] = np.log10(_ds[flash_area])
-            flash_area_hist_ds = xr_pd_utils.histogram_using_pandas(
-                                    _ds[['flash_area_log', 'latitude', 'longitude']], data_var_name='flash_area_log',
-                                    min_bin_edge=cts.f_ar_min_bin, max_bin_edge=cts.f_ar_max_bin,
-                                    step=cts.f_ar_hist_step, res_var_name='flash_area_log_hist')
-            flash_area_hist_ds['flash_area_log_hist'].attrs.update({
-                'long_name': f'Number of flash occurrences in log10(flash_area) bin in a {grid_res}° x {grid_res}° x 1h grid cell',
-                'comment': 'log10(flash_area) bins between 1.5 and 4.5, step between bins = 0.1'
-            })
-            # merge count and hist ds with target ds
-            target_ds = xr.merge([count_ds, flash_en_hist_ds, flash_area_hist_ds, target_ds], combine_attrs='no_conflicts')
-        # add pre-regrid file date to regrid date + add regrid file creation date attr
-        target_ds = target_ds.expand_dims({'time': [pre_regrid_file_date]})
-        target_ds.attrs['regrid_file_creation_date'] = datetime.now().isoformat()
-        # TODO: réduire units de l'heure pour prendre moins de place (pas besoin de nanoseconds en soit)
-        target_ds.to_netcdf(
-            path=result_dir_path, mode='w',
-            encoding={"time": {"dtype": 'float64', 'units': 'nanoseconds since 1970-01-01'}}
-        )
-        print(f"Created netcdf file {result_dir_path}")
+    # result nc file path of each grid resolution to generate (regrid file does not exist or overwrite == True)
+    result_file_paths = _get_hourly_regrid_file_paths_to_generate(
+        date=pre_regrid_file_date, sat_name=sat_name, sat_version=pre_regrid_path_parsed.satellite_version,
+        grid_resolutions=_get_grid_resolutions(grid_res, grid_res_str), overwrite=overwrite,
+        result_dir_path=result_dir_path)
+    if not result_file_paths:
+        return False
+    domain_bbox, domain_description = _get_regrid_domain_bbox(domain, sat_name=sat_name,
+                                                              sat_version=pre_regrid_path_parsed.satellite_version)
+
+    #       STEP 4.2: open pre-regrid glm file
+    with xr.open_dataset(pre_regrid_file_url) as lightning_sat_ds:
+        # keep several attributes from the original sat file
+        attrs = _get_attrs_to_keep(lightning_sat_ds.attrs, sat_name)
+        attrs['pre_regrid_satellite_file'] = pre_regrid_path_parsed.url.name
+        regrid_accumulator = None
+        if chunk_size is None and max_memory_mb is None:
+            # whole hour read once for all the grid resolutions
+            flash_arrays = _get_flash_arrays(lightning_sat_ds, sat_name)
+        else:
+            # same computation as the raw granules streaming regrid, with the flashes read in slices of chunk_size
+            # flashes, only once for all the grid resolutions
+            regrid_accumulator = MultiResolutionRegridAccumulator(
+                grid_res_list=[grid_res for grid_res, _ in result_file_paths],
+                lat_min=lat_min, lat_max=lat_max, lon_min=lon_min, lon_max=lon_max)
+            if max_memory_mb is not None:
+                chunk_size = min(chunk_size or np.inf, get_regrid_chunk_size(max_memory_mb, regrid_accumulator))
+            for flash_arrays in iter_flash_array_chunks(lightning_sat_ds, sat_name, chunk_size=chunk_size):
+                regrid_accumulator.add_flashes(*flash_arrays)
+    for (grid_res, grid_res_str), result_file_path in result_file_paths.items():
+        if regrid_accumulator is None:
+            regrid_ds = regrid_lightning_flashes(
+                *flash_arrays, flash_time=pre_regrid_file_date, grid_res=grid_res, lat_min=lat_min, lat_max=lat_max,
+                lon_min=lon_min, lon_max=lon_max, attrs=attrs, domain=domain, sat_name=sat_name,
+                sat_version=pre_regrid_path_parsed.satellite_version, output_format=output_format,
+                engine=engine if len(result_file_paths) == 1 else cts.REGRID_ENGINE_INDEX)
+            _write_regrid_file(regrid_ds, result_file_path=result_file_path, encoding_profile=encoding_profile)
+            continue
+        # one dense dataset at a time
+        regrid_ds = regrid_accumulator.to_dataset(grid_res=grid_res,
+                                                  attrs={'grid_resolution': f'{grid_res}° x {grid_res}°', **attrs})
+        _write_hourly_regrid_file(_crop_regrid_ds(regrid_ds, domain_bbox, domain_description),
+                                  date=pre_regrid_file_date,
+                                  result_file_path=result_file_path, output_format=output_format,
+                                  encoding_profile=encoding_profile)
+    return True
+
+
+def _get_grid_resolutions(grid_res, grid_res_str):
+    """
+    :param grid_res: <float> or <list> [ <float>, ... ] grid resolution(s)
+    :param grid_res_str: <str> or <list> [ <str>, ... ] grid resolution str(s) (same length as grid_res)
+    :return: <list> [ (<float> grid_res, <str> grid_res_str), ... ]
+    """
+    grid_res_list = list(grid_res) if isinstance(grid_res, (list, tuple)) else [grid_res]
+    grid_res_str_list = list(grid_res_str) if isinstance(grid_res_str, (list, tuple)) else [grid_res_str]
+    if len(grid_res_list) != len(grid_res_str_list):
+        raise ValueError(f'Expecting as many grid resolutions as grid resolution str, got {grid_res_list} and '
+                         f'{grid_res_str_list}')
+    return list(zip(grid_res_list, grid_res_str_list))
+
 
-    else:  # file already exists so no need to create it again
-        print(f"{result_dir_path} already exists")
+def _get_hourly_regrid_file_paths_to_generate(date, sat_name, sat_version, grid_resolutions, overwrite,
+                                              result_dir_path=None):
+    """
+    Hourly regrid file paths of the grid resolutions to generate (regrid file does not exist or overwrite == True),
+    the directories containing them are created
+    :param date: <pandas.Timestamp> start date of the hour
+    :param sat_name: <str> satellite name
+    :param sat_version: <str> satellite version e.g.: 'G16'
+    :param grid_resolutions: <list> [ (<float> grid_res, <str> grid_res_str), ... ]
+    :param overwrite: <bool>
+    :param result_dir_path: <pathlib.Path> or <str> root directory (if different from default)
+    :return: <dict> { (<float> grid_res, <str> grid_res_str): <pathlib.Path> regrid file path }
+    """
+    result_file_paths = {}
+    for grid_res, grid_res_str in grid_resolutions:
+        result_file_path = generate_sat_hourly_file_path(date=date, satellite=sat_name, regrid=True,
+                                                         sat_version=sat_version, regrid_res_str=grid_res_str,
+                                                         dir_path=result_dir_path)
+        # check if regrid file exists and if it doesn't OR if overwrite == True --> "create it"
+        if not result_file_path.exists() or overwrite:
+            result_file_paths[(grid_res, grid_res_str)] = result_file_path
+        else:  # file already exists so no need to create it again
+            print(f"{result_file_path} already exists")
+    return result_file_paths
+
+
+def _get_regrid_domain_bbox(domain, sat_name, sat_version):
+    """
+    Bounding box of the regrid domain
+    :param domain: None (whole grid), <dict> bbox { "LAT_MIN": , "LAT_MAX": , "LON_MIN": , "LON_MAX": }, <list> of
+                    GEO_REGIONS ids (bbox containing all the regions) or 'fov' (bbox containing the satellite field of view)
+    :param sat_name: <str> satellite name
+    :param sat_version: <str> satellite version e.g.: 'G16' (field of view) or <list> of satellite versions (mosaic:
+                    bbox containing all the fields of view)
+    :return: <tuple> (<dict> bbox or None, <str> domain description stored as regrid file attribute or None)
+    """
+    if domain is None:
+        return None, None
+    if isinstance(domain, str) and domain == cts.REGRID_DOMAIN_FOV:
+        sat_version_list = list(sat_version) if isinstance(sat_version, (list, tuple)) else [sat_version]
+        domain_bbox = regions_utils.get_geo_regions_bbox(
+            region_ids=sat_version_list,
+            geo_regions_dict={version: get_sat_field_of_view_bbox(sat_name=sat_name, sat_version=version)
+                              for version in sat_version_list})
+        domain_name = f'{" ".join(sat_version_list)} field of view'
+    elif isinstance(domain, dict) and all(key in domain for key in ['LAT_MIN', 'LAT_MAX', 'LON_MIN', 'LON_MAX']):
+        domain_bbox = {key: float(domain[key]) for key in ['LAT_MIN', 'LAT_MAX', 'LON_MIN', 'LON_MAX']}
+        domain_name = 'bbox'
+    elif isinstance(domain, (list, tuple)) and not isinstance(domain, str):
+        domain_bbox = regions_utils.get_geo_regions_bbox(region_ids=list(domain))
+        domain_name = f'GEO_REGIONS {list(domain)}'
+    else:
+        raise ValueError(f'{domain} {cts.REGRID_DOMAIN_VALUE_ERROR}')
+    domain_description = f'{domain_name}: ' + ', '.join(f'{key}={value}' for key, value in domain_bbox.items())
+    return domain_bbox, domain_description
+
+
+def _crop_regrid_ds(regrid_ds, domain_bbox, domain_description):
+    """
+    Only keep the grid cells intersecting the domain bbox (coordinates are the ones of the whole grid)
+    """
+    if domain_bbox is None:
+        return regrid_ds
+    regrid_ds = regrid_ds.isel(
+        latitude=xr_pd_utils.get_grid_domain_slice(regrid_ds['latitude'].values, domain_bbox['LAT_MIN'],
+                                                   domain_bbox['LAT_MAX']),
+        longitude=xr_pd_utils.get_grid_domain_slice(regrid_ds['longitude'].values, domain_bbox['LON_MIN'],
+                                                    domain_bbox['LON_MAX'])
+    )
+    regrid_ds.attrs[cts.REGRID_DOMAIN_ATTR] = domain_description
+    return regrid_ds
+
+
+def _write_hourly_regrid_file(regrid_ds, date, result_file_path, output_format=cts.REGRID_DENSE_FORMAT,
+                              encoding_profile=cts.DEFAULT_REGRID_ENCODING_PROFILE):
+    """
+    Add the time dimension and the creation date attribute to the regrid dataset of an hour and write it to netcdf
+    :param regrid_ds: <xarray.Dataset> dense regrid dataset (latitude, longitude(, bin)) of the hour
+    :param date: <pandas.Timestamp> start date of the hour
+    :param result_file_path: <pathlib.Path> hourly regrid file path
+    :param output_format: <str> 'dense' (default) or 'sparse_coo'
+    :param encoding_profile: <str> netcdf encoding profile, 'legacy' (default) or 'compact'
+    """
+    # add pre-regrid file date to regrid date
+    regrid_ds = regrid_ds.expand_dims({'time': [date]})
+    if output_format == cts.REGRID_SPARSE_FORMAT:
+        regrid_ds = sparse_regrid_utils.dense_to_sparse_regrid_ds(regrid_ds)
+    _write_regrid_file(regrid_ds, result_file_path=result_file_path, encoding_profile=encoding_profile)
+
+
+def _write_regrid_file(regrid_ds, result_file_path, encoding_profile=cts.DEFAULT_REGRID_ENCODING_PROFILE,
+                       complevel=None):
+    """
+    Add the creation date and encoding profile attributes to a regrid dataset (with a time dimension, dense or sparse)
+    and write it to netcdf (temporary file first so that an interrupted job does not leave an incomplete regrid file)
+    """
+    regrid_ds.attrs['regrid_file_creation_date'] = datetime.now().isoformat()
+    regrid_ds.attrs[cts.REGRID_ENCODING_ATTR] = encoding_profile
+    temp_file_path = result_file_path.parent / f'temp_{result_file_path.name}'
+    regrid_ds.to_netcdf(
+        path=temp_file_path, mode='w',
+        encoding=regrid_encoding_utils.get_regrid_encoding(regrid_ds, encoding_profile=encoding_profile,
+                                                           complevel=complevel)
+    )
+    os.replace(temp_file_path, result_file_path)
+    print(f"Created netcdf file {result_file_path}")
+
+
+def iter_lightning_sat_granules(granule_path_list, sat_name, chunk_size=None):
+    """
+    Generator over raw lightning satellite granules (e.g. GLM 20 sec files), one granule opened at a time and only the
+    flash variables needed for the regrid are read
+    :param granule_path_list: <list> [ <pathlib.Path>, ... ] raw granule files
+    :param sat_name: <str> satellite name
+    :param chunk_size: <int> if not None, granules are read in slices of chunk_size flashes
+    :return: <generator> yields (<dict> granule attributes, (flash_lat, flash_lon, flash_energy, flash_area))
+    """
+    for granule_path in granule_path_list:
+        with xr.open_dataset(granule_path) as granule_ds:
+            for flash_arrays in iter_flash_array_chunks(granule_ds, sat_name, chunk_size=chunk_size):
+                yield granule_ds.attrs, flash_arrays
+
+
+def generate_lightning_sat_hourly_regrid_file_from_granules(granule_path_list, sat_name, grid_res, grid_res_str,
+                                                            overwrite,
+                                                            lat_min=cts.FPOUT_LAT_MIN, lat_max=cts.FPOUT_LAT_MAX,
+                                                            lon_min=cts.FPOUT_LON_MIN, lon_max=cts.FPOUT_LON_MAX,
+                                                            result_dir_path=None,
+                                                            output_format=cts.REGRID_DENSE_FORMAT,
+                                                            encoding_profile=cts.DEFAULT_REGRID_ENCODING_PROFILE,
+                                                            domain=None, chunk_size=None, max_memory_mb=None):
+    """
+    Regrid the raw granules of an hour (e.g. the ~180 GLM 20 sec files) straight into the hourly regrid file, WITHOUT
+    generating the pre-regrid hourly file: granules are read one after the other and the flash counts and histograms
+    are accumulated incrementally (result identical to generate_lightning_sat_hourly_regrid_file on the concatenated
+    granules)
+    :param granule_path_list: <list> [ <pathlib.Path>, ... ] raw granule files of a single hour and satellite version
+    :param sat_name: <str> satellite name (only 'GOES_GLM' supported for now)
+    :param grid_res: <float> grid resolution or <list> of grid resolutions (all obtained from a single read of the
+                    granules)
+    :param grid_res_str: <str> grid resolution str (to be added to the resulting filename) or <list> (one per grid
+                    resolution)
+    :param overwrite: <bool> overwrite file if it already exists
+    :param lat_min: <float>
+    :param lat_max: <float>
+    :param lon_min: <float>
+    :param lon_max: <float>
+    :param result_dir_path: <pathlib.Path> or <str> mostly for testing, directory in which resulting file should be stored, if None --> use default path
+    :param output_format: <str> 'dense' (default) or 'sparse_coo'
+    :param encoding_profile: <str> netcdf encoding profile, 'legacy' (default) or 'compact'
+    :param domain: regrid domain: None (default, whole grid), <dict> bbox, <list> of GEO_REGIONS ids or 'fov' (see
+                    generate_lightning_sat_hourly_regrid_file)
+    :param chunk_size: <int> granules read in slices of chunk_size flashes (e.g. very active granules)
+    :param max_memory_mb: <float> memory ceiling (MB), see generate_lightning_sat_hourly_regrid_file
+    :return: <bool> True if at least one regrid file was created, False if they all already existed
+    """
+    if sat_name == cts.GOES_SATELLITE_GLM:
+        SatPathParser = GLMPathParser
+    else:
+        raise ValueError(f'{sat_name} {cts.SAT_VALUE_ERROR}')
+    if output_format not in cts.REGRID_FORMATS:
+        raise ValueError(f'{output_format} {cts.REGRID_FORMAT_VALUE_ERROR}')
+    if encoding_profile not in cts.REGRID_ENCODING_PROFILES:
+        raise ValueError(f'{encoding_profile} {cts.REGRID_ENCODING_PROFILE_VALUE_ERROR}')
+    granule_path_list = sorted(granule_path_list)
+    granules_parsed = [SatPathParser(file_url=granule_path, regrid=False, hourly=False)
+                       for granule_path in granule_path_list]
+    hour_date = granules_parsed[0].start_datetime
+    sat_version = granules_parsed[0].satellite_version
+    if any(parsed.start_datetime != hour_date or parsed.satellite_version != sat_version
+           for parsed in granules_parsed):
+        raise ValueError(f'Expecting raw granules of a single hour and satellite version '
+                         f'({granule_path_list[0].name} ... {granule_path_list[-1].name})')
+    result_file_paths = _get_hourly_regrid_file_paths_to_generate(
+        date=hour_date, sat_name=sat_name, sat_version=sat_version,
+        grid_resolutions=_get_grid_resolutions(grid_res, grid_res_str), overwrite=overwrite,
+        result_dir_path=result_dir_path)
+    if not result_file_paths:
+        return False
+    domain_bbox, domain_description = _get_regrid_domain_bbox(domain, sat_name=sat_name, sat_version=sat_version)
+    regrid_accumulator = MultiResolutionRegridAccumulator(
+        grid_res_list=[grid_res for grid_res, _ in result_file_paths],
+        lat_min=lat_min, lat_max=lat_max, lon_min=lon_min, lon_max=lon_max)
+    if max_memory_mb is not None:
+        chunk_size = min(chunk_size or np.inf, get_regrid_chunk_size(max_memory_mb, regrid_accumulator))
+    first_granule_attrs = None
+    for granule_attrs, flash_arrays in iter_lightning_sat_granules(granule_path_list, sat_name,
+                                                                   chunk_size=chunk_size):
+        if first_granule_attrs is None:
+            first_granule_attrs = granule_attrs
+        regrid_accumulator.add_flashes(*flash_arrays)
+    # attributes kept from the first granule of the hour (same as the ncrcat pre-regrid hourly file)
+    attrs = {**_get_attrs_to_keep(first_granule_attrs, sat_name),
+             'raw_satellite_files': f'{granule_path_list[0].name} ... {granule_path_list[-1].name} '
+                                    f'({len(granule_path_list)} files)'}
+    for (grid_res, grid_res_str), result_file_path in result_file_paths.items():
+        regrid_ds = regrid_accumulator.to_dataset(grid_res=grid_res,
+                                                  attrs={'grid_resolution': f'{grid_res}° x {grid_res}°', **attrs})
+        _write_hourly_regrid_file(_crop_regrid_ds(regrid_ds, domain_bbox, domain_description), date=hour_date,
+                                  result_file_path=result_file_path, output_format=output_format,
+                                  encoding_profile=encoding_profile)
+    return True
+
+
+def group_sat_granules_by_hour(granule_path_list, sat_name):
+    """
+    Group raw granule files by satellite version and hour
+    :param granule_path_list: <list> [ <pathlib.Path>, ... ] raw granule files
+    :param sat_name: <str> satellite name (only 'GOES_GLM' supported for now)
+    :return: <list> [ [ <pathlib.Path>, ... ], ... ] sorted list of the granules of each (satellite version, hour)
+    """
+    if sat_name == cts.GOES_SATELLITE_GLM:
+        SatPathParser = GLMPathParser
+    else:
+        raise ValueError(f'{sat_name} {cts.SAT_VALUE_ERROR}')
+    hourly_granules = {}
+    for granule_path in granule_path_list:
+        granule_parsed = SatPathParser(file_url=granule_path, regrid=False, hourly=False)
+        hourly_granules.setdefault((granule_parsed.satellite_version, granule_parsed.start_datetime), []) \
+            .append(pathlib.Path(granule_path))
+    return [sorted(hourly_granules[key]) for key in sorted(hourly_granules)]
+
+
+def group_sat_files_by_hour_for_mosaic(path_list, sat_name, raw_granules=False, naming_convention=None):
+    """
+    Group the pre-regrid hourly files (or raw granules) of all the satellite versions by hour (GLM mosaic)
+    :param path_list: <list> [ <pathlib.Path>, ... ] pre-regrid hourly files or raw granules
+    :param sat_name: <str> satellite name (only 'GOES_GLM' supported for now)
+    :param raw_granules: <bool> if True, path_list contains raw granules
+    :param naming_convention: <str> pre-regrid file naming convention
+    :return: <list> [ { <str> sat_version: [ <pathlib.Path>, ... ] }, ... ] files of each satellite version for each
+                    hour (sorted by hour)
+    """
+    if sat_name == cts.GOES_SATELLITE_GLM:
+        SatPathParser = GLMPathParser
+    else:
+        raise ValueError(f'{sat_name} {cts.SAT_VALUE_ERROR}')
+    hourly_files = {}
+    for file_path in path_list:
+        path_parsed = SatPathParser(file_url=file_path, regrid=False, hourly=not raw_granules,
+                                    naming_convention=None if raw_granules else naming_convention)
+        hourly_files.setdefault(path_parsed.start_datetime, {}) \
+            .setdefault(path_parsed.satellite_version, []).append(pathlib.Path(file_path))
+    return [
+        {sat_version: sorted(file_list) for sat_version, file_list in sorted(hourly_files[hour_date].items())}
+        for hour_date in sorted(hourly_files)
+    ]
+
+
+def generate_lightning_sat_regrid_files_batch(pre_regrid_file_list, sat_name, grid_res, grid_res_str, overwrite,
+                                              lat_min=cts.FPOUT_LAT_MIN, lat_max=cts.FPOUT_LAT_MAX,
+                                              lon_min=cts.FPOUT_LON_MIN, lon_max=cts.FPOUT_LON_MAX,
+                                              result_dir_path=None, naming_convention=None,
+                                              output_format=cts.REGRID_DENSE_FORMAT,
+                                              encoding_profile=cts.DEFAULT_REGRID_ENCODING_PROFILE, domain=None,
+                                              layout=cts.HOURLY_LAYOUT):
+    """
+    Batched regrid of several pre-regrid hourly files (e.g. the 24 hours of a day): the flashes of all the hours are
+    regridded together in one vectorized pass with the hour as an extra grouping key (see get_sparse_regrid_ds), so
+    that the fixed cost of the hourly regrid (target grid, merges, ...) is paid once per batch instead of once per hour
+        - layout 'hourly' (default): one hourly regrid file per hour (same files as
+        generate_lightning_sat_hourly_regrid_file)
+        - layout 'daily': one dense (time, latitude, longitude) block per day and satellite version, written straight
+        to the consolidated daily regrid file (<!> hours of the day NOT in pre_regrid_file_list are missing from it,
+        the block is converted to dense one hour at a time while written)
+    :param pre_regrid_file_list: <list> [ <pathlib.Path>, ... ] pre-regrid hourly files (any satellite version)
+    :param sat_name: <str> satellite name (only 'GOES_GLM' supported for now)
+    :param grid_res: <float> grid resolution or <list> of grid resolutions
+    :param grid_res_str: <str> grid resolution str or <list> (one per grid resolution)
+    :param overwrite: <bool> overwrite the regrid files if they already exist
+    :param lat_min: <float>
+    :param lat_max: <float>
+    :param lon_min: <float>
+    :param lon_max: <float>
+    :param result_dir_path: <pathlib.Path> or <str> root directory (if different from default)
+    :param naming_convention: <str> pre-regrid file naming convention
+    :param output_format: <str> hourly regrid file format, 'dense' (default) or 'sparse_coo' (consolidated daily
+                    files are always dense)
+    :param encoding_profile: <str> netcdf encoding profile of the hourly files, 'legacy' (default) or 'compact'
+                    (consolidated daily files are always written with the compact profile)
+    :param domain: regrid domain: None (default, whole grid), <dict> bbox, <list> of GEO_REGIONS ids or 'fov' (see
+                    generate_lightning_sat_hourly_regrid_file)
+    :param layout: <str> 'hourly' (default) or 'daily'
+    :return: <list> [ <pathlib.Path>, ... ] regrid files written
+    """
+    if sat_name == cts.GOES_SATELLITE_GLM:
+        SatPathParser = GLMPathParser
+    else:
+        raise ValueError(f'{sat_name} {cts.SAT_VALUE_ERROR}')
+    if output_format not in cts.REGRID_FORMATS:
+        raise ValueError(f'{output_format} {cts.REGRID_FORMAT_VALUE_ERROR}')
+    if encoding_profile not in cts.REGRID_ENCODING_PROFILES:
+        raise ValueError(f'{encoding_profile} {cts.REGRID_ENCODING_PROFILE_VALUE_ERROR}')
+    if layout not in [cts.HOURLY_LAYOUT, cts.DAILY_LAYOUT]:
+        raise ValueError(f'{layout} {cts.REGRID_LAYOUT_VALUE_ERROR}')
+    grid_resolutions = _get_grid_resolutions(grid_res, grid_res_str)
+    # batches: hours of each satellite version (and day if daily layout)
+    batch_files = {}
+    for pre_regrid_file_url in pre_regrid_file_list:
+        path_parsed = SatPathParser(file_url=pre_regrid_file_url, regrid=False, naming_convention=naming_convention)
+        batch_key = (path_parsed.satellite_version,
+                     path_parsed.start_datetime.floor('D') if layout == cts.DAILY_LAYOUT else None)
+        batch_files.setdefault(batch_key, []).append((path_parsed.start_datetime, pathlib.Path(pre_regrid_file_url)))
+    written_file_list = []
+    for (sat_version, day_date), hour_file_list in sorted(batch_files.items()):
+        hour_file_list = sorted(hour_file_list)
+        # regrid file paths to write: { (grid_res, grid_res_str): { hour date: path } } (hourly layout) or
+        # { (grid_res, grid_res_str): path } (daily layout)
+        if layout == cts.HOURLY_LAYOUT:
+            result_file_paths = {}
+            for hour_date, _ in hour_file_list:
+                for grid_resolution, result_file_path in _get_hourly_regrid_file_paths_to_generate(
+                        date=hour_date, sat_name=sat_name, sat_version=sat_version,
+                        grid_resolutions=grid_resolutions, overwrite=overwrite,
+                        result_dir_path=result_dir_path).items():
+                    result_file_paths.setdefault(grid_resolution, {})[hour_date] = result_file_path
+            hours_to_read = sorted({hour_date for hour_paths in result_file_paths.values() for hour_date in hour_paths})
+        else:
+            result_file_paths = {}
+            for grid_resolution in grid_resolutions:
+                result_file_path = generate_sat_consolidated_file_path(date=day_date, satellite=sat_name,
+                                                                       sat_version=sat_version, layout=layout,
+                                                                       regrid_res_str=grid_resolution[1],
+                                                                       dir_path=result_dir_path)
+                if result_file_path.exists() and not overwrite:
+                    print(f"{result_file_path} already exists")
+                    continue
+                result_file_path.parent.mkdir(parents=True, exist_ok=True)
+                result_file_paths[grid_resolution] = result_file_path
+            hours_to_read = [hour_date for hour_date, _ in hour_file_list] if result_file_paths else []
+        if not hours_to_read:
+            continue
+        domain_bbox, domain_description = _get_regrid_domain_bbox(domain, sat_name=sat_name, sat_version=sat_version)
+
+        # read the flashes of all the hours of the batch
+        hour_file_dict = dict(hour_file_list)
+        flash_arrays_list, hour_attrs_list = [], []
+        for hour_date in hours_to_read:
+            with xr.open_dataset(hour_file_dict[hour_date]) as lightning_sat_ds:
+                flash_arrays_list.append(_get_flash_arrays(lightning_sat_ds, sat_name))
+                hour_attrs_list.append({**_get_attrs_to_keep(lightning_sat_ds.attrs, sat_name),
+                                        'pre_regrid_satellite_file': hour_file_dict[hour_date].name})
+        flash_time_index = np.concatenate([np.full(flash_arrays[0].size, time_index, dtype='i8')
+                                           for time_index, flash_arrays in enumerate(flash_arrays_list)])
+        flash_arrays = [np.concatenate(flash_var_arrays) for flash_var_arrays in zip(*flash_arrays_list)]
+
+        for (grid_res, grid_res_str), grid_res_file_paths in result_file_paths.items():
+            grid_attrs = {'grid_resolution': f'{grid_res}° x {grid_res}°'}
+            domain_attrs = {cts.REGRID_DOMAIN_ATTR: domain_description} if domain_bbox is not None else {}
+            # dense outputs: regrid on the whole grid and crop once dense (see regrid_lightning_flashes)
+            dense_output = layout != cts.HOURLY_LAYOUT or output_format == cts.REGRID_DENSE_FORMAT
+            sparse_ds = get_sparse_regrid_ds(flash_time_index, *flash_arrays, times=hours_to_read,
+                                             latitudes=np.arange(lat_min, lat_max + grid_res, grid_res),
+                                             longitudes=np.arange(lon_min, lon_max + grid_res, grid_res),
+                                             grid_res=grid_res, domain_bbox=None if dense_output else domain_bbox)
+            if layout == cts.HOURLY_LAYOUT:
+                for time_index, (hour_date, hour_attrs) in enumerate(zip(hours_to_read, hour_attrs_list)):
+                    if hour_date not in grid_res_file_paths:
+                        continue
+                    hour_ds = sparse_regrid_utils.select_sparse_regrid_time_step(sparse_ds, time_index)
+                    hour_ds.attrs = {**grid_attrs, **hour_attrs, **domain_attrs,
+                                     cts.REGRID_FORMAT_ATTR: cts.REGRID_SPARSE_FORMAT}
+                    if output_format == cts.REGRID_DENSE_FORMAT:
+                        hour_ds = _crop_regrid_ds(sparse_regrid_utils.sparse_to_dense_regrid_ds(hour_ds), domain_bbox,
+                                                  domain_description)
+                    _write_regrid_file(hour_ds, result_file_path=grid_res_file_paths[hour_date],
+                                       encoding_profile=encoding_profile)
+                    written_file_list.append(grid_res_file_paths[hour_date])
+            else:
+                # attributes common to all the hours (same as the consolidated files, see write_consolidated_regrid_file)
+                sparse_ds.attrs = {
+                    **grid_attrs,
+                    **{attr: value for attr, value in hour_attrs_list[0].items()
+                       if all(hour_attrs.get(attr) == value for hour_attrs in hour_attrs_list)},
+                    **domain_attrs, 'regrid_layout': layout
+                }
+                _write_regrid_file(_crop_regrid_ds(sparse_regrid_utils.sparse_to_lazy_dense_regrid_ds(sparse_ds),
+                                                   domain_bbox, domain_description),
+                                   result_file_path=grid_res_file_paths,
+                                   encoding_profile=cts.CONSOLIDATED_ENCODING_PROFILE)
+                written_file_list.append(grid_res_file_paths)
+    return written_file_list
+
+
+def _check_mosaic_rule(mosaic_rule):
+    if not (mosaic_rule == cts.GLM_MOSAIC_NADIR_RULE or
+            (isinstance(mosaic_rule, (int, float)) and not isinstance(mosaic_rule, bool))):
+        raise ValueError(f'{mosaic_rule} {cts.GLM_MOSAIC_RULE_VALUE_ERROR}')
+
+
+def get_mosaic_flash_mask(flash_lon, sat_version, mosaic_sat_versions, mosaic_rule=cts.GLM_MOSAIC_NADIR_RULE):
+    """
+    Flashes of a satellite kept in the mosaic of several satellites (e.g. GOES-East and GOES-West GLM): each flash is
+    kept from a single satellite so that the flashes seen by several satellites (overlap zone) are counted once
+        - 'nadir' (default): satellite with the closest sub-satellite point (see constants.GLM_SUBSATELLITE_LON)
+        - <float> seam longitude: satellite on the same side of the seam (east: [seam, seam + 180[, west otherwise),
+        closest sub-satellite point if several satellites are on the same side (or if none is)
+    :param flash_lon: <numpy.ndarray> flash longitudes of the satellite
+    :param sat_version: <str> satellite version of the flashes e.g.: 'G16'
+    :param mosaic_sat_versions: <list> [ <str>, ... ] satellite versions of the mosaic hour (all the flashes are kept if
+                    sat_version is the only one)
+    :param mosaic_rule: <str> 'nadir' or <float> seam longitude
+    :return: <numpy.ndarray> boolean mask of the flashes to keep
+    """
+    _check_mosaic_rule(mosaic_rule)
+    mosaic_sat_versions = sorted(mosaic_sat_versions)
+    if any(version not in cts.GLM_SUBSATELLITE_LON for version in mosaic_sat_versions):
+        raise ValueError(f'Unknown sub-satellite point for {mosaic_sat_versions}, expecting satellite versions among '
+                         f'{list(cts.GLM_SUBSATELLITE_LON)}')
+    sat_lon = np.array([cts.GLM_SUBSATELLITE_LON[version] for version in mosaic_sat_versions])
+    flash_lon = np.asarray(flash_lon, dtype='f8')
+    # longitude distance (wrapped at +/-180°) between each flash and each sub-satellite point (flashes, satellites)
+    distance = np.abs((flash_lon[:, np.newaxis] - sat_lon[np.newaxis, :] + 180) % 360 - 180)
+    if mosaic_rule != cts.GLM_MOSAIC_NADIR_RULE:
+        flash_east = (flash_lon - mosaic_rule) % 360 < 180
+        sat_east = (sat_lon - mosaic_rule) % 360 < 180
+        same_side_distance = np.where(flash_east[:, np.newaxis] == sat_east[np.newaxis, :], distance, np.inf)
+        no_sat_on_side = np.isinf(same_side_distance).all(axis=1)
+        distance = np.where(no_sat_on_side[:, np.newaxis], distance, same_side_distance)
+    return np.argmin(distance, axis=1) == mosaic_sat_versions.index(sat_version)
+
+
+def _get_mosaic_attrs(sat_attrs_dict, sat_file_dict, sat_name, mosaic_rule, raw_granules=False):
+    """
+    Attributes of the mosaic regrid file: attributes kept from each satellite (see _get_attrs_to_keep), the distinct
+    values being joined (e.g. platform_ID='G16 G17'), the satellites and rule of the mosaic and the input files
+    """
+    sat_attrs_list = [_get_attrs_to_keep(sat_attrs, sat_name) for _, sat_attrs in sorted(sat_attrs_dict.items())]
+    return {
+        **{attr: ' '.join(dict.fromkeys(str(sat_attrs[attr]) for sat_attrs in sat_attrs_list))
+           for attr in sat_attrs_list[0]},
+        'mosaic_satellites': ' '.join(sat_file_dict),
+        'mosaic_rule': str(mosaic_rule),
+        ('raw_satellite_files' if raw_granules else 'pre_regrid_satellite_file'): ', '.join(
+            f'{file_list[0].name} ... {file_list[-1].name} ({len(file_list)} files)' if raw_granules
+            else file_list[0].name
+            for file_list in sat_file_dict.values())
+    }
+
+
+def generate_lightning_sat_hourly_mosaic_regrid_file(sat_file_dict, sat_name, grid_res, grid_res_str, overwrite,
+                                                     lat_min=cts.FPOUT_LAT_MIN, lat_max=cts.FPOUT_LAT_MAX,
+                                                     lon_min=cts.FPOUT_LON_MIN, lon_max=cts.FPOUT_LON_MAX,
+                                                     result_dir_path=None, naming_convention=None, raw_granules=False,
+                                                     output_format=cts.REGRID_DENSE_FORMAT,
+                                                     encoding_profile=cts.DEFAULT_REGRID_ENCODING_PROFILE,
+                                                     domain=None, chunk_size=None, max_memory_mb=None,
+                                                     mosaic_rule=cts.GLM_MOSAIC_NADIR_RULE):
+    """
+    Regrid the files of all the satellites available for an hour (e.g. G16 and G17) into a single mosaic hourly regrid
+    file (satellite version 'MOSAIC'): the satellites are read one after the other into the same accumulators and each
+    flash of the overlap zone is only kept from one satellite (see get_mosaic_flash_mask)
+    :param sat_file_dict: <dict> { <str> sat_version: [ <pathlib.Path>, ... ] } pre-regrid hourly file (or raw
+                    granules) of each satellite version, all for the same hour
+    :param sat_name: <str> satellite name (only 'GOES_GLM' supported for now)
+    :param grid_res: <float> grid resolution or <list> of grid resolutions
+    :param grid_res_str: <str> grid resolution str or <list> (one per grid resolution)
+    :param overwrite: <bool> overwrite file if it already exists
+    :param lat_min: <float>
+    :param lat_max: <float>
+    :param lon_min: <float>
+    :param lon_max: <float>
+    :param result_dir_path: <pathlib.Path> or <str> root directory (if different from default)
+    :param naming_convention: <str> pre-regrid file naming convention (ignored if raw_granules)
+    :param raw_granules: <bool> if True, sat_file_dict contains raw granules
+    :param output_format: <str> 'dense' (default) or 'sparse_coo'
+    :param encoding_profile: <str> netcdf encoding profile, 'legacy' (default) or 'compact'
+    :param domain: regrid domain: None (default, whole grid), <dict> bbox, <list> of GEO_REGIONS ids or 'fov' (bbox
+                    containing the field of view of all the satellites of the hour)
+    :param chunk_size: <int> files read in slices of chunk_size flashes
+    :param max_memory_mb: <float> memory ceiling (MB), see generate_lightning_sat_hourly_regrid_file
+    :param mosaic_rule: <str> 'nadir' (default) or <float> seam longitude, see get_mosaic_flash_mask
+    :return: <bool> True if at least one regrid file was created, False if they all already existed
+    """
+    if sat_name == cts.GOES_SATELLITE_GLM:
+        SatPathParser = GLMPathParser
+    else:
+        raise ValueError(f'{sat_name} {cts.SAT_VALUE_ERROR}')
+    if output_format not in cts.REGRID_FORMATS:
+        raise ValueError(f'{output_format} {cts.REGRID_FORMAT_VALUE_ERROR}')
+    if encoding_profile not in cts.REGRID_ENCODING_PROFILES:
+        raise ValueError(f'{encoding_profile} {cts.REGRID_ENCODING_PROFILE_VALUE_ERROR}')
+    sat_file_dict = {sat_version: sorted(file_list) for sat_version, file_list in sorted(sat_file_dict.items())}
+    mosaic_sat_versions = list(sat_file_dict)
+    _check_mosaic_rule(mosaic_rule)
+    path_parsed_list = [
+        SatPathParser(file_url=file_path, regrid=False, hourly=not raw_granules,
+                      naming_convention=None if raw_granules else naming_convention)
+        for file_list in sat_file_dict.values() for file_path in file_list
+    ]
+    hour_date = path_parsed_list[0].start_datetime
+    if any(path_parsed.start_datetime != hour_date for path_parsed in path_parsed_list) or \
+            any(path_parsed.satellite_version not in sat_file_dict for path_parsed in path_parsed_list):
+        raise ValueError(f'Expecting files of a single hour for the mosaic, got {sat_file_dict}')
+    result_file_paths = _get_hourly_regrid_file_paths_to_generate(
+        date=hour_date, sat_name=sat_name, sat_version=cts.GLM_MOSAIC_VERSION,
+        grid_resolutions=_get_grid_resolutions(grid_res, grid_res_str), overwrite=overwrite,
+        result_dir_path=result_dir_path)
+    if not result_file_paths:
+        return False
+    domain_bbox, domain_description = _get_regrid_domain_bbox(domain, sat_name=sat_name,
+                                                              sat_version=mosaic_sat_versions)
+    regrid_accumulator = MultiResolutionRegridAccumulator(
+        grid_res_list=[grid_res for grid_res, _ in result_file_paths],
+        lat_min=lat_min, lat_max=lat_max, lon_min=lon_min, lon_max=lon_max)
+    if max_memory_mb is not None:
+        chunk_size = min(chunk_size or np.inf, get_regrid_chunk_size(max_memory_mb, regrid_accumulator))
+    sat_attrs_dict = {}
+    for sat_version, file_list in sat_file_dict.items():
+        for sat_attrs, flash_arrays in iter_lightning_sat_granules(file_list, sat_name, chunk_size=chunk_size):
+            sat_attrs_dict.setdefault(sat_version, sat_attrs)
+            mosaic_mask = get_mosaic_flash_mask(flash_arrays[1], sat_version, mosaic_sat_versions,
+                                                mosaic_rule=mosaic_rule)
+            regrid_accumulator.add_flashes(*(flash_array[mosaic_mask] for flash_array in flash_arrays))
+    attrs = _get_mosaic_attrs(sat_attrs_dict, sat_file_dict, sat_name, mosaic_rule=mosaic_rule,
+                              raw_granules=raw_granules)
+    for (grid_res, grid_res_str), result_file_path in result_file_paths.items():
+        regrid_ds = regrid_accumulator.to_dataset(grid_res=grid_res,
+                                                  attrs={'grid_resolution': f'{grid_res}° x {grid_res}°', **attrs})
+        _write_hourly_regrid_file(_crop_regrid_ds(regrid_ds, domain_bbox, domain_description), date=hour_date,
+                                  result_file_path=result_file_path, output_format=output_format,
+                                  encoding_profile=encoding_profile)
+    return True
+
+
+def regrid_sat_files_in_memory(pre_regrid_file_list, sat_name, grid_res=cts.GRID_RESOLUTION,
+                               lat_min=cts.FPOUT_LAT_MIN, lat_max=cts.FPOUT_LAT_MAX,
+                               lon_min=cts.FPOUT_LON_MIN, lon_max=cts.FPOUT_LON_MAX, naming_convention=None,
+                               domain=None, mosaic=False, mosaic_rule=cts.GLM_MOSAIC_NADIR_RULE):
+    """
+    Regrid pre-regrid hourly files in memory (see regrid_lightning_flashes): nothing is written, e.g. one-off regrid
+    of hours missing from the regrid archive
+    :param pre_regrid_file_list: <list> [ <pathlib.Path>, ... ] pre-regrid hourly files
+    :param sat_name: <str> satellite name (only 'GOES_GLM' supported for now)
+    :param grid_res: <float> grid resolution
+    :param lat_min: <float>
+    :param lat_max: <float>
+    :param lon_min: <float>
+    :param lon_max: <float>
+    :param naming_convention: <str> pre-regrid file naming convention
+    :param domain: regrid domain: None (default, whole grid), <dict> bbox, <list> of GEO_REGIONS ids or 'fov'
+    :param mosaic: <bool> if True, the files of all the satellite versions of each hour are regridded into a single
+                    mosaic time step (see generate_lightning_sat_hourly_mosaic_regrid_file)
+    :param mosaic_rule: <str> 'nadir' (default) or <float> seam longitude, see get_mosaic_flash_mask
+    :return: <xarray.Dataset> dense regrid dataset (time, latitude, longitude), one time step per file (per hour if
+                    mosaic), or None if pre_regrid_file_list is empty
+    """
+    if mosaic:
+        _check_mosaic_rule(mosaic_rule)
+        hourly_sat_files_list = group_sat_files_by_hour_for_mosaic(pre_regrid_file_list, sat_name=sat_name,
+                                                                   naming_convention=naming_convention)
+    else:
+        hourly_sat_files_list = [
+            {GLMPathParser(file_url=file_path, regrid=False, naming_convention=naming_convention).satellite_version:
+                 [pathlib.Path(file_path)]}
+            for file_path in sorted(pre_regrid_file_list)
+        ]
+    hour_ds_list = []
+    for sat_file_dict in hourly_sat_files_list:
+        file_path = next(iter(sat_file_dict.values()))[0]
+        hour_date = GLMPathParser(file_url=file_path, regrid=False, naming_convention=naming_convention) \
+            .get_start_date_pdTimestamp(ignore_missing_start_hour=False)
+        sat_attrs_dict, flash_arrays_list = {}, []
+        for sat_version, file_list in sat_file_dict.items():
+            with xr.open_dataset(file_list[0]) as lightning_sat_ds:
+                sat_attrs_dict[sat_version] = lightning_sat_ds.attrs
+                flash_arrays = _get_flash_arrays(lightning_sat_ds, sat_name)
+            if mosaic:
+                mosaic_mask = get_mosaic_flash_mask(flash_arrays[1], sat_version, list(sat_file_dict),
+                                                    mosaic_rule=mosaic_rule)
+                flash_arrays = tuple(flash_array[mosaic_mask] for flash_array in flash_arrays)
+            flash_arrays_list.append(flash_arrays)
+        if mosaic:
+            attrs = _get_mosaic_attrs(sat_attrs_dict, sat_file_dict, sat_name, mosaic_rule=mosaic_rule)
+        else:
+            attrs = {**_get_attrs_to_keep(sat_attrs_dict[next(iter(sat_file_dict))], sat_name),
+                     'pre_regrid_satellite_file': file_path.name}
+        hour_ds_list.append(regrid_lightning_flashes(
+            *(np.concatenate(flash_var_arrays) for flash_var_arrays in zip(*flash_arrays_list)),
+            flash_time=hour_date, grid_res=grid_res, lat_min=lat_min, lat_max=lat_max, lon_min=lon_min,
+            lon_max=lon_max, attrs=attrs, domain=domain, sat_name=sat_name, sat_version=list(sat_file_dict)))
+    if not hour_ds_list:
+        return None
+    return xr.concat(hour_ds_list, dim='time', combine_attrs='drop_conflicts')
+
+
+def _regrid_sat_file_worker(regrid_function, regrid_kwargs, input_hash_check=None):
+    """
+    Regrid a single satellite file (or hour of raw granules) in a worker process (or in the main process if workers is
+    1), exceptions are caught so that one failing file does not stop the other files from being regridded
+    :param regrid_function: generate_lightning_sat_hourly_regrid_file,
+                            generate_lightning_sat_hourly_regrid_file_from_granules,
+                            generate_lightning_sat_hourly_mosaic_regrid_file or
+                            generate_lightning_sat_regrid_files_batch
+    :param regrid_kwargs: <dict> regrid_function arguments
+    :param input_hash_check: <tuple> (<list> input files, <str> recorded input hash or None) of an input whose mtime
+                    changed (see utils.regrid_manifest.get_input_status): the input hash is computed here, in the worker,
+                    and the regrid is skipped if it is the recorded one (content unchanged)
+    :return: <tuple> (<str> regrid status: 'succeeded', 'skipped' or 'failed', <str> error message or None, <str> input
+                    hash or None)
+    """
+    input_hash = None
+    try:
+        if input_hash_check is not None:
+            input_path_list, recorded_input_hash = input_hash_check
+            input_hash = regrid_manifest.get_input_hash(input_path_list)
+            if input_hash == recorded_input_hash:
+                return cts.REGRID_SKIPPED, None, input_hash
+        created = regrid_function(**regrid_kwargs)
+    except Exception as e:
+        return cts.REGRID_FAILED, f'{type(e).__name__}: {e}', input_hash
+    return (cts.REGRID_SUCCEEDED if created else cts.REGRID_SKIPPED), None, input_hash
+
+
+def _get_regrid_batch_list(hour_index_list, hour_path_list, hour_resolutions_list, regrid_kwargs_list,
+                           naming_convention=None):
+    """
+    Groups the hours to regrid by satellite version, day and grid resolutions to regrid (batched regrid)
+    :return: <list> [ (<list> [ <int> hour index, ... ], <dict> generate_lightning_sat_regrid_files_batch arguments), ... ]
+    """
+    batch_dict = {}
+    for i_hour in hour_index_list:
+        path_parsed = GLMPathParser(file_url=hour_path_list[i_hour], regrid=False, naming_convention=naming_convention)
+        batch_key = (path_parsed.satellite_version, path_parsed.start_datetime.floor('D'),
+                     tuple(hour_resolutions_list[i_hour]))
+        batch_dict.setdefault(batch_key, []).append(i_hour)
+    batch_list = []
+    for batch_hour_index_list in batch_dict.values():
+        hour_kwargs = regrid_kwargs_list[batch_hour_index_list[0]]
+        batch_kwargs = {kwarg: hour_kwargs[kwarg] for kwarg in ['sat_name', 'grid_res', 'grid_res_str', 'result_dir_path',
+                                                                'naming_convention', 'output_format',
+                                                                'encoding_profile', 'domain']}
+        batch_kwargs.update(pre_regrid_file_list=[hour_path_list[i_hour] for i_hour in batch_hour_index_list],
+                            overwrite=any(regrid_kwargs_list[i_hour]['overwrite'] for i_hour in batch_hour_index_list))
+        batch_list.append((batch_hour_index_list, batch_kwargs))
+    return batch_list
+
+
+def _get_hourly_regrid_file_path(hour_path, sat_name, grid_res_str, result_dir_path=None, naming_convention=None,
+                                 raw_granules=False, mosaic=False):
+    """
+    Hourly regrid file path of a pre-regrid hourly file (or of the first raw granule of an hour), mosaic regrid file
+    of the hour if mosaic == True
+    """
+    hour_path_parsed = GLMPathParser(file_url=hour_path, regrid=False, hourly=not raw_granules,
+                                     naming_convention=None if raw_granules else naming_convention)
+    return generate_sat_hourly_file_path(date=hour_path_parsed.start_datetime, satellite=sat_name, regrid=True,
+                                         sat_version=cts.GLM_MOSAIC_VERSION if mosaic else hour_path_parsed.satellite_version,
+                                         regrid_res_str=grid_res_str, dir_path=result_dir_path)
+
+
+def _is_valid_regrid_file(file_path, expected_attrs=None):
+    """
+    Returns True if the regrid file exists and can be opened (e.g. NOT partially written by an interrupted job) and, if
+    expected_attrs is not None, was written with the expected encoding profile, format, domain, ... (files written
+    before these attributes existed: legacy encoding, dense format and whole grid)
+    :param expected_attrs: <dict> { <attr>: <value or None if the attribute is expected to be absent>, ... }
+    """
+    if not file_path.exists():
+        return False
+    try:
+        with xr.open_dataset(file_path) as regrid_ds:
+            file_attrs = {cts.REGRID_ENCODING_ATTR: cts.LEGACY_ENCODING_PROFILE, **regrid_ds.attrs}
+            return 'flash_count' in regrid_ds.data_vars and \
+                all(file_attrs.get(attr) == value for attr, value in (expected_attrs or {}).items())
+    except Exception:
+        return False
+
+
+def _is_existing_regrid_file(file_path):
+    """
+    Returns True if the regrid file exists and is not empty (stat only, the file is NOT opened)
+    """
+    try:
+        return file_path.stat().st_size > 0
+    except OSError:
+        return False
+
+
+def _get_expected_regrid_file_attrs(grid_res, output_format, encoding_profile, domain, sat_name, sat_version,
+                                    mosaic_rule=None):
+    """
+    Attributes of the hourly regrid files written with the regrid parameters given (see _is_valid_regrid_file)
+    """
+    _, domain_description = _get_regrid_domain_bbox(domain, sat_name=sat_name, sat_version=sat_version)
+    expected_attrs = {
+        'grid_resolution': f'{grid_res}° x {grid_res}°',
+        cts.REGRID_ENCODING_ATTR: encoding_profile,
+        # dense files have no format attribute
+        cts.REGRID_FORMAT_ATTR: cts.REGRID_SPARSE_FORMAT if output_format == cts.REGRID_SPARSE_FORMAT else None,
+        cts.REGRID_DOMAIN_ATTR: domain_description
+    }
+    if mosaic_rule is not None:
+        expected_attrs['mosaic_rule'] = str(mosaic_rule)
+    return expected_attrs
 
 
 def regrid_sat_files(path_list, sat_name, grid_res=cts.GRID_RESOLUTION,
                      grid_res_str=cts.GRID_RESOLUTION_STR, dir_list=False, overwrite=False,
-                     result_dir_path=None, naming_convention=None):
+                     result_dir_path=None, naming_convention=None, engine=cts.REGRID_ENGINE_PANDAS, workers=1,
+                     layout=cts.HOURLY_LAYOUT, output_format=cts.REGRID_DENSE_FORMAT, raw_granules=False,
+                     encoding_profile=cts.DEFAULT_REGRID_ENCODING_PROFILE, use_manifest=True, domain=None,
+                     chunk_size=None, max_memory_mb=None, mosaic=False, mosaic_rule=cts.GLM_MOSAIC_NADIR_RULE,
+                     batch=False, flash_count_cube_append=False, flash_count_cumsum=False, reference_index=False,
+                     verify_adopted_outputs=False):
     """
-    Function to regrid a list of hourly satellite data files to a specific grid resolution
+    Function to regrid a list of hourly satellite data files (or raw granules) to a specific grid resolution
     :param path_list: <list> [ <str> or <pathlib.Path>, ... ] list of files or directories to regrid
     :param sat_name: <str> name of the satellite (only 'GOES_GLM' supported for now)
-    :param grid_res: <float> grid resolution
-    :param grid_res_str: <str> grid resolution str (to be added to the resulting filename)
+    :param grid_res: <float> grid resolution or <list> of grid resolutions (all regridded from a single read of each
+                    hour)
+    :param grid_res_str: <str> grid resolution str (to be added to the resulting filename) or <list> (one per grid
+                    resolution)
     :param dir_list: <bool> if True, list received is a list of directories containing data files, NOT a list of files
     :param overwrite: <bool> overwrite file if it already exists
     :param result_dir_path: <pathlib.Path> or <str> mostly for testing, directory in which resulting file should be stored, if None --> use default path
     :param naming_convention: <str> file or directory naming convention (mostly for backward compatibility). Supported values: 'OLD_TEMP', 'OLD' or None (default)
-    :return:
+    :param engine: <str> regrid engine, supported values: 'pandas' (default) or 'index'
+    :param workers: <int> number of worker processes, if > 1 the files are regridded in parallel in a process pool. In
+                    both cases a failing file does NOT stop the others (failed files listed in the returned summary)
+    :param layout: <str> 'hourly' (default), 'daily' or 'monthly': if 'daily' or 'monthly', the hourly regrid files are
+                    also compacted into consolidated daily or monthly files (see compact_regrid_files)
+    :param output_format: <str> hourly regrid file format, 'dense' (default) or 'sparse_coo'
+    :param encoding_profile: <str> netcdf encoding profile of the hourly regrid files, 'legacy' (default) or 'compact'
+                    (consolidated files: compact profile, see compact_regrid_files)
+    :param raw_granules: <bool> if True, path_list contains raw granules (e.g. GLM 20 sec files) or directories
+                    containing raw granules: the granules are grouped by hour and streamed straight into the hourly
+                    regrid files (no pre-regrid hourly file generated, engine and naming_convention ignored)
+    :param use_manifest: <bool> if True (default), the regrid manifest (SQLite file in the hourly regrid root directory,
+                    see utils.regrid_manifest) is used to skip the up-to-date hours without opening the output files
+                    (files NOT even stat-ed in the directories unchanged since their last check), to regrid again the
+                    failed, interrupted or stale ones (input or regrid parameters changed) and every regridded hour is
+                    recorded in it. Hours not in the manifest yet with an existing output file are recorded as up to
+                    date (see verify_adopted_outputs). If False, only the existence of the output file is checked
+    :param domain: regrid domain, only the grid cells intersecting the domain are written: None (default, whole grid),
+                    <dict> bbox { "LAT_MIN": , "LAT_MAX": , "LON_MIN": , "LON_MAX": }, <list> of GEO_REGIONS ids or
+                    'fov' (field of view of the satellite version of each hour)
+    :param chunk_size: <int> if not None, flashes are read and accumulated in slices of chunk_size flashes
+    :param max_memory_mb: <float> memory ceiling of each regrid (MB, per worker), the flashes are read in slices small
+                    enough for the regrid to stay below it (see get_regrid_chunk_size)
+    :param mosaic: <bool> if True, the files of all the satellite versions (e.g. G16 and G17) of each hour are regridded
+                    into a single mosaic hourly regrid file (satellite version 'MOSAIC', see
+                    generate_lightning_sat_hourly_mosaic_regrid_file) instead of one regrid file per satellite version
+    :param mosaic_rule: <str> 'nadir' (default) or <float> seam longitude: satellite from which the flashes of the
+                    overlap zone are kept (see get_mosaic_flash_mask)
+    :param batch: <bool> if True, the hours of each day (and satellite version) are regridded together in one pass
+                    (see generate_lightning_sat_regrid_files_batch, engine, chunk_size and max_memory_mb ignored), a
+                    failing batch fails all its hours. Pre-regrid hourly files only (NOT raw_granules or mosaic)
+    :param flash_count_cube_append: <bool> if True, the flash counts of the regridded hours are also written to the
+                    yearly flash count cubes (see utils.flash_count_cube, hours skipped only written if missing from
+                    the cube)
+    :param flash_count_cumsum: <bool> if True, the cumulative flash count cubes (prefix sums for window sums, see
+                    utils.flash_count_cube.CumulativeFlashCountCube) are also updated (implies flash_count_cube_append)
+    :param reference_index: <bool> if True, the reference indexes of the daily regrid directories of the regridded hours
+                    are built or updated (see utils.regrid_reference_index, lets the comparison stage open the hourly
+                    regrid files of any time range without opening them)
+    :param verify_adopted_outputs: <bool> if True, the existing output files of the hours not in the manifest yet are
+                    opened and only recorded if readable and written with the same parameters (encoding profile,
+                    format, domain, ...), regridded again otherwise. If False (default), they are recorded as is
+                    (<!> files regridded with other parameters before the manifest existed are NOT detected)
+    :return: <dict> { 'succeeded': [ <path>, ... ], 'skipped': [ ... ], 'failed': [ ... ] } regrid summary (paths in
+                    the same order as the list of files to regrid, first granule of each hour if raw_granules, first
+                    file of each hour if mosaic)
     """
+    if sat_name != cts.GOES_SATELLITE_GLM:
+        raise ValueError(
+            f'{sat_name} satellite data not yet supported. Supported satellite data so far: GOES_GLM')
+    if layout not in cts.REGRID_LAYOUTS:
+        raise ValueError(f'{layout} {cts.REGRID_LAYOUT_VALUE_ERROR}')
+    grid_resolutions = _get_grid_resolutions(grid_res, grid_res_str)
+    if domain != cts.REGRID_DOMAIN_FOV:
+        # invalid domain --> ValueError before regridding any file (field of view depends on each hour sat version)
+        _get_regrid_domain_bbox(domain, sat_name=sat_name, sat_version=None)
+    if mosaic:
+        _check_mosaic_rule(mosaic_rule)
+    if batch and (raw_granules or mosaic):
+        raise ValueError(cts.REGRID_BATCH_VALUE_ERROR)
     # if path_list contains paths to directories --> get list of files in each directory
     if dir_list:
-        filename_pattern = generate_sat_hourly_filename_pattern(sat_name=sat_name, regrid=False,
-                                                                naming_convention=naming_convention)
+        if raw_granules:
+            filename_pattern = generate_sat_raw_granule_filename_pattern(sat_name=sat_name)
+        else:
+            filename_pattern = generate_sat_hourly_filename_pattern(sat_name=sat_name, regrid=False,
+                                                                    naming_convention=naming_convention)
         # Get list of files in subdirectories
         path_list[:] = [
             file_path
-            
+
             for dir_path in sorted(path_list)
-            for file_path in dir_path.glob(filename_pattern)
+            for file_path in sorted(dir_path.glob(filename_pattern))
+        ]
+    if mosaic:
+        regrid_function = generate_lightning_sat_hourly_mosaic_regrid_file
+        hourly_sat_files_list = group_sat_files_by_hour_for_mosaic(path_list, sat_name=sat_name,
+                                                                   raw_granules=raw_granules,
+                                                                   naming_convention=naming_convention)
+        # each hour is identified by its first file (first satellite version) in the summary
+        hour_path_list = [next(iter(sat_file_dict.values()))[0] for sat_file_dict in hourly_sat_files_list]
+        regrid_kwargs_list = [
+            dict(sat_file_dict=sat_file_dict, sat_name=sat_name, grid_res=grid_res, grid_res_str=grid_res_str,
+                 overwrite=overwrite, result_dir_path=result_dir_path, naming_convention=naming_convention,
+                 raw_granules=raw_granules, output_format=output_format, encoding_profile=encoding_profile,
+                 domain=domain, chunk_size=chunk_size, max_memory_mb=max_memory_mb, mosaic_rule=mosaic_rule)
+            for sat_file_dict in hourly_sat_files_list
+        ]
+    elif raw_granules:
+        regrid_function = generate_lightning_sat_hourly_regrid_file_from_granules
+        hourly_granules_list = group_sat_granules_by_hour(path_list, sat_name=sat_name)
+        # each hour is identified by its first granule in the summary
+        hour_path_list = [granule_path_list[0] for granule_path_list in hourly_granules_list]
+        regrid_kwargs_list = [
+            dict(granule_path_list=granule_path_list, sat_name=sat_name, grid_res=grid_res,
+                 grid_res_str=grid_res_str, overwrite=overwrite, result_dir_path=result_dir_path,
+                 output_format=output_format, encoding_profile=encoding_profile, domain=domain,
+                 chunk_size=chunk_size, max_memory_mb=max_memory_mb)
+            for granule_path_list in hourly_granules_list
         ]
-    for pre_regrid_file_url in path_list:
-        if sat_name == cts.GOES_SATELLITE_GLM:
-            print(f"\nGenerating hourly regrid file for: {pre_regrid_file_url}")
-            generate_lightning_sat_hourly_regrid_file(pre_regrid_file_url=pre_regrid_file_url,
-                                                      sat_name=sat_name,
-                                                      grid_res=grid_res, grid_res_str=grid_res_str,
-                                                      overwrite=overwrite, result_dir_path=result_dir_path,
-                                                      naming_convention=naming_convention)
+    else:
+        regrid_function = generate_lightning_sat_hourly_regrid_file
+        hour_path_list = list(path_list)
+        regrid_kwargs_list = [
+            dict(pre_regrid_file_url=pre_regrid_file_url, sat_name=sat_name, grid_res=grid_res,
+                 grid_res_str=grid_res_str, overwrite=overwrite, result_dir_path=result_dir_path,
+                 naming_convention=naming_convention, engine=engine, output_format=output_format,
+                 encoding_profile=encoding_profile, domain=domain, chunk_size=chunk_size,
+                 max_memory_mb=max_memory_mb)
+            for pre_regrid_file_url in path_list
+        ]
+    # input files of each hour (used to detect changes in the manifest)
+    if mosaic:
+        hour_input_list = [[file_path for file_list in sat_file_dict.values() for file_path in file_list]
+                           for sat_file_dict in hourly_sat_files_list]
+    else:
+        hour_input_list = hourly_granules_list if raw_granules else [[hour_path] for hour_path in hour_path_list]
+    # manifest key of each hour (mosaic entries distinct from the regrid of the first file satellite version)
+    hour_key_list = [pathlib.Path(f'{hour_path}.{cts.GLM_MOSAIC_VERSION}') if mosaic else hour_path
+                     for hour_path in hour_path_list]
+    # grid resolutions to regrid for each hour
+    hour_resolutions_list = [list(grid_resolutions) for _ in hour_path_list]
+    hour_status_list = [None] * len(hour_path_list)
+    manifest = None
+    if use_manifest:
+        manifest = regrid_manifest.RegridManifest(regrid_manifest.get_regrid_manifest_path(result_dir_path))
+        # one manifest entry per (hour, grid resolution)
+        regrid_params_dict = {
+            grid_resolution: regrid_manifest.get_regrid_params(
+                grid_res=grid_resolution[0], grid_res_str=grid_resolution[1], output_format=output_format,
+                encoding_profile=encoding_profile, raw_granules=raw_granules,
+                # (no domain parameter for whole grid regrids: same parameters as before regrid domains existed)
+                **({'domain': domain} if domain is not None else {}),
+                **({'mosaic_rule': mosaic_rule} if mosaic else {}))
+            for grid_resolution in grid_resolutions
+        }
+    # hours whose input mtime changed: (<list> input files, <str> recorded input hash), see _regrid_sat_file_worker
+    input_hash_check_list = [None] * len(hour_path_list)
+    if manifest is not None and not overwrite:
+        # input and output directories unchanged since all their hours were found up to date: their hours are trusted
+        # without stat-ing the files
+        verified_dir_dict = manifest.get_verified_dirs()
+        dir_mtime_dict = {}
+        unverified_dir_set = set()
+        for i_hour, (hour_path, hour_key, input_path_list) in enumerate(zip(hour_path_list, hour_key_list,
+                                                                            hour_input_list)):
+            output_path_dict = {
+                grid_resolution: _get_hourly_regrid_file_path(hour_path, sat_name=sat_name,
+                                                              grid_res_str=grid_resolution[1],
+                                                              result_dir_path=result_dir_path,
+                                                              naming_convention=naming_convention,
+                                                              raw_granules=raw_granules, mosaic=mosaic)
+                for grid_resolution in grid_resolutions
+            }
+            hour_dir_set = {str(pathlib.Path(file_path).absolute().parent)
+                            for file_path in list(input_path_list) + list(output_path_dict.values())}
+            for dir_path in hour_dir_set - dir_mtime_dict.keys():
+                dir_mtime_dict[dir_path] = regrid_manifest.get_dir_mtime_ns(dir_path)
+            check_stat = any(dir_mtime_dict[dir_path] is None or verified_dir_dict.get(dir_path) != dir_mtime_dict[dir_path]
+                             for dir_path in hour_dir_set)
+            resolutions_to_regrid = []
+            # recorded hash of the resolutions whose input mtime changed
+            modified_hash_list = []
+            for grid_resolution in grid_resolutions:
+                regrid_params = regrid_params_dict[grid_resolution]
+                input_status = manifest.get_input_status(hour_key, input_path_list, regrid_params,
+                                                         check_stat=check_stat)
+                if input_status == regrid_manifest.UP_TO_DATE:
+                    continue
+                if input_status == regrid_manifest.MODIFIED:
+                    modified_hash_list.append(manifest.get_entry(hour_key, grid_resolution[1])['input_hash'])
+                elif input_status == regrid_manifest.UNKNOWN:
+                    # not in the manifest (e.g. regridded before the manifest existed): existing output is recorded as
+                    # is (opened only if verify_adopted_outputs), missing or empty output is regridded again
+                    output_path = output_path_dict[grid_resolution]
+                    if verify_adopted_outputs:
+                        expected_attrs = _get_expected_regrid_file_attrs(
+                            grid_res=grid_resolution[0], output_format=output_format,
+                            encoding_profile=encoding_profile, domain=domain, sat_name=sat_name,
+                            sat_version=list(hourly_sat_files_list[i_hour]) if mosaic else GLMPathParser(
+                                file_url=hour_path, regrid=False, hourly=not raw_granules,
+                                naming_convention=None if raw_granules else naming_convention).satellite_version,
+                            mosaic_rule=mosaic_rule if mosaic else None)
+                        adopt_output = _is_valid_regrid_file(output_path, expected_attrs=expected_attrs)
+                    else:
+                        adopt_output = _is_existing_regrid_file(output_path)
+                    if adopt_output:
+                        manifest.record(hour_key, input_path_list, regrid_params, output_path=output_path,
+                                        status=cts.REGRID_SUCCEEDED)
+                        continue
+                # failed, interrupted, regridded with other parameters/input or missing output --> redo
+                resolutions_to_regrid.append(grid_resolution)
+            if resolutions_to_regrid:
+                unverified_dir_set.update(hour_dir_set)
+                hour_resolutions_list[i_hour] = resolutions_to_regrid
+                regrid_kwargs_list[i_hour].update(grid_res=[grid_res for grid_res, _ in resolutions_to_regrid],
+                                                  grid_res_str=[grid_res_str for _, grid_res_str in resolutions_to_regrid],
+                                                  overwrite=True)
+                if modified_hash_list:
+                    # regrid skipped by the worker if the content did not change (only if the input mtime changed for
+                    # all the resolutions to regrid, otherwise the hash is only computed to be recorded)
+                    input_hash_check_list[i_hour] = (
+                        input_path_list,
+                        modified_hash_list[0] if len(modified_hash_list) == len(resolutions_to_regrid) and
+                        len(set(modified_hash_list)) == 1 else None
+                    )
+            else:
+                hour_status_list[i_hour] = cts.REGRID_SKIPPED
+        manifest.set_verified_dirs({dir_path: mtime_ns for dir_path, mtime_ns in dir_mtime_dict.items()
+                                    if dir_path not in unverified_dir_set and mtime_ns is not None and
+                                    verified_dir_dict.get(dir_path) != mtime_ns})
+        print(f"\nRegrid manifest {manifest.manifest_path}: {hour_status_list.count(cts.REGRID_SKIPPED)} / "
+              f"{len(hour_path_list)} hours up to date")
+    hour_index_list = [i_hour for i_hour, hour_status in enumerate(hour_status_list) if hour_status is None]
+    # regrid tasks: [ (<list> hour indices, regrid function, <dict> regrid function arguments, input hash check), ... ]
+    if batch:
+        # (no input hash check: the hours of a batch whose input mtime changed are regridded again)
+        regrid_task_list = [
+            (batch_hour_index_list, generate_lightning_sat_regrid_files_batch, batch_kwargs, None)
+            for batch_hour_index_list, batch_kwargs in _get_regrid_batch_list(
+                hour_index_list, hour_path_list, hour_resolutions_list, regrid_kwargs_list,
+                naming_convention=naming_convention)
+        ]
+    else:
+        regrid_task_list = [([i_hour], regrid_function, regrid_kwargs_list[i_hour], input_hash_check_list[i_hour])
+                            for i_hour in hour_index_list]
+
+    def _record_regrid(i_hour, status, error_msg=None, input_hash=None):
+        hour_status_list[i_hour] = status
+        n_done = sum(hour_status_list[i_todo] is not None for i_todo in hour_index_list)
+        print(f"[{n_done}/{len(hour_index_list)}] {status}: {hour_path_list[i_hour]}")
+        if error_msg is not None:
+            print(f"<!> Failed to regrid {hour_path_list[i_hour]}: {error_msg}")
+        if manifest is not None and status == cts.REGRID_SKIPPED and input_hash is not None:
+            # input mtime changed but same content: nothing regridded
+            for _, res_str in hour_resolutions_list[i_hour]:
+                manifest.update_input_stat(hour_key_list[i_hour], hour_input_list[i_hour], res_str, input_hash)
+        elif manifest is not None and status != cts.REGRID_SKIPPED:
+            for grid_resolution in hour_resolutions_list[i_hour]:
+                output_path = None
+                if status == cts.REGRID_SUCCEEDED:
+                    output_path = _get_hourly_regrid_file_path(hour_path_list[i_hour], sat_name=sat_name,
+                                                               grid_res_str=grid_resolution[1],
+                                                               result_dir_path=result_dir_path,
+                                                               naming_convention=naming_convention,
+                                                               raw_granules=raw_granules, mosaic=mosaic)
+                manifest.record(hour_key_list[i_hour], hour_input_list[i_hour], regrid_params_dict[grid_resolution],
+                                output_path=output_path, status=status, error=error_msg, input_hash=input_hash)
+
+    try:
+        if workers > 1:
+            print(f"\nGenerating {len(hour_index_list)} hourly regrid files with {workers} workers")
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                # executor.map returns the results in the same order as path_list
+                for (task_hour_index_list, _, _, _), (status, error_msg, input_hash) in zip(
+                        regrid_task_list, executor.map(
+                            _regrid_sat_file_worker,
+                            [task_function for _, task_function, _, _ in regrid_task_list],
+                            [task_kwargs for _, _, task_kwargs, _ in regrid_task_list],
+                            [input_hash_check for _, _, _, input_hash_check in regrid_task_list])):
+                    for i_hour in task_hour_index_list:
+                        _record_regrid(i_hour, status, error_msg, input_hash)
         else:
-            raise ValueError(
-                f'{sat_name} satellite data not yet supported. Supported satellite data so far: GOES_GLM')
+            for task_hour_index_list, task_function, task_kwargs, input_hash_check in regrid_task_list:
+                print(f"\nGenerating hourly regrid file for: "
+                      f"{', '.join(str(hour_path_list[i_hour]) for i_hour in task_hour_index_list)}")
+                # same failure isolation as the worker pool: a failing file is recorded and the others go on
+                status, error_msg, input_hash = _regrid_sat_file_worker(task_function, task_kwargs,
+                                                                        input_hash_check=input_hash_check)
+                for i_hour in task_hour_index_list:
+                    _record_regrid(i_hour, status, error_msg, input_hash)
+    finally:
+        if manifest is not None:
+            manifest.close()
+    summary = {cts.REGRID_SUCCEEDED: [], cts.REGRID_SKIPPED: [], cts.REGRID_FAILED: []}
+    for hour_path, hour_status in zip(hour_path_list, hour_status_list):
+        summary[hour_status].append(hour_path)
+    print(f"\nRegrid summary: {len(summary[cts.REGRID_SUCCEEDED])} succeeded, "
+          f"{len(summary[cts.REGRID_SKIPPED])} skipped, {len(summary[cts.REGRID_FAILED])} failed")
+    if flash_count_cube_append or flash_count_cumsum:
+        for grid_res, res_str in grid_resolutions:
+            for status, overwrite_cube_hours in [(cts.REGRID_SUCCEEDED, True), (cts.REGRID_SKIPPED, False)]:
+                flash_count_cube.append_regrid_files_to_flash_count_cube(
+                    [_get_hourly_regrid_file_path(hour_path, sat_name=sat_name, grid_res_str=res_str,
+                                                  result_dir_path=result_dir_path, naming_convention=naming_convention,
+                                                  raw_granules=raw_granules, mosaic=mosaic)
+                     for hour_path in summary[status]],
+                    grid_res=grid_res, grid_res_str=res_str, target_dir=result_dir_path, overwrite=overwrite_cube_hours,
+                    update_cumulative=flash_count_cumsum)
+    if layout != cts.HOURLY_LAYOUT or reference_index:
+        for _, res_str in grid_resolutions:
+            # daily regrid directories containing the regridded hours
+            regrid_dir_list = sorted({
+                generate_sat_dir_path(
+                    date=GLMPathParser(file_url=pre_regrid_file_url, regrid=False, hourly=not raw_granules,
+                                       naming_convention=None if raw_granules else naming_convention),
+                    sat_name=sat_name, regrid=True, regrid_res_str=res_str, target_dir=result_dir_path)
+                for pre_regrid_file_url in summary[cts.REGRID_SUCCEEDED] + summary[cts.REGRID_SKIPPED]
+            })
+            if reference_index:
+                regrid_reference_index.build_regrid_reference_indexes(regrid_dir_list)
+            if layout == cts.HOURLY_LAYOUT:
+                continue
+            compact_regrid_files(dir_list=regrid_dir_list, sat_name=sat_name, layout=layout, grid_res_str=res_str,
+                                 overwrite=overwrite, regrid_root_dir_path=result_dir_path,
+                                 result_dir_path=result_dir_path,
+                                 sat_version=cts.GLM_MOSAIC_VERSION if mosaic else cts.Gxx_PATTERN)
+    return summary
+
+
+def compact_regrid_files(dir_list, sat_name, layout, grid_res_str=cts.GRID_RESOLUTION_STR, overwrite=False,
+                         regrid_root_dir_path=None, result_dir_path=None, complevel=cts.CONSOLIDATED_COMPLEVEL,
+                         encoding_profile=cts.CONSOLIDATED_ENCODING_PROFILE, sat_version=cts.Gxx_PATTERN):
+    """
+    Compact existing hourly regrid files into one chunked and compressed file per day or per month (and satellite
+    version) with a time dimension. All the hourly files of the days/months covered by the daily regrid directories
+    in dir_list are used (<!> even those NOT in dir_list for monthly files).
+    A consolidated file is (re)written if it does not exist, if overwrite == True or if it contains fewer hours than
+    the hourly regrid files available for that period.
+    :param dir_list: <list> [ <pathlib.Path>, ... ] daily regrid directories (xxdeg_OR_GLM-L2-LCFA_YYYY_DDD)
+    :param sat_name: <str> satellite name (only 'GOES_GLM' supported for now)
+    :param layout: <str> 'daily' or 'monthly'
+    :param grid_res_str: <str> grid resolution str
+    :param overwrite: <bool> overwrite consolidated files if they already exist
+    :param regrid_root_dir_path: <pathlib.Path> or <str> root directory of the hourly regrid files (if different from default)
+    :param result_dir_path: <pathlib.Path> or <str> root directory of the consolidated files (if different from default)
+    :param complevel: <int> compression level (overrides the encoding profile compression level)
+    :param encoding_profile: <str> netcdf encoding profile of the consolidated files, 'compact' (default, whatever the
+                    profile of the hourly files) or 'legacy' (<!> neither chunked nor compressed)
+    :param sat_version: <str> satellite version (pattern) of the hourly files to compact, default: any GOES satellite,
+                    'MOSAIC' for GLM mosaic files
+    :return: <list> [ <pathlib.Path>, ... ] list of the consolidated files (re)written
+    """
+    if layout not in cts.CONSOLIDATED_REGRID_GLM_DIRNAMES:
+        raise ValueError(f'{layout} {cts.REGRID_LAYOUT_VALUE_ERROR}')
+    if sat_name == cts.GOES_SATELLITE_GLM:
+        SatPathParser = GLMPathParser
+    else:
+        raise ValueError(f'{sat_name} {cts.SAT_VALUE_ERROR}')
+    # periods (days or months) covered by the daily directories
+    period_start_list = sorted({
+        get_consolidated_period_start_date(
+            date=SatPathParser(dir_path, directory=True, regrid=True).get_start_date_pdTimestamp(
+                ignore_missing_start_hour=True),
+            layout=layout)
+        for dir_path in dir_list
+    })
+    written_file_list = []
+    for period_start in period_start_list:
+        period_end = get_consolidated_period_end_date(date=period_start, layout=layout)
+        period_dir_list = generate_sat_dir_list_between_start_end_date(start_date=period_start, end_date=period_end,
+                                                                        satellite=sat_name, regrid=True,
+                                                                        regrid_res_str=grid_res_str,
+                                                                        target_dir=regrid_root_dir_path)
+        hourly_file_list = get_sat_files_list_between_start_end_date(dir_list=period_dir_list,
+                                                                     start_date=period_start, end_date=period_end,
+                                                                     sat_name=sat_name, regrid=True,
+                                                                     regrid_res_str=grid_res_str,
+                                                                     sat_version=sat_version)
+        # one consolidated file per satellite version
+        sat_version_file_dict = {}
+        for file_path in hourly_file_list:
+            sat_version = SatPathParser(file_path, regrid=True).satellite_version
+            sat_version_file_dict.setdefault(sat_version, []).append(file_path)
+        for sat_version, file_list in sorted(sat_version_file_dict.items()):
+            consolidated_file_path = generate_sat_consolidated_file_path(date=period_start, satellite=sat_name,
+                                                                         sat_version=sat_version, layout=layout,
+                                                                         regrid_res_str=grid_res_str,
+                                                                         dir_path=result_dir_path)
+            if consolidated_file_path.exists() and not overwrite:
+                with xr.open_dataset(consolidated_file_path) as consolidated_ds:
+                    up_to_date = consolidated_ds.sizes['time'] >= len(file_list)
+                if up_to_date:
+                    print(f"{consolidated_file_path} already exists")
+                    continue
+            write_consolidated_regrid_file(file_list=file_list, consolidated_file_path=consolidated_file_path,
+                                           layout=layout, complevel=complevel, encoding_profile=encoding_profile)
+            written_file_list.append(consolidated_file_path)
+    return written_file_list
+
+
+def write_consolidated_regrid_file(file_list, consolidated_file_path, layout, complevel=cts.CONSOLIDATED_COMPLEVEL,
+                                   encoding_profile=cts.CONSOLIDATED_ENCODING_PROFILE):
+    """
+    Write a list of hourly regrid files (dense or sparse format, any encoding profile) into a single dense chunked and
+    compressed netcdf file (compact profile: one chunk per hour, the time dimension being the one we slice on in the
+    comparison stage)
+    :param file_list: <list> [ <pathlib.Path>, ... ] hourly regrid files
+    :param consolidated_file_path: <pathlib.Path> resulting file path
+    :param layout: <str> 'daily' or 'monthly' (stored as attribute)
+    :param complevel: <int> compression level (overrides the encoding profile compression level)
+    :param encoding_profile: <str> netcdf encoding profile, 'compact' (default) or 'legacy' (<!> neither chunked nor
+                    compressed)
+    """
+    consolidated_file_path.parent.mkdir(parents=True, exist_ok=True)
+    with sparse_regrid_utils.open_regrid_mfdataset(file_list) as consolidated_ds:
+        consolidated_ds = consolidated_ds.drop_encoding()
+        consolidated_ds.attrs.update({
+            'regrid_layout': layout,
+            'regrid_file_creation_date': datetime.now().isoformat(),
+            cts.REGRID_ENCODING_ATTR: encoding_profile
+        })
+        encoding = regrid_encoding_utils.get_regrid_encoding(consolidated_ds, encoding_profile=encoding_profile,
+                                                             complevel=complevel)
+        # write in temporary file first so that an interrupted job does not leave an incomplete consolidated file
+        temp_file_path = consolidated_file_path.parent / f'temp_{consolidated_file_path.name}'
+        consolidated_ds.to_netcdf(path=temp_file_path, mode='w', encoding=encoding)
+    os.replace(temp_file_path, consolidated_file_path)
+    print(f"Created consolidated netcdf file {consolidated_file_path} ({len(file_list)} hours)")
+
+
+def reencode_regrid_file(file_path, encoding_profile=cts.COMPACT_ENCODING_PROFILE, complevel=None,
+                         overwrite=False):
+    """
+    Re-encode an existing regrid file (hourly or consolidated, dense or sparse) in place with an encoding profile.
+    The file is written to a temporary file first and then replaces the original file (an interrupted job does not
+    leave an incomplete file)
+    :param file_path: <pathlib.Path> regrid file path
+    :param encoding_profile: <str> netcdf encoding profile, 'compact' (default) or 'legacy'
+    :param complevel: <int> compression level (overrides the encoding profile compression level)
+    :param overwrite: <bool> re-encode the file even if it is already encoded with encoding_profile
+    :return: <bool> True if the file has been re-encoded, False if it was already encoded with encoding_profile
+    """
+    file_path = pathlib.Path(file_path)
+    with xr.open_dataset(file_path) as regrid_ds:
+        # files without encoding profile attribute were written before encoding profiles existed
+        current_profile = regrid_ds.attrs.get(cts.REGRID_ENCODING_ATTR, cts.LEGACY_ENCODING_PROFILE)
+        if current_profile == encoding_profile and not overwrite:
+            print(f"{file_path} already encoded with {encoding_profile} profile")
+            return False
+        regrid_ds = regrid_ds.load().drop_encoding()
+    regrid_ds.attrs[cts.REGRID_ENCODING_ATTR] = encoding_profile
+    temp_file_path = file_path.parent / f'temp_{file_path.name}'
+    regrid_ds.to_netcdf(path=temp_file_path, mode='w',
+                        encoding=regrid_encoding_utils.get_regrid_encoding(regrid_ds, encoding_profile=encoding_profile,
+                                                                           complevel=complevel))
+    os.replace(temp_file_path, file_path)
+    print(f"Re-encoded {file_path} ({current_profile} -> {encoding_profile})")
+    return True
+
+
+def _reencode_regrid_file_worker(reencode_kwargs):
+    """
+    Re-encode a single regrid file in a worker process (or in the main process if workers is 1), exceptions are caught
+    so that one failing file does not stop the other files from being re-encoded
+    :param reencode_kwargs: <dict> reencode_regrid_file arguments
+    :return: <tuple> (<str> status: 'succeeded', 'skipped' or 'failed', <str> error message or None)
+    """
+    try:
+        reencoded = reencode_regrid_file(**reencode_kwargs)
+    except Exception as e:
+        return cts.REGRID_FAILED, f'{type(e).__name__}: {e}'
+    return (cts.REGRID_SUCCEEDED if reencoded else cts.REGRID_SKIPPED), None
+
+
+def reencode_regrid_files(file_list, encoding_profile=cts.COMPACT_ENCODING_PROFILE, complevel=None,
+                          overwrite=False, workers=1):
+    """
+    Migrate existing regrid files (hourly or consolidated) to an encoding profile, in place and in parallel
+    :param file_list: <list> [ <pathlib.Path>, ... ] regrid files to re-encode
+    :param encoding_profile: <str> netcdf encoding profile, 'compact' (default) or 'legacy'
+    :param complevel: <int> compression level (overrides the encoding profile compression level)
+    :param overwrite: <bool> re-encode the files even if they are already encoded with encoding_profile
+    :param workers: <int> number of worker processes, if > 1 the files are re-encoded in a process pool
+    :return: <dict> { 'succeeded': [ <path>, ... ], 'skipped': [ ... ], 'failed': [ ... ] } summary
+    """
+    if encoding_profile not in cts.REGRID_ENCODING_PROFILES:
+        raise ValueError(f'{encoding_profile} {cts.REGRID_ENCODING_PROFILE_VALUE_ERROR}')
+    reencode_kwargs_list = [
+        dict(file_path=file_path, encoding_profile=encoding_profile, complevel=complevel, overwrite=overwrite)
+        for file_path in sorted(file_list)
+    ]
+    summary = {cts.REGRID_SUCCEEDED: [], cts.REGRID_SKIPPED: [], cts.REGRID_FAILED: []}
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(_reencode_regrid_file_worker, reencode_kwargs_list))
+    else:
+        # same failure isolation as the worker pool: a failing file is recorded and the others go on
+        results = [_reencode_regrid_file_worker(reencode_kwargs) for reencode_kwargs in reencode_kwargs_list]
+    for reencode_kwargs, (status, error_msg) in zip(reencode_kwargs_list, results):
+        summary[status].append(reencode_kwargs['file_path'])
+        if error_msg is not None:
+            print(f"<!> Failed to re-encode {reencode_kwargs['file_path']}: {error_msg}")
+    print(f"\nRe-encode summary: {len(summary[cts.REGRID_SUCCEEDED])} succeeded, "
+          f"{len(summary[cts.REGRID_SKIPPED])} skipped, {len(summary[cts.REGRID_FAILED])} failed")
+    return summary
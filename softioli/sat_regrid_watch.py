@@ -0,0 +1,192 @@
+import fnmatch
+import os
+import pathlib
+import threading
+import time
+import pandas as pd
+
+from utils import constants as cts
+from utils import generate_sat_dir_path, generate_sat_hourly_filename_pattern
+from utils.sat_utils import generate_sat_dir_list_between_start_end_date
+import sat_regrid
+
+try:
+    # optional: filesystem notifications wake the watch loop up as soon as a file lands (polling only without it)
+    from watchdog.events import FileSystemEventHandler
+    from watchdog.observers import Observer
+except ImportError:
+    FileSystemEventHandler = object
+    Observer = None
+
+
+class PreRegridFileWatcher:
+    """
+    Keeps track of the pre-regrid hourly files of the recent daily directories and returns the newly completed ones:
+    files whose size and mtime did not change between two scans and for at least settle_time seconds. Each file is
+    returned once (again if it is rewritten). Only the daily directories of the lookback period are scanned (os.scandir,
+    no glob of the whole pre-regrid tree and no filename parsing of the files already seen).
+    """
+
+    def __init__(self, sat_name, naming_convention=None, target_dir=None, settle_time=cts.REGRID_WATCH_SETTLE_TIME,
+                 lookback_days=cts.REGRID_WATCH_LOOKBACK_DAYS):
+        """
+        @param sat_name: <str> satellite name (only 'GOES_GLM' supported for now)
+        @param naming_convention: <str> pre-regrid file naming convention
+        @param target_dir: <pathlib.Path> or <str> root directory of the pre-regrid files (if different from default)
+        @param settle_time: <float> seconds without size/mtime change after which a file is considered complete
+        @param lookback_days: <int> number of days before today whose daily directories are scanned
+        """
+        self.sat_name = sat_name
+        self.target_dir = target_dir
+        self.settle_time = settle_time
+        self.lookback_days = lookback_days
+        self.filename_pattern = generate_sat_hourly_filename_pattern(sat_name=sat_name, regrid=False,
+                                                                     naming_convention=naming_convention)
+        # files seen but not returned yet: { <str> path: (<int> size, <int> mtime_ns) }
+        self._pending = {}
+        # files already returned: { <str> path: (<int> size, <int> mtime_ns) }
+        self._done = {}
+
+    @property
+    def root_dir_path(self):
+        """
+        Pre-regrid root directory (e.g. /o3p/patj/glm/pre_regrid_hourly_glm), watched for filesystem notifications
+        """
+        return generate_sat_dir_path(date=pd.Timestamp.now(), sat_name=self.sat_name, regrid=False,
+                                     target_dir=self.target_dir).parent.parent
+
+    def get_dir_list(self, now=None):
+        """
+        @param now: <pandas.Timestamp> current date (UTC), default: now
+        @return: <list> [ <pathlib.Path>, ... ] daily directories of the lookback period
+        """
+        end_date = now if now is not None else pd.Timestamp.now(tz='UTC').tz_localize(None)
+        return generate_sat_dir_list_between_start_end_date(start_date=end_date - pd.Timedelta(self.lookback_days, 'D'),
+                                                            end_date=end_date, satellite=self.sat_name, regrid=False,
+                                                            target_dir=self.target_dir)
+
+    def scan(self, now=None):
+        """
+        Scan the daily directories of the lookback period
+        @param now: <pandas.Timestamp> current date (UTC), default: now
+        @return: <list> [ <pathlib.Path>, ... ] sorted list of the newly completed files (see mark_done)
+        """
+        scan_time = time.time()
+        completed_file_list = []
+        for dir_path in self.get_dir_list(now=now):
+            if not dir_path.exists():
+                continue
+            with os.scandir(dir_path) as dir_entries:
+                for dir_entry in dir_entries:
+                    if not dir_entry.is_file() or not fnmatch.fnmatch(dir_entry.name, self.filename_pattern):
+                        continue
+                    file_stat = dir_entry.stat()
+                    file_key = (file_stat.st_size, file_stat.st_mtime_ns)
+                    if self._done.get(dir_entry.path) == file_key:
+                        continue
+                    # unchanged since the previous scan and not modified for settle_time --> complete
+                    if self._pending.get(dir_entry.path) == file_key and file_stat.st_size > 0 and \
+                            scan_time - file_stat.st_mtime_ns / 1e9 >= self.settle_time:
+                        completed_file_list.append(dir_entry.path)
+                    else:
+                        self._pending[dir_entry.path] = file_key
+        return sorted(pathlib.Path(file_path) for file_path in completed_file_list)
+
+    def mark_done(self, file_list):
+        """
+        Files returned by scan that have been processed (NOT returned again unless they are rewritten)
+        @param file_list: <list> [ <pathlib.Path>, ... ]
+        """
+        for file_path in file_list:
+            file_key = self._pending.pop(str(file_path), None)
+            if file_key is not None:
+                self._done[str(file_path)] = file_key
+
+    def get_next_scan_delay(self, poll_interval):
+        """
+        @param poll_interval: <float> seconds between two scans
+        @return: <float> seconds before the next scan: poll_interval, or less if a pending file settles before
+        """
+        now = time.time()
+        settle_delays = [self.settle_time - (now - mtime_ns / 1e9) for _, mtime_ns in self._pending.values()]
+        return min([poll_interval] + [settle_delay for settle_delay in settle_delays if settle_delay > 0])
+
+
+class _WakeUpEventHandler(FileSystemEventHandler):
+    """
+    Sets the wake-up event of the watch loop on any filesystem event in the watched directory
+    """
+
+    def __init__(self, wake_up_event):
+        super().__init__()
+        self.wake_up_event = wake_up_event
+
+    def on_any_event(self, event):
+        self.wake_up_event.set()
+
+
+def watch_pre_regrid_files(sat_name, grid_res=cts.GRID_RESOLUTION, grid_res_str=cts.GRID_RESOLUTION_STR,
+                           target_dir=None, result_dir_path=None, naming_convention=None, workers=1,
+                           poll_interval=cts.REGRID_WATCH_POLL_INTERVAL, settle_time=cts.REGRID_WATCH_SETTLE_TIME,
+                           lookback_days=cts.REGRID_WATCH_LOOKBACK_DAYS, use_notifications=True, max_scans=None,
+                           **regrid_kwargs):
+    """
+    Watch mode: regrid the new pre-regrid hourly files as they land in the pre-regrid daily directories of the lookback
+    period. The directories are scanned every poll_interval seconds (or earlier on filesystem notifications if watchdog
+    is installed), the newly completed files are regridded with regrid_sat_files (worker pool of workers processes)
+    and recorded in the regrid manifest (hours already up to date in the manifest are skipped, e.g. after a restart).
+    A file failing to regrid is recorded as failed in the manifest and retried only if it is rewritten (or after a
+    restart). Stops on KeyboardInterrupt (or after max_scans scans).
+    @param sat_name: <str> satellite name (only 'GOES_GLM' supported for now)
+    @param grid_res: <float> grid resolution or <list> of grid resolutions
+    @param grid_res_str: <str> grid resolution str or <list> (one per grid resolution)
+    @param target_dir: <pathlib.Path> or <str> root directory of the pre-regrid files (if different from default)
+    @param result_dir_path: <pathlib.Path> or <str> root directory of the regrid files (if different from default)
+    @param naming_convention: <str> pre-regrid file naming convention
+    @param workers: <int> number of worker processes
+    @param poll_interval: <float> seconds between two scans
+    @param settle_time: <float> seconds without size/mtime change after which a file is considered complete
+    @param lookback_days: <int> number of days before today whose daily directories are scanned
+    @param use_notifications: <bool> wake up on filesystem notifications (only if watchdog is installed)
+    @param max_scans: <int> stop after this number of scans, if None (default) watch until interrupted
+    @param regrid_kwargs: other regrid_sat_files arguments (engine, layout, output_format, encoding_profile, domain, ...)
+    @return: <dict> { 'succeeded': [ <path>, ... ], 'skipped': [ ... ], 'failed': [ ... ] } files regridded while
+                    watching
+    """
+    watcher = PreRegridFileWatcher(sat_name=sat_name, naming_convention=naming_convention, target_dir=target_dir,
+                                   settle_time=settle_time, lookback_days=lookback_days)
+    wake_up_event = threading.Event()
+    observer = None
+    if use_notifications and Observer is not None and watcher.root_dir_path.exists():
+        observer = Observer()
+        observer.schedule(_WakeUpEventHandler(wake_up_event), str(watcher.root_dir_path), recursive=True)
+        observer.start()
+    print(f"Watching {watcher.root_dir_path} (last {lookback_days} days, "
+          f"{'filesystem notifications + ' if observer is not None else ''}polling every {poll_interval} s)")
+    watch_summary = {cts.REGRID_SUCCEEDED: [], cts.REGRID_SKIPPED: [], cts.REGRID_FAILED: []}
+    n_scans = 0
+    try:
+        while max_scans is None or n_scans < max_scans:
+            wake_up_event.clear()
+            completed_file_list = watcher.scan()
+            n_scans += 1
+            if completed_file_list:
+                print(f"\n{len(completed_file_list)} new pre-regrid files: {completed_file_list}")
+                regrid_summary = sat_regrid.regrid_sat_files(path_list=completed_file_list, sat_name=sat_name,
+                                                             grid_res=grid_res, grid_res_str=grid_res_str,
+                                                             result_dir_path=result_dir_path,
+                                                             naming_convention=naming_convention, workers=workers,
+                                                             **regrid_kwargs)
+                for status, status_file_list in regrid_summary.items():
+                    watch_summary[status].extend(status_file_list)
+                watcher.mark_done(completed_file_list)
+            if max_scans is None or n_scans < max_scans:
+                wake_up_event.wait(watcher.get_next_scan_delay(poll_interval))
+    except KeyboardInterrupt:
+        print('\nWatch mode stopped')
+    finally:
+        if observer is not None:
+            observer.stop()
+            observer.join()
+    return watch_summary
+
@@ -1,4 +1,9 @@
+import calendar
 import datetime
+import os
+import re
+
+import numpy as np
 import pandas as pd
 import pathlib
 
@@ -8,6 +13,73 @@ from .SatPathParser import SatPathParser
 OLD_GLM_NOTATION = 'OLD'  # GLM_array(_05deg)_DDD for dirs and # GLM_array(_xxdeg)_DDD_HH1-HH2.nc for files
 OLD_GLM_PRE_REGRID_TEMP_NOTATION = 'OLD_TEMP'  # OR_GLM-L2-LCFA_Gxx_sYYYYDDD for dirs GLM_array_DDD_temp_HH.nc for files
 
+# old naming conventions: only 05-2018 and 06-2018 files
+_OLD_GLM_YEAR = 2018
+_OLD_GLM_SATELLITE_VERSION = 'G16'
+
+# date part of the file/directory names (matched at the end of the name without suffix)
+_DIR_DATE_PATTERNS = {
+    None: re.compile(r'_(?P<year>\d+)_(?P<day_of_year>\d+)$'),  # (xxdeg_)OR_GLM-L2-LCFA_YYYY_DDD
+    OLD_GLM_NOTATION: re.compile(r'_(?P<day_of_year>\d+)$'),  # GLM_array(_05deg)_DDD
+    OLD_GLM_PRE_REGRID_TEMP_NOTATION: re.compile(r'_.(?P<year>\d{4})(?P<day_of_year>\d{3})$')  # OR_GLM-L2-LCFA_Gxx_sYYYYDDD
+}
+_HOURLY_FILE_DATE_PATTERNS = {
+    # (xxdeg_)OR_GLM-L2-LCFA_Gxx_YYYY_DDD_HH1-HH2.nc
+    None: re.compile(r'_(?P<year>\d+)_(?P<day_of_year>\d+)_(?P<start_hour>\d+)-(?P<end_hour>\d+)$'),
+    # GLM_array(_xxdeg)_DDD_HH1-HH2.nc
+    OLD_GLM_NOTATION: re.compile(r'_(?P<day_of_year>\d+)_(?P<start_hour>\d+)-(?P<end_hour>\d+)$'),
+    # GLM_array_DDD_temp_HH.nc
+    OLD_GLM_PRE_REGRID_TEMP_NOTATION: re.compile(r'_(?P<day_of_year>\d+)_[^_]*_(?P<start_hour>\d+)$')
+}
+# OR_GLM-L2-LCFA_G16_sYYYYDDDHHMMSSS_eYYYYDDDHHMMSSS_cYYYYDDDHHMMSSS.nc (raw 20sec)
+_RAW_GRANULE_DATE_PATTERN = re.compile(r'_.(?P<year>\d{4})(?P<day_of_year>\d{3})(?P<start_hour>\d{2})[^_]*_[^_]*_[^_]*$')
+_DATE_KEYS = ('year', 'day_of_year', 'start_hour', 'end_hour')
+
+# proleptic Gregorian ordinal of 1970-01-01 (dates built from the number of days since the epoch)
+_EPOCH_ORDINAL = datetime.date(1970, 1, 1).toordinal()
+_NS_PER_DAY = 86400 * 10 ** 9
+_NS_PER_HOUR = 3600 * 10 ** 9
+
+
+def _get_date_pattern(directory, hourly, naming_convention):
+    if directory:
+        return _DIR_DATE_PATTERNS[naming_convention]
+    elif not hourly:
+        return _RAW_GRANULE_DATE_PATTERN
+    else:
+        return _HOURLY_FILE_DATE_PATTERNS[naming_convention]
+
+
+def _get_default_date_values(directory, hourly, naming_convention):
+    """
+    Date values NOT in the file/directory name
+    """
+    if naming_convention in {OLD_GLM_NOTATION, OLD_GLM_PRE_REGRID_TEMP_NOTATION} and not directory and hourly:
+        # if old_glm_filename --> year = 2018
+        return {'year': _OLD_GLM_YEAR}
+    return {}
+
+
+def _check_naming_convention(naming_convention):
+    if naming_convention not in {OLD_GLM_NOTATION, OLD_GLM_PRE_REGRID_TEMP_NOTATION, None}:
+        raise ValueError(
+            f'Naming convention {naming_convention} NOT supported. Expecting "{OLD_GLM_NOTATION}", "{OLD_GLM_PRE_REGRID_TEMP_NOTATION}" or None')
+
+
+def get_start_datetime(year, day_of_year, hour):
+    """
+    Start date of an hour from its year, day of the year and hour (same as datetime.strptime with '%Y_%j_%H', computed
+    from the number of days since the epoch)
+    @param year: <int>
+    @param day_of_year: <int> 1 to 365 (366 in leap years)
+    @param hour: <int> 0 to 23
+    @return: <pandas.Timestamp>
+    """
+    if not 1 <= day_of_year <= 365 + calendar.isleap(year) or not 0 <= hour <= 23:
+        raise ValueError(f'Invalid date: year={year}, day_of_year={day_of_year}, hour={hour}')
+    return pd.Timestamp((datetime.date(year, 1, 1).toordinal() - _EPOCH_ORDINAL + day_of_year - 1) * _NS_PER_DAY
+                        + hour * _NS_PER_HOUR)
+
 
 class GLMPathParser(SatPathParser):
     """
@@ -19,7 +91,10 @@ class GLMPathParser(SatPathParser):
         DIRECTORIES:
         - OR_GLM-L2-LCFA_YYYY_DDD (<!> NO satellite nb, in pre_regrid_hourly_glm dir)
         - xxdeg_OR_GLM-L2-LCFA_YYYY_DDD (<!> NO satellite nb, in regrid_hourly_glm dir)
+    To parse many paths at once, see parse_glm_paths
     """
+    __slots__ = ('url', 'hourly', 'regrid', 'regrid_res', 'satellite_version', 'directory', 'naming_convention',
+                 'year', 'day_of_year', 'start_hour', 'end_hour', 'start_datetime', '_name_stem')
 
     def __init__(self, file_url, regrid, hourly=True, year=None, day_of_year=None, start_hour=None, end_hour=None,
                  regrid_res_str=None, satellite_version=None, directory=False, naming_convention=None):
@@ -38,28 +113,26 @@ class GLMPathParser(SatPathParser):
         @param naming_convention: <str>, Describes the file/directory naming convention. Supported values: 'OLD', 'OLD_TEMP' or None (if default notation)
         """
         self.url = pathlib.Path(file_url)  # pathlib.Path object
+        self._name_stem = _get_name_stem(file_url)
         self.hourly = hourly
         self.regrid = regrid
         self.regrid_res = regrid_res_str
         self.satellite_version = satellite_version
         # file/dir name related attributes
         self.directory = directory
-        if naming_convention not in {OLD_GLM_NOTATION, OLD_GLM_PRE_REGRID_TEMP_NOTATION, None}:
-            raise ValueError(
-                f'Naming convention {naming_convention} NOT supported. Expecting "{OLD_GLM_NOTATION}", "{OLD_GLM_PRE_REGRID_TEMP_NOTATION}" or None')
-        else:
-            self.naming_convention = naming_convention
+        _check_naming_convention(naming_convention)
+        self.naming_convention = naming_convention
         # date attributes
         self.year = int(year) if year is not None else year
         self.day_of_year = int(day_of_year) if day_of_year is not None else day_of_year
         self.start_hour = int(start_hour) if start_hour is not None else start_hour
         self.end_hour = int(end_hour) if end_hour is not None else end_hour
         # if we're missing at least 1 date info --> extract date from filename
-        if any(val is None for val in [self.year, self.day_of_year, self.start_hour]):
+        if self.year is None or self.day_of_year is None or self.start_hour is None:
             self.extract_missing_date()
         # extract missing values
         if end_hour is None and self.hourly and start_hour is not None:
-            self.end_hour = start_hour + 1
+            self.end_hour = self.start_hour + 1
         if self.regrid and self.regrid_res is None:
             self.extract_regrid_res()
         if self.satellite_version is None:
@@ -67,81 +140,28 @@ class GLMPathParser(SatPathParser):
         self.start_datetime = self.get_start_date_pdTimestamp()
 
     def extract_missing_date(self):
-        filename = self.url.stem
-        filename_split = filename.split('_')
-        # if directory
-        if self.directory:
-            if self.naming_convention == OLD_GLM_NOTATION:  # GLM_array(_05deg)_DDD
-                date = {
-                    "year": None,
-                    "day_of_year": int(filename_split[-1]),
-                    "start_hour": None,
-                    "end_hour": None
-                }
-            elif self.naming_convention == OLD_GLM_PRE_REGRID_TEMP_NOTATION:  # OR_GLM-L2-LCFA_Gxx_sYYYYDDD
-                date = {
-                    "year": filename_split[-1][1:5],  # YYYY part of sYYYYDDD
-                    "day_of_year": filename_split[-1][5:8],  # DDD part of sYYYYDDD
-                    "start_hour": None,
-                    "end_hour": None
-                }
-            else:  # (xxdeg_)OR_GLM-L2-LCFA_YYYY_DDD
-                date = {
-                    "year": int(filename_split[-2]),
-                    "day_of_year": int(filename_split[-1]),
-                    "start_hour": None,
-                    "end_hour": None
-                }
-        # if file
-        elif not self.hourly:
-            # if not hourly --> raw 20 sec file
-            # filename: OR_GLM-L2-LCFA_G16_sYYYYDDDHHMMSSS_eYYYYDDDHHMMSSS_cYYYYDDDHHMMSSS.nc
-            # don't get the end_hour in this case for now
-            start_date = filename_split[-3]  # recup sYYYYDDDHHMMSSS part
-            date = {
-                "year": int(start_date[1:5]),  # YYYY part of sYYYYDDDHHMMSSS
-                "day_of_year": int(start_date[5:8]),  # DDD part of sYYYYDDDHHMMSSS
-                "start_hour": int(start_date[8:10]),  # HH part of sYYYYDDDHHMMSSS
-                "end_hour": None
-            }
-        elif self.naming_convention == OLD_GLM_NOTATION:  # GLM_array(_xxdeg)_DDD_HH1-HH2.nc
-            # if old_glm_filename --> year = 2018
-            hour_split = filename_split[-1].split('-')
-            date = {
-                "year": 2018,
-                "day_of_year": int(filename_split[-2]),
-                "start_hour": int(hour_split[0]),
-                "end_hour": int(hour_split[1])
-            }
-        elif self.naming_convention == OLD_GLM_PRE_REGRID_TEMP_NOTATION:  # GLM_array_DDD_temp_HH.nc
-            # if old_glm_filename --> year = 2018
-            date = {
-                "year": 2018,
-                "day_of_year": int(filename_split[-3]),
-                "start_hour": int(filename_split[-1]),
-                "end_hour": int(filename_split[-1]) + 1
-            }
-        else:  # (xxdeg_)OR_GLM-L2-LCFA_Gxx_YYYY_DDD_HH1-HH2.nc
-            hour_split = filename_split[-1].split('-')
-            date = {
-                "year": int(filename_split[-3]),
-                "day_of_year": int(filename_split[-2]),
-                "start_hour": int(hour_split[0]),
-                "end_hour": int(hour_split[1])
-            }
+        date_match = _get_date_pattern(self.directory, self.hourly, self.naming_convention).search(self._name_stem)
+        if date_match is None:
+            raise ValueError(f'{self.url} does NOT match the GLM {"directory" if self.directory else "file"} name '
+                             f'format (naming convention: {self.naming_convention})')
+        date = {key: int(value) for key, value in date_match.groupdict().items()}
+        date.update(_get_default_date_values(self.directory, self.hourly, self.naming_convention))
+        if self.naming_convention == OLD_GLM_PRE_REGRID_TEMP_NOTATION and not self.directory and self.hourly:
+            # GLM_array_DDD_temp_HH.nc: one hour files
+            date['end_hour'] = date['start_hour'] + 1
 
         if self.year is None:
-            self.year = date['year']
+            self.year = date.get('year')
         if self.day_of_year is None:
-            self.day_of_year = date['day_of_year']
+            self.day_of_year = date.get('day_of_year')
         if self.start_hour is None:
-            self.start_hour = date['start_hour']
+            self.start_hour = date.get('start_hour')
         if self.end_hour is None:
-            self.end_hour = date['end_hour']
+            self.end_hour = date.get('end_hour')
 
     def extract_regrid_res(self):
-        if 'deg' in self.url.stem:
-            filename_split = self.url.stem.split('_')
+        if 'deg' in self._name_stem:
+            filename_split = self._name_stem.split('_')
             if self.naming_convention == OLD_GLM_NOTATION:  # GLM_array_xxdeg_DDD_HH1-HH2.nc
                 self.regrid_res = filename_split[-3]
             else:  # xxdeg_OR_GLM-L2-LCFA_Gxx_YYYY_DDD_HH1-HH2.nc
@@ -150,15 +170,13 @@ class GLMPathParser(SatPathParser):
             self.regrid_res = None
 
     def extract_satellite(self):
-        filename = self.url.stem
-        filename_split = filename.split('_')
         if self.naming_convention == OLD_GLM_NOTATION or self.naming_convention == OLD_GLM_PRE_REGRID_TEMP_NOTATION:
             # old_glm_filename --> usually only for 05-2018 or 06-2018 files so 'G16' satellite
-            self.satellite_version = 'G16'
+            self.satellite_version = _OLD_GLM_SATELLITE_VERSION
         elif self.directory:
             self.satellite_version = None
         else:
-            self.satellite_version = filename_split[-4]
+            self.satellite_version = self._name_stem.split('_')[-4]
 
     def get_start_date_pdTimestamp(self, ignore_missing_start_hour=False):
         """
@@ -168,19 +186,87 @@ class GLMPathParser(SatPathParser):
         """
         if self.directory:
             # if ignore missing start hour --> create timestamp with hour == 00:00 (only OK if directory)
-            if ignore_missing_start_hour and not any(val is None for val in [self.year, self.day_of_year]):
-                dtime = datetime.datetime.strptime(f'{self.year}_{self.day_of_year}_00', '%Y_%j_%H')
+            if ignore_missing_start_hour and self.year is not None and self.day_of_year is not None:
+                return get_start_datetime(self.year, self.day_of_year, 0)
             else:
                 return None
-        else:
-            # if missing value (year, hour, start_hour)--> can't create timestamp
-            if any(val is None for val in [self.year, self.day_of_year, self.start_hour]):
-                raise ValueError(f'Cannot get datetime object, one of more start date value missing (year={self.year}, '
-                                 f'day_of_year={self.day_of_year}, start_hour={self.start_hour})')
-            else:
-                dtime = datetime.datetime.strptime(f'{self.year}_{self.day_of_year}_{self.start_hour}', '%Y_%j_%H')
-        return pd.Timestamp(dtime)
+        # if missing value (year, hour, start_hour)--> can't create timestamp
+        if self.year is None or self.day_of_year is None or self.start_hour is None:
+            raise ValueError(f'Cannot get datetime object, one of more start date value missing (year={self.year}, '
+                             f'day_of_year={self.day_of_year}, start_hour={self.start_hour})')
+        return get_start_datetime(self.year, self.day_of_year, self.start_hour)
 
     def print(self):
-        for attr_key, attr_val in vars(self).items():
-            print(f'{attr_key}: {attr_val}')
+        # no instance __dict__ (__slots__) --> attributes listed from the slots
+        for attr_key in self.__slots__:
+            if not attr_key.startswith('_'):
+                print(f'{attr_key}: {getattr(self, attr_key)}')
+
+
+def _get_name_stem(path):
+    # same as pathlib.Path(path).stem, without building a Path object
+    name = os.fspath(path).rstrip(os.sep).rpartition(os.sep)[2]
+    suffix_index = name.rfind('.')
+    return name[:suffix_index] if 0 < suffix_index < len(name) - 1 else name
+
+
+def parse_glm_paths(path_list, regrid, hourly=True, directory=False, naming_convention=None):
+    """
+    Parse a list of GLM file/directory paths at once (precompiled regex, date arithmetic on arrays, no GLMPathParser
+    nor pandas.Timestamp per path): same values as the GLMPathParser attributes
+    @param path_list: <list> [ <pathlib.Path> or <str>, ... ] paths of the same kind (see GLMPathParser)
+    @param regrid: <bool>
+    @param hourly: <bool>
+    @param directory: <bool>
+    @param naming_convention: <str> 'OLD', 'OLD_TEMP' or None (default notation)
+    @return: <pandas.DataFrame> one row per path (same order), columns: 'path' (as given), 'year', 'day_of_year',
+                'start_hour', 'end_hour' (Int16, <NA> if not in the name), 'regrid_res' and 'satellite_version' (<str>
+                or None), 'start_datetime' (datetime64[ns], NaT if not in the name, 00:00 for directories)
+    """
+    _check_naming_convention(naming_convention)
+    path_list = list(path_list)
+    stems = [_get_name_stem(path) for path in path_list]
+    date_pattern = _get_date_pattern(directory, hourly, naming_convention)
+    date_matches = [date_pattern.search(stem) for stem in stems]
+    if None in date_matches:
+        raise ValueError(f'{[stem for stem, date_match in zip(stems, date_matches) if date_match is None]} do NOT '
+                         f'match the GLM {"directory" if directory else "file"} name format (naming convention: '
+                         f'{naming_convention})')
+    date_values = {key: np.array([int(date_match[key]) for date_match in date_matches], dtype='int64')
+                   for key in date_pattern.groupindex}
+    default_date_values = _get_default_date_values(directory, hourly, naming_convention)
+    for key, value in default_date_values.items():
+        date_values[key] = np.full(len(stems), value, dtype='int64')
+    if naming_convention == OLD_GLM_PRE_REGRID_TEMP_NOTATION and not directory and hourly:
+        # GLM_array_DDD_temp_HH.nc: one hour files
+        date_values['end_hour'] = date_values['start_hour'] + 1
+    parsed_df = pd.DataFrame({'path': pd.Series(path_list, dtype=object)})
+    for key in _DATE_KEYS:
+        parsed_df[key] = pd.array(date_values[key], dtype='Int16') if key in date_values \
+            else pd.array([pd.NA] * len(stems), dtype='Int16')
+    # regrid resolution and satellite version (same rules as extract_regrid_res and extract_satellite)
+    if regrid:
+        res_index = -3 if naming_convention == OLD_GLM_NOTATION else 0
+        parsed_df['regrid_res'] = [stem.split('_')[res_index] if 'deg' in stem else None for stem in stems]
+    else:
+        parsed_df['regrid_res'] = pd.Series([None] * len(stems), dtype=object)
+    if naming_convention is not None:
+        parsed_df['satellite_version'] = pd.Series([_OLD_GLM_SATELLITE_VERSION] * len(stems), dtype=object)
+    elif directory:
+        parsed_df['satellite_version'] = pd.Series([None] * len(stems), dtype=object)
+    else:
+        parsed_df['satellite_version'] = pd.Series([stem.split('_')[-4] for stem in stems], dtype=object)
+    # start dates: January 1st + day of the year + hour (directories: 00:00), NaT if the year is NOT in the names
+    start_datetime = np.full(len(stems), np.datetime64('NaT'), dtype='datetime64[ns]')
+    if 'year' in date_values and (directory or 'start_hour' in date_values):
+        start_hour = date_values['start_hour'] if 'start_hour' in date_values else np.zeros(len(stems), dtype='int64')
+        # (same as calendar.isleap)
+        leap_year = (date_values['year'] % 4 == 0) & ((date_values['year'] % 100 != 0) | (date_values['year'] % 400 == 0))
+        if ((date_values['day_of_year'] < 1) | (date_values['day_of_year'] > 365 + leap_year)
+                | (start_hour < 0) | (start_hour > 23)).any():
+            raise ValueError(f'Invalid dates in {stems}')
+        start_datetime = ((date_values['year'] - 1970).astype('datetime64[Y]').astype('datetime64[ns]')
+                          + (date_values['day_of_year'] - 1) * np.timedelta64(1, 'D')
+                          + start_hour * np.timedelta64(1, 'h'))
+    parsed_df['start_datetime'] = start_datetime
+    return parsed_df
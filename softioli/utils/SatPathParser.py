@@ -1,6 +1,8 @@
 from abc import ABC, abstractmethod
 
 class SatPathParser(ABC):
+     # no instance __dict__ (subclasses define their own __slots__)
+     __slots__ = ()
 
      @abstractmethod
      def extract_missing_date(self):
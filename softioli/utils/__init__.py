@@ -6,18 +6,29 @@ from .utils_functions import (
 from .GLMPathParser import (
     GLMPathParser,
     OLD_GLM_NOTATION,
-    OLD_GLM_PRE_REGRID_TEMP_NOTATION
+    OLD_GLM_PRE_REGRID_TEMP_NOTATION,
+    parse_glm_paths
 )
 
 from .sat_utils import (
     generate_sat_dir_path,
     generate_sat_hourly_filename_pattern,
+    generate_sat_raw_granule_filename_pattern,
+    get_sat_field_of_view_bbox,
     generate_sat_hourly_file_path,
     get_list_of_dates_from_list_of_sat_path,
     generate_sat_dirname_pattern,
-    get_list_of_sat_files
+    get_list_of_sat_files,
+    generate_sat_consolidated_file_path,
+    get_consolidated_period_start_date,
+    get_consolidated_period_end_date,
+    get_sat_consolidated_files_list_between_start_end_date
 )
 
 from . import constants
 
 from . import xarray_pandas_utils
+
+from . import sparse_regrid_utils
+
+from . import regrid_encoding_utils
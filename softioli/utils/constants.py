@@ -96,6 +96,8 @@ FLIGHT_PROGRAM_KEYERROR_MSG = f'flight program NOT supported yet, supported valu
 #----- part 2 -----
 FP_LOUTSTEP = '1h' # flexpart timestep
 FP_DURATION = 10 #days
+FP_RELEASE_WINDOW_DAYS = 7 # days before each release compared with the satellite data (see utils.fp_release_windows)
+FP_RELEASE_WINDOWS_EMPTY_VALUE_ERROR = 'no FLEXPART output time step in the window of any release (no release or release dates outside of the simulation)'
 FP_OUTHEIGHT_MIN = 500 #m
 FP_OUTHEIGHT_STEP = 500
 FP_OUTHEIGHT_MAX = 18000
@@ -113,11 +115,62 @@ REGRID_GLM_DIRNAME = 'regrid_hourly_glm'
 PRE_REGRID_GLM_DIRNAME = 'pre_regrid_hourly_glm'
 
 REGRID_GLM_ROOT_DIR = pathlib.Path(f'{GLM_ROOT_DIR}/{REGRID_GLM_DIRNAME}')
+
+# regrid file layouts: one file per hour (default) or consolidated files (one file per day or month with time dim)
+HOURLY_LAYOUT = 'hourly'
+DAILY_LAYOUT = 'daily'
+MONTHLY_LAYOUT = 'monthly'
+REGRID_LAYOUTS = [HOURLY_LAYOUT, DAILY_LAYOUT, MONTHLY_LAYOUT]
+REGRID_LAYOUT_VALUE_ERROR = f'regrid layout not supported. Supported values: {REGRID_LAYOUTS}'
+CONSOLIDATED_REGRID_GLM_DIRNAMES = {
+    DAILY_LAYOUT: 'regrid_daily_glm',
+    MONTHLY_LAYOUT: 'regrid_monthly_glm'
+}
+CONSOLIDATED_COMPLEVEL = 4 # zlib compression level of the consolidated files
+# flash count cube: one memory-mapped (hour, latitude, longitude) flash_count array per year (see utils.flash_count_cube)
+FLASH_COUNT_CUBE_GLM_DIRNAME = 'flash_count_cube_glm'
+FLASH_COUNT_CUBE_DTYPE = 'uint16' # max value of the dtype = fill value (no flash / outside of the regrid domain)
+CUMULATIVE_FLASH_COUNT_CUBE_DTYPE = 'uint32' # yearly sum of a cell < 8784 hours * 65535
+FLASH_COUNT_CUBE_MOSAIC_VALUE_ERROR = 'satellite data can only be read from the mosaic flash count cubes (mosaic=True), one cube per satellite version otherwise'
+
+# regrid file formats: dense (default) or sparse (COO: lit cells + non-zero histogram entries only)
+REGRID_DENSE_FORMAT = 'dense'
+REGRID_SPARSE_FORMAT = 'sparse_coo'
+REGRID_FORMATS = [REGRID_DENSE_FORMAT, REGRID_SPARSE_FORMAT]
+REGRID_FORMAT_VALUE_ERROR = f'regrid file format not supported. Supported values: {REGRID_FORMATS}'
+REGRID_FORMAT_ATTR = 'regrid_format' # global attribute indicating the format of sparse regrid files
+# regrid file encoding profiles
+LEGACY_ENCODING_PROFILE = 'legacy' # float64 nanoseconds time, uncompressed, counts stored as computed (float64 with NaN)
+COMPACT_ENCODING_PROFILE = 'compact' # int32 hours time, zlib, uint16 counts (NaN -> _FillValue), one chunk per hour
+REGRID_ENCODING_PROFILES = {
+    LEGACY_ENCODING_PROFILE: {
+        'time_dtype': 'float64', 'time_units': 'nanoseconds since 1970-01-01',
+        'count_dtype': None, 'compression': None, 'complevel': None, 'chunks': None
+    },
+    COMPACT_ENCODING_PROFILE: {
+        'time_dtype': 'int32', 'time_units': 'hours since 1970-01-01 00:00:00',
+        'count_dtype': 'uint16', 'compression': 'zlib', 'complevel': CONSOLIDATED_COMPLEVEL,
+        # get_weighted_flash_count reads whole (latitude, longitude) fields hour by hour: one chunk per hour,
+        # dimensions not listed are not split
+        'chunks': {'time': 1}
+    }
+}
+# same format as the existing regrid archive, compact is opt-in (--encoding-profile or re-encode migration)
+DEFAULT_REGRID_ENCODING_PROFILE = LEGACY_ENCODING_PROFILE
+# consolidated daily/monthly files: always chunked (one chunk per hour) and compressed, whatever the hourly files profile
+CONSOLIDATED_ENCODING_PROFILE = COMPACT_ENCODING_PROFILE
+REGRID_ENCODING_PROFILE_VALUE_ERROR = f'regrid encoding profile not supported. Supported values: {list(REGRID_ENCODING_PROFILES)}'
+REGRID_ENCODING_ATTR = 'regrid_encoding_profile' # global attribute indicating the encoding profile of regrid files
 PRE_REGRID_GLM_ROOT_DIR = pathlib.Path(f'{GLM_ROOT_DIR}/{PRE_REGRID_GLM_DIRNAME}')
 
 GOES_SATELLITE_GLM = 'GOES_GLM'
 GLM_PATH_PREFIX = 'OR_GLM-L2-LCFA'
-Gxx_PATTERN = 'G1[6-7]' # TODO: update if newer versions available
+Gxx_PATTERN = 'G1[6-8]' # TODO: update if newer versions available
+# GLM mosaic: one hourly regrid product from all the GOES satellites available (stored as satellite version 'MOSAIC')
+GLM_MOSAIC_VERSION = 'MOSAIC'
+GLM_MOSAIC_NADIR_RULE = 'nadir' # flashes of the overlap zone kept from the satellite with the closest sub-satellite point
+GLM_MOSAIC_RULE_VALUE_ERROR = f'mosaic rule not supported. Expecting "{GLM_MOSAIC_NADIR_RULE}" or a seam longitude (<float>)'
+GLM_MOSAIC_SEAM_LON = -106.2 # midway between GOES-East and GOES-West sub-satellite points
 
 # sat settings dict keys
 flash_energy_varname = "flash_energy_varname"
@@ -134,6 +187,37 @@ f_ar_min_bin = 1.5 # log
 f_ar_max_bin = 4.5
 f_ar_hist_step = 0.1
 
+# regrid engines
+REGRID_ENGINE_PANDAS = 'pandas' # snap flashes to the grid with xarray .sel(method='nearest') + pandas groupby
+REGRID_ENGINE_INDEX = 'index' # grid cell indices computed arithmetically + flat bincount
+REGRID_ENGINES = [REGRID_ENGINE_PANDAS, REGRID_ENGINE_INDEX]
+REGRID_ENGINE_VALUE_ERROR = f'regrid engine not supported. Supported values: {REGRID_ENGINES}'
+
+# chunked regrid (memory-bounded): flashes read and accumulated in slices of a fixed number of flashes
+REGRID_BYTES_PER_FLASH = 200 # estimated peak memory per flash of a slice (float64 copies, grid indices, log10 values, masks)
+REGRID_MIN_CHUNK_SIZE = 10000 # minimum number of flashes per slice
+REGRID_BASE_MEMORY_MB = 120 # python + numpy/xarray/netcdf libraries
+REGRID_OUTPUT_MEMORY_FACTOR = 2.5 # dense output dataset + copies made by the netcdf encoding (x dataset size)
+# batched regrid: hours of a day (and satellite version) regridded together in one vectorized pass
+REGRID_BATCH_VALUE_ERROR = 'batched regrid only supported for pre-regrid hourly files (NOT raw granules or mosaic)'
+
+# regrid status (regrid_sat_files summary keys)
+REGRID_SUCCEEDED = 'succeeded'
+REGRID_SKIPPED = 'skipped'
+REGRID_FAILED = 'failed'
+# regrid manifest (SQLite index of the regridded hours, in the hourly regrid root directory)
+REGRID_MANIFEST_FILENAME = 'regrid_manifest.sqlite'
+REGRID_VERSION = 1 # <!> increment when the regrid output changes so that the manifest marks the regridded hours as stale
+# satellite file catalogue (SQLite index of the pre-regrid/regrid/consolidated files, in the GLM root directory)
+SAT_FILE_CATALOGUE_FILENAME = 'glm_file_catalogue.sqlite'
+# regrid reference index (JSON layout of the hourly regrid files of a daily directory, see utils.regrid_reference_index)
+REGRID_REFERENCE_INDEX_FILENAME = 'regrid_reference_index.json'
+REGRID_REFERENCE_INDEX_VERSION = 1 # <!> increment when the index content changes so that existing indexes are rebuilt
+# regrid watch mode (new pre-regrid hourly files regridded as they land, see sat_regrid_watch)
+REGRID_WATCH_POLL_INTERVAL = 60 # seconds between two scans of the pre-regrid daily directories
+REGRID_WATCH_SETTLE_TIME = 60 # a file is complete once its size and mtime did not change for this number of seconds
+REGRID_WATCH_LOOKBACK_DAYS = 2 # daily directories scanned: from (today - lookback days) to today
+
 # TODO: complete with other satellite data + add dataset_name (mais là pas OK parce que nom fichier 20sec, PAS hourly)
 SAT_SETTINGS = {
     GOES_SATELLITE_GLM: {
@@ -152,6 +236,43 @@ FPOUT_LAT_MAX = 89.75
 FPOUT_LON_MIN = -179.25
 FPOUT_LON_MAX = 180.25
 
+# regrid domain: sub-grid of the FPOUT grid written in the regrid files (default: whole FPOUT grid)
+REGRID_DOMAIN_FOV = 'fov' # bbox containing the field of view of the satellite
+REGRID_DOMAIN_VALUE_ERROR = f'regrid domain not supported. Expecting None, a bbox dict {{"LAT_MIN": , "LAT_MAX": , "LON_MIN": , "LON_MAX": }}, a list of GEO_REGIONS ids or "{REGRID_DOMAIN_FOV}"'
+REGRID_DOMAIN_ATTR = 'regrid_domain' # global attribute describing the domain of cropped regrid files
+# GLM field of view: sub-satellite point longitude of each satellite version and half width (in degrees, latitude and
+# longitude) of the bbox containing the field of view (conservative: flashes outside the bbox would be dropped)
+GLM_SUBSATELLITE_LON = {
+    'G16': -75.2, # GOES-East
+    'G17': -137.2, # GOES-West
+    'G18': -137.0 # GOES-West
+}
+GLM_FIELD_OF_VIEW_HALF_WIDTH = 70.
+
+# FLEXPART output x satellite weighting engines (weighted flash count, see fpout_sat_comparison)
+WEIGHTING_ENGINE_EAGER = 'eager' # merged FLEXPART output / satellite dataset (get_weighted_fp_sat_ds)
+WEIGHTING_ENGINE_LAZY = 'lazy' # dask graph of the weighted flash count only, computed at the end (get_weighted_fp_sat_lazy_ds)
+WEIGHTING_ENGINE_RELEASES = 'releases' # window of each release read as a hyperslab (get_weighted_fp_sat_release_windows_ds)
+WEIGHTING_ENGINE_AGE = 'age' # releases stacked on a release relative age axis (get_weighted_fp_sat_age_ds)
+WEIGHTING_ENGINE_STREAMING = 'streaming' # time slab by time slab, all the releases of a slab at once (get_weighted_fp_sat_streaming_ds)
+WEIGHTING_ENGINE_SPARSE = 'sparse' # sparse (COO) footprints stored next to the FLEXPART output (get_weighted_fp_sat_sparse_ds)
+WEIGHTING_ENGINES = [WEIGHTING_ENGINE_EAGER, WEIGHTING_ENGINE_LAZY, WEIGHTING_ENGINE_RELEASES, WEIGHTING_ENGINE_AGE,
+                     WEIGHTING_ENGINE_STREAMING, WEIGHTING_ENGINE_SPARSE]
+WEIGHTING_ENGINE_VALUE_ERROR = f'weighting engine not supported. Supported values: {WEIGHTING_ENGINES}'
+# lazy weighting: chunks of the (time, pointspec, latitude, longitude) arrays (latitude and longitude not split)
+FP_SAT_LAZY_CHUNKS = {'time': 24, 'pointspec': 1}
+# streaming weighting: maximum number of hours of the FLEXPART output and satellite slices read at once (slabs of
+# whole FLEXPART output time chunks)
+FP_SAT_STREAMING_SLAB_HOURS = 24
+# sparse weighting: sparse footprint file stored next to the FLEXPART output (<prefix><FLEXPART output filename>)
+SPARSE_FOOTPRINT_FILENAME_PREFIX = 'sparse_footprint_'
+SPARSE_FOOTPRINT_DIMS_VALUE_ERROR = 'footprint dims not supported. Expecting (pointspec, time, latitude, longitude) (summed over height)'
+DASK_SCHEDULER_THREADS = 'threads'
+DASK_SCHEDULER_PROCESSES = 'processes'
+DASK_SCHEDULER_DISTRIBUTED = 'distributed' # local dask.distributed cluster (optional dependency)
+DASK_SCHEDULERS = [DASK_SCHEDULER_THREADS, DASK_SCHEDULER_PROCESSES, DASK_SCHEDULER_DISTRIBUTED]
+DASK_SCHEDULER_VALUE_ERROR = f'dask scheduler not supported. Supported values: {DASK_SCHEDULERS}'
+
 GRID_RESOLUTION_STR = '05deg'
 GRID_RESOLUTION = 0.5
 
@@ -0,0 +1,55 @@
+import contextlib
+
+import dask
+
+from . import constants as cts
+
+try:
+    # optional: local distributed cluster scheduler (threads or processes schedulers only without it)
+    from dask.distributed import Client, LocalCluster
+except ImportError:
+    Client = LocalCluster = None
+
+
+@contextlib.contextmanager
+def dask_scheduler(scheduler=cts.DASK_SCHEDULER_THREADS, workers=None):
+    """
+    Context manager in which the dask computations (.compute(), .load(), .to_netcdf(), ...) run with the scheduler given
+    - 'threads' (default): local thread pool
+    - 'processes': local process pool (GIL-bound tasks, e.g. netcdf decoding)
+    - 'distributed': dask.distributed LocalCluster started for the context (dashboard, spilling to disk), requires the
+        distributed package
+    @param scheduler: <str> 'threads', 'processes' or 'distributed'
+    @param workers: <int> number of threads, processes or cluster workers (dask default if None)
+    """
+    if scheduler not in cts.DASK_SCHEDULERS:
+        raise ValueError(f'{scheduler} {cts.DASK_SCHEDULER_VALUE_ERROR}')
+    if scheduler != cts.DASK_SCHEDULER_DISTRIBUTED:
+        with dask.config.set(scheduler=scheduler, num_workers=workers):
+            yield
+        return
+    if LocalCluster is None:
+        raise ImportError(f'"{cts.DASK_SCHEDULER_DISTRIBUTED}" dask scheduler requires the distributed package '
+                          f'(pip install distributed)')
+    with LocalCluster(n_workers=workers) as cluster, Client(cluster):
+        yield
+
+
+def get_chunk_aligned_slabs(chunk_size_list, slab_size):
+    """
+    Group consecutive chunks of a dimension into slabs of at most slab_size elements (a chunk larger than slab_size
+    is a slab on its own) so that each chunk is read by a single slab
+    @param chunk_size_list: <tuple> chunk sizes along the dimension (e.g. DataArray.chunksizes['time'])
+    @param slab_size: <int>
+    @return: <list> [ <slice>, ... ] index slices of the slabs
+    """
+    slab_list = []
+    slab_start = slab_end = 0
+    for chunk_size in chunk_size_list:
+        if slab_end > slab_start and slab_end + chunk_size - slab_start > slab_size:
+            slab_list.append(slice(slab_start, slab_end))
+            slab_start = slab_end
+        slab_end += chunk_size
+    if slab_end > slab_start:
+        slab_list.append(slice(slab_start, slab_end))
+    return slab_list
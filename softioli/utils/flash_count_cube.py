@@ -0,0 +1,405 @@
+import json
+import os
+import pathlib
+
+import numpy as np
+import pandas as pd
+import xarray as xr
+
+from . import constants as cts
+from .GLMPathParser import GLMPathParser
+from .sparse_regrid_utils import open_regrid_file
+from .utils_functions import date_to_pd_timestamp
+from .xarray_pandas_utils import get_sub_grid_index
+
+_HEADER_SUFFIX = '.json'
+_CUMULATIVE_SUFFIX = '_cumsum'
+# hours of the flash count cube loaded at once to update the cumulative cube
+_CUMSUM_BLOCK_HOURS = 24
+
+
+def get_flash_count_cube_path(year, grid_res_str, sat_version, target_dir=None, cumulative=False):
+    """
+    Returns the path of the flash count cube of a year (raw array file, the sidecar header has the same name with a
+    .json suffix)
+    :param year: <int>
+    :param grid_res_str: <str> grid resolution str e.g.: '05deg'
+    :param sat_version: <str> satellite version e.g.: 'G16' or 'MOSAIC'
+    :param target_dir: <str> or <pathlib.Path> root directory path (if different from default (/o3p/patj/glm), mostly used for testing)
+    :param cumulative: <bool> if True, path of the cumulative flash count cube (see CumulativeFlashCountCube)
+    :return: <pathlib.Path>
+    """
+    root_dir_path = target_dir if target_dir is not None else cts.GLM_ROOT_DIR
+    return pathlib.Path(f'{root_dir_path}/{cts.FLASH_COUNT_CUBE_GLM_DIRNAME}/'
+                        f'{grid_res_str}_{cts.GLM_PATH_PREFIX}_{sat_version}_{year}'
+                        f'{_CUMULATIVE_SUFFIX if cumulative else ""}.dat')
+
+
+class YearlyMemmapCube:
+    """
+    Base class of the flash count cubes: one year of hourly (latitude, longitude) rows stored as a single memory-mapped
+    array of fixed layout (hours of the year + n_extra_rows, latitude, longitude) in the dtype of the subclass + a small
+    sidecar JSON header (grid coordinates, fill value and hours written). The hour index is the number of hours since
+    January 1st: any [start, end] hour range is a contiguous slice of the array (no file opened per hour).
+    """
+    dtype = None
+    # number of rows of the array in addition to the hours of the year
+    n_extra_rows = 0
+
+    def __init__(self, cube_path, year=None, latitudes=None, longitudes=None, writable=False):
+        """
+        Opens an existing cube, or creates it (writable only) if it does not exist
+        @param cube_path: <pathlib.Path> cube array file (see get_flash_count_cube_path)
+        @param year: <int> year of the cube (creation only)
+        @param latitudes: <numpy.ndarray> regular grid latitudes (creation only)
+        @param longitudes: <numpy.ndarray> regular grid longitudes (creation only)
+        @param writable: <bool> if True, the cube can be written (see flush)
+        """
+        self.cube_path = pathlib.Path(cube_path)
+        self.header_path = self.cube_path.with_suffix(_HEADER_SUFFIX)
+        self.writable = writable
+        if self.header_path.exists():
+            with open(self.header_path) as header_file:
+                self.header = json.load(header_file)
+        elif writable and year is not None and latitudes is not None and longitudes is not None:
+            self.header = self._create(year, latitudes, longitudes)
+        else:
+            raise FileNotFoundError(f'Flash count cube {self.cube_path} does NOT exist')
+        self.year = self.header['year']
+        self.latitudes = self._get_coord_values('latitude')
+        self.longitudes = self._get_coord_values('longitude')
+        self.start_date = pd.Timestamp(self.header['start_date'])
+        self.n_hours = self.header['shape'][0] - self.n_extra_rows
+        self.fill_value = self.header['fill_value']
+        self.written_hours = np.unpackbits(np.frombuffer(bytes.fromhex(self.header['written_hours']), dtype='u1'),
+                                           count=self.n_hours).astype(bool)
+        self.data = np.memmap(self.cube_path, dtype=self.header['dtype'], mode='r+' if writable else 'r',
+                              shape=tuple(self.header['shape']))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def _create(self, year, latitudes, longitudes):
+        start_date = pd.Timestamp(year=year, month=1, day=1)
+        n_hours = int((pd.Timestamp(year=year + 1, month=1, day=1) - start_date) / pd.Timedelta(1, 'h'))
+        header = {
+            'year': year,
+            'start_date': start_date.isoformat(),
+            'shape': [n_hours + self.n_extra_rows, len(latitudes), len(longitudes)],
+            'dtype': self.dtype,
+            'fill_value': int(np.iinfo(self.dtype).max),
+            # regular grids: first value, step and size (values = first + index * step, same as numpy.arange)
+            'latitude': {'first': float(latitudes[0]), 'step': float(latitudes[1] - latitudes[0]),
+                         'size': len(latitudes)},
+            'longitude': {'first': float(longitudes[0]), 'step': float(longitudes[1] - longitudes[0]),
+                          'size': len(longitudes)},
+            'written_hours': np.packbits(np.zeros(n_hours, dtype=bool)).tobytes().hex()
+        }
+        self.cube_path.parent.mkdir(parents=True, exist_ok=True)
+        # sparse file (hours not written yet do not use any disk space)
+        with open(self.cube_path, 'wb') as cube_file:
+            cube_file.truncate(int(np.prod(header['shape'])) * np.dtype(header['dtype']).itemsize)
+        self._write_header(header)
+        return header
+
+    def _get_coord_values(self, coord_name):
+        coord = self.header[coord_name]
+        return coord['first'] + np.arange(coord['size']) * coord['step']
+
+    def _write_header(self, header):
+        # temporary file first so that an interrupted job does not leave an incomplete header
+        temp_header_path = self.header_path.parent / f'temp_{self.header_path.name}'
+        with open(temp_header_path, 'w') as header_file:
+            json.dump(header, header_file, indent=1)
+        os.replace(temp_header_path, self.header_path)
+
+    def get_hour_index(self, date):
+        """
+        @param date: <pandas.Timestamp> start date of the hour
+        @return: <int> index of the hour in the cube
+        """
+        hour_index = (date_to_pd_timestamp(date) - self.start_date) / pd.Timedelta(1, 'h')
+        if hour_index != int(hour_index) or not 0 <= hour_index < self.n_hours:
+            raise ValueError(f'{date} is NOT the start of an hour of {self.year}')
+        return int(hour_index)
+
+    def get_hour_index_range(self, start_date, end_date):
+        """
+        Hours of the cube between start and end date (included): contiguous slice [start_index, end_index[ (empty if
+        the period is outside of the year)
+        @param start_date: <pandas.Timestamp> or <numpy.ndarray> of dates
+        @param end_date: <pandas.Timestamp> or <numpy.ndarray> of dates
+        @return: <tuple> (start_index, end_index) <int> or <numpy.ndarray> (same shape as the dates)
+        """
+        start_index = np.clip((pd.DatetimeIndex(np.atleast_1d(start_date)).ceil('h') - self.start_date)
+                              // pd.Timedelta(1, 'h'), 0, self.n_hours)
+        end_index = np.clip((pd.DatetimeIndex(np.atleast_1d(end_date)).floor('h') - self.start_date)
+                            // pd.Timedelta(1, 'h') + 1, start_index, self.n_hours)
+        if np.ndim(start_date) == 0 and np.ndim(end_date) == 0:
+            return int(start_index[0]), int(end_index[0])
+        return np.asarray(start_index), np.asarray(end_index)
+
+    def flush(self):
+        """
+        Write the modified hours to disk and update the header (hours written)
+        """
+        self.data.flush()
+        self.header['written_hours'] = np.packbits(self.written_hours).tobytes().hex()
+        self._write_header(self.header)
+
+    def close(self):
+        if self.writable:
+            self.flush()
+        del self.data
+
+
+class FlashCountCube(YearlyMemmapCube):
+    """
+    Hourly flash counts of a year (see YearlyMemmapCube) in FLASH_COUNT_CUBE_DTYPE. Cells without any flash
+    (flash_count NaN) or outside of the regrid domain are stored as fill value, hours not written yet as 0 (see
+    written_hours).
+    """
+    dtype = cts.FLASH_COUNT_CUBE_DTYPE
+
+    def write_hour(self, date, flash_count_da):
+        """
+        Write the flash counts of an hour (the whole hour is overwritten)
+        @param date: <pandas.Timestamp> start date of the hour
+        @param flash_count_da: <xarray.DataArray> (latitude, longitude) dense flash counts (NaN: no flash), on the cube
+                    grid or a sub-grid of it (regrid domain, cells outside of it stored as fill value)
+        """
+        hour_index = self.get_hour_index(date)
+        lat_index = get_sub_grid_index(flash_count_da['latitude'].values, self.latitudes)
+        lon_index = get_sub_grid_index(flash_count_da['longitude'].values, self.longitudes)
+        flash_count = flash_count_da.transpose('latitude', 'longitude').values
+        max_count = np.nanmax(flash_count, initial=0)
+        if max_count >= self.fill_value:
+            raise ValueError(f'{date} flash count max value ({max_count}) cannot be stored as {self.header["dtype"]}')
+        hour_data = np.full(self.data.shape[1:], self.fill_value, dtype=self.data.dtype)
+        hour_data[np.ix_(lat_index, lon_index)] = np.where(np.isnan(flash_count), self.fill_value, flash_count)
+        self.data[hour_index] = hour_data
+        self.written_hours[hour_index] = True
+
+    def get_flash_count_da(self, start_date, end_date, masked=False):
+        """
+        Flash counts of the hours between start and end date (included)
+        @param start_date: <pandas.Timestamp>
+        @param end_date: <pandas.Timestamp>
+        @param masked: <bool> if False (default), the DataArray is a view of the memory-mapped cube (no copy, counts as
+                    stored: fill value for cells without flash, 0 for hours not written). If True, fill values and hours
+                    not written are NaN (float copy, same values as the flash_count variable of the regrid files)
+        @return: <xarray.DataArray> (time, latitude, longitude)
+        """
+        start_index, end_index = self.get_hour_index_range(start_date, end_date)
+        start_date = self.start_date + pd.Timedelta(start_index, 'h')
+        flash_count_da = xr.DataArray(
+            self.data[start_index:end_index], name='flash_count', dims=('time', 'latitude', 'longitude'),
+            coords={'time': pd.date_range(start_date, periods=end_index - start_index, freq='h').values.astype('datetime64[ns]'),
+                    'latitude': self.latitudes, 'longitude': self.longitudes},
+            attrs={'_FillValue': self.fill_value}
+        )
+        if not masked:
+            return flash_count_da
+        written_da = xr.DataArray(self.written_hours[start_index:end_index], dims='time')
+        return flash_count_da.where((flash_count_da != self.fill_value) & written_da).assign_attrs({})
+
+
+class CumulativeFlashCountCube(YearlyMemmapCube):
+    """
+    Temporal prefix sums of a flash count cube: row i is the sum of the flash counts of the hours [0, i[ of the year
+    (fill values and hours not written counted as 0), stored as an extra (hours of the year + 1, latitude, longitude)
+    memory-mapped array in CUMULATIVE_FLASH_COUNT_CUBE_DTYPE. The flash count of any hour window [start, end] is then
+    row(end + 1) - row(start): two row reads and a subtraction, whatever the window length.
+    Only the rows up to the last hour written in the flash count cube are stored (see valid_rows), the following rows
+    are equal to the last one (read as such).
+    """
+    dtype = cts.CUMULATIVE_FLASH_COUNT_CUBE_DTYPE
+    n_extra_rows = 1
+
+    @property
+    def valid_rows(self):
+        """
+        Number of rows computed (row 0: no hour, always 0)
+        """
+        return self.header.get('valid_rows', 1)
+
+    def update(self, flash_count_cube, start_date=None):
+        """
+        Compute the prefix sums from the flash counts of flash_count_cube (same year and grid), from start_date to the
+        last hour written in flash_count_cube
+        @param flash_count_cube: <FlashCountCube>
+        @param start_date: <pandas.Timestamp> first hour modified in flash_count_cube since the previous update, if None
+                    (default) the whole year is computed again
+        """
+        if (flash_count_cube.year, flash_count_cube.data.shape[1:]) != (self.year, self.data.shape[1:]):
+            raise ValueError(f'{flash_count_cube.cube_path} and {self.cube_path} do NOT have the same year and grid')
+        written_hour_indexes = np.flatnonzero(flash_count_cube.written_hours)
+        end_index = written_hour_indexes[-1] + 1 if len(written_hour_indexes) else 0
+        start_index = 0 if start_date is None else flash_count_cube.get_hour_index(date_to_pd_timestamp(start_date))
+        # rows after valid_rows are NOT stored --> computed from the last valid row
+        start_index = min(start_index, self.valid_rows - 1, end_index)
+        prefix_sum = np.array(self.data[start_index])
+        for block_start_index in range(start_index, end_index, _CUMSUM_BLOCK_HOURS):
+            block_end_index = min(block_start_index + _CUMSUM_BLOCK_HOURS, end_index)
+            flash_count = flash_count_cube.data[block_start_index:block_end_index]
+            flash_count = np.where(
+                (flash_count == flash_count_cube.fill_value)
+                | ~flash_count_cube.written_hours[block_start_index:block_end_index, np.newaxis, np.newaxis],
+                0, flash_count
+            )
+            block_prefix_sum = prefix_sum + np.cumsum(flash_count, axis=0, dtype=self.data.dtype)
+            self.data[block_start_index + 1:block_end_index + 1] = block_prefix_sum
+            prefix_sum = block_prefix_sum[-1]
+        self.written_hours = flash_count_cube.written_hours.copy()
+        self.header['valid_rows'] = int(end_index) + 1
+
+    def get_row_values(self, row_index):
+        """
+        @param row_index: <numpy.ndarray> row indexes (rows after valid_rows read as the last valid row)
+        @return: <numpy.ndarray> (row_index shape, latitude, longitude) prefix sums (only the rows needed are read)
+        """
+        unique_row_index, row_index_inverse = np.unique(np.minimum(row_index, self.valid_rows - 1), return_inverse=True)
+        return self.data[unique_row_index][row_index_inverse.reshape(np.shape(row_index))]
+
+    def get_window_sum_values(self, start_date, end_date):
+        """
+        Flash counts of the hours between start and end date (included) of the windows, hours outside of the year
+        ignored
+        @param start_date: <numpy.ndarray> window start dates
+        @param end_date: <numpy.ndarray> window end dates (same shape)
+        @return: <numpy.ndarray> (window, latitude, longitude)
+        """
+        start_index, end_index = self.get_hour_index_range(np.atleast_1d(start_date), np.atleast_1d(end_date))
+        row_values = self.get_row_values(np.stack([start_index, end_index]))
+        return row_values[1] - row_values[0]
+
+
+def update_cumulative_flash_count_cube(year, grid_res_str, sat_version, start_date=None, target_dir=None):
+    """
+    Update (or create) the cumulative flash count cube of a year from its flash count cube (see
+    CumulativeFlashCountCube)
+    :param year: <int>
+    :param grid_res_str: <str> grid resolution str
+    :param sat_version: <str> satellite version e.g.: 'G16' or 'MOSAIC'
+    :param start_date: <pandas.Timestamp> first hour modified since the previous update, if None (default) the whole
+                    year is computed again
+    :param target_dir: <str> or <pathlib.Path> root directory path (if different from default)
+    """
+    flash_count_cube = FlashCountCube(get_flash_count_cube_path(year, grid_res_str=grid_res_str,
+                                                                sat_version=sat_version, target_dir=target_dir))
+    with CumulativeFlashCountCube(get_flash_count_cube_path(year, grid_res_str=grid_res_str, sat_version=sat_version,
+                                                            target_dir=target_dir, cumulative=True),
+                                  year=year, latitudes=flash_count_cube.latitudes,
+                                  longitudes=flash_count_cube.longitudes, writable=True) as cumulative_cube:
+        cumulative_cube.update(flash_count_cube, start_date=start_date)
+    flash_count_cube.close()
+
+
+def get_flash_count_window_sum_da(start_date, end_date, grid_res_str, sat_version, target_dir=None):
+    """
+    Flash counts summed over hour windows [start_date, end_date] (hours of the windows between the two dates
+    included, as in open_flash_count_cube_da) read from the yearly cumulative flash count cubes: two rows read per
+    window and per year (see CumulativeFlashCountCube)
+    <!> cells without any flash AND hours not written in the flash count cubes are counted as 0
+    :param start_date: <pandas.Timestamp> or array-like of window start dates
+    :param end_date: <pandas.Timestamp> or array-like of window end dates (same length as start_date)
+    :param grid_res_str: <str> grid resolution str
+    :param sat_version: <str> satellite version e.g.: 'G16' or 'MOSAIC'
+    :param target_dir: <str> or <pathlib.Path> root directory path (if different from default)
+    :return: <xarray.DataArray> (window, latitude, longitude) (latitude, longitude) if start_date and end_date are
+                    single dates
+    """
+    start_dates = pd.DatetimeIndex(np.atleast_1d(start_date))
+    end_dates = pd.DatetimeIndex(np.atleast_1d(end_date))
+    if len(start_dates) != len(end_dates):
+        raise ValueError(f'{len(start_dates)} window start dates but {len(end_dates)} window end dates')
+    window_sum = None
+    for year in range(start_dates.min().year, end_dates.max().year + 1):
+        cube = CumulativeFlashCountCube(get_flash_count_cube_path(year, grid_res_str=grid_res_str,
+                                                                  sat_version=sat_version, target_dir=target_dir,
+                                                                  cumulative=True))
+        year_window_sum = cube.get_window_sum_values(start_dates.values, end_dates.values)
+        window_sum = year_window_sum if window_sum is None else window_sum + year_window_sum
+        latitudes, longitudes = cube.latitudes, cube.longitudes
+        cube.close()
+    window_sum_da = xr.DataArray(
+        window_sum, name='flash_count', dims=('window', 'latitude', 'longitude'),
+        coords={'window_start': ('window', start_dates.values), 'window_end': ('window', end_dates.values),
+                'latitude': latitudes, 'longitude': longitudes}
+    )
+    if np.ndim(start_date) == 0 and np.ndim(end_date) == 0:
+        return window_sum_da.squeeze('window')
+    return window_sum_da
+
+
+def open_flash_count_cube_da(start_date, end_date, grid_res_str, sat_version, target_dir=None, masked=False):
+    """
+    Flash counts of the hours between start and end date read from the yearly flash count cubes (see FlashCountCube)
+    <!> zero-copy view only if the hours are in a single year (concatenated otherwise)
+    :param start_date: <pandas.Timestamp>
+    :param end_date: <pandas.Timestamp>
+    :param grid_res_str: <str> grid resolution str
+    :param sat_version: <str> satellite version e.g.: 'G16' or 'MOSAIC'
+    :param target_dir: <str> or <pathlib.Path> root directory path (if different from default)
+    :param masked: <bool> see FlashCountCube.get_flash_count_da
+    :return: <xarray.DataArray> (time, latitude, longitude)
+    """
+    start_date, end_date = date_to_pd_timestamp(start_date), date_to_pd_timestamp(end_date)
+    flash_count_da_list = []
+    for year in range(start_date.year, end_date.year + 1):
+        cube = FlashCountCube(get_flash_count_cube_path(year, grid_res_str=grid_res_str, sat_version=sat_version,
+                                                        target_dir=target_dir))
+        flash_count_da_list.append(cube.get_flash_count_da(start_date, end_date, masked=masked))
+    if len(flash_count_da_list) == 1:
+        return flash_count_da_list[0]
+    return xr.concat(flash_count_da_list, dim='time')
+
+
+def append_regrid_files_to_flash_count_cube(regrid_file_list, grid_res, grid_res_str, lat_min=cts.FPOUT_LAT_MIN,
+                                            lat_max=cts.FPOUT_LAT_MAX, lon_min=cts.FPOUT_LON_MIN,
+                                            lon_max=cts.FPOUT_LON_MAX, target_dir=None, overwrite=True,
+                                            update_cumulative=False):
+    """
+    Write the flash counts of hourly regrid files (dense or sparse, whole grid or regrid domain) to the flash count cubes
+    of their satellite version and year (cubes created if needed)
+    :param regrid_file_list: <list> [ <pathlib.Path>, ... ] hourly regrid files of the same grid resolution
+    :param grid_res: <float> grid resolution
+    :param grid_res_str: <str> grid resolution str
+    :param lat_min: <float> cube grid
+    :param lat_max: <float>
+    :param lon_min: <float>
+    :param lon_max: <float>
+    :param target_dir: <str> or <pathlib.Path> root directory path (if different from default)
+    :param overwrite: <bool> if False, hours already written in the cube are NOT written again
+    :param update_cumulative: <bool> if True, the cumulative flash count cubes are also updated from the first hour
+                    written (see CumulativeFlashCountCube)
+    :return: <int> number of hours written
+    """
+    cube_files = {}
+    for regrid_file_path in regrid_file_list:
+        path_parsed = GLMPathParser(file_url=regrid_file_path, regrid=True)
+        cube_files.setdefault((path_parsed.satellite_version, path_parsed.year), []) \
+            .append((path_parsed.start_datetime, regrid_file_path))
+    n_written = 0
+    for (sat_version, year), hour_file_list in sorted(cube_files.items()):
+        with FlashCountCube(get_flash_count_cube_path(year, grid_res_str=grid_res_str, sat_version=sat_version,
+                                                      target_dir=target_dir),
+                            year=year, latitudes=np.arange(lat_min, lat_max + grid_res, grid_res),
+                            longitudes=np.arange(lon_min, lon_max + grid_res, grid_res), writable=True) as cube:
+            first_hour_written = None
+            for hour_date, regrid_file_path in sorted(hour_file_list):
+                if not overwrite and cube.written_hours[cube.get_hour_index(hour_date)]:
+                    continue
+                cube.write_hour(hour_date, open_regrid_file(regrid_file_path)['flash_count'].squeeze('time', drop=True))
+                if first_hour_written is None:
+                    first_hour_written = hour_date
+                n_written += 1
+        cumulative_cube_path = get_flash_count_cube_path(year, grid_res_str=grid_res_str, sat_version=sat_version,
+                                                         target_dir=target_dir, cumulative=True)
+        if update_cumulative and (first_hour_written is not None or not cumulative_cube_path.exists()):
+            update_cumulative_flash_count_cube(year, grid_res_str=grid_res_str, sat_version=sat_version,
+                                               start_date=first_hour_written, target_dir=target_dir)
+    return n_written
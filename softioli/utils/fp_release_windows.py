@@ -0,0 +1,137 @@
+import numpy as np
+import pandas as pd
+import xarray as xr
+
+from . import constants as cts
+
+
+def get_release_start_dates(fp_ds):
+    """
+    Returns the "start" date of each release of a backward FLEXPART output: ietime + RELEND (backwards) rounded to the
+    next hour
+    :param fp_ds: <xarray.Dataset> FLEXPART output (iedate and ietime attributes, RELEND variable)
+    :return: <xarray.DataArray> (pointspec) datetime64
+    """
+    ietime = pd.Timestamp(f"{fp_ds.attrs['iedate']}{fp_ds.attrs['ietime']}")
+    return (ietime + fp_ds.RELEND).dt.ceil('h')
+
+
+def get_release_time_slices(times, release_start_dates, window=pd.Timedelta(cts.FP_RELEASE_WINDOW_DAYS, 'D')):
+    """
+    Returns the index range of the time steps of the window [release start date - window, release start date] of each
+    release
+    <!> times expected to be monotonic (FLEXPART output time steps): the time steps of a window are contiguous
+    :param times: <numpy.ndarray> datetime64 time steps
+    :param release_start_dates: <numpy.ndarray> or <xarray.DataArray> datetime64 start date of each release
+    :param window: <pandas.Timedelta>
+    :return: <list> [ <slice>, ... ] one slice per release (empty slice if no time step in the window)
+    """
+    times = np.asarray(times)
+    time_slice_list = []
+    for release_start_date in np.asarray(release_start_dates, dtype='datetime64[ns]'):
+        time_index = np.flatnonzero((times >= release_start_date - window.to_timedelta64()) &
+                                    (times <= release_start_date))
+        time_slice_list.append(slice(int(time_index[0]), int(time_index[-1]) + 1) if time_index.size else slice(0, 0))
+    return time_slice_list
+
+
+class FpOutReleaseWindows:
+    """
+    Ragged per release view of a backward FLEXPART output: spec001_mr of each release restricted to its own window
+    [release start date - window, release start date] (see get_release_start_dates). Each release is a (time, [height,]
+    latitude, longitude) hyperslab of spec001_mr selected by index: the time steps outside of its window are NOT read
+    and NOT padded with NaN (unlike a (time, pointspec) mask of the whole spec001_mr cube).
+    The releases can also be stacked on a release relative "age" axis (hours before the release start date, see
+    get_age_da): dense (age, pointspec) array whatever the release start dates
+    """
+
+    def __init__(self, fp_ds, window=pd.Timedelta(cts.FP_RELEASE_WINDOW_DAYS, 'D'), sum_height=True):
+        """
+        @param fp_ds: <xarray.Dataset> FLEXPART output with a pointspec dimension (nageclass squeezed), spec001_mr
+                        arrays lazily read (dask or backend arrays): only the hyperslabs selected are read
+        @param window: <pandas.Timedelta> window before the start date of each release
+        @param sum_height: <bool> if True, the spec001_mr hyperslabs are summed over height
+        """
+        self.fp_ds = fp_ds
+        # release info (RELxxxx variables)
+        self.rel_ds = fp_ds.drop_vars([var for var in fp_ds.variables if not 'REL' in var])
+        self.release_start_dates = get_release_start_dates(fp_ds)
+        self.time_slices = get_release_time_slices(fp_ds['time'].values, self.release_start_dates, window=window)
+        self.sum_height = sum_height
+        # age axis: 0 (hour of the release start date) .. window (in hours)
+        self.ages = np.arange(window // pd.Timedelta(1, 'h') + 1)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def close(self):
+        self.fp_ds.close()
+
+    def __len__(self):
+        return len(self.time_slices)
+
+    def __getitem__(self, release_index):
+        """
+        @param release_index: <int> index of the release along pointspec
+        @return: <xarray.DataArray> (time, [height,] latitude, longitude) spec001_mr of the release over its window (lazy)
+        """
+        release_da = self.fp_ds['spec001_mr'].isel(pointspec=release_index, time=self.time_slices[release_index])
+        if self.sum_height and 'height' in release_da.dims:
+            release_da = release_da.sum('height')
+        return release_da
+
+    def __iter__(self):
+        for release_index in range(len(self)):
+            yield self[release_index]
+
+    def get_window_times(self):
+        """
+        @return: <numpy.ndarray> sorted datetime64 time steps of the FLEXPART output in the window of at least one release
+                        (empty if all the windows are empty)
+        """
+        times = self.fp_ds['time'].values
+        return np.unique(np.concatenate([times[:0]] + [times[time_slice] for time_slice in self.time_slices]))
+
+    def get_time_range(self):
+        """
+        @return: <tuple> (<pandas.Timestamp>, <pandas.Timestamp>) first and last time steps of the release windows
+        """
+        window_times = self.get_window_times()
+        if not window_times.size:
+            raise ValueError(cts.FP_RELEASE_WINDOWS_EMPTY_VALUE_ERROR)
+        return pd.Timestamp(window_times.min()), pd.Timestamp(window_times.max())
+
+    def get_age_da(self):
+        """
+        spec001_mr of all the releases re-indexed on the number of hours before their start date (age): dense
+        (age, pointspec, latitude, longitude) array (lazy), NaN for the ages without time step in the FLEXPART output
+        @return: <xarray.DataArray> with a time (age, pointspec) coordinate: date of each (age, release)
+        """
+        release_da_list = [self.get_release_age_da(release_index, release_da)
+                           for release_index, release_da in enumerate(self)]
+        age_da = xr.concat(release_da_list, dim='pointspec').transpose('age', 'pointspec', ...)
+        return age_da.assign_coords(time=(('age', 'pointspec'), self.get_age_times()))
+
+    def get_release_age_da(self, release_index, release_da, fill_value=np.nan):
+        """
+        Re-index an array of a release on the age axis (number of hours before the release start date)
+        @param release_index: <int> index of the release along pointspec
+        @param release_da: <xarray.DataArray> with a time dimension: time steps of the window of the release (or a
+                    subset of them), e.g. self[release_index] or a reduction of it over latitude and longitude
+        @param fill_value: value of the ages without time step in release_da
+        @return: <xarray.DataArray> age dimension instead of time
+        """
+        release_start_date = self.release_start_dates.values[release_index]
+        release_ages = (release_start_date - release_da['time'].values) // np.timedelta64(1, 'h')
+        return release_da.assign_coords(age=('time', release_ages)).swap_dims({'time': 'age'}).drop_vars('time') \
+            .reindex(age=self.ages, fill_value=fill_value)
+
+    def get_age_times(self):
+        """
+        @return: <numpy.ndarray> (age, pointspec) datetime64 date of each (age, release): release start date - age hours
+        """
+        return np.asarray(self.release_start_dates.values, dtype='datetime64[ns]')[np.newaxis, :] - \
+            self.ages[:, np.newaxis] * np.timedelta64(1, 'h')
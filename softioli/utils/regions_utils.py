@@ -28,3 +28,22 @@ def assign_geo_region_to_ds(ds, geo_regions_dict=GEO_REGIONS):
     return ds
 
 
+def get_geo_regions_bbox(region_ids, geo_regions_dict=GEO_REGIONS):
+    """
+    Returns the bounding box containing several geographical regions
+    :param region_ids: <list> [ <int>, ... ] ids of the regions in geo_regions_dict
+    :param geo_regions_dict: <dict> { <reg_id>: { "REGION_NAME": <str>, "LON_MIN": <float>, "LON_MAX": <float>, "LAT_MIN": <float>, "LAT_MAX": <float> }, ... }
+    :return: <dict> { "LAT_MIN": <float>, "LAT_MAX": <float>, "LON_MIN": <float>, "LON_MAX": <float> }
+    """
+    if not region_ids:
+        raise ValueError('Expecting at least one geographical region id')
+    unknown_region_ids = [region_id for region_id in region_ids if region_id not in geo_regions_dict]
+    if unknown_region_ids:
+        raise ValueError(f'Unknown geographical region ids: {unknown_region_ids}. Supported values: {list(geo_regions_dict)}')
+    regions = [geo_regions_dict[region_id] for region_id in region_ids]
+    return {
+        "LAT_MIN": min(region["LAT_MIN"] for region in regions),
+        "LAT_MAX": max(region["LAT_MAX"] for region in regions),
+        "LON_MIN": min(region["LON_MIN"] for region in regions),
+        "LON_MAX": max(region["LON_MAX"] for region in regions)
+    }
@@ -0,0 +1,93 @@
+import numpy as np
+
+from . import constants as cts
+from .sparse_regrid_utils import SPARSE_DIMS_ATTR, is_sparse_regrid_ds
+
+# wider unsigned integer dtypes used when the counts do not fit in the profile count dtype
+_WIDER_UINT_DTYPES = ['uint16', 'uint32', 'uint64']
+
+
+def get_regrid_encoding_profile(encoding_profile, complevel=None):
+    """
+    Returns the encoding profile settings (see constants.REGRID_ENCODING_PROFILES)
+    @param encoding_profile: <str> 'legacy' or 'compact'
+    @param complevel: <int> compression level, if None the profile compression level is used
+    @return: <dict>
+    """
+    if encoding_profile not in cts.REGRID_ENCODING_PROFILES:
+        raise ValueError(f'{encoding_profile} {cts.REGRID_ENCODING_PROFILE_VALUE_ERROR}')
+    profile = dict(cts.REGRID_ENCODING_PROFILES[encoding_profile])
+    if complevel is not None:
+        profile['complevel'] = complevel
+    return profile
+
+
+def get_count_var_names(regrid_ds):
+    """
+    Returns the names of the count variables of a regrid dataset (flash count and histograms): all the data variables
+    of a dense dataset, the variables with a sparse_dims attribute (i.e. NOT the lit cell/bin indices) of a sparse one
+    @param regrid_ds: <xarray.Dataset>
+    @return: <list> [ <str>, ... ]
+    """
+    if is_sparse_regrid_ds(regrid_ds):
+        return [var_name for var_name, data_var in regrid_ds.data_vars.items() if SPARSE_DIMS_ATTR in data_var.attrs]
+    return list(regrid_ds.data_vars)
+
+
+def get_count_dtype(count_da, count_dtype, fill_value):
+    """
+    Returns the smallest unsigned integer dtype (starting from count_dtype) able to store the counts of count_da
+    <!> if fill_value, the max value of the dtype is used as _FillValue (for NaN values) and cannot be a count
+    @param count_da: <xarray.DataArray> counts (float with NaN or integer)
+    @param count_dtype: <str> unsigned integer dtype of the encoding profile
+    @param fill_value: <bool>
+    @return: <str> dtype
+    """
+    # (lazy max if count_da is a dask array, e.g. consolidated files)
+    max_count = float(count_da.max().values) if count_da.size > 0 else 0.
+    if np.isnan(max_count):
+        max_count = 0.
+    for dtype in _WIDER_UINT_DTYPES[_WIDER_UINT_DTYPES.index(count_dtype):]:
+        max_storable_count = np.iinfo(dtype).max - 1 if fill_value else np.iinfo(dtype).max
+        if max_count <= max_storable_count:
+            if dtype != count_dtype:
+                print(f"<!> {count_da.name} max value ({max_count}) overflows {count_dtype}, stored as {dtype}")
+            return dtype
+    raise ValueError(f'{count_da.name} max value ({max_count}) cannot be stored as unsigned integer')
+
+
+def get_regrid_encoding(regrid_ds, encoding_profile=cts.DEFAULT_REGRID_ENCODING_PROFILE, complevel=None):
+    """
+    Returns the netcdf encoding of a regrid dataset (hourly or consolidated, dense or sparse) for an encoding profile:
+        - time: dtype and units
+        - count variables: unsigned integer dtype (NaN stored as _FillValue in dense datasets), a wider dtype is used if
+        the counts overflow the profile dtype
+        - all data variables: compression and chunks (dimensions not listed in the profile chunks are not split)
+    @param regrid_ds: <xarray.Dataset>
+    @param encoding_profile: <str> 'legacy' (default) or 'compact'
+    @param complevel: <int> compression level, if None the profile compression level is used
+    @return: <dict> encoding to pass to xarray.Dataset.to_netcdf
+    """
+    profile = get_regrid_encoding_profile(encoding_profile, complevel=complevel)
+    encoding = {'time': {'dtype': profile['time_dtype'], 'units': profile['time_units']}}
+    if np.issubdtype(np.dtype(profile['time_dtype']), np.integer):
+        encoding['time']['_FillValue'] = None
+    count_var_names = get_count_var_names(regrid_ds)
+    sparse = is_sparse_regrid_ds(regrid_ds)
+    for var_name, data_var in regrid_ds.data_vars.items():
+        var_encoding = {}
+        if profile['count_dtype'] is not None and var_name in count_var_names:
+            dtype = get_count_dtype(data_var, profile['count_dtype'], fill_value=not sparse)
+            var_encoding['dtype'] = dtype
+            var_encoding['_FillValue'] = None if sparse else np.iinfo(dtype).max
+        if profile['compression'] == 'zlib':
+            var_encoding.update({'zlib': True, 'complevel': profile['complevel']})
+        elif profile['compression'] is not None:
+            var_encoding.update({'compression': profile['compression'], 'complevel': profile['complevel']})
+        # chunks cannot be defined on empty dimensions (e.g. sparse hour without any flash)
+        if profile['chunks'] is not None and all(regrid_ds.sizes[dim] > 0 for dim in data_var.dims):
+            var_encoding['chunksizes'] = tuple(min(profile['chunks'].get(dim, regrid_ds.sizes[dim]),
+                                                   regrid_ds.sizes[dim])
+                                               for dim in data_var.dims)
+        encoding[var_name] = var_encoding
+    return encoding
@@ -0,0 +1,283 @@
+import hashlib
+import json
+import os
+import pathlib
+import sqlite3
+from datetime import datetime
+
+from . import constants as cts
+
+# manifest input status
+UP_TO_DATE = 'up_to_date'  # regridded with the same parameters and the input did not change
+STALE = 'stale'  # regrid failed, parameters or input changed since the last regrid
+MODIFIED = 'modified'  # same input size but different mtime: input content compared (hash) in the regrid worker
+UNKNOWN = 'unknown'  # input not in the manifest
+
+_HASH_BLOCK_SIZE = 2 ** 20
+
+
+def get_regrid_manifest_path(target_dir=None):
+    """
+    Returns the path of the regrid manifest (one SQLite file in the hourly regrid root directory)
+    :param target_dir: <str> or <pathlib.Path> root directory path (if different from default (/o3p/patj/glm), mostly used for testing)
+    :return: <pathlib.Path>
+    """
+    root_dir_path = target_dir if target_dir is not None else cts.GLM_ROOT_DIR
+    return pathlib.Path(f'{root_dir_path}/{cts.REGRID_GLM_DIRNAME}/{cts.REGRID_MANIFEST_FILENAME}')
+
+
+def get_regrid_params(**params):
+    """
+    Regrid parameters recorded in the manifest: the parameters passed + histogram bins and regrid version (an input
+    regridded with different parameters is considered stale)
+    :return: <dict>
+    """
+    return {
+        **params,
+        'flash_energy_log_bins': [cts.f_en_min_bin, cts.f_en_max_bin, cts.f_en_hist_step],
+        'flash_area_log_bins': [cts.f_ar_min_bin, cts.f_ar_max_bin, cts.f_ar_hist_step],
+        'regrid_version': cts.REGRID_VERSION
+    }
+
+
+def _get_input_key(input_key):
+    # absolute path so that the same input gets the same key whatever the working directory
+    return str(pathlib.Path(input_key).absolute())
+
+
+def get_input_stat(input_path_list):
+    """
+    :param input_path_list: <list> [ <pathlib.Path>, ... ] input files of an hour (pre-regrid hourly file or raw granules)
+    :return: <tuple> (<int> number of files, <int> total size, <int> most recent mtime in ns)
+    """
+    stat_list = [os.stat(input_path) for input_path in input_path_list]
+    return len(stat_list), sum(stat.st_size for stat in stat_list), max(stat.st_mtime_ns for stat in stat_list)
+
+
+def get_input_hash(input_path_list):
+    """
+    :param input_path_list: <list> [ <pathlib.Path>, ... ] input files of an hour
+    :return: <str> sha256 of the content of the input files
+    """
+    input_hash = hashlib.sha256()
+    for input_path in input_path_list:
+        with open(input_path, 'rb') as input_file:
+            for block in iter(lambda: input_file.read(_HASH_BLOCK_SIZE), b''):
+                input_hash.update(block)
+    return input_hash.hexdigest()
+
+
+def get_dir_mtime_ns(dir_path):
+    """
+    :param dir_path: <pathlib.Path> or <str>
+    :return: <int> mtime of the directory in ns (changes when a file is created, deleted or replaced in it), None if
+                    the directory does not exist
+    """
+    try:
+        return os.stat(dir_path).st_mtime_ns
+    except OSError:
+        return None
+
+
+def is_output_unchanged(entry):
+    """
+    :param entry: <sqlite3.Row> manifest entry of a succeeded regrid
+    :return: <bool> True if the recorded output file exists with the recorded size and mtime (entries recorded before
+                    the output stat was stored: existence only)
+    """
+    if entry['output_path'] is None:
+        return False
+    try:
+        output_stat = os.stat(entry['output_path'])
+    except OSError:
+        return False
+    if entry['output_size'] is None:
+        return True
+    return output_stat.st_size == entry['output_size'] and output_stat.st_mtime_ns == entry['output_mtime_ns']
+
+
+class RegridManifest:
+    """
+    SQLite index of the regridded hours: for each input (pre-regrid hourly file or first raw granule of the hour) and
+    regrid resolution, the input files size, mtime and hash, the regrid parameters, the output path, size and mtime and
+    the regrid status. Used by sat_regrid.regrid_sat_files to skip up-to-date hours without opening the output files
+    and to redo failed, interrupted or stale ones (including deleted or modified outputs).
+    The mtime of the input and output directories whose hours were all found up to date is also recorded: as long as
+    they do not change (no file created, deleted or replaced in them), their hours are trusted without stat-ing their
+    files (<!> files modified in place, without being replaced, are then NOT detected).
+    """
+
+    def __init__(self, manifest_path):
+        """
+        @param manifest_path: <pathlib.Path> SQLite file (created if it does not exist)
+        """
+        self.manifest_path = pathlib.Path(manifest_path)
+        self.manifest_path.parent.mkdir(parents=True, exist_ok=True)
+        # timeout: several regrid jobs might update the manifest at the same time
+        self.connection = sqlite3.connect(self.manifest_path, timeout=60)
+        self.connection.row_factory = sqlite3.Row
+        with self.connection:
+            self.connection.execute(
+                """CREATE TABLE IF NOT EXISTS regrid_files (
+                    input_key TEXT NOT NULL,
+                    regrid_res_str TEXT NOT NULL,
+                    input_files INTEGER,
+                    input_size INTEGER,
+                    input_mtime_ns INTEGER,
+                    input_hash TEXT,
+                    regrid_params TEXT,
+                    output_path TEXT,
+                    status TEXT,
+                    error TEXT,
+                    last_update TEXT,
+                    output_size INTEGER,
+                    output_mtime_ns INTEGER,
+                    PRIMARY KEY (input_key, regrid_res_str)
+                )"""
+            )
+            self.connection.execute(
+                """CREATE TABLE IF NOT EXISTS verified_dirs (
+                    dir_path TEXT PRIMARY KEY,
+                    mtime_ns INTEGER
+                )"""
+            )
+            # manifests created before the output stat was recorded
+            column_names = [row['name'] for row in self.connection.execute('PRAGMA table_info(regrid_files)')]
+            for column_name in ['output_size', 'output_mtime_ns']:
+                if column_name not in column_names:
+                    self.connection.execute(f'ALTER TABLE regrid_files ADD COLUMN {column_name} INTEGER')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def close(self):
+        self.connection.close()
+
+    def get_entry(self, input_key, regrid_res_str):
+        """
+        @param input_key: <pathlib.Path> or <str> input identifier
+        @param regrid_res_str: <str>
+        @return: <sqlite3.Row> or None
+        """
+        return self.connection.execute(
+            'SELECT * FROM regrid_files WHERE input_key = ? AND regrid_res_str = ?',
+            (_get_input_key(input_key), regrid_res_str)
+        ).fetchone()
+
+    def get_input_status(self, input_key, input_path_list, regrid_params, check_stat=True):
+        """
+        Compare an input with its manifest entry: 'up_to_date', 'stale', 'modified' or 'unknown'
+        If check_stat, the input files and the recorded output file are stat-ed (the output is NOT opened): a missing
+        output or an output whose size or mtime changed since the regrid (e.g. deleted, truncated or rewritten) is
+        stale. If only the input mtime changed (e.g. file copied), the input is 'modified': its hash is compared with
+        the recorded one by the regrid worker (NOT here, see sat_regrid._regrid_sat_file_worker)
+        @param input_key: <pathlib.Path> or <str> input identifier
+        @param input_path_list: <list> [ <pathlib.Path>, ... ] input files
+        @param regrid_params: <dict> see get_regrid_params
+        @param check_stat: <bool> if False, the entry is trusted without stat-ing the files (see get_verified_dirs)
+        @return: <str>
+        """
+        entry = self.get_entry(input_key, regrid_params['grid_res_str'])
+        if entry is None:
+            return UNKNOWN
+        # (parameters compared once serialized, e.g. tuples stored as lists)
+        if entry['status'] != cts.REGRID_SUCCEEDED or \
+                json.loads(entry['regrid_params']) != json.loads(json.dumps(regrid_params, sort_keys=True)):
+            return STALE
+        if not check_stat:
+            return UP_TO_DATE
+        input_files, input_size, input_mtime_ns = get_input_stat(input_path_list)
+        if input_files != entry['input_files'] or input_size != entry['input_size']:
+            return STALE
+        if not is_output_unchanged(entry):
+            return STALE
+        if entry['output_size'] is None:
+            # entry recorded before the output stat was stored: output stat recorded from now on
+            output_stat = os.stat(entry['output_path'])
+            with self.connection:
+                self.connection.execute(
+                    'UPDATE regrid_files SET output_size = ?, output_mtime_ns = ? WHERE input_key = ? AND '
+                    'regrid_res_str = ?',
+                    (output_stat.st_size, output_stat.st_mtime_ns, _get_input_key(input_key),
+                     regrid_params['grid_res_str'])
+                )
+        if input_mtime_ns != entry['input_mtime_ns']:
+            return MODIFIED
+        return UP_TO_DATE
+
+    def update_input_stat(self, input_key, input_path_list, regrid_res_str, input_hash):
+        """
+        Record the new mtime (and hash) of a modified input whose content did not change (see get_input_status)
+        @param input_key: <pathlib.Path> or <str> input identifier
+        @param input_path_list: <list> [ <pathlib.Path>, ... ] input files
+        @param regrid_res_str: <str>
+        @param input_hash: <str> see get_input_hash
+        """
+        _, _, input_mtime_ns = get_input_stat(input_path_list)
+        with self.connection:
+            self.connection.execute(
+                'UPDATE regrid_files SET input_mtime_ns = ?, input_hash = ? WHERE input_key = ? AND regrid_res_str = ?',
+                (input_mtime_ns, input_hash, _get_input_key(input_key), regrid_res_str)
+            )
+
+    def record(self, input_key, input_path_list, regrid_params, output_path, status, error=None, input_hash=None):
+        """
+        Record the regrid of an input
+        @param input_key: <pathlib.Path> or <str> input identifier
+        @param input_path_list: <list> [ <pathlib.Path>, ... ] input files
+        @param regrid_params: <dict> see get_regrid_params
+        @param output_path: <pathlib.Path> or None
+        @param status: <str> 'succeeded' or 'failed'
+        @param error: <str> error message if failed
+        @param input_hash: <str> input hash if computed by the regrid worker (modified inputs only, see
+                    get_input_status), NOT computed here
+        """
+        try:
+            input_files, input_size, input_mtime_ns = get_input_stat(input_path_list)
+        except OSError:
+            input_files, input_size, input_mtime_ns = None, None, None
+        try:
+            output_stat = os.stat(output_path) if output_path is not None else None
+        except OSError:
+            output_stat = None
+        with self.connection:
+            self.connection.execute(
+                'INSERT OR REPLACE INTO regrid_files (input_key, regrid_res_str, input_files, input_size, '
+                'input_mtime_ns, input_hash, regrid_params, output_path, status, error, last_update, output_size, '
+                'output_mtime_ns) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                (_get_input_key(input_key), regrid_params['grid_res_str'], input_files, input_size, input_mtime_ns,
+                 input_hash, json.dumps(regrid_params, sort_keys=True), str(output_path) if output_path is not None else None,
+                 status, error, datetime.now().isoformat(),
+                 output_stat.st_size if output_stat is not None else None,
+                 output_stat.st_mtime_ns if output_stat is not None else None)
+            )
+
+    def get_verified_dirs(self):
+        """
+        @return: <dict> { <str> directory path: <int> mtime in ns } directories whose hours were all up to date when
+                    they had this mtime
+        """
+        return dict(self.connection.execute('SELECT dir_path, mtime_ns FROM verified_dirs').fetchall())
+
+    def set_verified_dirs(self, dir_mtime_dict):
+        """
+        @param dir_mtime_dict: <dict> { <str> directory path: <int> mtime in ns (before checking its hours) }
+        """
+        with self.connection:
+            self.connection.executemany('INSERT OR REPLACE INTO verified_dirs (dir_path, mtime_ns) VALUES (?, ?)',
+                                        [(str(dir_path), mtime_ns) for dir_path, mtime_ns in dir_mtime_dict.items()])
+
+    def get_status_counts(self, regrid_res_str=None):
+        """
+        @param regrid_res_str: <str> if not None, only count the entries of this regrid resolution
+        @return: <dict> { <status>: <int> number of entries }
+        """
+        query = 'SELECT status, COUNT(*) FROM regrid_files'
+        query_params = ()
+        if regrid_res_str is not None:
+            query += ' WHERE regrid_res_str = ?'
+            query_params = (regrid_res_str,)
+        return dict(self.connection.execute(query + ' GROUP BY status', query_params).fetchall())
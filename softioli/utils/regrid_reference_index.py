@@ -0,0 +1,289 @@
+import hashlib
+import json
+import os
+import pathlib
+
+import dask
+import dask.array
+import numpy as np
+import xarray as xr
+
+from . import constants as cts
+from . import sparse_regrid_utils
+
+
+def get_regrid_reference_index_path(dir_path):
+    """
+    Returns the path of the reference index of a daily regrid directory (one JSON file in the directory)
+    :param dir_path: <pathlib.Path> or <str> daily regrid directory
+    :return: <pathlib.Path>
+    """
+    return pathlib.Path(dir_path, cts.REGRID_REFERENCE_INDEX_FILENAME)
+
+
+def _get_file_key(file_stat):
+    return [file_stat.st_size, file_stat.st_mtime_ns]
+
+
+def _to_json_value(value):
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+
+def _from_json_value(value):
+    # netcdf array attributes are read as numpy arrays
+    return np.asarray(value) if isinstance(value, list) else value
+
+
+def _get_json_attrs(attrs, excluded_attrs=()):
+    return {attr: _to_json_value(value) for attr, value in attrs.items() if attr not in excluded_attrs}
+
+
+def _get_file_entry(file_path, file_stat):
+    """
+    Layout of a regrid file, read from its header only (data variables NOT read): time values, dimensions, dtype and
+    attributes of the data variables once decoded (sparse files: variables of the dense dataset, see
+    sparse_regrid_utils.sparse_to_dense_regrid_ds) and non time coordinates
+    :param file_path: <pathlib.Path> hourly regrid file (dense or sparse format)
+    :param file_stat: <os.stat_result>
+    :return: <tuple> (<dict> coordinates, <dict> file entry)
+    """
+    with xr.open_dataset(file_path) as regrid_ds:
+        coords = {
+            coord_name: {'dims': list(coord.dims), 'dtype': str(coord.dtype), 'values': coord.values.tolist(),
+                         'attrs': _get_json_attrs(coord.attrs)}
+            for coord_name, coord in regrid_ds.coords.items() if 'time' not in coord.dims
+        }
+        variables = {}
+        if sparse_regrid_utils.is_sparse_regrid_ds(regrid_ds):
+            for var_name, sparse_da in regrid_ds.data_vars.items():
+                if sparse_regrid_utils.SPARSE_DIMS_ATTR not in sparse_da.attrs:
+                    continue
+                dims = sparse_da.attrs[sparse_regrid_utils.SPARSE_DIMS_ATTR].split()
+                # dense arrays filled with NaN (float64)
+                variables[var_name] = {'dims': dims, 'shape': [regrid_ds.sizes[dim] for dim in dims],
+                                       'dtype': 'float64',
+                                       'attrs': _get_json_attrs(sparse_da.attrs,
+                                                                (sparse_regrid_utils.SPARSE_DIMS_ATTR,))}
+            attrs = _get_json_attrs(regrid_ds.attrs, (cts.REGRID_FORMAT_ATTR,))
+        else:
+            for var_name, regrid_da in regrid_ds.data_vars.items():
+                variables[var_name] = {'dims': list(regrid_da.dims), 'shape': list(regrid_da.shape),
+                                       'dtype': str(regrid_da.dtype), 'attrs': _get_json_attrs(regrid_da.attrs)}
+            attrs = _get_json_attrs(regrid_ds.attrs)
+        time = regrid_ds['time'].values.astype('datetime64[ns]').astype('i8').tolist()
+    return coords, {'stat': _get_file_key(file_stat), 'time': time, 'attrs': attrs, 'variables': variables}
+
+
+def _get_coords_id(coords):
+    return hashlib.sha1(json.dumps(coords, sort_keys=True).encode()).hexdigest()[:16]
+
+
+def load_regrid_reference_index(dir_path):
+    """
+    :param dir_path: <pathlib.Path> or <str> daily regrid directory
+    :return: <dict> reference index of the directory, None if it is missing, unreadable or built by another version
+    """
+    try:
+        with open(get_regrid_reference_index_path(dir_path)) as index_file:
+            index = json.load(index_file)
+    except (OSError, ValueError):
+        return None
+    if index.get('index_version') != cts.REGRID_REFERENCE_INDEX_VERSION:
+        return None
+    return index
+
+
+def is_regrid_reference_index_up_to_date(dir_path):
+    """
+    The index file is touched after each build (see build_regrid_reference_index): a directory modified after it (file
+    created, deleted or replaced, e.g. hour regridded again) has a more recent mtime than its index
+    <!> files modified in place (without being replaced) are NOT detected
+    :param dir_path: <pathlib.Path> or <str> daily regrid directory
+    :return: <bool> False if the index is missing or older than the directory
+    """
+    try:
+        return os.stat(dir_path).st_mtime_ns <= os.stat(get_regrid_reference_index_path(dir_path)).st_mtime_ns
+    except OSError:
+        return False
+
+
+def build_regrid_reference_index(dir_path, overwrite=False):
+    """
+    Build (or update) the reference index of a daily regrid directory: layout of each hourly regrid file (see
+    _get_file_entry) + the coordinates shared by the files (latitude, longitude and histogram bins, stored once per
+    grid). Files already indexed and unchanged (same size and mtime) are NOT opened again.
+    The index lets open_regrid_mfdataset_from_index open the hourly regrid files of any time range as a single lazy
+    dataset without opening the files (one JSON read per directory)
+    :param dir_path: <pathlib.Path> or <str> daily regrid directory
+    :param overwrite: <bool> if True, all the files are indexed again
+    :return: <pathlib.Path> index path
+    """
+    dir_path = pathlib.Path(dir_path)
+    index_path = get_regrid_reference_index_path(dir_path)
+    index = None if overwrite else load_regrid_reference_index(dir_path)
+    if index is None:
+        index = {'index_version': cts.REGRID_REFERENCE_INDEX_VERSION, 'coords': {}, 'files': {}}
+    coords_dict, file_entries, updated = {}, {}, False
+    for file_path in sorted(dir_path.glob('*.nc')):
+        if file_path.name.startswith('temp_'):
+            # regrid file being written
+            continue
+        file_stat = os.stat(file_path)
+        file_entry = index['files'].get(file_path.name)
+        if file_entry is None or file_entry['stat'] != _get_file_key(file_stat):
+            coords, file_entry = _get_file_entry(file_path, file_stat)
+            file_entry['coords_id'] = _get_coords_id(coords)
+            coords_dict[file_entry['coords_id']] = coords
+            updated = True
+        else:
+            coords_dict[file_entry['coords_id']] = index['coords'][file_entry['coords_id']]
+        file_entries[file_path.name] = file_entry
+    if updated or set(file_entries) != set(index['files']) or not index_path.exists():
+        index['coords'], index['files'] = coords_dict, file_entries
+        # write in temporary file first so that a reader never gets an incomplete index
+        temp_index_path = index_path.parent / f'temp_{index_path.name}'
+        with open(temp_index_path, 'w') as index_file:
+            json.dump(index, index_file)
+        os.replace(temp_index_path, index_path)
+    # index touched after the directory was last modified (including by the index replace itself): up to date as long
+    # as the directory does not change (see is_regrid_reference_index_up_to_date)
+    os.utime(index_path)
+    return index_path
+
+
+def build_regrid_reference_indexes(dir_list, overwrite=False, print_debug=False):
+    """
+    Build (or update) the reference index of each daily regrid directory (see build_regrid_reference_index)
+    :param dir_list: <list> [ <pathlib.Path>, ... ] daily regrid directories (missing directories ignored)
+    :param overwrite: <bool>
+    :param print_debug: <bool>
+    :return: <list> [ <pathlib.Path>, ... ] index paths
+    """
+    index_path_list = []
+    for dir_path in dir_list:
+        if not pathlib.Path(dir_path).is_dir():
+            continue
+        index_path_list.append(build_regrid_reference_index(dir_path, overwrite=overwrite))
+        if print_debug:
+            print(f'Regrid reference index {index_path_list[-1]}')
+    return index_path_list
+
+
+def _get_indexed_file_entries(file_list):
+    """
+    :param file_list: <list> [ <pathlib.Path>, ... ] hourly regrid files
+    :return: <tuple> (<list> [ (<pathlib.Path> file path, <dict> file entry, <str> coords id, <dict> coords), ... ]
+                    entries of the indexed files, <list> [ <pathlib.Path>, ... ] directories whose index is missing
+                    or stale, i.e. not containing a file or older than the directory, see
+                    is_regrid_reference_index_up_to_date: the files themselves are NOT stat-ed)
+    """
+    index_dict = {}
+    file_entry_list, stale_dir_set = [], set()
+    for file_path in file_list:
+        dir_path = file_path.parent
+        if dir_path not in index_dict:
+            index_dict[dir_path] = load_regrid_reference_index(dir_path) \
+                if is_regrid_reference_index_up_to_date(dir_path) else None
+        index = index_dict[dir_path]
+        file_entry = index['files'].get(file_path.name) if index is not None else None
+        if file_entry is None:
+            stale_dir_set.add(dir_path)
+            continue
+        file_entry_list.append((file_path, file_entry, file_entry['coords_id'], index['coords'][file_entry['coords_id']]))
+    return file_entry_list, sorted(stale_dir_set)
+
+
+def _combine_attrs(attrs_list):
+    # same as combine_attrs='drop_conflicts' (see sparse_regrid_utils.open_regrid_mfdataset): attributes with
+    # different values in the files are dropped
+    combined_attrs, conflict_attrs = {}, set()
+    for attrs in attrs_list:
+        for attr, value in attrs.items():
+            if attr in conflict_attrs:
+                continue
+            if attr not in combined_attrs:
+                combined_attrs[attr] = value
+            elif combined_attrs[attr] != value:
+                del combined_attrs[attr]
+                conflict_attrs.add(attr)
+    return {attr: _from_json_value(value) for attr, value in combined_attrs.items()}
+
+
+def _read_regrid_file_values(file_path, var_names):
+    regrid_ds = sparse_regrid_utils.open_regrid_file(file_path, dense=True)
+    return {var_name: regrid_ds[var_name].values for var_name in var_names}
+
+
+def _get_var_layout(file_entry):
+    return {var_name: (tuple(var['dims']), var['dtype']) for var_name, var in file_entry['variables'].items()}
+
+
+def _open_indexed_regrid_files(file_entry_list):
+    """
+    Dense regrid dataset of indexed hourly regrid files, built from the index only: coordinates from the index and
+    data variables backed by dask arrays (one chunk per file, the file is read when the chunk is computed)
+    :param file_entry_list: <list> see _get_indexed_file_entries
+    :return: <xarray.Dataset>, None if the files do not share the same grid and variables (NOT concatenable)
+    """
+    file_entry_list = sorted(file_entry_list, key=lambda file_entry_tuple: file_entry_tuple[1]['time'][0])
+    _, first_file_entry, first_coords_id, coords = file_entry_list[0]
+    var_layout = _get_var_layout(first_file_entry)
+    if any(coords_id != first_coords_id or _get_var_layout(file_entry) != var_layout
+           for _, file_entry, coords_id, _ in file_entry_list) or \
+            any('time' not in dims for dims, _ in var_layout.values()):
+        return None
+    time = np.concatenate([np.array(file_entry['time'], dtype='i8') for _, file_entry, _, _ in file_entry_list])
+    regrid_ds = xr.Dataset(
+        coords={
+            'time': time.astype('datetime64[ns]'),
+            **{coord_name: (coord['dims'], np.array(coord['values'], dtype=coord['dtype']),
+                            {attr: _from_json_value(value) for attr, value in coord['attrs'].items()})
+               for coord_name, coord in coords.items()}
+        },
+        attrs=_combine_attrs([file_entry['attrs'] for _, file_entry, _, _ in file_entry_list])
+    )
+    file_delayed_list = [dask.delayed(_read_regrid_file_values)(str(file_path), list(var_layout))
+                         for file_path, _, _, _ in file_entry_list]
+    for var_name, (dims, dtype) in var_layout.items():
+        regrid_ds[var_name] = (dims, dask.array.concatenate([
+            dask.array.from_delayed(file_delayed[var_name], shape=tuple(file_entry['variables'][var_name]['shape']),
+                                    dtype=dtype)
+            for file_delayed, (_, file_entry, _, _) in zip(file_delayed_list, file_entry_list)
+        ], axis=dims.index('time')), _combine_attrs([file_entry['variables'][var_name]['attrs']
+                                                     for _, file_entry, _, _ in file_entry_list]))
+    return regrid_ds
+
+
+def open_regrid_mfdataset_from_index(file_list, update_index=False, print_debug=False):
+    """
+    Opens a list of hourly regrid files (dense or sparse format) as a single lazy dense dataset using the reference
+    indexes of their daily directories (see build_regrid_reference_index): one index read per directory, the files
+    are NOT opened until the data is computed.
+    Falls back to sparse_regrid_utils.open_regrid_mfdataset if the index of a directory is missing or stale (file not
+    indexed or directory modified since it was indexed) or if the files do not share the same grid
+    :param file_list: <list> [ <pathlib.Path>, ... ] hourly regrid files
+    :param update_index: <bool> if True, the missing or stale indexes are built (updated) after the fallback so that
+                    the next opens of these directories use the index
+    :param print_debug: <bool>
+    :return: <xarray.Dataset>
+    """
+    file_list = sorted(pathlib.Path(file_path) for file_path in file_list)
+    file_entry_list, stale_dir_list = _get_indexed_file_entries(file_list)
+    if not stale_dir_list:
+        regrid_ds = _open_indexed_regrid_files(file_entry_list)
+        if regrid_ds is not None:
+            return regrid_ds
+    elif print_debug:
+        print(f'Missing or stale regrid reference index: {stale_dir_list}')
+    regrid_ds = sparse_regrid_utils.open_regrid_mfdataset(file_list)
+    if update_index and stale_dir_list:
+        try:
+            build_regrid_reference_indexes(stale_dir_list, print_debug=print_debug)
+        except OSError as e:
+            # e.g. read-only regrid archive
+            print(f'<!> Regrid reference index NOT updated: {e}')
+    return regrid_ds
@@ -0,0 +1,264 @@
+import fnmatch
+import os
+import pathlib
+import sqlite3
+import time
+from datetime import datetime
+
+import pandas as pd
+
+from . import constants as cts
+from .GLMPathParser import GLMPathParser, OLD_GLM_NOTATION, OLD_GLM_PRE_REGRID_TEMP_NOTATION
+from .sat_utils import generate_sat_hourly_filename_pattern, generate_sat_consolidated_filename_pattern, \
+    get_consolidated_period_end_date
+from .utils_functions import date_to_pd_timestamp
+
+# any regrid resolution / satellite version (file name patterns of the files to catalogue)
+_ANY_REGRID_RES_PATTERN = '*deg'
+_ANY_SAT_VERSION_PATTERN = '*'
+# directories modified less than this number of seconds before their scan are listed again at the next refresh (files
+# added during the same mtime tick would be missed with a coarse mtime resolution, e.g. NFS)
+_DIR_MTIME_MARGIN = 2
+
+
+def get_sat_file_catalogue_path(target_dir=None):
+    """
+    Returns the path of the satellite file catalogue (one SQLite file in the GLM root directory)
+    :param target_dir: <str> or <pathlib.Path> root directory path (if different from default (/o3p/patj/glm), mostly used for testing)
+    :return: <pathlib.Path>
+    """
+    root_dir_path = target_dir if target_dir is not None else cts.GLM_ROOT_DIR
+    return pathlib.Path(f'{root_dir_path}/{cts.SAT_FILE_CATALOGUE_FILENAME}')
+
+
+def _get_catalogued_file_patterns(sat_name):
+    """
+    :return: <list> [ (<str> filename pattern, <bool> regrid, <str> layout, <str> naming convention), ... ]
+    """
+    file_patterns = [
+        (generate_sat_hourly_filename_pattern(sat_name=sat_name, regrid=regrid, regrid_res_str=_ANY_REGRID_RES_PATTERN,
+                                              naming_convention=naming_convention,
+                                              sat_version=_ANY_SAT_VERSION_PATTERN),
+         regrid, cts.HOURLY_LAYOUT, naming_convention)
+        for regrid, naming_convention in [(False, None), (True, None), (False, OLD_GLM_NOTATION),
+                                          (True, OLD_GLM_NOTATION), (False, OLD_GLM_PRE_REGRID_TEMP_NOTATION)]
+    ]
+    file_patterns.extend(
+        (generate_sat_consolidated_filename_pattern(sat_name=sat_name, layout=layout,
+                                                    regrid_res_str=_ANY_REGRID_RES_PATTERN,
+                                                    sat_version=_ANY_SAT_VERSION_PATTERN),
+         True, layout, None)
+        for layout in cts.CONSOLIDATED_REGRID_GLM_DIRNAMES
+    )
+    return file_patterns
+
+
+def _parse_consolidated_filename(filename, layout):
+    # xxdeg_OR_GLM-L2-LCFA_Gxx_YYYY_DDD.nc (daily) or xxdeg_OR_GLM-L2-LCFA_Gxx_YYYY_MM.nc (monthly)
+    filename_split = pathlib.Path(filename).stem.split('_')
+    year = int(filename_split[-2])
+    if layout == cts.DAILY_LAYOUT:
+        start_date = pd.Timestamp(year=year, month=1, day=1) + pd.Timedelta(int(filename_split[-1]) - 1, 'D')
+    else:
+        start_date = pd.Timestamp(year=year, month=int(filename_split[-1]), day=1)
+    return filename_split[0], filename_split[-3], start_date, get_consolidated_period_end_date(start_date, layout)
+
+
+class SatFileCatalogue:
+    """
+    SQLite catalogue of the satellite files of the archive (pre-regrid and regrid hourly files, consolidated regrid
+    files): parsed dates, satellite version, regrid resolution, layout, naming convention, size and mtime of every file
+    of the directories catalogued. Used by the sat_utils file discovery functions (catalogue parameter) instead of
+    globbing and parsing the same directories again and again.
+    Each directory is refreshed incrementally: listed (os.scandir) again only if its mtime changed since the previous
+    scan (files written with a temporary file + os.replace, added or removed --> directory mtime updated).
+    """
+
+    def __init__(self, catalogue_path, sat_name=cts.GOES_SATELLITE_GLM):
+        """
+        @param catalogue_path: <pathlib.Path> SQLite file (created if it does not exist)
+        @param sat_name: <str> satellite name (only 'GOES_GLM' supported for now)
+        """
+        if sat_name != cts.GOES_SATELLITE_GLM:
+            raise ValueError(f'{sat_name} {cts.SAT_VALUE_ERROR}')
+        self.sat_name = sat_name
+        self.file_patterns = _get_catalogued_file_patterns(sat_name)
+        self.catalogue_path = pathlib.Path(catalogue_path)
+        self.catalogue_path.parent.mkdir(parents=True, exist_ok=True)
+        # timeout: several jobs might refresh the catalogue at the same time
+        self.connection = sqlite3.connect(self.catalogue_path, timeout=60)
+        self.connection.row_factory = sqlite3.Row
+        with self.connection:
+            self.connection.execute(
+                """CREATE TABLE IF NOT EXISTS sat_files (
+                    path TEXT PRIMARY KEY,
+                    dir_path TEXT NOT NULL,
+                    regrid INTEGER NOT NULL,
+                    layout TEXT NOT NULL,
+                    naming_convention TEXT,
+                    satellite_version TEXT,
+                    regrid_res_str TEXT,
+                    year INTEGER,
+                    day_of_year INTEGER,
+                    start_hour INTEGER,
+                    start_date TEXT NOT NULL,
+                    end_date TEXT NOT NULL,
+                    size INTEGER,
+                    mtime_ns INTEGER
+                )"""
+            )
+            self.connection.execute('CREATE INDEX IF NOT EXISTS sat_files_dir_path ON sat_files (dir_path)')
+            self.connection.execute(
+                'CREATE INDEX IF NOT EXISTS sat_files_dates ON sat_files (regrid, layout, regrid_res_str, start_date)'
+            )
+            self.connection.execute(
+                """CREATE TABLE IF NOT EXISTS sat_dirs (
+                    dir_path TEXT PRIMARY KEY,
+                    mtime_ns INTEGER,
+                    last_scan TEXT
+                )"""
+            )
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def close(self):
+        self.connection.close()
+
+    def _get_file_row(self, dir_entry):
+        """
+        @param dir_entry: <os.DirEntry>
+        @return: <tuple> sat_files row, None if the file is NOT a satellite file
+        """
+        if dir_entry.name.startswith('temp_'):
+            # regrid file being written (written in temporary file first, see sat_regrid), matches the '*deg' pattern
+            return None
+        for filename_pattern, regrid, layout, naming_convention in self.file_patterns:
+            if not fnmatch.fnmatch(dir_entry.name, filename_pattern):
+                continue
+            if layout == cts.HOURLY_LAYOUT:
+                path_parsed = GLMPathParser(file_url=dir_entry.name, regrid=regrid, naming_convention=naming_convention)
+                regrid_res_str, satellite_version = path_parsed.regrid_res, path_parsed.satellite_version
+                start_date = end_date = path_parsed.start_datetime
+                year, day_of_year, start_hour = path_parsed.year, path_parsed.day_of_year, path_parsed.start_hour
+            else:
+                regrid_res_str, satellite_version, start_date, end_date = _parse_consolidated_filename(dir_entry.name,
+                                                                                                       layout)
+                year, day_of_year, start_hour = start_date.year, start_date.dayofyear, None
+            file_stat = dir_entry.stat()
+            return (str(pathlib.Path(dir_entry.path).absolute()), str(pathlib.Path(dir_entry.path).parent.absolute()),
+                    int(regrid), layout, naming_convention, satellite_version, regrid_res_str, year, day_of_year,
+                    start_hour, start_date.isoformat(), end_date.isoformat(), file_stat.st_size, file_stat.st_mtime_ns)
+        return None
+
+    def refresh_dirs(self, dir_list, force=False):
+        """
+        Update the catalogue entries of directories: directories whose mtime changed since the previous scan (or never
+        scanned) are listed again, entries of the directories that do not exist anymore are removed
+        @param dir_list: <list> [ <pathlib.Path>, ... ] directories containing satellite files (e.g. daily directories)
+        @param force: <bool> if True, the directories are listed again even if their mtime did not change
+        @return: <int> number of directories listed
+        """
+        n_scanned = 0
+        for dir_path in dir_list:
+            dir_key = str(pathlib.Path(dir_path).absolute())
+            try:
+                dir_mtime_ns = os.stat(dir_key).st_mtime_ns
+            except FileNotFoundError:
+                dir_mtime_ns = None
+            dir_entry = self.connection.execute('SELECT mtime_ns FROM sat_dirs WHERE dir_path = ?',
+                                                (dir_key,)).fetchone()
+            if dir_mtime_ns is None and dir_entry is None:
+                continue
+            if not force and dir_mtime_ns is not None and dir_entry is not None and dir_entry['mtime_ns'] == dir_mtime_ns:
+                continue
+            file_rows = []
+            if dir_mtime_ns is not None:
+                scan_time = time.time()
+                with os.scandir(dir_key) as dir_entries:
+                    file_rows = [file_row for file_row in (self._get_file_row(entry) for entry in dir_entries
+                                                           if entry.is_file()) if file_row is not None]
+            with self.connection:
+                self.connection.execute('DELETE FROM sat_files WHERE dir_path = ?', (dir_key,))
+                self.connection.executemany(
+                    'INSERT OR REPLACE INTO sat_files VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)', file_rows
+                )
+                if dir_mtime_ns is None:
+                    self.connection.execute('DELETE FROM sat_dirs WHERE dir_path = ?', (dir_key,))
+                else:
+                    self.connection.execute(
+                        'INSERT OR REPLACE INTO sat_dirs VALUES (?, ?, ?)',
+                        (dir_key, dir_mtime_ns if scan_time - dir_mtime_ns / 1e9 >= _DIR_MTIME_MARGIN else None,
+                         datetime.now().isoformat())
+                    )
+            n_scanned += 1
+        return n_scanned
+
+    def refresh(self, target_dir=None, force=False):
+        """
+        Update the catalogue entries of the whole archive: daily directories of the pre-regrid and regrid hourly
+        directories and yearly directories of the consolidated regrid files (see refresh_dirs)
+        @param target_dir: <str> or <pathlib.Path> root directory path (if different from default)
+        @param force: <bool> if True, all the directories are listed again
+        @return: <int> number of directories listed
+        """
+        root_dir_path = pathlib.Path(target_dir if target_dir is not None else cts.GLM_ROOT_DIR)
+        dir_list = []
+        for dirname in [cts.PRE_REGRID_GLM_DIRNAME, cts.REGRID_GLM_DIRNAME]:
+            # <root>/<dirname>/<year>/<daily directory>
+            for year_dir_path in _list_sub_dirs(root_dir_path / dirname):
+                dir_list.extend(_list_sub_dirs(year_dir_path))
+        for dirname in cts.CONSOLIDATED_REGRID_GLM_DIRNAMES.values():
+            # <root>/<dirname>/<year>
+            dir_list.extend(_list_sub_dirs(root_dir_path / dirname))
+        # directories catalogued that do not exist anymore
+        dir_list.extend(pathlib.Path(row['dir_path']) for row in self.connection.execute('SELECT dir_path FROM sat_dirs')
+                        if row['dir_path'].startswith(str(root_dir_path.absolute())))
+        return self.refresh_dirs(sorted(set(dir_list)), force=force)
+
+    def get_file_list(self, regrid, start_date=None, end_date=None, regrid_res_str=None, layout=cts.HOURLY_LAYOUT,
+                      sat_version=cts.Gxx_PATTERN, naming_convention=None, dir_list=None):
+        """
+        Returns the list of catalogued files (<!> the catalogue is NOT refreshed, see refresh_dirs)
+        @param regrid: <bool> indicates if we want regridded files
+        @param start_date: <pandas.Timestamp> if not None, only the files of the hours (or consolidated periods) ending
+                    after start_date
+        @param end_date: <pandas.Timestamp> if not None, only the files of the hours (or consolidated periods) starting
+                    before end_date
+        @param regrid_res_str: <str> regrid resolution, if None any resolution
+        @param layout: <str> 'hourly' (default), 'daily' or 'monthly'
+        @param sat_version: <str> satellite version (pattern), default: any GOES satellite, 'MOSAIC' for GLM mosaic files
+        @param naming_convention: <str> file naming convention: 'OLD', 'OLD_TEMP' or None (default)
+        @param dir_list: <list> [ <pathlib.Path>, ... ] if not None, only the files of these directories
+        @return: <list> [ <pathlib.Path>, ... ] sorted list of file paths
+        """
+        query = 'SELECT path FROM sat_files WHERE regrid = ? AND layout = ? AND satellite_version GLOB ?'
+        query_params = [int(regrid), layout, sat_version]
+        query += ' AND naming_convention IS NULL' if naming_convention is None else ' AND naming_convention = ?'
+        query_params.extend([] if naming_convention is None else [naming_convention])
+        if regrid_res_str is not None:
+            query += ' AND regrid_res_str = ?'
+            query_params.append(regrid_res_str)
+        if start_date is not None:
+            # end_date: start of the last hour of the file
+            query += ' AND end_date >= ?'
+            query_params.append(date_to_pd_timestamp(start_date).floor('h').isoformat())
+        if end_date is not None:
+            query += ' AND start_date <= ?'
+            query_params.append(date_to_pd_timestamp(end_date).isoformat())
+        if dir_list is not None:
+            dir_key_list = sorted({str(pathlib.Path(dir_path).absolute()) for dir_path in dir_list})
+            query += f' AND dir_path IN ({", ".join("?" * len(dir_key_list))})'
+            query_params.extend(dir_key_list)
+        return [pathlib.Path(row['path']) for row in self.connection.execute(query + ' ORDER BY path', query_params)]
+
+
+def _list_sub_dirs(dir_path):
+    try:
+        with os.scandir(dir_path) as dir_entries:
+            return [pathlib.Path(entry.path) for entry in dir_entries if entry.is_dir()]
+    except FileNotFoundError:
+        return []
@@ -1,15 +1,33 @@
 import pathlib
 
+import numpy as np
 import pandas as pd
 from pandas import Timedelta
 
 from .utils_functions import date_to_pd_timestamp
 from . import constants as cts
-from . import GLMPathParser, OLD_GLM_PRE_REGRID_TEMP_NOTATION, OLD_GLM_NOTATION
+from . import GLMPathParser, OLD_GLM_PRE_REGRID_TEMP_NOTATION, OLD_GLM_NOTATION, parse_glm_paths
+
+
+def _get_catalogue_file_list(catalogue, dir_list, **query_kwargs):
+    """
+    Refresh the catalogue entries of the directories and returns their files matching the query (paths relative to the
+    directories of dir_list, like with pathlib glob)
+    :param catalogue: <utils.sat_file_catalogue.SatFileCatalogue>
+    :param dir_list: <list> [ <pathlib.Path>, ... ]
+    :param query_kwargs: SatFileCatalogue.get_file_list arguments
+    :return: <list> [ <pathlib.Path>, ... ]
+    """
+    dir_list = [pathlib.Path(dir_path) for dir_path in dir_list]
+    catalogue.refresh_dirs(dir_list)
+    dir_paths = {dir_path.absolute(): dir_path for dir_path in dir_list}
+    return [dir_paths[file_path.parent] / file_path.name
+            for file_path in catalogue.get_file_list(dir_list=dir_list, **query_kwargs)]
 
 
 def generate_sat_hourly_filename_pattern(sat_name, regrid, regrid_res_str=cts.GRID_RESOLUTION_STR, naming_convention=None,
-                                         YYYY=cts.YYYY_pattern, DDD=cts.DDD_pattern, start_HH=cts.HH_pattern, end_HH=cts.HH_pattern):
+                                         YYYY=cts.YYYY_pattern, DDD=cts.DDD_pattern, start_HH=cts.HH_pattern, end_HH=cts.HH_pattern,
+                                         sat_version=cts.Gxx_PATTERN):
     """
     Generate filename pattern for a specific satellite, naming convention and regrid resolution (to be used with pathlib glob function)
     :param sat_name: <str> name of the satellite (only 'GOES_GLM' supported for now)
@@ -20,12 +38,13 @@ def generate_sat_hourly_filename_pattern(sat_name, regrid, regrid_res_str=cts.GR
     :param DDD: <str> or <int> day of the year
     :param start_HH: <str> or <int> start hour
     :param end_HH:  <str> or <int> end hour
+    :param sat_version: <str> satellite version (pattern), default: any GOES satellite, 'MOSAIC' for GLM mosaic files
     :return: <str> filename pattern for the satellite
     """
     if sat_name == cts.GOES_SATELLITE_GLM:
         if naming_convention is None:
             # OR_GLM-L2-LCFA_Gxx_YYYY_DDD_HH-HH.nc
-            filename_pattern = f'{cts.GLM_PATH_PREFIX}_{cts.Gxx_PATTERN}_{YYYY}_{DDD}_{start_HH}-{end_HH}.nc'
+            filename_pattern = f'{cts.GLM_PATH_PREFIX}_{sat_version}_{YYYY}_{DDD}_{start_HH}-{end_HH}.nc'
         elif naming_convention == OLD_GLM_PRE_REGRID_TEMP_NOTATION:
             # GLM_array_DDD_temp_HH.nc
             filename_pattern = f'GLM_array_{DDD}_temp_{start_HH}.nc'
@@ -47,6 +66,42 @@ def generate_sat_hourly_filename_pattern(sat_name, regrid, regrid_res_str=cts.GR
         return filename_pattern
 
 
+def generate_sat_raw_granule_filename_pattern(sat_name, YYYY=cts.YYYY_pattern, DDD=cts.DDD_pattern, HH=cts.HH_pattern):
+    """
+    Generate raw granule (e.g. GLM 20 sec file) filename pattern for a specific satellite (to be used with pathlib glob function)
+    :param sat_name: <str> name of the satellite (only 'GOES_GLM' supported for now)
+    :param YYYY: <str> or <int> year
+    :param DDD: <str> or <int> day of the year
+    :param HH: <str> or <int> start hour
+    :return: <str> raw granule filename pattern for the satellite
+    """
+    if sat_name == cts.GOES_SATELLITE_GLM:
+        # OR_GLM-L2-LCFA_Gxx_sYYYYDDDHHMMSSS_eYYYYDDDHHMMSSS_cYYYYDDDHHMMSSS.nc
+        return f'{cts.GLM_PATH_PREFIX}_{cts.Gxx_PATTERN}_s{YYYY}{DDD}{HH}*_e*_c*.nc'
+    else:
+        raise ValueError(f'{sat_name} NOT supported yet. Supported satellite so far: "GOES_GLM"')
+
+
+def get_sat_field_of_view_bbox(sat_name, sat_version):
+    """
+    Returns the bounding box containing the field of view of a satellite (longitudes are NOT restricted if the field
+    of view crosses the antimeridian, e.g. GOES-West)
+    :param sat_name: <str> name of the satellite (only 'GOES_GLM' supported for now)
+    :param sat_version: <str> satellite version e.g.: 'G16'
+    :return: <dict> { "LAT_MIN": <float>, "LAT_MAX": <float>, "LON_MIN": <float>, "LON_MAX": <float> }
+    """
+    if sat_name != cts.GOES_SATELLITE_GLM:
+        raise ValueError(f'{sat_name} NOT supported yet. Supported satellite so far: "GOES_GLM"')
+    if sat_version not in cts.GLM_SUBSATELLITE_LON:
+        raise ValueError(f'Unknown {sat_name} satellite version {sat_version}. Supported values: {list(cts.GLM_SUBSATELLITE_LON)}')
+    half_width = cts.GLM_FIELD_OF_VIEW_HALF_WIDTH
+    lon_min = cts.GLM_SUBSATELLITE_LON[sat_version] - half_width
+    lon_max = cts.GLM_SUBSATELLITE_LON[sat_version] + half_width
+    if lon_min < -180 or lon_max > 180:
+        lon_min, lon_max = -180, 180
+    return {"LAT_MIN": -half_width, "LAT_MAX": half_width, "LON_MIN": lon_min, "LON_MAX": lon_max}
+
+
 def generate_sat_dirname_pattern(sat_name, regrid, regrid_res_str=cts.GRID_RESOLUTION_STR, naming_convention=None):
     """
     Generate directory name pattern for a specific satellite and regrid resolution (to be used with pathlib glob function)
@@ -124,7 +179,8 @@ def generate_sat_hourly_file_path(date, satellite, sat_version, regrid, regrid_r
     dir_path = generate_sat_dir_path(date=date, sat_name=satellite, regrid=regrid, regrid_res_str=regrid_res_str,
                                      target_dir=dir_path)
     if not dir_path.exists():
-        dir_path.mkdir(parents=True)
+        # exist_ok because another process (regrid_sat_files workers) might create it at the same time
+        dir_path.mkdir(parents=True, exist_ok=True)
     if satellite == cts.GOES_SATELLITE_GLM:
         filename = f'{cts.GLM_PATH_PREFIX}_{sat_version}_{date.year}_{date.dayofyear:03d}_{date.hour:02d}-{(date + Timedelta(hours=1)).hour:02d}.nc'
         if regrid:
@@ -135,6 +191,109 @@ def generate_sat_hourly_file_path(date, satellite, sat_version, regrid, regrid_r
         raise ValueError(f'{satellite} {cts.SAT_VALUE_ERROR}')
 
 
+def get_consolidated_period_start_date(date, layout):
+    """
+    Returns the start date of the consolidated file period (day or month) containing date
+    :param date: <pandas.Timestamp> or <numpy.datetime64> or <datetime.datetime> or <GLMPathParser>
+    :param layout: <str> consolidated file layout: 'daily' or 'monthly'
+    :return: <pandas.Timestamp>
+    """
+    date = date_to_pd_timestamp(date)
+    if layout == cts.DAILY_LAYOUT:
+        return date.floor('D')
+    elif layout == cts.MONTHLY_LAYOUT:
+        return pd.Timestamp(year=date.year, month=date.month, day=1)
+    else:
+        raise ValueError(f'{layout} {cts.REGRID_LAYOUT_VALUE_ERROR}')
+
+
+def get_consolidated_period_end_date(date, layout):
+    """
+    Returns the start date of the last hour of the consolidated file period (day or month) containing date
+    :param date: <pandas.Timestamp> or <numpy.datetime64> or <datetime.datetime> or <GLMPathParser>
+    :param layout: <str> consolidated file layout: 'daily' or 'monthly'
+    :return: <pandas.Timestamp>
+    """
+    period_start = get_consolidated_period_start_date(date=date, layout=layout)
+    if layout == cts.DAILY_LAYOUT:
+        return period_start + Timedelta(hours=23)
+    else:
+        return period_start + pd.DateOffset(months=1) - Timedelta(hours=1)
+
+
+def generate_sat_consolidated_filename_pattern(sat_name, layout, regrid_res_str=cts.GRID_RESOLUTION_STR,
+                                               YYYY=cts.YYYY_pattern, DDD=cts.DDD_pattern, MM=cts.MM_pattern,
+                                               sat_version=cts.Gxx_PATTERN):
+    """
+    Generate consolidated (daily or monthly) regrid filename pattern (to be used with pathlib glob function)
+    :param sat_name: <str> name of the satellite (only 'GOES_GLM' supported for now)
+    :param layout: <str> 'daily' or 'monthly'
+    :param regrid_res_str: <str> grid resolution str
+    :param YYYY: <str> or <int> year
+    :param DDD: <str> or <int> day of the year (daily layout)
+    :param MM: <str> or <int> month (monthly layout)
+    :param sat_version: <str> satellite version (pattern), default: any GOES satellite, 'MOSAIC' for GLM mosaic files
+    :return: <str> filename pattern
+    """
+    if sat_name == cts.GOES_SATELLITE_GLM:
+        if layout == cts.DAILY_LAYOUT:
+            # xxdeg_OR_GLM-L2-LCFA_Gxx_YYYY_DDD.nc
+            return f'{regrid_res_str}_{cts.GLM_PATH_PREFIX}_{sat_version}_{YYYY}_{DDD}.nc'
+        elif layout == cts.MONTHLY_LAYOUT:
+            # xxdeg_OR_GLM-L2-LCFA_Gxx_YYYY_MM.nc
+            return f'{regrid_res_str}_{cts.GLM_PATH_PREFIX}_{sat_version}_{YYYY}_{MM}.nc'
+        else:
+            raise ValueError(f'{layout} {cts.REGRID_LAYOUT_VALUE_ERROR}')
+    else:
+        raise ValueError(f'{sat_name} NOT supported yet. Supported satellite so far: "GOES_GLM"')
+
+
+def generate_sat_consolidated_dir_path(date, sat_name, layout, target_dir=None):
+    """
+    Generate the absolute path to the directory containing the consolidated (daily or monthly) regrid files of a year
+    :param date: <pandas.Timestamp> or <numpy.datetime64> or <datetime.datetime> or <GLMPathParser>
+    :param sat_name: <str> satellite name
+    :param layout: <str> 'daily' or 'monthly'
+    :param target_dir: <str> or <pathlib.Path> root directory path (if different from default (/o3p/patj/glm), mostly used for testing)
+    :return: <pathlib.Path>
+    """
+    date = date_to_pd_timestamp(date)
+    if layout not in cts.CONSOLIDATED_REGRID_GLM_DIRNAMES:
+        raise ValueError(f'{layout} {cts.REGRID_LAYOUT_VALUE_ERROR}')
+    if sat_name == cts.GOES_SATELLITE_GLM:
+        root_dir_path = target_dir if target_dir is not None else cts.GLM_ROOT_DIR
+        return pathlib.Path(f'{root_dir_path}/{cts.CONSOLIDATED_REGRID_GLM_DIRNAMES[layout]}/{date.year}')
+    else:
+        raise ValueError(f'{sat_name} {cts.SAT_VALUE_ERROR}')
+
+
+def generate_sat_consolidated_file_path(date, satellite, sat_version, layout, regrid_res_str=cts.GRID_RESOLUTION_STR,
+                                        dir_path=None):
+    """
+    Generate absolute path to a consolidated (daily or monthly) regrid file
+    <!> The path does not necessarily point to an existing file and the directory is NOT created
+    :param date: <pandas.Timestamp> or <numpy.datetime64> or <datetime.datetime> or <GLMPathParser> any date of the period
+    :param satellite: <str> satellite name
+    :param sat_version: <str> satellite version e.g.: 'G16' for GOES satellite
+    :param layout: <str> 'daily' or 'monthly'
+    :param regrid_res_str: <str> regrid resolution
+    :param dir_path: <str> or <pathlib.Path> root directory, mostly used for testing purposes, if == None the default directory path is used
+    :return: <pathlib.Path>
+    """
+    date = date_to_pd_timestamp(date)
+    year_dir_path = generate_sat_consolidated_dir_path(date=date, sat_name=satellite, layout=layout,
+                                                       target_dir=dir_path)
+    if layout == cts.DAILY_LAYOUT:
+        filename = generate_sat_consolidated_filename_pattern(sat_name=satellite, layout=layout,
+                                                              regrid_res_str=regrid_res_str, YYYY=date.year,
+                                                              DDD=f'{date.dayofyear:03d}', sat_version=sat_version)
+    else:
+        filename = generate_sat_consolidated_filename_pattern(sat_name=satellite, layout=layout,
+                                                              regrid_res_str=regrid_res_str, YYYY=date.year,
+                                                              MM=f'{date.month:02d}', sat_version=sat_version)
+    return year_dir_path / filename
+
+
 def get_list_of_dates_from_list_of_sat_path(path_list, directory, satellite, regrid, date_str, date_format='%Y-%j'):
     """
     Takes a list of satellite data paths (directories or files) and returns the corresponding dates
@@ -162,7 +321,8 @@ def get_list_of_dates_from_list_of_sat_path(path_list, directory, satellite, reg
 
 
 # TODO: jsp si ça me sert vraiment dans le code au final
-def get_list_of_sat_files(sat_dir_path, parent_dir, sat_name, regrid, regrid_res_str=cts.GRID_RESOLUTION_STR):
+def get_list_of_sat_files(sat_dir_path, parent_dir, sat_name, regrid, regrid_res_str=cts.GRID_RESOLUTION_STR,
+                          catalogue=None):
     """
     Function returning a list of all satellite data files in a given directory (or in the subdirectories of a parent directory)
     @param sat_dir_path: <list> [ <pathlib.Path>, ... ] or <pathlib.Path> or <str>
@@ -170,6 +330,8 @@ def get_list_of_sat_files(sat_dir_path, parent_dir, sat_name, regrid, regrid_res
     @param sat_name: <str> satellite name (supported so far: 'GOES_GLM')
     @param regrid: <bool> indicates if sat files to be listed are regridded
     @param regrid_res_str: <str> grid resolution if regrid=True
+    @param catalogue: <utils.sat_file_catalogue.SatFileCatalogue> if not None, files listed from the catalogue (entries
+                    of the directories refreshed first) instead of globbing the directories
     @return: <list> [ <pathlib.Path>, ... ]
     """
     # check if sat_dir_path is a single path (puts it in list, easier to loop through)
@@ -189,6 +351,9 @@ def get_list_of_sat_files(sat_dir_path, parent_dir, sat_name, regrid, regrid_res
             dir_list.extend(parent_dir_path.glob(dirname_pattern))
         sat_dir_path = dir_list
     # get list of files
+    if catalogue is not None:
+        return sorted(_get_catalogue_file_list(catalogue, dir_list=sat_dir_path, regrid=regrid,
+                                               regrid_res_str=regrid_res_str if regrid else None))
     filename_pattern = generate_sat_hourly_filename_pattern(sat_name=sat_name, regrid=regrid, regrid_res_str=regrid_res_str)
     file_list = []
     for dir_path in sat_dir_path:
@@ -200,7 +365,7 @@ def get_list_of_sat_files(sat_dir_path, parent_dir, sat_name, regrid, regrid_res
 
 
 def generate_sat_dir_list_between_start_end_date(start_date, end_date, satellite, regrid,
-                                                 regrid_res_str=cts.GRID_RESOLUTION_STR):
+                                                 regrid_res_str=cts.GRID_RESOLUTION_STR, target_dir=None):
     """
     Generate list (iter) of daily directory path containing satellite data between start and end date
     <!> does not necessarily generate directory paths <!>
@@ -209,6 +374,7 @@ def generate_sat_dir_list_between_start_end_date(start_date, end_date, satellite
     :param satellite: <str> satellite name
     :param regrid: <bool> indicates if the directory contains regridded files
     :param regrid_res_str: <str> regrid resolution
+    :param target_dir: <str> or <pathlib.Path> root directory path (if different from default, mostly used for testing)
     :return: <list>
     """
     # make sure the dates are pd.Timestamps
@@ -217,7 +383,7 @@ def generate_sat_dir_list_between_start_end_date(start_date, end_date, satellite
     dir_list = [
         generate_sat_dir_path(
             date=start_date + pd.Timedelta(i, 'D'), sat_name=satellite,
-            regrid=regrid, regrid_res_str=regrid_res_str
+            regrid=regrid, regrid_res_str=regrid_res_str, target_dir=target_dir
         )
         for i in range((end_date - start_date).days + 1)
     ]
@@ -225,24 +391,109 @@ def generate_sat_dir_list_between_start_end_date(start_date, end_date, satellite
 
 
 # TODO: add check dir_list contient que des pathlib.PurePath objects (?)
-def get_sat_files_list_between_start_end_date(dir_list, start_date, end_date, sat_name, regrid):
+def get_sat_files_list_between_start_end_date(dir_list, start_date, end_date, sat_name, regrid,
+                                              regrid_res_str=cts.GRID_RESOLUTION_STR, layout=cts.HOURLY_LAYOUT,
+                                              target_dir=None, sat_version=cts.Gxx_PATTERN, catalogue=None):
+    """
+    Returns the list of satellite data files between start and end date
+    - hourly layout: hourly files in the daily directories of dir_list, only keeping the hours between start and end date
+    - daily or monthly layout: existing consolidated regrid files of the days/months between start and end date
+      (<!> they can contain hours outside of [start_date, end_date], the time dimension needs to be sliced)
+    :param dir_list: <list> [ <pathlib.Path>, ... ] daily directories (hourly layout only, ignored otherwise)
+    :param start_date: <pandas.Timestamp> or <numpy.datetime64> or <datetime.datetime>
+    :param end_date: <pandas.Timestamp> or <numpy.datetime64> or <datetime.datetime>
+    :param sat_name: <str> satellite name
+    :param regrid: <bool> indicates if we want regridded files
+    :param regrid_res_str: <str> regrid resolution
+    :param layout: <str> 'hourly' (default), 'daily' or 'monthly' (consolidated regrid files)
+    :param target_dir: <str> or <pathlib.Path> root directory of the consolidated files (if different from default)
+    :param sat_version: <str> satellite version (pattern), default: any GOES satellite, 'MOSAIC' for GLM mosaic files
+    :param catalogue: <utils.sat_file_catalogue.SatFileCatalogue> if not None, files listed from the catalogue (entries
+                    of the directories refreshed first) instead of globbing the directories
+    :return: <list> [ <pathlib.Path>, ... ]
+    """
     if sat_name == cts.GOES_SATELLITE_GLM:
-        SatPathParser = GLMPathParser
+        parse_sat_paths = parse_glm_paths
     else:
         raise ValueError(f'{sat_name} {cts.SAT_VALUE_ERROR}')
     start_date, end_date = date_to_pd_timestamp(start_date), date_to_pd_timestamp(end_date)
+    if layout != cts.HOURLY_LAYOUT:
+        return get_sat_consolidated_files_list_between_start_end_date(start_date=start_date, end_date=end_date,
+                                                                      sat_name=sat_name, layout=layout,
+                                                                      regrid_res_str=regrid_res_str,
+                                                                      target_dir=target_dir, sat_version=sat_version,
+                                                                      catalogue=catalogue)
+    if catalogue is not None:
+        # hours between start and end date in the daily directories of dir_list
+        return sorted(_get_catalogue_file_list(catalogue, dir_list=dir_list, regrid=regrid,
+                                               regrid_res_str=regrid_res_str if regrid else None,
+                                               start_date=start_date, end_date=end_date, sat_version=sat_version))
     file_list = []
     dir_list = sorted(dir_list)
-    fname_pattern = generate_sat_hourly_filename_pattern(sat_name=sat_name, regrid=regrid)
-    for file in dir_list[0].glob(fname_pattern):
-        fparser = GLMPathParser(file_url=file, regrid=regrid)
-        if fparser.start_hour >= start_date.hour:
-            file_list.append(file)
-    for file in dir_list[-1].glob(fname_pattern):
-        fparser = GLMPathParser(file_url=file, regrid=regrid)
-        if fparser.start_hour <= end_date.hour:
-            file_list.append(file)
-    # for the days: start_day < day < end_day --> get all files matching generic filename pattern
-    for dir_path in dir_list[1:-1]:
-        file_list.extend(dir_path.glob(fname_pattern))
+    fname_pattern = generate_sat_hourly_filename_pattern(sat_name=sat_name, regrid=regrid,
+                                                         regrid_res_str=regrid_res_str, sat_version=sat_version)
+    for index, dir_path in enumerate(dir_list):
+        # for the days: start_day < day < end_day --> get all files matching generic filename pattern
+        if 0 < index < len(dir_list) - 1:
+            file_list.extend(dir_path.glob(fname_pattern))
+            continue
+        # first and last day --> only keep the hours after start hour and before end hour
+        day_file_list = list(dir_path.glob(fname_pattern))
+        start_hours = parse_sat_paths(day_file_list, regrid=regrid)['start_hour'].to_numpy(dtype='int64')
+        keep_file = np.ones(len(day_file_list), dtype=bool)
+        if index == 0:
+            keep_file &= start_hours >= start_date.hour
+        if index == len(dir_list) - 1:
+            keep_file &= start_hours <= end_date.hour
+        file_list.extend(file for file, keep in zip(day_file_list, keep_file) if keep)
     return sorted(file_list)
+
+
+def get_sat_consolidated_files_list_between_start_end_date(start_date, end_date, sat_name, layout,
+                                                           regrid_res_str=cts.GRID_RESOLUTION_STR, target_dir=None,
+                                                           missing=False, sat_version=cts.Gxx_PATTERN, catalogue=None):
+    """
+    Returns the list of consolidated (daily or monthly) regrid files covering the period between start and end date
+    :param start_date: <pandas.Timestamp> or <numpy.datetime64> or <datetime.datetime>
+    :param end_date: <pandas.Timestamp> or <numpy.datetime64> or <datetime.datetime>
+    :param sat_name: <str> satellite name
+    :param layout: <str> 'daily' or 'monthly'
+    :param regrid_res_str: <str> regrid resolution
+    :param target_dir: <str> or <pathlib.Path> root directory (if different from default)
+    :param missing: <bool> if True returns the list of period start dates (<pandas.Timestamp>) without any consolidated file instead
+    :param sat_version: <str> satellite version (pattern), default: any GOES satellite, 'MOSAIC' for GLM mosaic files
+    :param catalogue: <utils.sat_file_catalogue.SatFileCatalogue> if not None, files listed from the catalogue (entries
+                    of the yearly directories refreshed first) instead of globbing the directories
+    :return: <list> [ <pathlib.Path>, ... ] (or [ <pandas.Timestamp>, ... ] if missing == True)
+    """
+    start_date, end_date = date_to_pd_timestamp(start_date), date_to_pd_timestamp(end_date)
+    period_start = get_consolidated_period_start_date(date=start_date, layout=layout)
+    if catalogue is not None:
+        catalogue_file_list = _get_catalogue_file_list(
+            catalogue,
+            dir_list=sorted({generate_sat_consolidated_dir_path(date=pd.Timestamp(year=year, month=1, day=1),
+                                                                sat_name=sat_name, layout=layout, target_dir=target_dir)
+                             for year in range(period_start.year, end_date.year + 1)}),
+            regrid=True, regrid_res_str=regrid_res_str, layout=layout, start_date=start_date, end_date=end_date,
+            sat_version=sat_version
+        )
+    file_list, missing_periods = [], []
+    while period_start <= end_date:
+        year_dir_path = generate_sat_consolidated_dir_path(date=period_start, sat_name=sat_name, layout=layout,
+                                                           target_dir=target_dir)
+        fname_pattern = generate_sat_consolidated_filename_pattern(sat_name=sat_name, layout=layout,
+                                                                   regrid_res_str=regrid_res_str,
+                                                                   YYYY=period_start.year,
+                                                                   DDD=f'{period_start.dayofyear:03d}',
+                                                                   MM=f'{period_start.month:02d}',
+                                                                   sat_version=sat_version)
+        if catalogue is not None:
+            period_file_list = [file_path for file_path in catalogue_file_list
+                                if file_path.parent == year_dir_path and file_path.match(fname_pattern)]
+        else:
+            period_file_list = sorted(year_dir_path.glob(fname_pattern))
+        if not period_file_list:
+            missing_periods.append(period_start)
+        file_list.extend(period_file_list)
+        period_start = get_consolidated_period_end_date(date=period_start, layout=layout) + Timedelta(hours=1)
+    return missing_periods if missing else file_list
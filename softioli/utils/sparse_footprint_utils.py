@@ -0,0 +1,170 @@
+import pathlib
+
+import numpy as np
+import pandas as pd
+import xarray as xr
+
+from . import constants as cts
+from .xarray_pandas_utils import get_sub_grid_index
+
+# sparse footprint dataset variable/dim names
+FOOTPRINT_DIMS = ['pointspec', 'time', 'latitude', 'longitude']
+FOOTPRINT_ENTRY_DIM = 'footprint_entry'
+FOOTPRINT_INDEX_VARNAMES = {dim: f'footprint_{dim}_index' for dim in FOOTPRINT_DIMS}
+FOOTPRINT_THRESHOLD_ATTR = 'footprint_threshold'
+FOOTPRINT_TOP_K_ATTR = 'footprint_top_k'
+
+
+def get_sparse_footprint_path(fpout_path):
+    """
+    Returns the path of the sparse footprint file of a FLEXPART output (stored next to the FLEXPART output file)
+    :param fpout_path: <pathlib.Path> or <str> FLEXPART output netcdf file
+    :return: <pathlib.Path>
+    """
+    fpout_path = pathlib.Path(fpout_path)
+    return fpout_path.parent / f'{cts.SPARSE_FOOTPRINT_FILENAME_PREFIX}{fpout_path.name}'
+
+
+def get_footprint_keep_mask(values, threshold=None, top_k=None):
+    """
+    Returns the cells kept in the sparse representation of footprints: non-zero cells, with a value >= threshold x max
+    value of the footprint (if threshold is not None) and among the top_k cells of the footprint (if top_k is not None)
+    :param values: <numpy.ndarray> (n_footprints, n_cells) footprint values (no NaN)
+    :param threshold: <float> relative threshold (fraction of the max value of each footprint)
+    :param top_k: <int> max number of cells per footprint
+    :return: <numpy.ndarray> (n_footprints, n_cells) boolean
+    """
+    keep = values > 0
+    if threshold is not None:
+        keep &= values >= threshold * values.max(axis=1, keepdims=True)
+    if top_k is not None and top_k < values.shape[1]:
+        top_k_mask = np.zeros(values.shape, dtype=bool)
+        np.put_along_axis(top_k_mask, np.argpartition(values, -top_k, axis=1)[:, -top_k:], True, axis=1)
+        keep &= top_k_mask
+    return keep
+
+
+def dense_to_sparse_footprint_ds(spec001_mr_da, threshold=None, top_k=None,
+                                 slab_hours=cts.FP_SAT_STREAMING_SLAB_HOURS):
+    """
+    Converts FLEXPART footprints (spec001_mr, one (latitude, longitude) footprint per (release, time step)) to sparse
+    (COO) format: pointspec, time, latitude and longitude indices + value of the cells kept (see
+    get_footprint_keep_mask). The sensitivity mass (sum of the footprint values) of each footprint and the part of it
+    retained are stored to assess the threshold (see get_retained_mass_fraction).
+    spec001_mr is read release by release by slabs of slab_hours time steps (NaN: no sensitivity)
+    :param spec001_mr_da: <xarray.DataArray> (pointspec, time, latitude, longitude) footprints (summed over height)
+    :param threshold: <float> see get_footprint_keep_mask, if None and top_k is None: all the non-zero cells are kept
+                    (lossless)
+    :param top_k: <int> see get_footprint_keep_mask
+    :param slab_hours: <int>
+    :return: <xarray.Dataset> sparse footprint dataset
+    """
+    if set(spec001_mr_da.dims) != set(FOOTPRINT_DIMS):
+        raise ValueError(f'{spec001_mr_da.dims} {cts.SPARSE_FOOTPRINT_DIMS_VALUE_ERROR}')
+    spec001_mr_da = spec001_mr_da.transpose(*FOOTPRINT_DIMS)
+    n_pointspec, n_time, n_lat, n_lon = spec001_mr_da.shape
+    entry_index_list = {dim: [] for dim in FOOTPRINT_DIMS}
+    entry_value_list = []
+    total_mass = np.zeros((n_pointspec, n_time))
+    retained_mass = np.zeros((n_pointspec, n_time))
+    for pointspec_index in range(n_pointspec):
+        for time_start in range(0, n_time, slab_hours):
+            slab_values = np.nan_to_num(
+                spec001_mr_da[pointspec_index, time_start:time_start + slab_hours].values.reshape(-1, n_lat * n_lon),
+                nan=0.
+            )
+            keep = get_footprint_keep_mask(slab_values, threshold=threshold, top_k=top_k)
+            time_offset, cell_index = np.nonzero(keep)
+            time_slab = slice(time_start, time_start + slab_values.shape[0])
+            total_mass[pointspec_index, time_slab] = slab_values.sum(axis=1, dtype='f8')
+            retained_mass[pointspec_index, time_slab] = np.where(keep, slab_values, 0.).sum(axis=1, dtype='f8')
+            entry_index_list['pointspec'].append(np.full(time_offset.size, pointspec_index))
+            entry_index_list['time'].append(time_start + time_offset)
+            entry_index_list['latitude'].append(cell_index // n_lon)
+            entry_index_list['longitude'].append(cell_index % n_lon)
+            entry_value_list.append(slab_values[time_offset, cell_index])
+    sparse_fp_ds = xr.Dataset(
+        coords={dim: spec001_mr_da[dim] for dim in FOOTPRINT_DIMS if dim in spec001_mr_da.coords},
+        attrs={attr: value for attr, value in [(FOOTPRINT_THRESHOLD_ATTR, threshold), (FOOTPRINT_TOP_K_ATTR, top_k)]
+               if value is not None}
+    )
+    for dim in FOOTPRINT_DIMS:
+        sparse_fp_ds[FOOTPRINT_INDEX_VARNAMES[dim]] = (FOOTPRINT_ENTRY_DIM,
+                                                       np.concatenate(entry_index_list[dim]).astype('i4'))
+    sparse_fp_ds['spec001_mr'] = (FOOTPRINT_ENTRY_DIM, np.concatenate(entry_value_list), spec001_mr_da.attrs)
+    sparse_fp_ds['total_mass'] = (('pointspec', 'time'), total_mass)
+    sparse_fp_ds['retained_mass'] = (('pointspec', 'time'), retained_mass)
+    return sparse_fp_ds
+
+
+def is_sparse_footprint_ds_matching(sparse_fp_ds, threshold=None, top_k=None):
+    """
+    :param sparse_fp_ds: <xarray.Dataset> sparse footprint dataset
+    :param threshold: <float>
+    :param top_k: <int>
+    :return: <bool> True if the sparse footprints were built with the same threshold and top_k
+    """
+    return sparse_fp_ds.attrs.get(FOOTPRINT_THRESHOLD_ATTR) == threshold and \
+        sparse_fp_ds.attrs.get(FOOTPRINT_TOP_K_ATTR) == top_k
+
+
+def get_retained_mass_fraction(sparse_fp_ds, dim=None):
+    """
+    Fraction of the sensitivity mass of the footprints retained in the sparse representation
+    :param sparse_fp_ds: <xarray.Dataset> sparse footprint dataset
+    :param dim: <str> or <list> dimension(s) over which the masses are summed (all if None), e.g. 'time': fraction per
+                    release
+    :return: <xarray.DataArray> (1 for footprints without any sensitivity)
+    """
+    total_mass = sparse_fp_ds['total_mass'].sum(dim)
+    return (sparse_fp_ds['retained_mass'].sum(dim) / total_mass.where(total_mass > 0)).fillna(1.)
+
+
+def get_sparse_footprint_weighted_flash_count(sparse_fp_ds, flash_count_da,
+                                              slab_hours=cts.FP_SAT_STREAMING_SLAB_HOURS):
+    """
+    Weighted flash count (see fpout_sat_comparison.get_weighted_flash_count) computed as a sparse dot product: the
+    flash count of the cell of each footprint entry is read (hour slab by hour slab, entries outside of the satellite
+    grid or time steps without satellite data: no flash) and the entries products are summed for each (release, time
+    step) with a bincount
+    :param sparse_fp_ds: <xarray.Dataset> sparse footprint dataset (see dense_to_sparse_footprint_ds)
+    :param flash_count_da: <xarray.DataArray> (time, latitude, longitude) flash count, on a sub-grid of the footprint
+                    grid (NaN: no flash)
+    :param slab_hours: <int> number of hours of flash count read at once
+    :return: <xarray.DataArray> (pointspec, time) weighted flash count of the footprint time steps with satellite data
+    """
+    flash_count_da = flash_count_da.transpose('time', 'latitude', 'longitude')
+    # footprint grid --> satellite grid index (-1: outside of the satellite grid)
+    grid_maps = {}
+    for dim in ['latitude', 'longitude']:
+        grid_maps[dim] = np.full(sparse_fp_ds.sizes[dim], -1, dtype='i8')
+        grid_maps[dim][get_sub_grid_index(flash_count_da[dim].values, sparse_fp_ds[dim].values)] = \
+            np.arange(flash_count_da.sizes[dim])
+    # footprint time steps --> satellite time index (-1: no satellite data)
+    time_map = pd.Index(flash_count_da['time'].values).get_indexer(sparse_fp_ds['time'].values)
+    entry_time_index = sparse_fp_ds[FOOTPRINT_INDEX_VARNAMES['time']].values.astype('i8')
+    entry_sat_time_index = time_map[entry_time_index]
+    entry_lat_index = grid_maps['latitude'][sparse_fp_ds[FOOTPRINT_INDEX_VARNAMES['latitude']].values]
+    entry_lon_index = grid_maps['longitude'][sparse_fp_ds[FOOTPRINT_INDEX_VARNAMES['longitude']].values]
+    entry_flash_count = np.zeros(entry_time_index.size)
+    valid_entries = (entry_sat_time_index >= 0) & (entry_lat_index >= 0) & (entry_lon_index >= 0)
+    sat_time_index_list = np.unique(entry_sat_time_index[valid_entries])
+    for slab_start in range(0, sat_time_index_list.size, slab_hours):
+        slab_time_index = sat_time_index_list[slab_start:slab_start + slab_hours]
+        slab_flash_count = np.nan_to_num(flash_count_da.isel(time=slab_time_index).values, nan=0.)
+        slab_entries = valid_entries & np.isin(entry_sat_time_index, slab_time_index)
+        entry_flash_count[slab_entries] = slab_flash_count[
+            np.searchsorted(slab_time_index, entry_sat_time_index[slab_entries]),
+            entry_lat_index[slab_entries], entry_lon_index[slab_entries]
+        ]
+    n_pointspec, n_time = sparse_fp_ds.sizes['pointspec'], sparse_fp_ds.sizes['time']
+    weighted_flash_count = np.bincount(
+        sparse_fp_ds[FOOTPRINT_INDEX_VARNAMES['pointspec']].values.astype('i8') * n_time + entry_time_index,
+        weights=sparse_fp_ds['spec001_mr'].values * entry_flash_count, minlength=n_pointspec * n_time
+    ).reshape(n_pointspec, n_time) / 3600
+    weighted_flash_count_da = xr.DataArray(
+        weighted_flash_count, dims=('pointspec', 'time'),
+        coords={dim: sparse_fp_ds[dim] for dim in ['pointspec', 'time'] if dim in sparse_fp_ds.coords}
+    )
+    # same time steps as the dense product (inner join)
+    return weighted_flash_count_da.isel(time=time_map >= 0)
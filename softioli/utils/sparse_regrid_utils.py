@@ -0,0 +1,197 @@
+import dask
+import dask.array
+import numpy as np
+import xarray as xr
+
+from . import constants as cts
+
+# sparse regrid dataset variable/dim names
+LIT_CELL_DIM = 'lit_cell'
+LIT_CELL_INDEX_VARNAMES = {
+    'time': 'lit_cell_time_index',
+    'latitude': 'lit_cell_latitude_index',
+    'longitude': 'lit_cell_longitude_index'
+}
+SPARSE_DIMS_ATTR = 'sparse_dims'
+
+
+def is_sparse_regrid_ds(regrid_ds):
+    """
+    Returns True if the regrid dataset is stored in sparse (COO) format
+    @param regrid_ds: <xarray.Dataset>
+    @return: <bool>
+    """
+    return regrid_ds.attrs.get(cts.REGRID_FORMAT_ATTR) == cts.REGRID_SPARSE_FORMAT
+
+
+def dense_to_sparse_regrid_ds(regrid_ds, count_var_name='flash_count'):
+    """
+    Converts a dense regrid dataset to sparse (COO) format:
+        - lit cells (cells with at least one flash, i.e. count != NaN): time, latitude and longitude indices + count
+        - histograms: only the non-zero (lit cell, bin) entries
+    The NaN/0 pattern of the dense histograms is NOT stored, it is rebuilt from the lit cells (see sparse_to_dense_regrid_ds)
+    @param regrid_ds: <xarray.Dataset> dense regrid dataset with (time, latitude, longitude) count variable and
+                        (time, latitude, longitude, <bin_dim>) histogram variables
+    @param count_var_name: <str> name of the count variable defining the lit cells
+    @return: <xarray.Dataset> sparse regrid dataset
+    """
+    cell_dims = list(LIT_CELL_INDEX_VARNAMES)
+    count_da = regrid_ds[count_var_name].transpose(*cell_dims)
+    lit_cell_indices = np.nonzero(~np.isnan(count_da.values))
+    # position of each lit cell in the lit_cell dimension (-1 if the cell is not lit)
+    lit_cell_position = np.full(count_da.shape, -1, dtype='i8')
+    lit_cell_position[lit_cell_indices] = np.arange(lit_cell_indices[0].size)
+
+    sparse_ds = xr.Dataset(
+        coords={dim: regrid_ds[dim] for dim in regrid_ds.dims},
+        attrs={**regrid_ds.attrs, cts.REGRID_FORMAT_ATTR: cts.REGRID_SPARSE_FORMAT}
+    )
+    for dim, index in zip(cell_dims, lit_cell_indices):
+        sparse_ds[LIT_CELL_INDEX_VARNAMES[dim]] = (LIT_CELL_DIM, index.astype('i4'))
+    sparse_ds[count_var_name] = (LIT_CELL_DIM, count_da.values[lit_cell_indices].astype('i4'),
+                                 {**count_da.attrs, SPARSE_DIMS_ATTR: ' '.join(cell_dims)})
+    for var_name, hist_da in regrid_ds.data_vars.items():
+        if var_name == count_var_name:
+            continue
+        bin_dim = [dim for dim in hist_da.dims if dim not in cell_dims][0]
+        hist_values = hist_da.transpose(*cell_dims, bin_dim).values
+        entry_indices = np.nonzero(np.nan_to_num(hist_values, nan=0.))
+        entry_dim = f'{var_name}_entry'
+        sparse_ds[f'{var_name}_lit_cell'] = (entry_dim, lit_cell_position[entry_indices[:-1]].astype('i4'))
+        sparse_ds[f'{var_name}_bin_index'] = (entry_dim, entry_indices[-1].astype('i2'))
+        sparse_ds[var_name] = (entry_dim, hist_values[entry_indices].astype('i4'),
+                               {**hist_da.attrs, SPARSE_DIMS_ATTR: ' '.join(cell_dims + [bin_dim])})
+    return sparse_ds
+
+
+def sparse_to_dense_regrid_ds(sparse_ds, count_var_name='flash_count'):
+    """
+    Converts a sparse (COO) regrid dataset back to the dense regrid dataset (identical to the dataset generated by
+    sat_regrid.generate_lightning_sat_hourly_regrid_file):
+        - count: NaN in cells without any flash
+        - histograms: 0 in the cells of the (lit latitudes x lit longitudes) product of each hour, NaN elsewhere
+    @param sparse_ds: <xarray.Dataset> sparse regrid dataset
+    @param count_var_name: <str> name of the count variable defining the lit cells
+    @return: <xarray.Dataset> dense regrid dataset
+    """
+    cell_dims = sparse_ds[count_var_name].attrs[SPARSE_DIMS_ATTR].split()
+    cell_shape = tuple(sparse_ds.sizes[dim] for dim in cell_dims)
+    lit_cell_indices = tuple(sparse_ds[LIT_CELL_INDEX_VARNAMES[dim]].values.astype('i8') for dim in cell_dims)
+    dense_ds = xr.Dataset(
+        coords={coord_name: sparse_ds[coord_name] for coord_name in sparse_ds.coords},
+        attrs={attr: value for attr, value in sparse_ds.attrs.items() if attr != cts.REGRID_FORMAT_ATTR}
+    )
+    count = np.full(cell_shape, np.nan)
+    count[lit_cell_indices] = sparse_ds[count_var_name].values
+    dense_ds[count_var_name] = (cell_dims, count, _get_dense_attrs(sparse_ds[count_var_name]))
+
+    # histograms are defined (0 instead of NaN) on the lit latitudes x lit longitudes product of each time step
+    time_index, lat_index, lon_index = lit_cell_indices
+    lit_lat = np.zeros(cell_shape[:2], dtype=bool)
+    lit_lat[time_index, lat_index] = True
+    lit_lon = np.zeros((cell_shape[0], cell_shape[2]), dtype=bool)
+    lit_lon[time_index, lon_index] = True
+    hist_defined = lit_lat[:, :, np.newaxis] & lit_lon[:, np.newaxis, :]
+    for var_name, sparse_da in sparse_ds.data_vars.items():
+        if var_name == count_var_name or SPARSE_DIMS_ATTR not in sparse_da.attrs:
+            continue
+        hist_dims = sparse_da.attrs[SPARSE_DIMS_ATTR].split()
+        hist = np.where(hist_defined[..., np.newaxis], 0., np.nan) \
+            .repeat(sparse_ds.sizes[hist_dims[-1]], axis=-1)
+        entry_lit_cell = sparse_ds[f'{var_name}_lit_cell'].values.astype('i8')
+        entry_indices = tuple(index[entry_lit_cell] for index in lit_cell_indices) + \
+            (sparse_ds[f'{var_name}_bin_index'].values.astype('i8'),)
+        hist[entry_indices] = sparse_da.values
+        dense_ds[var_name] = (hist_dims, hist, _get_dense_attrs(sparse_da))
+    return dense_ds
+
+
+def select_sparse_regrid_time_step(sparse_ds, time_index, count_var_name='flash_count'):
+    """
+    Selects a single time step of a sparse (COO) regrid dataset: only its lit cells and histogram entries are kept
+    (same sparse dataset as the one of the time step alone)
+    @param sparse_ds: <xarray.Dataset> sparse regrid dataset
+    @param time_index: <int> index of the time step
+    @param count_var_name: <str> name of the count variable defining the lit cells
+    @return: <xarray.Dataset> sparse regrid dataset with a time dimension of size 1
+    """
+    time_step_lit_cells = sparse_ds[LIT_CELL_INDEX_VARNAMES['time']].values == time_index
+    # position of the lit cells of the time step in the selected lit_cell dimension
+    lit_cell_position = np.cumsum(time_step_lit_cells) - 1
+    time_step_ds = sparse_ds.isel({'time': [time_index], LIT_CELL_DIM: time_step_lit_cells})
+    time_step_ds[LIT_CELL_INDEX_VARNAMES['time']] = xr.zeros_like(time_step_ds[LIT_CELL_INDEX_VARNAMES['time']])
+    for var_name, sparse_da in sparse_ds.data_vars.items():
+        if var_name == count_var_name or SPARSE_DIMS_ATTR not in sparse_da.attrs:
+            continue
+        entry_dim = sparse_da.dims[0]
+        entry_lit_cell = sparse_ds[f'{var_name}_lit_cell'].values
+        time_step_entries = time_step_lit_cells[entry_lit_cell]
+        time_step_ds = time_step_ds.isel({entry_dim: time_step_entries})
+        time_step_ds[f'{var_name}_lit_cell'] = (entry_dim,
+                                                lit_cell_position[entry_lit_cell[time_step_entries]].astype('i4'))
+    return time_step_ds
+
+
+def sparse_to_lazy_dense_regrid_ds(sparse_ds, count_var_name='flash_count'):
+    """
+    Converts a sparse (COO) regrid dataset with several time steps to the dense regrid dataset backed by dask arrays
+    (one chunk per time step, converted to dense only when computed): the whole dense dataset is never held in memory
+    (e.g. when written to netcdf)
+    @param sparse_ds: <xarray.Dataset> sparse regrid dataset
+    @param count_var_name: <str> name of the count variable defining the lit cells
+    @return: <xarray.Dataset> dense regrid dataset (dask)
+    """
+    first_time_step_ds = sparse_to_dense_regrid_ds(select_sparse_regrid_time_step(sparse_ds, 0, count_var_name),
+                                                   count_var_name)
+    time_step_delayed_list = [
+        dask.delayed(lambda index: sparse_to_dense_regrid_ds(
+            select_sparse_regrid_time_step(sparse_ds, index, count_var_name), count_var_name))(time_index)
+        for time_index in range(sparse_ds.sizes['time'])
+    ]
+    lazy_dense_ds = xr.Dataset(coords={coord_name: sparse_ds[coord_name] for coord_name in sparse_ds.coords},
+                               attrs=first_time_step_ds.attrs)
+    for var_name, time_step_da in first_time_step_ds.data_vars.items():
+        time_axis = time_step_da.dims.index('time')
+        lazy_dense_ds[var_name] = (time_step_da.dims, dask.array.concatenate([
+            dask.array.from_delayed(time_step_delayed[var_name].values, shape=time_step_da.shape,
+                                    dtype=time_step_da.dtype)
+            for time_step_delayed in time_step_delayed_list
+        ], axis=time_axis), time_step_da.attrs)
+    return lazy_dense_ds
+
+
+def _get_dense_attrs(sparse_da):
+    return {attr: value for attr, value in sparse_da.attrs.items() if attr != SPARSE_DIMS_ATTR}
+
+
+def open_regrid_file(file_path, dense=True):
+    """
+    Opens a regrid file stored in dense or sparse format
+    @param file_path: <pathlib.Path> or <str>
+    @param dense: <bool> if True, sparse files are converted to the dense regrid dataset, if False the dataset is
+                    returned as stored (sparse or dense)
+    @return: <xarray.Dataset>
+    """
+    with xr.open_dataset(file_path) as regrid_ds:
+        if dense and is_sparse_regrid_ds(regrid_ds):
+            return sparse_to_dense_regrid_ds(regrid_ds.load())
+        return regrid_ds.load()
+
+
+def open_regrid_mfdataset(file_list, **kwargs):
+    """
+    Opens a list of regrid files (dense or sparse format) as a single dense dataset
+    - dense files: xarray.open_mfdataset (lazy)
+    - sparse files: each file is converted to dense and concatenated along time
+    <!> the format of the first file is used for all the files
+    @param file_list: <list> [ <pathlib.Path>, ... ]
+    @param kwargs: passed to xarray.open_mfdataset (dense files only)
+    @return: <xarray.Dataset>
+    """
+    file_list = sorted(file_list)
+    with xr.open_dataset(file_list[0]) as first_ds:
+        sparse = is_sparse_regrid_ds(first_ds)
+    if not sparse:
+        return xr.open_mfdataset(file_list, combine_attrs='drop_conflicts', **kwargs)
+    return xr.concat([open_regrid_file(file_path, dense=True) for file_path in file_list], dim='time',
+                     combine_attrs='drop_conflicts')
@@ -1,48 +1,56 @@
 import numpy as np
+import pandas as pd
+import xarray as xr
 
 
 def histogram_using_pandas(_ds, data_var_name, min_bin_edge, max_bin_edge, step,
                            groupby_dims=None, res_var_name=None):
     """
-    Function to calculate the histogram of a variable in a dataset using pandas to groupby on mutiple dimensions
-    @param _ds: <xarray.Dataset> containing the histogram variable
+    Function to calculate the histogram of a variable in a dataset grouped by mutiple dimensions (using pandas to get
+    the groups and a bincount to fill the histogram, memory scales with the number of values NOT values x bins)
+    @param _ds: <xarray.Dataset> containing the histogram variable and the groupby variables
     @param data_var_name: <str> name of the histogram variable
-    @param hist_params: <dict> histogram parameters (min, max, step, result_var_name)
+    @param min_bin_edge: <float> lower edge of the first bin
+    @param max_bin_edge: <float> upper edge of the last bin
+    @param step: <float> bin width
+    @param groupby_dims: dimensions overwhich to groupby (default = ['latitude', 'longitude'])
+    @param res_var_name: name of the resulting data variable (default = <data_var_name>_hist)
     @return: <xarray.Dataset>
     """
     if groupby_dims is None:
         groupby_dims = ['latitude', 'longitude']
-    hist_edges = np.arange(start=min_bin_edge, stop=max_bin_edge + step, step=step)
-    _ds = _ds.assign_coords({f'{data_var_name}_edges': hist_edges})
-    # True if <data_var_name>_value < <data_var_name>_edge
-    _ds[f'{data_var_name}_bool'] = _ds[f'{data_var_name}'] < _ds[f'{data_var_name}_edges']
-
-    # convert ds to dataframe to make groupby operations easier
-    _df = _ds.to_dataframe()
-    _df_grouped = _df.groupby(by=groupby_dims+[f'{data_var_name}_edges'], sort=True)
-
-    # get cummulative distribution function (sum <data_var_name>_bool)
-    _df_cdf = _df_grouped[f'{data_var_name}_bool'].sum().rename(f'{data_var_name}_cdf')
-    _da_cdf = _df_cdf.to_xarray()
+    hist_edges = get_histogram_bin_edges(min_bin_edge=min_bin_edge, max_bin_edge=max_bin_edge, step=step)
+    # flatten histogram variable and groupby variables (broadcast against each other first)
+    flat_values = [da.values.ravel() for da in xr.broadcast(*[_ds[var] for var in [data_var_name] + groupby_dims])]
+    data_values, groupby_values = flat_values[0], flat_values[1:]
+    # same as pandas groupby: values with a NaN group are dropped
+    valid = np.ones(data_values.size, dtype=bool)
+    for values in groupby_values:
+        valid &= ~pd.isna(values)
+    # get sorted group values + index of the group of each value along each groupby dimension
+    group_codes, group_uniques = [], []
+    for values in groupby_values:
+        codes, uniques = pd.factorize(values[valid], sort=True)
+        group_codes.append(codes)
+        group_uniques.append(uniques)
+    groups_shape = tuple(uniques.size for uniques in group_uniques)
+    group_index = np.ravel_multi_index(group_codes, groups_shape)
 
     # get new variable name or use default value
     if res_var_name is None:
         res_var_name = f'{data_var_name}_hist'
 
-    # get histogram values from cdf and fill nan values with 0
-    _da_hist = _da_cdf.diff(f'{data_var_name}_edges') \
-        .fillna(0.).astype('i4') \
-        .rename(res_var_name)
-
+    hist = histogram_using_bincount(data_values[valid], cell_index=group_index,
+                                    n_cells=int(np.prod(groups_shape)), bin_edges=hist_edges)
     # get middle value of bins
-    _da_hist = _da_hist.assign_coords({
-        f'{data_var_name}_bin': _da_hist[f'{data_var_name}_edges'] - step / 2
-    })
+    hist_bins = hist_edges[1:] - step / 2
+    _da_hist = xr.DataArray(
+        hist.reshape(groups_shape + (hist_bins.size,)).astype('i4'),
+        dims=groupby_dims + [f'{data_var_name}_bin'],
+        coords={**dict(zip(groupby_dims, group_uniques)), f'{data_var_name}_bin': hist_bins},
+        name=res_var_name
+    )
     _da_hist[f'{data_var_name}_bin'].attrs['comment'] = f'{min_bin_edge} <= bin <= {max_bin_edge}, bin_step = {step}'
-
-    # swap dims to have hist bin as dim instead of edges + drop edges
-    _da_hist = _da_hist.swap_dims({f'{data_var_name}_edges': f'{data_var_name}_bin'}) \
-        .drop_vars(f'{data_var_name}_edges')
     return _da_hist.to_dataset()
 
 
@@ -65,3 +73,140 @@ def count_using_pandas(_ds, data_var_name, groupby_dims=None, res_var_name=None)
         res_var_name = f'{data_var_name}_count'
     _df_count = _df_grouped.count().rename(columns={f'{data_var_name}': res_var_name})
     return _df_count.to_xarray()
+
+
+def get_nearest_grid_index(values, grid_values):
+    """
+    Function to get the index of the nearest grid value for each value, computed arithmetically from the grid minimum
+    value and resolution (same result as xarray .sel(method='nearest'), ties go to the upper grid value)
+    @param values: <numpy.ndarray> values to snap to the grid (e.g. flash latitudes)
+    @param grid_values: <numpy.ndarray> regularly spaced and increasing grid values (at least 2 values)
+    @return: <numpy.ndarray> (int64) index of the nearest grid value for each value
+    """
+    values = np.asarray(values, dtype='f8')
+    grid_values = np.asarray(grid_values, dtype='f8')
+    if np.isnan(values).any():
+        raise ValueError('Cannot get nearest grid index of NaN values')
+    grid_size = grid_values.size
+    grid_res = grid_values[1] - grid_values[0]
+    # index of the grid value directly below each value (clipped so that index + 1 is always a valid index)
+    index = np.clip(np.floor((values - grid_values[0]) / grid_res), 0, grid_size - 2).astype('i8')
+    # correct floating point rounding errors so that grid[index] <= value < grid[index + 1] (inside the grid)
+    index -= (grid_values[index] > values) & (index > 0)
+    index += (grid_values[index + 1] <= values) & (index < grid_size - 2)
+    # keep the nearest of the two surrounding grid values
+    left_distance = np.abs(grid_values[index] - values)
+    right_distance = np.abs(grid_values[index + 1] - values)
+    return np.where(left_distance < right_distance, index, index + 1)
+
+
+def get_grid_domain_slice(grid_values, domain_min, domain_max):
+    """
+    Function to get the slice of the grid cells (nearest grid value snapping) intersecting [domain_min, domain_max]:
+    from the cell containing domain_min to the cell containing domain_max
+    @param grid_values: <numpy.ndarray> regularly spaced and increasing grid values (at least 2 values)
+    @param domain_min: <float>
+    @param domain_max: <float>
+    @return: <slice>
+    """
+    if domain_min > domain_max:
+        raise ValueError(f'Invalid domain: min value ({domain_min}) > max value ({domain_max})')
+    start_index, end_index = get_nearest_grid_index([domain_min, domain_max], grid_values)
+    return slice(int(start_index), int(end_index) + 1)
+
+
+def get_sub_grid_index(sub_grid_values, grid_values):
+    """
+    Function to get the index of each value of a sub-grid (e.g. cropped regrid grid) in a grid with the same resolution
+    (e.g. FLEXPART output grid)
+    @param sub_grid_values: <numpy.ndarray> increasing grid values, each of them in grid_values
+    @param grid_values: <numpy.ndarray> regularly spaced and increasing grid values (at least 2 values)
+    @return: <numpy.ndarray> (int64) index of each sub-grid value in grid_values
+    """
+    grid_values = np.asarray(grid_values, dtype='f8')
+    index = get_nearest_grid_index(sub_grid_values, grid_values)
+    tolerance = 1e-6 * (grid_values[1] - grid_values[0])
+    if np.any(np.abs(grid_values[index] - np.asarray(sub_grid_values, dtype='f8')) > tolerance):
+        raise ValueError('Sub-grid values are not grid values (expecting the same grid resolution and origin)')
+    return index
+
+
+def is_nested_grid(fine_grid_values, coarse_grid_values):
+    """
+    Function to check if a coarse grid nests exactly in a fine grid (for nearest grid value snapping): every coarse
+    cell boundary (middle of two consecutive coarse grid values) is a fine cell boundary, so each fine grid cell is
+    entirely contained in a single coarse grid cell and coarse counts can be obtained by summing fine counts
+    e.g. 0.5° -> 1.5° grid (same first grid value) nests, 0.5° -> 1° grid does NOT (coarse boundaries on fine grid values)
+    @param fine_grid_values: <numpy.ndarray> regularly spaced and increasing grid values
+    @param coarse_grid_values: <numpy.ndarray> regularly spaced and increasing grid values
+    @return: <bool>
+    """
+    fine_bounds = (fine_grid_values[:-1] + fine_grid_values[1:]) / 2
+    coarse_bounds = (coarse_grid_values[:-1] + coarse_grid_values[1:]) / 2
+    if coarse_bounds.size == 0:
+        return True
+    if fine_bounds.size == 0:
+        return False
+    # distance between each coarse boundary and the nearest fine boundary
+    bound_index = get_nearest_grid_index(coarse_bounds, fine_bounds) if fine_bounds.size > 1 \
+        else np.zeros(coarse_bounds.size, dtype='i8')
+    tolerance = 1e-6 * (fine_grid_values[1] - fine_grid_values[0])
+    return bool(np.all(np.abs(fine_bounds[bound_index] - coarse_bounds) <= tolerance))
+
+
+def sum_over_nested_grid(values, fine_to_coarse_index, n_coarse, axis):
+    """
+    Function to sum values defined on a fine grid axis over the cells of a nested coarse grid (see is_nested_grid)
+    @param values: <numpy.ndarray> values with a fine grid axis
+    @param fine_to_coarse_index: <numpy.ndarray> index of the coarse grid cell containing each fine grid cell
+    @param n_coarse: <int> number of coarse grid cells
+    @param axis: <int> fine grid axis of values
+    @return: <numpy.ndarray> values summed over each coarse grid cell (same shape as values except along axis)
+    """
+    values = np.moveaxis(values, axis, 0)
+    coarse_values = np.zeros((n_coarse,) + values.shape[1:], dtype=values.dtype)
+    np.add.at(coarse_values, fine_to_coarse_index, values)
+    return np.moveaxis(coarse_values, 0, axis)
+
+
+def count_using_bincount(cell_index, n_cells, mask=None):
+    """
+    Function to count the number of values in each grid cell using a flat bincount on the grid cell indices
+    @param cell_index: <numpy.ndarray> flat (1D) grid cell index of each value (e.g. lat_index * n_lon + lon_index)
+    @param n_cells: <int> total number of grid cells
+    @param mask: <numpy.ndarray> boolean array, if not None only the values where mask is True are counted
+    @return: <numpy.ndarray> (n_cells,) number of values in each grid cell
+    """
+    if mask is not None:
+        cell_index = cell_index[mask]
+    return np.bincount(cell_index, minlength=n_cells)
+
+
+def get_histogram_bin_edges(min_bin_edge, max_bin_edge, step):
+    """
+    Function to get the histogram bin edges between min and max bin edge (both included)
+    @param min_bin_edge: <float>
+    @param max_bin_edge: <float>
+    @param step: <float>
+    @return: <numpy.ndarray>
+    """
+    return np.arange(start=min_bin_edge, stop=max_bin_edge + step, step=step)
+
+
+def histogram_using_bincount(values, cell_index, n_cells, bin_edges):
+    """
+    Function to calculate the histogram of values in each grid cell: each value is digitized once and scatter-added
+    into a (n_cells, n_bins) count array
+    <!> bin i contains values such as bin_edges[i] <= value < bin_edges[i + 1], NaN values and values outside of the
+    bin edges are ignored
+    @param values: <numpy.ndarray> values to digitize
+    @param cell_index: <numpy.ndarray> flat (1D) grid cell index of each value
+    @param n_cells: <int> total number of grid cells
+    @param bin_edges: <numpy.ndarray> increasing bin edges
+    @return: <numpy.ndarray> (n_cells, n_bins) number of values in each bin for each grid cell
+    """
+    n_bins = bin_edges.size - 1
+    bin_index = np.searchsorted(bin_edges, np.asarray(values, dtype='f8'), side='right') - 1
+    valid = (bin_index >= 0) & (bin_index < n_bins)
+    return count_using_bincount(cell_index * n_bins + bin_index, n_cells=n_cells * n_bins, mask=valid) \
+        .reshape(n_cells, n_bins)
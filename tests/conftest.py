@@ -0,0 +1,5 @@
+import pathlib
+import sys
+
+# softioli modules import each other as top-level modules (from utils import ...)
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent.parent / 'softioli'))
@@ -0,0 +1,134 @@
+"""
+In-memory regression tests of the regrid kernels (no file read or written): the 'index' engine and the bincount
+histogram must give the same datasets as the original pandas implementation
+"""
+import numpy as np
+import pandas as pd
+import pytest
+import xarray as xr
+
+import sat_regrid
+from utils import constants as cts
+from utils import xarray_pandas_utils as xr_pd_utils
+
+
+def histogram_using_pandas_cdf(_ds, data_var_name, min_bin_edge, max_bin_edge, step, groupby_dims=None,
+                               res_var_name=None):
+    """
+    Original histogram_using_pandas (cumulative distribution function of each group, one boolean per value and bin
+    edge), reference of the bincount kernel
+    """
+    if groupby_dims is None:
+        groupby_dims = ['latitude', 'longitude']
+    hist_edges = np.arange(start=min_bin_edge, stop=max_bin_edge + step, step=step)
+    _ds = _ds.assign_coords({f'{data_var_name}_edges': hist_edges})
+    _ds[f'{data_var_name}_bool'] = _ds[f'{data_var_name}'] < _ds[f'{data_var_name}_edges']
+    _df = _ds.to_dataframe()
+    _df_grouped = _df.groupby(by=groupby_dims + [f'{data_var_name}_edges'], sort=True)
+    _da_cdf = _df_grouped[f'{data_var_name}_bool'].sum().rename(f'{data_var_name}_cdf').to_xarray()
+    if res_var_name is None:
+        res_var_name = f'{data_var_name}_hist'
+    _da_hist = _da_cdf.diff(f'{data_var_name}_edges').fillna(0.).astype('i4').rename(res_var_name)
+    _da_hist = _da_hist.assign_coords({f'{data_var_name}_bin': _da_hist[f'{data_var_name}_edges'] - step / 2})
+    _da_hist[f'{data_var_name}_bin'].attrs['comment'] = f'{min_bin_edge} <= bin <= {max_bin_edge}, bin_step = {step}'
+    _da_hist = _da_hist.swap_dims({f'{data_var_name}_edges': f'{data_var_name}_bin'}) \
+        .drop_vars(f'{data_var_name}_edges')
+    return _da_hist.to_dataset()
+
+
+def get_synthetic_flashes(n_flashes, seed=0):
+    """
+    Random flashes over the whole FLEXPART grid with grid ties (values half way between two grid values), values on
+    the grid edges, NaN flash energies / areas and energies / areas outside of the histogram bins
+    """
+    rng = np.random.default_rng(seed)
+    flash_lat = rng.uniform(-90., 90., n_flashes)
+    flash_lon = rng.uniform(-180., 180., n_flashes)
+    # grid ties (0.5° grid values are x.25 and x.75) and grid edges
+    ties = rng.random(n_flashes) < 0.2
+    flash_lat[ties] = np.round(flash_lat[ties] * 2) / 2
+    flash_lon[ties] = np.round(flash_lon[ties] * 2) / 2
+    flash_lat[:4] = [-90., 90., cts.FPOUT_LAT_MIN, cts.FPOUT_LAT_MAX]
+    flash_lon[:4] = [-180., 180., cts.FPOUT_LON_MIN, cts.FPOUT_LON_MAX]
+    flash_energy = 10 ** rng.uniform(cts.f_en_min_bin - 0.5, cts.f_en_max_bin + 0.5, n_flashes)
+    flash_area = 10 ** rng.uniform(cts.f_ar_min_bin - 0.5, cts.f_ar_max_bin + 0.5, n_flashes)
+    flash_energy[rng.random(n_flashes) < 0.05] = np.nan
+    flash_area[rng.random(n_flashes) < 0.05] = np.nan
+    return flash_lat, flash_lon, flash_energy, flash_area
+
+
+def get_fp_out_grid(grid_res=cts.GRID_RESOLUTION):
+    """
+    Latitudes and longitudes of the regrid target grid (FLEXPART output grid)
+    """
+    return np.arange(cts.FPOUT_LAT_MIN, cts.FPOUT_LAT_MAX + grid_res, grid_res), \
+        np.arange(cts.FPOUT_LON_MIN, cts.FPOUT_LON_MAX + grid_res, grid_res)
+
+
+@pytest.mark.parametrize('n_flashes', [7, 5000, 50000])
+def test_get_nearest_grid_index_same_as_sel(n_flashes):
+    flash_lat, flash_lon, _, _ = get_synthetic_flashes(n_flashes)
+    for values, grid_values in zip([flash_lat, flash_lon], get_fp_out_grid()):
+        grid_da = xr.DataArray(grid_values, dims='grid', coords={'grid': grid_values})
+        np.testing.assert_array_equal(grid_values[xr_pd_utils.get_nearest_grid_index(values, grid_values)],
+                                      grid_da.sel(grid=values, method='nearest').values)
+
+
+@pytest.mark.parametrize('n_flashes', [7, 5000, 50000])
+def test_count_using_bincount_same_as_pandas(n_flashes):
+    flash_lat, flash_lon, flash_energy, _ = get_synthetic_flashes(n_flashes)
+    latitudes, longitudes = get_fp_out_grid()
+    lat_index = xr_pd_utils.get_nearest_grid_index(flash_lat, latitudes)
+    lon_index = xr_pd_utils.get_nearest_grid_index(flash_lon, longitudes)
+    _ds = xr.Dataset({
+        'flash_energy': ('flash', flash_energy),
+        'latitude': ('flash', latitudes[lat_index]),
+        'longitude': ('flash', longitudes[lon_index])
+    })
+    # cells without any flash: NaN, cells with flashes without valid energy only: 0 (same as the 'index' engine)
+    count_da = xr_pd_utils.count_using_pandas(_ds, data_var_name='flash_energy', res_var_name='flash_count') \
+        ['flash_count'].reindex(latitude=latitudes, longitude=longitudes)
+    cell_index = lat_index * longitudes.size + lon_index
+    flash_count = xr_pd_utils.count_using_bincount(cell_index, n_cells=latitudes.size * longitudes.size,
+                                                   mask=~np.isnan(flash_energy))
+    lit_cells = xr_pd_utils.count_using_bincount(cell_index, n_cells=latitudes.size * longitudes.size) > 0
+    np.testing.assert_array_equal(np.where(lit_cells, flash_count, np.nan).reshape(latitudes.size, longitudes.size),
+                                  count_da.values)
+
+
+@pytest.mark.parametrize('n_flashes', [7, 5000, 50000])
+def test_histogram_using_pandas_same_as_cdf(n_flashes):
+    flash_lat, flash_lon, flash_energy, _ = get_synthetic_flashes(n_flashes)
+    grid_values = np.arange(-5., 5.5, 0.5)
+    _ds = xr.Dataset({
+        'flash_energy_log': ('flash', np.log10(flash_energy)),
+        'latitude': ('flash', grid_values[xr_pd_utils.get_nearest_grid_index(flash_lat / 18, grid_values)]),
+        'longitude': ('flash', grid_values[xr_pd_utils.get_nearest_grid_index(flash_lon / 36, grid_values)])
+    })
+    hist_kwargs = dict(data_var_name='flash_energy_log', min_bin_edge=cts.f_en_min_bin, max_bin_edge=cts.f_en_max_bin,
+                       step=cts.f_en_hist_step, res_var_name='flash_energy_log_hist')
+    xr.testing.assert_identical(xr_pd_utils.histogram_using_pandas(_ds, **hist_kwargs),
+                                histogram_using_pandas_cdf(_ds, **hist_kwargs))
+
+
+@pytest.mark.parametrize('n_flashes', [7, 5000, 50000])
+@pytest.mark.parametrize('output_format', cts.REGRID_FORMATS)
+def test_regrid_lightning_flashes_index_same_as_pandas(n_flashes, output_format):
+    flashes = get_synthetic_flashes(n_flashes)
+    regrid_kwargs = dict(flash_time=pd.Timestamp('2018-06-01 12:00'), grid_res=cts.GRID_RESOLUTION,
+                         attrs={'platform_ID': 'G16'}, output_format=output_format)
+    xr.testing.assert_identical(
+        sat_regrid.regrid_lightning_flashes(*flashes, engine=cts.REGRID_ENGINE_INDEX, **regrid_kwargs),
+        sat_regrid.regrid_lightning_flashes(*flashes, engine=cts.REGRID_ENGINE_PANDAS, **regrid_kwargs)
+    )
+
+
+def test_regrid_lightning_flashes_several_hours_and_domain():
+    flashes = get_synthetic_flashes(5000, seed=1)
+    flash_time = pd.Timestamp('2018-06-01 12:00') + pd.to_timedelta(np.arange(5000) % 3, 'h')
+    regrid_kwargs = dict(flash_time=flash_time.values, grid_res=cts.GRID_RESOLUTION,
+                         domain={'LAT_MIN': -30., 'LAT_MAX': 45.3, 'LON_MIN': -120., 'LON_MAX': 10.})
+    index_ds = sat_regrid.regrid_lightning_flashes(*flashes, engine=cts.REGRID_ENGINE_INDEX, **regrid_kwargs)
+    assert index_ds.sizes['time'] == 3
+    xr.testing.assert_identical(
+        index_ds, sat_regrid.regrid_lightning_flashes(*flashes, engine=cts.REGRID_ENGINE_PANDAS, **regrid_kwargs))
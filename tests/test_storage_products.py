@@ -0,0 +1,172 @@
+"""
+Tests of the storage products built from the hourly regrid files: flash count cube (round trip and cumulative window
+sums), satellite file catalogue (date range queries) and regrid reference indexes (fallback to the regrid files and
+stale indexes). Everything is written in pytest temporary directories
+"""
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+import xarray as xr
+
+import sat_regrid
+from utils import constants as cts
+from utils import flash_count_cube
+from utils import regrid_encoding_utils
+from utils import regrid_reference_index
+from utils import sparse_regrid_utils
+from utils.sat_file_catalogue import SatFileCatalogue, get_sat_file_catalogue_path
+
+# small domain (flash count cube and regrid files)
+LATITUDES = np.arange(-9.75, 10., 0.5)
+LONGITUDES = np.arange(-79.75, -60., 0.5)
+DOMAIN = {'LAT_MIN': -10., 'LAT_MAX': 10., 'LON_MIN': -80., 'LON_MAX': -60.}
+
+
+def get_synthetic_flash_count_da(rng, latitudes=LATITUDES, longitudes=LONGITUDES):
+    """
+    Hourly flash count over a grid, NaN where there is no flash (as in the regrid files)
+    """
+    flash_count = rng.integers(1, 9, (len(latitudes), len(longitudes))).astype(float)
+    flash_count[rng.random(flash_count.shape) > 0.1] = np.nan
+    return xr.DataArray(flash_count, dims=('latitude', 'longitude'),
+                        coords={'latitude': latitudes, 'longitude': longitudes})
+
+
+def write_flash_count_cube(target_dir, hours, seed=0):
+    """
+    Writes the given hours of 2018 into a G16 flash count cube
+    :return: <dict> { <pandas.Timestamp>: <xarray.DataArray> flash count written }
+    """
+    rng = np.random.default_rng(seed)
+    cube_path = flash_count_cube.get_flash_count_cube_path(2018, cts.GRID_RESOLUTION_STR, 'G16', target_dir=target_dir)
+    flash_count_dict = {}
+    with flash_count_cube.FlashCountCube(cube_path, year=2018, latitudes=LATITUDES, longitudes=LONGITUDES,
+                                         writable=True) as cube:
+        for hour in hours:
+            date = pd.Timestamp('2018-01-01') + pd.Timedelta(hour, 'h')
+            flash_count_dict[date] = get_synthetic_flash_count_da(rng)
+            cube.write_hour(date, flash_count_dict[date])
+    return flash_count_dict
+
+
+def write_regrid_files(dir_path, start_date, n_hours, seed=0):
+    """
+    Writes hourly regrid files (compact encoding) of random flashes over DOMAIN
+    :return: <list> [ <pathlib.Path>, ... ]
+    """
+    rng = np.random.default_rng(seed)
+    dir_path.mkdir(parents=True, exist_ok=True)
+    file_list = []
+    for hour in range(n_hours):
+        date = start_date + pd.Timedelta(hour, 'h')
+        n_flashes = 200
+        regrid_ds = sat_regrid.regrid_lightning_flashes(
+            rng.uniform(-10., 10., n_flashes), rng.uniform(-80., -60., n_flashes),
+            10 ** rng.uniform(cts.f_en_min_bin, cts.f_en_max_bin, n_flashes),
+            10 ** rng.uniform(cts.f_ar_min_bin, cts.f_ar_max_bin, n_flashes),
+            flash_time=date, grid_res=cts.GRID_RESOLUTION, domain=DOMAIN, attrs={'platform_ID': 'G16'}
+        )
+        regrid_ds.attrs[cts.REGRID_ENCODING_ATTR] = cts.COMPACT_ENCODING_PROFILE
+        file_path = dir_path / f'{cts.GRID_RESOLUTION_STR}_{cts.GLM_PATH_PREFIX}_G16_{date.year}_' \
+                               f'{date.dayofyear:03d}_{date.hour:02d}-{date.hour + 1:02d}.nc'
+        regrid_ds.to_netcdf(file_path, encoding=regrid_encoding_utils.get_regrid_encoding(
+            regrid_ds, encoding_profile=cts.COMPACT_ENCODING_PROFILE))
+        file_list.append(file_path)
+    return file_list
+
+
+def test_flash_count_cube_round_trip(tmp_path):
+    flash_count_dict = write_flash_count_cube(tmp_path, hours=[0, 1, 5, 30])
+    flash_count_da = flash_count_cube.open_flash_count_cube_da(
+        pd.Timestamp('2018-01-01'), pd.Timestamp('2018-01-02 12:00'), cts.GRID_RESOLUTION_STR, 'G16',
+        target_dir=tmp_path, masked=True
+    )
+    assert flash_count_da.sizes['time'] == 37
+    for date in flash_count_da.time.values:
+        expected_da = flash_count_dict.get(pd.Timestamp(date))
+        if expected_da is None:
+            # hours never written: no flash
+            assert flash_count_da.sel(time=date).isnull().all()
+        else:
+            np.testing.assert_array_equal(flash_count_da.sel(time=date).values, expected_da.values)
+    np.testing.assert_array_equal(flash_count_da.latitude.values, LATITUDES)
+    np.testing.assert_array_equal(flash_count_da.longitude.values, LONGITUDES)
+
+
+def test_flash_count_cube_cumulative_window_sum(tmp_path):
+    write_flash_count_cube(tmp_path, hours=range(0, 100, 3), seed=1)
+    flash_count_cube.update_cumulative_flash_count_cube(2018, cts.GRID_RESOLUTION_STR, 'G16', target_dir=tmp_path)
+    flash_count_da = flash_count_cube.open_flash_count_cube_da(
+        pd.Timestamp('2018-01-01'), pd.Timestamp('2018-01-05 12:00'), cts.GRID_RESOLUTION_STR, 'G16',
+        target_dir=tmp_path, masked=True
+    )
+    start_dates = pd.to_datetime(['2018-01-01 02:00', '2018-01-02 05:00', '2018-01-04 00:00'])
+    end_dates = pd.to_datetime(['2018-01-03 00:00', '2018-01-05 03:00', '2018-01-04 00:00'])
+    window_sum_da = flash_count_cube.get_flash_count_window_sum_da(start_dates, end_dates, cts.GRID_RESOLUTION_STR,
+                                                                   'G16', target_dir=tmp_path)
+    for window_index, (start_date, end_date) in enumerate(zip(start_dates, end_dates)):
+        np.testing.assert_array_equal(window_sum_da.values[window_index],
+                                      flash_count_da.sel(time=slice(start_date, end_date)).sum('time').values)
+
+
+def test_sat_file_catalogue_date_range(tmp_path):
+    regrid_dir_path = tmp_path / cts.REGRID_GLM_DIRNAME / '2018'
+    file_list = []
+    for day_of_year in [150, 151]:
+        dir_path = regrid_dir_path / f'{cts.GRID_RESOLUTION_STR}_{cts.GLM_PATH_PREFIX}_2018_{day_of_year}'
+        dir_path.mkdir(parents=True)
+        for hour in range(24):
+            file_path = dir_path / f'{cts.GRID_RESOLUTION_STR}_{cts.GLM_PATH_PREFIX}_G16_2018_{day_of_year}_' \
+                                   f'{hour:02d}-{hour + 1:02d}.nc'
+            file_path.touch()
+            file_list.append(file_path)
+        # not satellite files / files being written
+        (dir_path / 'notes.txt').touch()
+        (dir_path / f'temp_{file_list[-1].name}').touch()
+    with SatFileCatalogue(get_sat_file_catalogue_path(tmp_path)) as catalogue:
+        assert catalogue.refresh(target_dir=tmp_path) == 2
+        assert catalogue.get_file_list(regrid=True) == file_list
+        # hours ending after the start date and starting before the end date (2018-05-30 = day 150)
+        assert catalogue.get_file_list(regrid=True, start_date=pd.Timestamp('2018-05-30 22:30'),
+                                       end_date=pd.Timestamp('2018-05-31 02:00'),
+                                       regrid_res_str=cts.GRID_RESOLUTION_STR) == file_list[22:27]
+        assert catalogue.get_file_list(regrid=True, sat_version='MOSAIC') == []
+        assert catalogue.get_file_list(regrid=False) == []
+        # removed file: catalogued again only when its directory is refreshed
+        file_list[0].unlink()
+        assert catalogue.refresh_dirs([file_list[0].parent]) == 1
+        assert catalogue.get_file_list(regrid=True, end_date=pd.Timestamp('2018-05-30 01:00')) == file_list[1:2]
+
+
+def test_regrid_reference_index_fallback(tmp_path):
+    dir_path = tmp_path / f'{cts.GRID_RESOLUTION_STR}_{cts.GLM_PATH_PREFIX}_2018_150'
+    file_list = write_regrid_files(dir_path, pd.Timestamp('2018-05-30'), n_hours=4)
+    regrid_ds = sparse_regrid_utils.open_regrid_mfdataset(file_list).load()
+    # no index yet: fallback to the regrid files, index built
+    assert not regrid_reference_index.is_regrid_reference_index_up_to_date(dir_path)
+    xr.testing.assert_identical(
+        regrid_reference_index.open_regrid_mfdataset_from_index(file_list, update_index=True).load(), regrid_ds
+    )
+    assert regrid_reference_index.is_regrid_reference_index_up_to_date(dir_path)
+    assert regrid_reference_index._get_indexed_file_entries(file_list)[1] == []
+    # indexed open: lazy dataset, one chunk per hourly file
+    indexed_ds = regrid_reference_index.open_regrid_mfdataset_from_index(file_list)
+    assert indexed_ds.flash_count.chunks[0] == (1,) * len(file_list)
+    xr.testing.assert_identical(indexed_ds.load(), regrid_ds)
+    xr.testing.assert_identical(regrid_reference_index.open_regrid_mfdataset_from_index(file_list[1:3]).load(),
+                                sparse_regrid_utils.open_regrid_mfdataset(file_list[1:3]).load())
+    # hour regridded again (file replaced): stale index until updated
+    temp_file_path = dir_path / f'temp_{file_list[0].name}'
+    shutil.copy2(file_list[0], temp_file_path)
+    os.replace(temp_file_path, file_list[0])
+    # (index made older than the directory whatever the mtime resolution of the file system)
+    index_path = regrid_reference_index.get_regrid_reference_index_path(dir_path)
+    os.utime(index_path, ns=(os.stat(index_path).st_atime_ns, os.stat(dir_path).st_mtime_ns - 10 ** 9))
+    assert not regrid_reference_index.is_regrid_reference_index_up_to_date(dir_path)
+    assert regrid_reference_index._get_indexed_file_entries(file_list)[1] == [dir_path]
+    xr.testing.assert_identical(
+        regrid_reference_index.open_regrid_mfdataset_from_index(file_list, update_index=True).load(), regrid_ds
+    )
+    assert regrid_reference_index._get_indexed_file_entries(file_list)[1] == []
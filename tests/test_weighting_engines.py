@@ -0,0 +1,139 @@
+"""
+Equivalence tests of the weighting engines: the lazy, streaming, releases, age and sparse engines must give the same
+weighted flash count as the eager engine (merged FLEXPART output / satellite dataset). The FLEXPART output is a
+synthetic backward simulation written in a pytest temporary directory (FLEXPART variables and attributes used by the
+weighting only), the satellite dataset is built in memory
+"""
+import numpy as np
+import pandas as pd
+import pytest
+import xarray as xr
+
+fpout_sat_comparison = pytest.importorskip('fpout_sat_comparison')
+
+LATITUDES = np.arange(-9.75, 10., 0.5)
+LONGITUDES = np.arange(-79.75, -60., 0.5)
+IETIME = pd.Timestamp('2018-06-10 03:00')
+FP_CHUNKS = {'time': 24}
+
+
+def write_synthetic_fp_out(fpout_path, n_releases=5, n_days=10, seed=0):
+    """
+    Backward FLEXPART output (decreasing time steps, one hour apart, ending at the simulation start date iedate /
+    ietime) with releases up to 40 hours before the simulation start date and sparse sensitivities over 2 heights
+    """
+    rng = np.random.default_rng(seed)
+    times = pd.date_range(end=IETIME, periods=n_days * 24 + 1, freq='h')[::-1][1:]
+    release_end = -pd.to_timedelta(rng.integers(0, 40 * 3600, n_releases), unit='s')
+    spec001_mr = rng.gamma(0.3, 1., (1, n_releases, len(times), 2, len(LATITUDES), len(LONGITUDES))).astype('float32')
+    spec001_mr[spec001_mr < 0.2] = 0.
+    xr.Dataset(
+        {
+            'spec001_mr': (('nageclass', 'numpoint', 'time', 'height', 'latitude', 'longitude'), spec001_mr),
+            'RELEND': ('numpoint', release_end.values),
+            'RELSTART': ('numpoint', (release_end - pd.Timedelta('10min')).values),
+            'RELLAT1': ('numpoint', rng.uniform(-5., 5., n_releases)),
+            'RELLNG1': ('numpoint', rng.uniform(-75., -65., n_releases)),
+        },
+        coords={'time': times, 'latitude': LATITUDES, 'longitude': LONGITUDES, 'height': [500., 1000.]},
+        attrs={'iedate': IETIME.strftime('%Y%m%d'), 'ietime': IETIME.strftime('%H%M%S')}
+    ).to_netcdf(fpout_path)
+    return fpout_path
+
+
+def get_synthetic_sat_ds(n_days=12, seed=1, missing_hours=False, latitudes=LATITUDES, longitudes=LONGITUDES):
+    """
+    Hourly flash count (NaN where there is no flash) covering the FLEXPART output and some hours after it, with some
+    missing hours if missing_hours
+    """
+    rng = np.random.default_rng(seed)
+    times = pd.date_range(end=IETIME + pd.Timedelta(3, 'h'), periods=n_days * 24, freq='h')
+    flash_count = rng.integers(1, 50, (len(times), len(latitudes), len(longitudes))).astype('float32')
+    flash_count[rng.random(flash_count.shape) > 0.02] = np.nan
+    sat_ds = xr.Dataset({'flash_count': (('time', 'latitude', 'longitude'), flash_count)},
+                        coords={'time': times, 'latitude': latitudes, 'longitude': longitudes})
+    if missing_hours:
+        sat_ds = sat_ds.drop_isel(time=list(range(100, 113)) + [150, 170])
+    return sat_ds
+
+
+@pytest.fixture
+def fpout_path(tmp_path, monkeypatch):
+    # FLEXPART output opened lazily as fpout.open_fp_dataset does (release variables loaded)
+    def open_fp_dataset(fpout_path, chunks='auto', max_chunk_size=1e8, assign_releases_position_coords=False):
+        fp_ds = xr.open_dataset(fpout_path, chunks=FP_CHUNKS if chunks == 'auto' else chunks)
+        return fp_ds.assign({var: fp_ds[var].load() for var in fp_ds.data_vars if 'REL' in var})
+
+    monkeypatch.setattr(fpout_sat_comparison, 'open_fp_dataset', open_fp_dataset)
+    return write_synthetic_fp_out(tmp_path / 'grid_time_20180610030000.nc')
+
+
+@pytest.fixture(params=['full', 'missing_hours', 'sub_grid'])
+def sat_ds(request):
+    if request.param == 'sub_grid':
+        # regrid files cropped to a sub-domain of the FLEXPART grid
+        return get_synthetic_sat_ds(latitudes=LATITUDES[5:30], longitudes=LONGITUDES[3:20])
+    return get_synthetic_sat_ds(missing_hours=request.param == 'missing_hours')
+
+
+def assert_same_weighted_flash_count(weighted_fp_sat_ds, eager_ds):
+    eager_da = eager_ds['weighted_flash_count'].compute()
+    weighted_flash_count_da = weighted_fp_sat_ds['weighted_flash_count'].compute().transpose(*eager_da.dims)
+    np.testing.assert_array_equal(weighted_flash_count_da.time.values, eager_da.time.values)
+    np.testing.assert_allclose(weighted_flash_count_da.values, eager_da.values, rtol=1e-5)
+    for var in eager_ds.data_vars:
+        if 'REL' in var:
+            xr.testing.assert_identical(weighted_fp_sat_ds[var], eager_ds[var])
+
+
+@pytest.fixture
+def eager_ds(fpout_path, sat_ds):
+    return fpout_sat_comparison.get_weighted_fp_sat_ds(fpout_sat_comparison.get_fp_out_ds_7days(fpout_path), sat_ds)
+
+
+def test_lazy_engine_same_as_eager(fpout_path, sat_ds, eager_ds):
+    fp_ds = fpout_sat_comparison.get_fp_out_ds_7days(fpout_path, lazy=True)
+    assert_same_weighted_flash_count(fpout_sat_comparison.get_weighted_fp_sat_lazy_ds(fp_ds, sat_ds), eager_ds)
+
+
+@pytest.mark.parametrize('slab_hours', [7, 24, 1000])
+def test_streaming_engine_same_as_eager(fpout_path, sat_ds, eager_ds, slab_hours):
+    fp_ds = fpout_sat_comparison.get_fp_out_ds_7days(fpout_path, lazy=True, lazy_chunks={'pointspec': 1})
+    assert_same_weighted_flash_count(
+        fpout_sat_comparison.get_weighted_fp_sat_streaming_ds(fp_ds, sat_ds, slab_hours=slab_hours), eager_ds
+    )
+
+
+def test_releases_engine_same_as_eager(fpout_path, sat_ds, eager_ds):
+    with fpout_sat_comparison.get_fp_out_release_windows(fpout_path) as fp_release_windows:
+        assert_same_weighted_flash_count(
+            fpout_sat_comparison.get_weighted_fp_sat_release_windows_ds(fp_release_windows, sat_ds), eager_ds
+        )
+
+
+def test_sparse_engine_same_as_eager(fpout_path, sat_ds, eager_ds):
+    # no threshold and no top_k: every non-zero cell kept
+    sparse_fp_ds = fpout_sat_comparison.get_sparse_footprint_ds(fpout_path, slab_hours=24)
+    weighted_fp_sat_ds = fpout_sat_comparison.get_weighted_fp_sat_sparse_ds(sparse_fp_ds, sat_ds)
+    assert_same_weighted_flash_count(weighted_fp_sat_ds, eager_ds)
+    np.testing.assert_allclose(weighted_fp_sat_ds['retained_mass_fraction'].values, 1., rtol=1e-5)
+
+
+def test_age_engine_same_as_eager(fpout_path, sat_ds, eager_ds):
+    eager_da = eager_ds['weighted_flash_count'].compute()
+    with fpout_sat_comparison.get_fp_out_release_windows(fpout_path) as fp_release_windows:
+        age_da = fpout_sat_comparison.get_weighted_fp_sat_age_ds(fp_release_windows, sat_ds)['weighted_flash_count'] \
+            .compute()
+        release_start_dates = fp_release_windows.release_start_dates.values
+    assert age_da.dims == ('age', 'pointspec')
+    for age_index, age in enumerate(age_da.age.values):
+        for release_index in range(age_da.sizes['pointspec']):
+            date = age_da.time.values[age_index, release_index]
+            assert date == release_start_dates[release_index] - np.timedelta64(int(age), 'h')
+            weighted_flash_count = float(age_da.values[age_index, release_index])
+            if date in eager_da.time.values and date in sat_ds.time.values:
+                assert weighted_flash_count == pytest.approx(
+                    float(eager_da.sel(time=date).isel(pointspec=release_index)), rel=1e-5)
+            else:
+                # hours without FLEXPART output or satellite data
+                assert weighted_flash_count == 0.
@@ -0,0 +1,88 @@
+"""
+Watch mode: regrid the new pre-regrid hourly GLM files as they land in pre_regrid_hourly_glm (runs until interrupted)
+python watch_regrid_glm_files.py --logname watch_regrid_glm --workers 4 --layout daily
+"""
+import argparse
+import logging
+import pathlib
+from sys import argv
+
+import common.log
+from common.log import logger
+from common.utils import timestamp_now_formatted, short_list_repr
+
+from softioli import sat_regrid_watch
+from softioli import constants as cts
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+
+    default_logdir = pathlib.Path(cts.DEFAULT_LOGDIR, 'watch_regrid_glm_files')
+    parser.add_argument('-l', '--logdir', default=default_logdir, help=f'log directory; default is {default_logdir}',
+                        type=pathlib.Path)
+    parser.add_argument('--logname',
+                        help='Log file prefix, resulting log file will be of the form "YYYY-MM-DD_HHmm_<log_file_prefix>.log" with YYYY: year, MM: month, DD: day, HH: hour, mm: minutes',
+                        default='watch_regrid_glm_files')
+    parser.add_argument('--loglevel',
+                        help='logging level, default=logging.DEBUG(10) - other values: INFO=10, WARNING=30, ERROR=40, CRITICAL=50',
+                        default=logging.DEBUG, type=int)
+
+    parser.add_argument('-s', '--sat-name', default=cts.GOES_SATELLITE_GLM,
+                        help=f'satellite name, supported satellites so far: "{cts.GOES_SATELLITE_GLM}" (default value)')
+    parser.add_argument('--regrid-res-str', default=cts.GRID_RESOLUTION_STR, nargs='+',
+                        help=f'grid resolution (str), default = "{cts.GRID_RESOLUTION_STR}", several values (one per --regrid-res value) to regrid on several grids')
+    parser.add_argument('--regrid-res', default=cts.GRID_RESOLUTION, nargs='+', type=float,
+                        help=f'grid resolution (float), default = {cts.GRID_RESOLUTION}')
+    parser.add_argument('--engine', choices=cts.REGRID_ENGINES, default=cts.REGRID_ENGINE_PANDAS,
+                        help=f'regrid engine (default = "{cts.REGRID_ENGINE_PANDAS}")')
+    parser.add_argument('--layout', choices=cts.REGRID_LAYOUTS, default=cts.HOURLY_LAYOUT,
+                        help=f'regrid file layout (default = "{cts.HOURLY_LAYOUT}"), "{cts.DAILY_LAYOUT}"/"{cts.MONTHLY_LAYOUT}": consolidated files updated after each batch of new hours')
+    parser.add_argument('--output-format', choices=cts.REGRID_FORMATS, default=cts.REGRID_DENSE_FORMAT,
+                        help=f'hourly regrid file format (default = "{cts.REGRID_DENSE_FORMAT}")')
+    parser.add_argument('--encoding-profile', choices=list(cts.REGRID_ENCODING_PROFILES),
+                        default=cts.DEFAULT_REGRID_ENCODING_PROFILE,
+                        help=f'netcdf encoding profile of the regrid files (default = "{cts.DEFAULT_REGRID_ENCODING_PROFILE}")')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='number of worker processes used to regrid the new files (default = 1)')
+    parser.add_argument('--max-memory', type=float,
+                        help='memory ceiling of each regrid in MB (per worker)')
+
+    parser.add_argument('--poll-interval', type=float, default=cts.REGRID_WATCH_POLL_INTERVAL,
+                        help=f'seconds between two scans of the pre-regrid daily directories (default = {cts.REGRID_WATCH_POLL_INTERVAL})')
+    parser.add_argument('--settle-time', type=float, default=cts.REGRID_WATCH_SETTLE_TIME,
+                        help=f'a file is regridded once its size and mtime did not change for this number of seconds (default = {cts.REGRID_WATCH_SETTLE_TIME})')
+    parser.add_argument('--lookback-days', type=int, default=cts.REGRID_WATCH_LOOKBACK_DAYS,
+                        help=f'daily directories watched: from today - lookback days to today (default = {cts.REGRID_WATCH_LOOKBACK_DAYS})')
+    parser.add_argument('--no-notifications', action='store_true',
+                        help='only poll, do NOT use filesystem notifications (used if the watchdog package is installed)')
+
+    parser.add_argument('--input-root-dir', type=pathlib.Path,
+                        help='root directory of the pre-regrid files (if different from default, mostly used when testing)')
+    parser.add_argument('--res-path', type=pathlib.Path,
+                        help='root directory of the regrid files (if different from default, mostly used when testing)')
+
+    args = parser.parse_args()
+
+    # logs
+    if not args.logdir.exists():
+        args.logdir.mkdir(parents=True)
+    timenow = timestamp_now_formatted(cts.TIMESTAMP_FORMAT, tz="CET")
+    logfile = str(pathlib.Path(default_logdir, f'{timenow}_{args.logname}.log'))
+    common.log.start_logging(logfile, logging_level=args.loglevel)
+
+    print(args)
+    cmd_line = ' '.join(argv)
+    logger().info(f'Running: {cmd_line}')
+    logger().debug(f'Arguments passed : {args}')
+
+    watch_summary = sat_regrid_watch.watch_pre_regrid_files(
+        sat_name=args.sat_name, grid_res=args.regrid_res, grid_res_str=args.regrid_res_str,
+        target_dir=args.input_root_dir, result_dir_path=args.res_path, workers=args.workers,
+        poll_interval=args.poll_interval, settle_time=args.settle_time, lookback_days=args.lookback_days,
+        use_notifications=not args.no_notifications, engine=args.engine, layout=args.layout,
+        output_format=args.output_format, encoding_profile=args.encoding_profile, max_memory_mb=args.max_memory)
+
+    for status, file_list in watch_summary.items():
+        logger().info(f'{len(file_list)} files {status}')
+        logger().debug(f'{status}: {short_list_repr(file_list)}')